@@ -0,0 +1,77 @@
+"""
+Measures the memory every prompt directory of a large listing takes up when kept as plain objects with a __dict__ (how
+the models used to be), as slotted ImagePromptDirectory records and in DirectoryColumns.
+
+One in ten prompts repeats the prompt from a few entries before, as happens when the same prompt is generated again.
+Memory is measured with tracemalloc so it includes the strings of every field.
+
+Run from the project root with : python benchmarks/bench_model_memory.py [entries ...]
+"""
+import gc
+import sys
+import tracemalloc
+from datetime import date as Date, timedelta
+from pathlib import Path
+from typing import Callable, Iterator, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent/"src"))
+
+from repoManager.DirectoryColumns import DirectoryColumns
+from repoManager.Models import ImagePromptDirectory
+
+
+REPO = "Dall-e"
+DIRECTORIES_PER_DAY = 100
+
+
+class PlainDirectory(object):
+    def __init__(self, prompt: str, repo: str, date: str, time: str):
+        self.prompt = prompt
+        self.repo = repo
+        self.date = date
+        self.time = time
+
+
+def generate_fields(numEntries: int) -> Iterator[Tuple[str, str, str]]:
+    # Fields are made fresh for every entry, like they are when listed from the file system or the catalog
+    firstDate = Date(2024, 1, 1)
+    for i in range(numEntries):
+        day, second = divmod(i, DIRECTORIES_PER_DAY)
+        prompt = f"A photo of {i - 5 if i % 10 == 5 else i} cats wearing sad hats"
+        yield (firstDate + timedelta(days=day)).isoformat(), f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}.{i % 1000000:06d}", prompt
+
+
+def list_plain(numEntries: int):
+    return [PlainDirectory(prompt, REPO, date, time) for date, time, prompt in generate_fields(numEntries)]
+
+
+def list_records(numEntries: int):
+    return [ImagePromptDirectory(prompt, REPO, date, time) for date, time, prompt in generate_fields(numEntries)]
+
+
+def list_columns(numEntries: int):
+    listing = DirectoryColumns(REPO)
+    for date, time, prompt in generate_fields(numEntries):
+        listing.append_values(date, time, prompt)
+    return listing
+
+
+def measure(build: Callable[[int], object], numEntries: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    listing = build(numEntries)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del listing
+    return current / numEntries
+
+
+def main(entryCounts=(100000, 1000000)):
+    for numEntries in entryCounts:
+        print(f"{numEntries} entries")
+        for name, build in [("plain objects", list_plain), ("slotted records", list_records), ("columns", list_columns)]:
+            print(f"    {name:<16} {measure(build, numEntries):8.1f} bytes per entry")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (100000, 1000000))
@@ -0,0 +1,37 @@
+"""
+Compares the cost of preparing provider images for saving with the passthrough fast path (magic bytes and header checks)
+against always decoding and re-encoding them as PNG.
+
+Run from the project root with : python benchmarks/bench_save_image.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent/"src"))
+
+from utils.imageFormats import can_pass_through, transcode_image
+
+
+IMAGES_PATH = Path(__file__).resolve().parent.parent/"testResources"/"images"/"ai"
+
+
+def passthrough(imageBytes: bytes) -> bytes:
+    return imageBytes if can_pass_through(imageBytes) is not None else transcode_image(imageBytes, "PNG")
+
+
+def reencode(imageBytes: bytes) -> bytes:
+    return transcode_image(imageBytes, "PNG")
+
+
+def main(repeat: int = 5):
+    for imagePath in sorted(IMAGES_PATH.iterdir()):
+        imageBytes = imagePath.read_bytes()
+        print(f"{imagePath.name} ({len(imageBytes) / 1024:.0f} KiB)")
+        for name, prepare in [("passthrough", passthrough), ("re-encode", reencode)]:
+            seconds = min(timeit.repeat(lambda: prepare(imageBytes), number=1, repeat=repeat))
+            print(f"    {name:<12} {seconds * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,16 @@ def normalize_item(item):
     return (key, value)
 
 
+def get_fields(obj) -> dict:
+    """
+    Gets the attributes of an object by name, whether they are kept in its __dict__ or in __slots__.
+    """
+    if(hasattr(obj, "__dict__")):
+        return vars(obj)
+    names = [name for cls in reversed(type(obj).__mro__) for name in getattr(cls, "__slots__", ())]
+    return dict((name, getattr(obj, name)) for name in names if hasattr(obj, name))
+
+
 def auto_str(cls):
     """
     Decorator that automatically creates a "to string" method when str is called on the object
@@ -21,7 +31,7 @@ def auto_str(cls):
     def __str__(self):
         return '%s(%s)' % (
             type(self).__name__,
-            ', '.join('%s=%s' % normalize_item(item) for item in vars(self).items())
+            ', '.join('%s=%s' % normalize_item(item) for item in get_fields(self).items())
         )
     cls.__str__ = __str__
     return cls
\ No newline at end of file
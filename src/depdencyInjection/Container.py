@@ -1,6 +1,7 @@
 from dependency_injector import containers, providers
 from imageProviders.DalleProvider import DalleProvider
 from repoManager.RepoManager import RepoManager
+from repoManager.StorageBudget import StorageBudget
 from speechRecognition.GoogleSpeachRecognizer import GoogleSpeechRecognizer
 from ui.widgets.MainWindow import MainWindow
 from ui.QApplicationManager import QApplicationManager
@@ -37,10 +38,24 @@ class Container(containers.DeclarativeContainer):
         GoogleSpeechRecognizer
     )
 
+    storageBudget = providers.Singleton(
+        StorageBudget,
+        maxBytes=config.repos.budgetBytes,
+        maxImages=config.repos.budgetImages,
+        archivePath=config.repos.archivePath,
+    )
+
     repoManager = providers.Singleton(
         RepoManager,
         config.repos.imageReposPath,
         config.repos.startingRepo,
+        useCatalog=config.repos.useCatalog,
+        pageCacheBytes=config.repos.pageCacheBytes,
+        watchRepo=config.repos.watchRepo,
+        asyncSaves=config.repos.asyncSaves,
+        packAfterDays=config.repos.packAfterDays,
+        storageFormat=config.repos.storageFormat,
+        storageBudget=storageBudget,
     )
 
     home = providers.Singleton(HomePage, repoManager, imageProvider, speechRecognizer)
@@ -63,5 +78,6 @@ class Container(containers.DeclarativeContainer):
         qApplicationManager,
         home,
         gallery,
-        mainWindow
+        mainWindow,
+        repoManager
     )
\ No newline at end of file
@@ -2,16 +2,24 @@
 from depdencyInjection.Container import Container
 from imageProviders.DalleProvider import ENGINE_NAME
 from utils.loggingUtils import configureBasicLogger
-from utils.pathingUtils import get_or_create_image_repos
+from utils.pathingUtils import get_or_create_image_repos, get_resources
 
 
 configureBasicLogger()
 
 
+# Optional overrides of the defaults below (ex: repos.packAfterDays), only read if it exists
+USER_CONFIG = get_resources()/"configs"/"config.yml"
+
+
 def main() -> None:
     container = Container()
     container.config.repos.imageReposPath.from_value(get_or_create_image_repos())
     container.config.repos.startingRepo.from_value(ENGINE_NAME)
+    container.config.repos.useCatalog.from_value(True)
+    container.config.repos.pageCacheBytes.from_value(32 * 1024 * 1024)
+    container.config.repos.asyncSaves.from_value(True)
+    container.config.from_yaml(USER_CONFIG.as_posix())
 
     container.uiOrchestrator().start()
 
@@ -0,0 +1,164 @@
+
+import argparse
+import logging
+from contextlib import closing
+from pathlib import Path
+
+from datetime import datetime
+
+from imageProviders.DalleProvider import ENGINE_NAME
+from repoManager.Exporter import EXPORT_FORMATS
+from repoManager.Fsck import FSCK_ACTIONS
+from repoManager.ImageMetadata import backfill_metadata
+from repoManager.Importer import IMPORT_MODES
+from repoManager.Mirror import DEFAULT_WORKERS as MIRROR_WORKERS
+from repoManager.Reencoder import reencode_repo
+from repoManager.RepoManager import RepoManager
+from repoManager.Thumbnails import backfill_thumbnails
+from utils.imageFormats import STORAGE_FORMATS
+from utils.loggingUtils import configureBasicLogger
+from utils.pathingUtils import get_image_repos
+
+
+configureBasicLogger(filename='repoCli.log')
+
+
+def thumbnails_command(args: argparse.Namespace):
+    numBuilt = backfill_thumbnails(Path(args.reposPath)/args.repo, maxWorkers=args.workers)
+    print(f"Built thumbnails for {numBuilt} images")
+
+
+def metadata_command(args: argparse.Namespace):
+    numWritten = backfill_metadata(Path(args.reposPath)/args.repo, maxWorkers=args.workers)
+    print(f"Wrote metadata for {numWritten} prompts")
+
+
+def print_progress(done: int, total: int):
+    print(f"\rImported {done}/{total}", end="", flush=True)
+
+
+def import_command(args: argparse.Namespace):
+    with closing(RepoManager(args.reposPath, args.repo, useCatalog=True)) as repoManager:
+        result = repoManager.import_images(args.source, mode=args.mode, maxWorkers=args.workers, onProgress=print_progress)
+        print()
+        print(f"Imported {result.imported} images, skipped {result.skipped} already imported")
+        for sourcePath, errorMessage in result.failed:
+            print(f"Failed {sourcePath} : {errorMessage}")
+
+
+def pack_command(args: argparse.Namespace):
+    with closing(RepoManager(args.reposPath, args.repo)) as repoManager:
+        numPacked = repoManager.pack_old_dates(args.olderThan).result()
+        print(f"Packed {numPacked} dates older then {args.olderThan} days")
+
+
+def unpack_command(args: argparse.Namespace):
+    with closing(RepoManager(args.reposPath, args.repo)) as repoManager:
+        numUnpacked = repoManager.unpack_dates(args.date).result()
+        print(f"Unpacked {numUnpacked} dates")
+
+
+def reencode_command(args: argparse.Namespace):
+    result = reencode_repo(Path(args.reposPath)/args.repo, args.format, maxWorkers=args.workers, onProgress=lambda done, total: print(f"\rRe-encoded {done}/{total}", end="", flush=True))
+    print()
+    print(f"Re-encoded {result.reencoded} images as {args.format}, skipped {result.skipped} already in the format")
+    if(result.reencoded > 0):
+        print(f"Saved {result.bytes_saved() / (1024 * 1024):.1f} MB ({result.bytesBefore} -> {result.bytesAfter} bytes)")
+        print(f"Decode time per image went from {result.decodeSecondsBefore / result.reencoded * 1000:.1f} ms to {result.decodeSecondsAfter / result.reencoded * 1000:.1f} ms")
+    for imagePath, errorMessage in result.failed:
+        print(f"Failed {imagePath} : {errorMessage}")
+
+
+def fsck_command(args: argparse.Namespace):
+    with closing(RepoManager(args.reposPath, args.repo, useCatalog=True)) as repoManager:
+        report = repoManager.fsck(action=args.fix, full=args.full, maxWorkers=args.workers)
+        print(f"Checked {report.imagesChecked} images in {report.datesChecked} dates, skipped {report.imagesSkipped} unchanged since the last check")
+        for issue in report.issues:
+            print(f"{issue.kind} : {issue.relative_path()}" + (f" ({issue.detail})" if issue.detail is not None else ""))
+        if(args.fix is not None):
+            print(f"Fixed {report.fixed} of {len(report.issues)} problems")
+
+
+def export_command(args: argparse.Namespace):
+    with closing(RepoManager(args.reposPath, args.repo, useCatalog=True)) as repoManager:
+        result = repoManager.export(args.output, archiveFormat=args.format, start=args.start, end=args.end, query=args.query, incremental=args.incremental)
+        print(f"Exported {result.entries} prompts ({result.files} images, {result.bytes / (1024 * 1024):.1f} MB) to {args.output}")
+
+
+def mirror_command(args: argparse.Namespace):
+    with closing(RepoManager(args.reposPath, args.repo)) as repoManager:
+        result = repoManager.mirror(args.target, maxWorkers=args.workers, verify=args.verify, onProgress=lambda done, total: print(f"\rCopied {done}/{total}", end="", flush=True))
+        print()
+        print(f"Copied {result.copied} files ({result.bytesCopied / (1024 * 1024):.1f} MB), deleted {result.deleted} and left {result.unchanged} unchanged")
+        for relativePath, errorMessage in result.failed:
+            print(f"Failed {relativePath} : {errorMessage}")
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """
+    Command line tools for maintaining the image repos outside of the PAIID UI.
+    """
+    parser = argparse.ArgumentParser(description="Maintenance tools for PAIID image repos")
+    parser.add_argument("--reposPath", default=get_image_repos(), help="Path to the directory containing all image repos")
+    parser.add_argument("--repo", default=ENGINE_NAME, help="Name of the repo to work on")
+    subparsers = parser.add_subparsers(required=True)
+
+    thumbnailsParser = subparsers.add_parser("thumbnails", help="Build missing thumbnails for every image in the repo")
+    thumbnailsParser.add_argument("--workers", type=int, default=None, help="Number of processes to use. Defaults to the number of cores.")
+    thumbnailsParser.set_defaults(command=thumbnails_command)
+
+    metadataParser = subparsers.add_parser("metadata", help="Write missing metadata files for every prompt in the repo")
+    metadataParser.add_argument("--workers", type=int, default=None, help="Number of processes to use. Defaults to the number of cores.")
+    metadataParser.set_defaults(command=metadata_command)
+
+    importParser = subparsers.add_parser("import", help="Import a tree of existing images into the repo. Rerun to resume an interrupted import.")
+    importParser.add_argument("source", help="Root directory of the images to import")
+    importParser.add_argument("--mode", choices=IMPORT_MODES, default="copy", help="Copy images or hardlink them into the repo")
+    importParser.add_argument("--workers", type=int, default=None, help="Number of processes to use. Defaults to the number of cores.")
+    importParser.set_defaults(command=import_command)
+
+    packParser = subparsers.add_parser("pack", help="Pack old date directories into segment files")
+    packParser.add_argument("--olderThan", type=int, required=True, help="Pack dates older then this many days")
+    packParser.set_defaults(command=pack_command)
+
+    unpackParser = subparsers.add_parser("unpack", help="Unpack packed dates back into date directories")
+    unpackParser.add_argument("--date", action="append", default=None, help="Only unpack this date (ex: 2024-01-14). Can be given more then once, defaults to every packed date.")
+    unpackParser.set_defaults(command=unpack_command)
+
+    fsckParser = subparsers.add_parser("fsck", help="Check every image and prompt directory of the repo for damage")
+    fsckParser.add_argument("--fix", choices=FSCK_ACTIONS, default=None, help="Delete (repair) or quarantine the problems found instead of only reporting them")
+    fsckParser.add_argument("--full", action="store_true", help="Re-read every image, even ones unchanged since the last check")
+    fsckParser.add_argument("--workers", type=int, default=None, help="Number of processes to use. Defaults to the number of cores.")
+    fsckParser.set_defaults(command=fsck_command)
+
+    exportParser = subparsers.add_parser("export", help="Export the repo, a date range or a search into a single archive")
+    exportParser.add_argument("output", help="Path of the archive to write")
+    exportParser.add_argument("--format", choices=EXPORT_FORMATS, default="zip", help="The archive format to write")
+    exportParser.add_argument("--start", type=datetime.fromisoformat, default=None, help="Only export prompts saved at or after this ISO time (ex: 2024-01-14 or 2024-01-14T03:03:45)")
+    exportParser.add_argument("--end", type=datetime.fromisoformat, default=None, help="Only export prompts saved at or before this ISO time")
+    exportParser.add_argument("--query", default=None, help="Only export prompts matching this search")
+    exportParser.add_argument("--incremental", action="store_true", help="Only export prompts newer then the last export of the whole repo")
+    exportParser.set_defaults(command=export_command)
+
+    mirrorParser = subparsers.add_parser("mirror", help="Incrementally back up the repo to another directory, drive or mount. Rerun to resume.")
+    mirrorParser.add_argument("target", help="Directory to mirror the repo into")
+    mirrorParser.add_argument("--workers", type=int, default=MIRROR_WORKERS, help="Number of files to copy at once")
+    mirrorParser.add_argument("--verify", action="store_true", help="Also recopy files that went missing from the target")
+    mirrorParser.set_defaults(command=mirror_command)
+
+    reencodeParser = subparsers.add_parser("reencode", help="Re-encode every image of the repo in a more compact storage format")
+    reencodeParser.add_argument("--format", choices=list(STORAGE_FORMATS.keys()), default="webp-lossless", help="The storage format to re-encode images in")
+    reencodeParser.add_argument("--workers", type=int, default=None, help="Number of processes to use. Defaults to the number of cores.")
+    reencodeParser.set_defaults(command=reencode_command)
+
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    logging.info(f"Running repo command with {args}")
+    args.command(args)
+
+
+if __name__ == "__main__":
+    main()
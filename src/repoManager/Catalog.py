@@ -0,0 +1,650 @@
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from decorators.decorators import auto_str
+from repoManager.DateCounts import DateVersion, get_date_version
+from repoManager.DirectoryColumns import DirectoryColumns
+from repoManager.Models import ImagePromptDirectory
+from repoManager.PackedSegments import PackedSegment, generate_index_path, list_packed_dates
+from repoManager.utils import extract_file_name, generate_file_name, list_date_directories, list_image_files
+from utils.enums import DIRECTION
+from utils.pathingUtils import get_reverse_sorted_directory_by_name
+
+
+CATALOG_FILE_NAME = "catalog.sqlite3"
+
+
+# Rows are keyed by the raw time_prompt directory name rather then (time, prompt) so that the catalog orders entries
+# exactly the same way the DirectoryIterator orders directory names.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    repo TEXT NOT NULL,
+    date TEXT NOT NULL,
+    timePrompt TEXT NOT NULL,
+    time TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    imageCount INTEGER NOT NULL,
+    PRIMARY KEY (repo, date, timePrompt)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS repos (
+    repo TEXT PRIMARY KEY NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS date_versions (
+    repo TEXT NOT NULL,
+    date TEXT NOT NULL,
+    directoryVersion INTEGER,
+    segmentVersion INTEGER,
+    PRIMARY KEY (repo, date)
+) WITHOUT ROWID;
+"""
+
+
+# Full text index over the prompts. The prompts table has no rowid for the index to point at, so every prompt directory
+# gets a search id in its own table. Both are kept in sync with the prompts table by the catalog's own write methods
+# (triggers would be simpler but make every write to the full text index an order of magnitude slower).
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_ids (
+    searchId INTEGER PRIMARY KEY,
+    repo TEXT NOT NULL,
+    date TEXT NOT NULL,
+    timePrompt TEXT NOT NULL,
+    UNIQUE (repo, date, timePrompt)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS prompt_search USING fts5(prompt);
+"""
+
+
+CatalogRow = Tuple[str, str, str, str, str, int]
+
+
+@auto_str
+class CatalogConsistencyReport(object):
+    def __init__(self, repo: str, missing: List[ImagePromptDirectory], stale: List[ImagePromptDirectory], mismatchedCounts: List[ImagePromptDirectory]):
+        self.repo = repo
+        self.missing = missing
+        self.stale = stale
+        self.mismatchedCounts = mismatchedCounts
+
+
+    def is_consistent(self) -> bool:
+        return len(self.missing) == 0 and len(self.stale) == 0 and len(self.mismatchedCounts) == 0
+
+
+def _row_to_directory(row: Tuple[str, str, str, str]) -> ImagePromptDirectory:
+    repo, date, time, prompt = row
+    return ImagePromptDirectory(prompt=prompt, repo=repo, date=date, time=time)
+
+
+def scan_date_directory(repoPath: Path, date: str) -> List[CatalogRow]:
+    """
+    Lists every time_prompt directory under a single date directory and counts the images within each of them. Time prompts
+    packed into a segment for the date are included.
+
+    Parameters
+    ----------
+    repoPath (Path):
+        Absolute path to the repo the date directory belongs to
+
+    date (str):
+        Name of the date directory to scan
+
+    Returns
+    -------
+    List[CatalogRow]
+        One catalog row per time_prompt directory found.
+    """
+    repo = repoPath.name
+    imageCounts = {}
+    if(generate_index_path(repoPath, date).exists()):
+        segment = PackedSegment(repoPath, date)
+        try:
+            for timePrompt in segment.list_time_prompts():
+                imageCounts[timePrompt] = len(segment.list_image_files(timePrompt))
+        finally:
+            segment.close()
+    if((repoPath/date).is_dir()):
+        for timePrompt in get_reverse_sorted_directory_by_name(repoPath/date):
+            imageCounts[timePrompt] = len(list_image_files(repoPath/date/timePrompt))
+
+    rows = []
+    for timePrompt in sorted(imageCounts.keys(), reverse=True):
+        time, prompt = extract_file_name(timePrompt)
+        rows.append((repo, date, timePrompt, time, prompt, imageCounts[timePrompt]))
+    return rows
+
+
+def list_dates(repoPath: Path) -> List[str]:
+    """
+    Lists every date of a repo, from either its date directory or its segment, most recent first.
+    """
+    return sorted(set(list_date_directories(repoPath)).union(list_packed_dates(repoPath)), reverse=True)
+
+
+def scan_repo(repoPath: Path, maxWorkers: int = None) -> List[CatalogRow]:
+    """
+    Scans an entire repo on the file system and returns the catalog rows for it. Date directories are scanned in parallel
+    as each scan is dominated by waiting on the file system rather then the interpreter.
+    """
+    dates = list_dates(repoPath)
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        rowsPerDate = executor.map(lambda date: scan_date_directory(repoPath, date), dates)
+        return [row for rows in rowsPerDate for row in rows]
+
+
+class RepoCatalog(object):
+    """
+    A persistent index of every prompt directory within the image repos, stored as a SQLite database.
+
+    The catalog keeps one row per prompt directory (repo, date, time, prompt and the number of images in it). Because rows are
+    stored ordered by their primary key (repo, date, time_prompt) pages of prompt directories can be answered with an indexed
+    range query instead of listing and sorting directories on the file system.
+
+    The catalog does NOT replace the file system as the source of truth. Users of the catalog are expected to keep it updated
+    whenever they add or remove prompt directories, and can check or rebuild it against the file system at any time.
+    The version of each date (see get_date_version) is stored whenever the date is scanned, so changes made by other tools
+    can be picked up by reconciling without scanning the whole repo again.
+
+    Attributes
+    ----------
+
+    Methods
+    ----------
+    add_directory(directory, imageCount)
+        Adds or updates the row of a prompt directory
+
+    remove_directory(directory)
+        Removes the row of a prompt directory
+
+    apply_changes(updated, removed)
+        Updates and removes many rows at once
+
+    get_directories(repo, number, startingDirectory, direction)
+        Gets the next page of prompt directories from the provided starting directory
+
+    search(repo, matchQuery, number, startingDirectory, direction)
+        Same as get_directories but only prompt directories whose prompt matches a full text query
+
+    rebuild(repoPath)
+        Replaces all rows of a repo with a fresh scan of the file system
+
+    reconcile(repoPath)
+        Rescans only the dates of a repo changed on the file system since they were last scanned
+
+    check_consistency(repoPath)
+        Compares the rows of a repo with what is actually on the file system
+    """
+
+    def __init__(self, catalogPath: Union[str, Path]):
+        self.catalogPath = Path(catalogPath)
+        self.lock = threading.RLock()
+        # The catalog is shared with background workers so access is serialized with a lock rather then sqlite's thread check
+        self.connection = sqlite3.connect(self.catalogPath, check_same_thread=False)
+        with self.lock, self.connection:
+            hadSearch = self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'prompt_search'").fetchone() is not None
+            self.connection.executescript(SCHEMA + SEARCH_SCHEMA)
+        if(not hadSearch):
+            # Catalog made before it had a search index
+            with self.lock, self.connection:
+                self._index_repo(None)
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+    def _index(self, keys: List[Tuple[str, str, str]]):
+        # Keys must not be indexed already (unindex them first). Ids are handed out here so the full text rows can be inserted
+        # with plain values, inserting them from a select is many times slower.
+        firstId = self.connection.execute("SELECT COALESCE(MAX(searchId), 0) + 1 FROM search_ids").fetchone()[0]
+        self.connection.executemany("INSERT INTO search_ids (searchId, repo, date, timePrompt) VALUES (?, ?, ?, ?)", [(firstId + index,) + key for index, key in enumerate(keys)])
+        self.connection.executemany(
+            "INSERT INTO prompt_search (rowid, prompt) VALUES (?, ?)",
+            [(firstId + index, extract_file_name(timePrompt)[1]) for index, (_, _, timePrompt) in enumerate(keys)]
+        )
+
+
+    def _unindex(self, keys: List[Tuple[str, str, str]]):
+        self.connection.executemany(
+            "DELETE FROM prompt_search WHERE rowid = (SELECT searchId FROM search_ids WHERE repo = ? AND date = ? AND timePrompt = ?)",
+            keys
+        )
+        self.connection.executemany("DELETE FROM search_ids WHERE repo = ? AND date = ? AND timePrompt = ?", keys)
+
+
+    def _index_repo(self, repo: str):
+        # Indexes every prompt of a repo (or of every repo if None) in bulk. The repo must have nothing indexed yet.
+        repoFilter, params = ("WHERE repo = ?", (repo,)) if repo is not None else ("", ())
+        self.connection.execute(f"INSERT INTO search_ids (repo, date, timePrompt) SELECT repo, date, timePrompt FROM prompts {repoFilter}", params)
+        self.connection.execute(
+            f"INSERT INTO prompt_search (rowid, prompt) SELECT search_ids.searchId, prompts.prompt FROM search_ids JOIN prompts USING (repo, date, timePrompt) {repoFilter.replace('repo', 'search_ids.repo')}",
+            params
+        )
+
+
+    def _unindex_repo(self, repo: str):
+        self.connection.execute("DELETE FROM prompt_search WHERE rowid IN (SELECT searchId FROM search_ids WHERE repo = ?)", (repo,))
+        self.connection.execute("DELETE FROM search_ids WHERE repo = ?", (repo,))
+
+
+    def is_catalogued(self, repo: str) -> bool:
+        """
+        Whether the repo was ever fully scanned into the catalog.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM repos WHERE repo = ?", (repo,)).fetchone() is not None
+
+
+    def count(self, repo: str) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM prompts WHERE repo = ?", (repo,)).fetchone()[0]
+
+
+    def add_directory(self, directory: ImagePromptDirectory, imageCount: int):
+        """
+        Adds the prompt directory to the catalog. If it already exists then its image count is replaced instead.
+        """
+        self.apply_changes(updated=[(directory, imageCount)])
+
+
+    def remove_directory(self, directory: ImagePromptDirectory):
+        self.apply_changes(removed=[directory])
+
+
+    def _remove_date_rows(self, repo: str, date: str):
+        self.connection.execute("DELETE FROM prompt_search WHERE rowid IN (SELECT searchId FROM search_ids WHERE repo = ? AND date = ?)", (repo, date))
+        self.connection.execute("DELETE FROM search_ids WHERE repo = ? AND date = ?", (repo, date))
+        self.connection.execute("DELETE FROM prompts WHERE repo = ? AND date = ?", (repo, date))
+        self.connection.execute("DELETE FROM date_versions WHERE repo = ? AND date = ?", (repo, date))
+
+
+    def _store_versions(self, repo: str, versions: Dict[str, DateVersion]):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO date_versions (repo, date, directoryVersion, segmentVersion) VALUES (?, ?, ?, ?)",
+            [(repo, date, version[0], version[1]) for date, version in versions.items()]
+        )
+
+
+    def get_date_versions(self, repo: str) -> Dict[str, DateVersion]:
+        """
+        Versions the dates of a repo had when they were last scanned into the catalog.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT date, directoryVersion, segmentVersion FROM date_versions WHERE repo = ?", (repo,)).fetchall()
+        return dict((date, [directoryVersion, segmentVersion]) for date, directoryVersion, segmentVersion in rows)
+
+
+    def remove_date(self, repo: str, date: str):
+        """
+        Removes every prompt directory of a date from the catalog.
+        """
+        with self.lock, self.connection:
+            self._remove_date_rows(repo, date)
+
+
+    def rescan_date(self, repoPath: Union[str, Path], date: str):
+        """
+        Replaces the rows of a single date with a fresh scan of its date directory and segment.
+        """
+        repoPath = Path(repoPath)
+        # Versioned before scanning so a change made during the scan is picked up by the next reconcile
+        version = get_date_version(repoPath, date)
+        rows = scan_date_directory(repoPath, date)
+        with self.lock, self.connection:
+            self._remove_date_rows(repoPath.name, date)
+            self.connection.executemany("INSERT INTO prompts (repo, date, timePrompt, time, prompt, imageCount) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._index([(repo, date, timePrompt) for repo, date, timePrompt, _, _, _ in rows])
+            if(len(rows) > 0):
+                self._store_versions(repoPath.name, { date: version })
+
+
+    def apply_changes(self, updated: List[Tuple[ImagePromptDirectory, int]] = [], removed: List[ImagePromptDirectory] = []):
+        """
+        Updates the image counts of some prompt directories and removes others in a single transaction.
+        """
+        updatedKeys = [(directory.repo, directory.date, generate_file_name(directory.time, directory.prompt)) for directory, _ in updated]
+        removedKeys = [(directory.repo, directory.date, generate_file_name(directory.time, directory.prompt)) for directory in removed]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO prompts (repo, date, timePrompt, time, prompt, imageCount) VALUES (?, ?, ?, ?, ?, ?)",
+                [(directory.repo, directory.date, timePrompt, directory.time, directory.prompt, imageCount) for (directory, imageCount), (_, _, timePrompt) in zip(updated, updatedKeys)]
+            )
+            self.connection.executemany("DELETE FROM prompts WHERE repo = ? AND date = ? AND timePrompt = ?", removedKeys)
+            self._unindex(updatedKeys + removedKeys)
+            self._index(updatedKeys)
+
+
+    def _range_filter(self, repo: str, startingDirectory: ImagePromptDirectory, direction: DIRECTION) -> Tuple[str, List, str]:
+        # Where clause (and its params) for the prompt directories after the starting directory and the order they come in
+        comparison, order = ("<", "DESC") if direction is not DIRECTION.BACKWARD else (">", "ASC")
+        where = "WHERE repo = ?"
+        params = [repo]
+        if(startingDirectory is not None):
+            where += f" AND (date, timePrompt) {comparison} (?, ?)"
+            params += [startingDirectory.date, generate_file_name(startingDirectory.time, startingDirectory.prompt)]
+        return where, params, order
+
+
+    def get_directories(self, repo: str, number: int, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD, offset: int = 0) -> List[ImagePromptDirectory]:
+        """
+        Gets up to "number" prompt directories that logically come after the starting directory in the given direction.
+        Follows the same ordering as the DirectoryIterator: forward means going from the most recent date and time to the oldest.
+
+        Parameters
+        ----------
+        repo (str):
+            The repo to get prompt directories from
+
+        number (int):
+            The maximum number of prompt directories to return
+
+        startingDirectory (ImagePromptDirectory):
+            Optional exclusive bound to start from. Does not need to exist in the catalog.
+
+        direction: (DIRECTION):
+            The direction to get prompt directories from
+
+        offset: (int):
+            Number of prompt directories after the starting directory to skip over. Skipped rows are only stepped over by
+            SQLite, they aren't read into prompt directories.
+
+        Returns
+        -------
+        List[ImagePromptDirectory]
+            The prompt directories in the order they would be iterated in.
+        """
+        where, params, order = self._range_filter(repo, startingDirectory, direction)
+        query = f"SELECT repo, date, time, prompt FROM prompts {where} ORDER BY date {order}, timePrompt {order} LIMIT ? OFFSET ?"
+
+        with self.lock:
+            rows = self.connection.execute(query, params + [number, offset]).fetchall()
+        return [_row_to_directory(row) for row in rows]
+
+
+    def count_directories(self, repo: str, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD) -> int:
+        """
+        Counts the prompt directories that logically come after the starting directory in the given direction (see
+        get_directories) with a single query.
+        """
+        where, params, _ = self._range_filter(repo, startingDirectory, direction)
+        with self.lock:
+            return self.connection.execute(f"SELECT COUNT(*) FROM prompts {where}", params).fetchone()[0]
+
+
+    def list_directories(self, repo: str) -> DirectoryColumns:
+        """
+        Lists every prompt directory of a repo, most recent first, as columns. Rows are read straight into the columns
+        without making a record for each.
+        """
+        listing = DirectoryColumns(repo)
+        with self.lock:
+            for date, time, prompt in self.connection.execute("SELECT date, time, prompt FROM prompts WHERE repo = ? ORDER BY date DESC, timePrompt DESC", (repo,)):
+                listing.append_values(date, time, prompt)
+        return listing
+
+
+    def search(self, repo: str, matchQuery: str, number: int, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD) -> List[ImagePromptDirectory]:
+        """
+        Gets up to "number" prompt directories matching a full text query that logically come after the starting directory
+        in the given direction. Ordered the same way as get_directories.
+
+        Parameters
+        ----------
+        repo (str):
+            The repo to search
+
+        matchQuery (str):
+            A SQLite full text MATCH expression (see PromptSearch.build_match_query)
+
+        number (int):
+            The maximum number of prompt directories to return
+
+        startingDirectory (ImagePromptDirectory):
+            Optional exclusive bound to start from. Does not need to exist in the catalog or match the query.
+
+        direction: (DIRECTION):
+            The direction to get prompt directories from
+
+        Returns
+        -------
+        List[ImagePromptDirectory]
+            The matching prompt directories in the order they would be iterated in.
+        """
+        comparison, order = ("<", "DESC") if direction is not DIRECTION.BACKWARD else (">", "ASC")
+        # Walk the repo in order and check each prompt against the set of matches. Joining from the full text index instead
+        # makes SQLite sort every match first which is far slower for common words.
+        query = (
+            "SELECT prompts.repo, prompts.date, prompts.time, prompts.prompt FROM search_ids"
+            " JOIN prompts USING (repo, date, timePrompt)"
+            " WHERE search_ids.searchId IN (SELECT rowid FROM prompt_search WHERE prompt_search MATCH ?) AND search_ids.repo = ?"
+        )
+        params = [matchQuery, repo]
+        if(startingDirectory is not None):
+            query += f" AND (search_ids.date, search_ids.timePrompt) {comparison} (?, ?)"
+            params += [startingDirectory.date, generate_file_name(startingDirectory.time, startingDirectory.prompt)]
+        query += f" ORDER BY search_ids.date {order}, search_ids.timePrompt {order} LIMIT ?"
+        params.append(number)
+
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [_row_to_directory(row) for row in rows]
+
+
+    def get_image_counts(self, repo: str) -> Dict[Tuple[str, str], int]:
+        with self.lock:
+            rows = self.connection.execute("SELECT date, timePrompt, imageCount FROM prompts WHERE repo = ?", (repo,)).fetchall()
+        return dict(((date, timePrompt), imageCount) for date, timePrompt, imageCount in rows)
+
+
+    def rebuild(self, repoPath: Union[str, Path], maxWorkers: int = None) -> int:
+        """
+        Replaces every row of a repo with a fresh scan of the file system. Date directories are scanned in parallel.
+
+        Parameters
+        ----------
+        repoPath (Path):
+            Absolute path to the repo. The name of the path is used as the repo name.
+
+        maxWorkers (int):
+            Optional number of workers scanning date directories.
+
+        Returns
+        -------
+        int
+            The number of prompt directories now in the catalog for the repo.
+        """
+        repoPath = Path(repoPath)
+        repo = repoPath.name
+        logging.info(f"Rebuilding catalog for repo {repo}")
+        versions = dict((date, get_date_version(repoPath, date)) for date in list_dates(repoPath))
+        rows = scan_repo(repoPath, maxWorkers=maxWorkers)
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM prompts WHERE repo = ?", (repo,))
+            self.connection.execute("DELETE FROM date_versions WHERE repo = ?", (repo,))
+            self._store_versions(repo, versions)
+            self.connection.executemany(
+                "INSERT INTO prompts (repo, date, timePrompt, time, prompt, imageCount) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._unindex_repo(repo)
+            self._index_repo(repo)
+            self.connection.execute("INSERT OR IGNORE INTO repos (repo) VALUES (?)", (repo,))
+
+        logging.info(f"Catalogued {len(rows)} prompt directories for repo {repo}")
+        return len(rows)
+
+
+    def reconcile(self, repoPath: Union[str, Path], maxWorkers: int = None) -> List[str]:
+        """
+        Brings the rows of a catalogued repo up to date with changes made to it by other tools (ex: the importer or copying
+        date directories in by hand). Only the version of each date is read, then dates whose version differs from when
+        they were last scanned are rescanned and dates no longer on the file system are removed.
+
+        Like get_date_version, images added to or removed from an existing prompt directory aren't noticed.
+
+        Returns
+        -------
+        List[str]
+            The dates that were rescanned or removed, most recent first.
+        """
+        repoPath = Path(repoPath)
+        repo = repoPath.name
+        storedVersions = self.get_date_versions(repo)
+        with self.lock:
+            cataloguedDates = set(date for date, in self.connection.execute("SELECT DISTINCT date FROM prompts WHERE repo = ?", (repo,)))
+
+        dates = list_dates(repoPath)
+        changedDates = [date for date in dates if storedVersions.get(date) != get_date_version(repoPath, date)]
+        removedDates = cataloguedDates.union(storedVersions.keys()).difference(dates)
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            list(executor.map(lambda date: self.rescan_date(repoPath, date), changedDates))
+        for date in removedDates:
+            self.remove_date(repo, date)
+
+        if(len(changedDates) + len(removedDates) > 0):
+            logging.info(f"Reconciled {len(changedDates)} changed and {len(removedDates)} removed dates of repo {repo} into the catalog")
+        return sorted(set(changedDates).union(removedDates), reverse=True)
+
+
+    def check_consistency(self, repoPath: Union[str, Path], maxWorkers: int = None) -> CatalogConsistencyReport:
+        """
+        Compares the rows of a repo with the file system without modifying either of them.
+
+        Returns
+        -------
+        CatalogConsistencyReport
+            Prompt directories missing from the catalog, rows that no longer exist on the file system and rows whose image
+            count differs from the file system.
+        """
+        repoPath = Path(repoPath)
+        repo = repoPath.name
+        scanned = dict(((date, timePrompt), (time, prompt, imageCount)) for _, date, timePrompt, time, prompt, imageCount in scan_repo(repoPath, maxWorkers=maxWorkers))
+        catalogued = self.get_image_counts(repo)
+
+        def to_directory(key: Tuple[str, str]) -> ImagePromptDirectory:
+            date, timePrompt = key
+            time, prompt = extract_file_name(timePrompt)
+            return ImagePromptDirectory(prompt=prompt, repo=repo, date=date, time=time)
+
+        missing = [to_directory(key) for key in sorted(scanned.keys() - catalogued.keys(), reverse=True)]
+        stale = [to_directory(key) for key in sorted(catalogued.keys() - scanned.keys(), reverse=True)]
+        mismatchedCounts = [to_directory(key) for key in sorted(scanned.keys() & catalogued.keys(), reverse=True) if scanned[key][2] != catalogued[key]]
+
+        return CatalogConsistencyReport(repo=repo, missing=missing, stale=stale, mismatchedCounts=mismatchedCounts)
+
+
+class BatchedCatalogIterator(ABC):
+    """
+    Base of iterators that fetch prompt directories from a RepoCatalog in batches, each batch starting after the last
+    prompt directory returned. Subclasses only say how a batch is fetched by implementing fetch.
+    """
+    def __init__(self, catalog: RepoCatalog, repo: str, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD, batchSize: int = 32):
+        self.catalog = catalog
+        self.repo = repo
+        self.direction = direction
+        self.batchSize = batchSize
+        self.lastDirectory = startingDirectory
+        self.buffer: List[ImagePromptDirectory] = []
+        self.exhausted = False
+
+
+    @abstractmethod
+    def fetch(self, number: int, startingDirectory: ImagePromptDirectory) -> List[ImagePromptDirectory]:
+        """
+        Gets up to number prompt directories after the starting directory, in the direction of iteration.
+        """
+
+
+    def __iter__(self):
+        return self
+
+
+    def __next__(self) -> ImagePromptDirectory:
+        if(len(self.buffer) == 0 and not self.exhausted):
+            self.buffer = self.fetch(self.batchSize, self.lastDirectory)
+            self.buffer.reverse() # pop from the end
+            self.exhausted = len(self.buffer) < self.batchSize
+
+        if(len(self.buffer) == 0):
+            raise StopIteration
+
+        self.lastDirectory = self.buffer.pop()
+        return self.lastDirectory
+
+
+    def take(self, count: int) -> List[ImagePromptDirectory]:
+        """
+        Gets the next count prompt directories, fetching whatever isn't already buffered with a single query. Same as calling
+        next count times, returning fewer if the iterator is exhausted.
+        """
+        taken: List[ImagePromptDirectory] = []
+        while(len(taken) < count and len(self.buffer) > 0):
+            taken.append(self.buffer.pop())
+        if(len(taken) < count and not self.exhausted):
+            fetched = self.fetch(count - len(taken), taken[-1] if len(taken) > 0 else self.lastDirectory)
+            self.exhausted = len(fetched) < count - len(taken)
+            taken.extend(fetched)
+        if(len(taken) > 0):
+            self.lastDirectory = taken[-1]
+        return taken
+
+
+    def advance(self, count: int) -> int:
+        """
+        Skips ahead as though next was called count times. Returns the number of prompt directories actually skipped.
+        """
+        return len(self.take(count))
+
+
+class CatalogIterator(BatchedCatalogIterator):
+    """
+    An iterator with the same behavior as the DirectoryIterator but backed by a RepoCatalog instead of the file system.
+
+    Prompt directories are fetched from the catalog in batches using indexed range queries so no directories need to be listed
+    or sorted while iterating. Like the DirectoryIterator, advance and count_remaining don't make a directory model for any
+    entry they skip or count, they use OFFSET and COUNT queries instead.
+    """
+    def fetch(self, number: int, startingDirectory: ImagePromptDirectory) -> List[ImagePromptDirectory]:
+        return self.catalog.get_directories(self.repo, number, startingDirectory=startingDirectory, direction=self.direction)
+
+
+    def advance(self, count: int) -> int:
+        """
+        Skips ahead as though next was called count times. Whatever isn't buffered is skipped with a single OFFSET query for
+        the entry being skipped to. Returns the number of prompt directories actually skipped.
+        """
+        numBuffered = min(count, len(self.buffer))
+        if(numBuffered > 0):
+            self.lastDirectory = self.buffer[len(self.buffer) - numBuffered]
+            del self.buffer[len(self.buffer) - numBuffered:]
+        if(numBuffered == count or self.exhausted):
+            return numBuffered
+
+        landedOn = self.catalog.get_directories(self.repo, 1, startingDirectory=self.lastDirectory, direction=self.direction, offset=count - numBuffered - 1)
+        if(len(landedOn) > 0):
+            self.lastDirectory = landedOn[0]
+            return count
+        # Fewer left then were asked to be skipped
+        skipped = self.catalog.count_directories(self.repo, startingDirectory=self.lastDirectory, direction=self.direction)
+        self.exhausted = True
+        return numBuffered + skipped
+
+
+    def count_remaining(self) -> int:
+        """
+        Counts the prompt directories next would still return with a COUNT query. The iterator's position is left as is.
+        """
+        if(self.exhausted):
+            return len(self.buffer)
+        # Buffer is reversed so the furthest prompt directory fetched so far is at its start
+        lastFetched = self.buffer[0] if len(self.buffer) > 0 else self.lastDirectory
+        return len(self.buffer) + self.catalog.count_directories(self.repo, startingDirectory=lastFetched, direction=self.direction)
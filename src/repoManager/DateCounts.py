@@ -0,0 +1,373 @@
+import json
+import logging
+import os
+import threading
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from repoManager.PackedSegments import PackedSegment, generate_index_path, generate_pack_path, list_packed_dates
+from repoManager.SaveQueue import generate_temp_path
+from repoManager.utils import list_date_directories, list_visible_directories
+from utils.algoUtils import FenwickTree, reverse_bisect_left
+from utils.pathingUtils import get_file_size
+
+
+# Directory under the metadata directory with a counts file per repo
+COUNTS_DIRECTORY_NAME = "counts"
+
+# Changes to the counts (ex: from every saved image) are written to disk at most this often rather then on every change.
+# Counts that didn't make it to disk before a crash are recounted when loaded since their dates' versions won't match.
+SAVE_DELAY_SECONDS = 5.0
+
+
+DateVersion = List[Optional[int]]
+
+
+def _get_mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_date_version(repoPath: Path, date: str) -> DateVersion:
+    """
+    Version of everything making up a date. Changes whenever a prompt directory is added to or removed from the date
+    directory or the date's segment.
+    """
+    return [_get_mtime_ns(repoPath/date), _get_mtime_ns(generate_index_path(repoPath, date))]
+
+
+def count_date(repoPath: Path, date: str) -> Tuple[int, int]:
+    """
+    Counts the prompt directories of a date, both in its directory and its segment, and the bytes they take up on disk.
+    """
+    timePrompts = set(list_visible_directories(repoPath/date)) if (repoPath/date).is_dir() else set()
+    numBytes = 0
+    for timePrompt in timePrompts:
+        with os.scandir(repoPath/date/timePrompt) as entries:
+            numBytes += sum(entry.stat().st_size for entry in entries if entry.is_file())
+    if(generate_index_path(repoPath, date).exists()):
+        segment = PackedSegment(repoPath, date)
+        try:
+            timePrompts.update(segment.list_time_prompts())
+        finally:
+            segment.close()
+        numBytes += get_file_size(generate_pack_path(repoPath, date)) + get_file_size(generate_index_path(repoPath, date))
+    return len(timePrompts), numBytes
+
+
+class DateCountIndex(object):
+    """
+    Number of prompt directories per date of a repo, kept as prefix sums so the position of any prompt directory in the
+    repo can be found without iterating the repo.
+
+    Dates are ordered most recent first (the order pages are in) and their counts are kept in a FenwickTree. Finding which
+    date the n-th prompt directory is in and the total number of prompt directories both take O(log dates).
+
+    The bytes every date takes up on disk are kept too, so the size of a repo is known without walking it.
+
+    Counts are stored on disk along with the version of every date they were counted from. Dates are only counted the first
+    time the counts are used (rather then when the index is made) and then only dates whose version changed (ex: modified by
+    another tool) are recounted. Users are expected to call add for every prompt directory they add or remove (and add_bytes
+    for every file written) so counts stay current without recounting. Changes are written to disk in the background at most
+    every SAVE_DELAY_SECONDS, call close to write any pending changes right away.
+
+    Methods
+    ----------
+    total()
+        Number of prompt directories in the repo
+
+    total_bytes()
+        Number of bytes the repo takes up on disk
+
+    locate(position)
+        Finds the date of the prompt directory at a position and how far into the date it is
+
+    add(date, delta)
+        Changes the count of a date
+
+    add_bytes(date, delta)
+        Changes the bytes a date takes up
+
+    remove_date(date)
+        Forgets a date that was removed from the repo
+
+    oldest_date()
+        The oldest date with any prompt directories
+
+    refresh_date(date)
+        Recounts a date from the file system
+
+    refresh()
+        Recounts every date that changed since it was last counted
+
+    close()
+        Waits for counting in the background and writes any changes not yet written to disk
+    """
+    def __init__(self, repoPath: Union[str, Path], countsPath: Union[str, Path]):
+        self.repoPath = Path(repoPath)
+        self.countsPath = Path(countsPath)
+        self.lock = threading.RLock()
+        self.counts: Dict[str, int] = {}
+        self.versions: Dict[str, DateVersion] = {}
+        self.sizes: Dict[str, int] = {}
+        self.totalBytes = 0
+        self.dates: List[str] = []
+        self.tree = FenwickTree()
+        # Whether the dates were counted since the index was loaded
+        self.counted = False
+        # Versions dates were last recounted at, until the next add (or add_bytes) for them. A change made right before a
+        # recount is already in it, the add for it that follows is skipped rather then counting the change twice.
+        self.countedVersions: Dict[str, DateVersion] = {}
+        self.sizedVersions: Dict[str, DateVersion] = {}
+        self.dirty = False
+        self.saveTimer: Optional[threading.Timer] = None
+        self.countThread: Optional[threading.Thread] = None
+        # Once closed changes are written right away since nothing is left to write them later
+        self.closed = False
+        self._load()
+
+
+    def _load(self):
+        try:
+            with open(self.countsPath, "r") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for date, stored in stored.get("dates", {}).items():
+            self.counts[date] = stored[0]
+            # Counts stored before sizes were kept have no size, leaving their version out has them recounted
+            if(len(stored) > 2):
+                self.versions[date] = stored[1]
+                self.sizes[date] = stored[2]
+
+
+    def _save(self):
+        self.countsPath.parent.mkdir(parents=True, exist_ok=True)
+        tempPath = generate_temp_path(self.countsPath)
+        with open(tempPath, "w") as f:
+            json.dump({ "dates": dict((date, [self.counts[date], self.versions.get(date), self.sizes.get(date, 0)]) for date in self.dates) }, f)
+        os.replace(tempPath, self.countsPath)
+        self.dirty = False
+
+
+    def _save_later(self):
+        self.dirty = True
+        if(self.closed):
+            self._save()
+        elif(self.saveTimer is None):
+            self.saveTimer = threading.Timer(SAVE_DELAY_SECONDS, self.flush)
+            self.saveTimer.daemon = True
+            self.saveTimer.start()
+
+
+    def flush(self):
+        """
+        Writes the counts to disk if they changed since they were last written.
+        """
+        with self.lock:
+            self.saveTimer = None
+            if(self.dirty):
+                self._save()
+
+
+    def close(self, wait: bool = True):
+        """
+        Writes any changes not yet written to disk. Counting in the background is waited for unless wait is False, in which
+        case the counts it finds are written as soon as it's done.
+        """
+        # Joined outside the lock since counting takes it
+        countThread = self.countThread
+        if(wait and countThread is not None and countThread is not threading.current_thread()):
+            countThread.join()
+        with self.lock:
+            self.closed = True
+            if(self.saveTimer is not None):
+                self.saveTimer.cancel()
+            self.flush()
+
+
+    def _ensure_counted(self):
+        if(not self.counted):
+            self.refresh()
+
+
+    def is_counted(self) -> bool:
+        return self.counted
+
+
+    def count_in_background(self, onCounted: Callable[[], None] = None) -> threading.Thread:
+        """
+        Counts the dates on a background thread (ex: when a repo is opened) so whoever uses the counts first doesn't wait on
+        the repo being walked. onCounted is called from that thread once they're counted.
+        """
+        def count():
+            try:
+                self._ensure_counted()
+            except BaseException as e:
+                logging.error(f"Could not count the dates of {self.repoPath} : {traceback.format_exc()}")
+                return
+            if(onCounted is not None):
+                onCounted()
+        self.countThread = threading.Thread(target=count, name="dateCounts", daemon=True)
+        self.countThread.start()
+        return self.countThread
+
+
+    def _recount(self, date: str):
+        version = get_date_version(self.repoPath, date)
+        self.versions[date] = version
+        self.countedVersions[date] = version
+        self.sizedVersions[date] = version
+        self.counts[date], self.sizes[date] = count_date(self.repoPath, date)
+
+
+    def _rebuild_tree(self):
+        # Dates without any prompt directories don't take up a position
+        self.dates = sorted((date for date, count in self.counts.items() if count > 0), reverse=True)
+        self.tree = FenwickTree([self.counts[date] for date in self.dates])
+        self.totalBytes = sum(self.sizes.get(date, 0) for date in self.dates)
+
+
+    def refresh(self) -> int:
+        """
+        Recounts every date that was added, removed or modified since it was last counted.
+
+        Returns
+        -------
+        int
+            The number of dates recounted
+        """
+        with self.lock:
+            dates = set(list_date_directories(self.repoPath)).union(list_packed_dates(self.repoPath))
+            for date in set(self.counts.keys()) - dates:
+                self._forget(date)
+            staleDates = [date for date in dates if self.versions.get(date) != get_date_version(self.repoPath, date)]
+            for date in staleDates:
+                self._recount(date)
+            self._rebuild_tree()
+            self.counted = True
+            if(len(staleDates) > 0 or self.dirty or not self.countsPath.exists()):
+                logging.info(f"Recounted {len(staleDates)} dates of {self.repoPath}")
+                self._save()
+            return len(staleDates)
+
+
+    def refresh_date(self, date: str):
+        with self.lock:
+            if(not self.counted):
+                self.refresh()
+                return
+            self._recount(date)
+            self._rebuild_tree()
+            self._save_later()
+
+
+    def _forget(self, date: str):
+        self.counts.pop(date, None)
+        self.versions.pop(date, None)
+        self.sizes.pop(date, None)
+        self.countedVersions.pop(date, None)
+        self.sizedVersions.pop(date, None)
+
+
+    def remove_date(self, date: str):
+        with self.lock:
+            if(not self.counted):
+                self.refresh()
+                return
+            self._forget(date)
+            self._rebuild_tree()
+            self._save_later()
+
+
+    def add(self, date: str, delta: int):
+        """
+        Changes the count of a date by delta (ex: 1 for a new prompt directory). Only dates appearing or disappearing rebuild the
+        prefix sums, anything else is O(log dates).
+
+        Changes must already be on the file system, if the dates weren't counted yet they are counted instead.
+        """
+        with self.lock:
+            if(not self.counted):
+                self.refresh()
+                return
+            version = get_date_version(self.repoPath, date)
+            if(self.countedVersions.pop(date, None) == version):
+                return
+            count = self.counts.get(date, 0) + delta
+            self.counts[date] = max(count, 0)
+            self.versions[date] = version
+            index = self._index_of(date)
+            if(index is not None and self.counts[date] > 0):
+                self.tree.add(index, delta)
+            else:
+                self._rebuild_tree()
+            self._save_later()
+
+
+    def add_bytes(self, date: str, delta: int):
+        """
+        Changes the bytes a date takes up by delta (ex: the size of a newly written image).
+        """
+        with self.lock:
+            if(not self.counted):
+                self.refresh()
+                return
+            if(self.sizedVersions.pop(date, None) == get_date_version(self.repoPath, date)):
+                return
+            self.sizes[date] = max(self.sizes.get(date, 0) + delta, 0)
+            if(self._index_of(date) is not None):
+                self.totalBytes += delta
+            self._save_later()
+
+
+    def _index_of(self, date: str) -> Optional[int]:
+        index = reverse_bisect_left(self.dates, date)
+        return index if index < len(self.dates) and self.dates[index] == date else None
+
+
+    def total(self) -> int:
+        with self.lock:
+            self._ensure_counted()
+            return self.tree.total()
+
+
+    def total_bytes(self) -> int:
+        with self.lock:
+            self._ensure_counted()
+            return self.totalBytes
+
+
+    def num_dates(self) -> int:
+        with self.lock:
+            self._ensure_counted()
+            return len(self.dates)
+
+
+    def oldest_date(self) -> Optional[str]:
+        with self.lock:
+            self._ensure_counted()
+            return self.dates[-1] if len(self.dates) > 0 else None
+
+
+    def newest_date(self) -> Optional[str]:
+        with self.lock:
+            self._ensure_counted()
+            return self.dates[0] if len(self.dates) > 0 else None
+
+
+    def locate(self, position: int) -> Optional[Tuple[str, int]]:
+        """
+        Finds the date of the prompt directory at a zero based position (ordered most recent first) and how many prompt
+        directories of the date come before it. Returns None if the position is past the end of the repo.
+        """
+        with self.lock:
+            self._ensure_counted()
+            found = self.tree.find(position)
+            if(found is None):
+                return None
+            index, offset = found
+            return (self.dates[index], offset)
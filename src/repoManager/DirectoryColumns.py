@@ -0,0 +1,162 @@
+import sys
+from array import array
+from collections import OrderedDict
+from datetime import date as Date
+from typing import Dict, Iterable, Iterator, Optional
+
+from repoManager.Models import ImagePromptDirectory
+
+
+MICROSECONDS_PER_SECOND = 1000000
+
+# Stands in for a time that isn't "HH:MM:SS.ffffff" in the times column, the time itself is kept on the side
+IRREGULAR_TIME = -1
+
+# Prompts are only looked up among this many of the most recently used distinct prompts when interning. Prompts are
+# usually repeated right after they were first generated (ex: to get another take on it) and keeping every prompt around
+# to intern against would cost more memory then interning saves.
+RECENT_PROMPTS = 1024
+
+
+def time_to_microseconds(time: str) -> Optional[int]:
+    """
+    Converts a "HH:MM:SS.ffffff" time into microseconds since midnight. Returns None for anything else.
+    """
+    if(len(time) != 15 or time[2] != ":" or time[5] != ":" or time[8] != "."):
+        return None
+    try:
+        hours, minutes, seconds, microseconds = int(time[0:2]), int(time[3:5]), int(time[6:8]), int(time[9:15])
+    except ValueError:
+        return None
+    return ((hours * 60 + minutes) * 60 + seconds) * MICROSECONDS_PER_SECOND + microseconds
+
+
+def microseconds_to_time(microseconds: int) -> str:
+    seconds, microseconds = divmod(microseconds, MICROSECONDS_PER_SECOND)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{microseconds:06d}"
+
+
+class DirectoryColumns(object):
+    """
+    Listing of the prompt directories of a single repo kept as columns rather then as a record per directory, for listings
+    too big to keep as ImagePromptDirectory records (ex: every prompt directory of a repo at once).
+
+    Dates are kept as day ordinals and times as microseconds since midnight, each in a packed array of machine integers.
+    Prompts are kept back to back as UTF-8 in a single buffer and only their index is kept per directory. Prompts repeated
+    among the recently used ones are only stored once. This takes a fraction of the memory of records (see
+    benchmarks/bench_model_memory.py).
+
+    Directories keep the order they were appended in. Records are only made when a directory is read.
+
+    Methods
+    ----------
+    append(directory)
+        Adds a prompt directory to the end of the listing
+
+    extend(directories)
+        Adds every prompt directory of an iterable to the end of the listing
+
+    nbytes()
+        Approximate memory taken up by the listing
+    """
+    def __init__(self, repo: str, directories: Iterable[ImagePromptDirectory] = ()):
+        self.repo = repo
+        self.dates = array("i")
+        self.times = array("q")
+        self.promptIds = array("I")
+        self.promptData = bytearray()
+        # Where every prompt ends in the prompt data, the first prompt starts at 0
+        self.promptEnds = array("Q")
+        self.recentPrompts: OrderedDict[str, int] = OrderedDict()
+        # Times that aren't "HH:MM:SS.ffffff" by position in the listing. Only badly named directories have them.
+        self.irregularTimes: Dict[int, str] = {}
+        self.extend(directories)
+
+
+    def append(self, directory: ImagePromptDirectory):
+        self.append_values(directory.date, directory.time, directory.prompt)
+
+
+    def append_values(self, date: str, time: str, prompt: str):
+        """
+        Same as append but from the fields of a prompt directory, saving making a record (ex: for rows read from the catalog).
+        """
+        microseconds = time_to_microseconds(time)
+        if(microseconds is None):
+            self.irregularTimes[len(self.times)] = time
+            microseconds = IRREGULAR_TIME
+        promptId = self._intern(prompt)
+        self.dates.append(Date.fromisoformat(date).toordinal())
+        self.times.append(microseconds)
+        self.promptIds.append(promptId)
+
+
+    def _intern(self, prompt: str) -> int:
+        promptId = self.recentPrompts.get(prompt)
+        if(promptId is not None):
+            self.recentPrompts.move_to_end(prompt)
+            return promptId
+        promptId = len(self.promptEnds)
+        self.promptData += prompt.encode("utf-8")
+        self.promptEnds.append(len(self.promptData))
+        self.recentPrompts[prompt] = promptId
+        if(len(self.recentPrompts) > RECENT_PROMPTS):
+            self.recentPrompts.popitem(last=False)
+        return promptId
+
+
+    def extend(self, directories: Iterable[ImagePromptDirectory]):
+        for directory in directories:
+            self.append(directory)
+
+
+    def get_date(self, index: int) -> str:
+        return Date.fromordinal(self.dates[index]).isoformat()
+
+
+    def get_time(self, index: int) -> str:
+        index = index if index >= 0 else len(self) + index
+        microseconds = self.times[index]
+        return microseconds_to_time(microseconds) if microseconds != IRREGULAR_TIME else self.irregularTimes[index]
+
+
+    def get_prompt(self, index: int) -> str:
+        promptId = self.promptIds[index]
+        start = self.promptEnds[promptId - 1] if promptId > 0 else 0
+        return self.promptData[start:self.promptEnds[promptId]].decode("utf-8")
+
+
+    def num_prompts(self) -> int:
+        """
+        Number of prompts stored, repeated prompts that were interned only count once.
+        """
+        return len(self.promptEnds)
+
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+    def __getitem__(self, index: int) -> ImagePromptDirectory:
+        if(index < -len(self) or index >= len(self)):
+            raise IndexError("DirectoryColumns index out of range")
+        return ImagePromptDirectory(prompt=self.get_prompt(index), repo=self.repo, date=self.get_date(index), time=self.get_time(index))
+
+
+    def __iter__(self) -> Iterator[ImagePromptDirectory]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+    def nbytes(self) -> int:
+        """
+        Approximate number of bytes the listing takes up, counting its columns, the prompts and irregular times.
+        """
+        return (
+            sum(column.buffer_info()[1] * column.itemsize for column in (self.dates, self.times, self.promptIds, self.promptEnds)) +
+            sys.getsizeof(self.promptData) +
+            sys.getsizeof(self.recentPrompts) + sum(sys.getsizeof(prompt) for prompt in self.recentPrompts.keys()) +
+            sys.getsizeof(self.irregularTimes) + sum(sys.getsizeof(time) for time in self.irregularTimes.values())
+        )
@@ -2,8 +2,11 @@ import logging
 import os
 from pathlib import Path
 from typing import Union, List
+from repoManager.ListingCache import get_cached_listing
 from repoManager.Models import ImagePromptDirectory
-from repoManager.utils import generate_file_name, extract_file_name
+from repoManager.PackedSegments import SegmentStore
+from repoManager.RepoSnapshot import RepoSnapshot
+from repoManager.utils import generate_file_name, extract_file_name, list_date_directories
 
 from utils.pathingUtils import get_reverse_sorted_directory_by_name
 from utils.algoUtils import get_next_string_index_from_reverse_sorted
@@ -18,6 +21,12 @@ def get_before_start_index(direction: DIRECTION, collection: List):
     return -1 if direction is not DIRECTION.BACKWARD else len(collection)
 
 
+def merge_reverse_sorted(first: List[str], second: List[str]) -> List[str]:
+    if(len(second) == 0):
+        return first
+    return sorted(set(first).union(second), reverse=True)
+
+
 class DirectoryIterator:
     """
     An iterator that simplifies traversal of the file system for an image repo. Its primary mode of traversal is going to the logical "next"
@@ -47,11 +56,25 @@ class DirectoryIterator:
     The DirectoryIterator has internal pointers to where it is in the directory structure. These pointers can be adjusted with a 
     provided startingDirectory arg. The startingDirectory does not need to be physical directory in the system and this 
     DirectoryIterator will iterate to the next logical entry from the provided starting directory.
+
+    Optionally a RepoSnapshot, kept up to date by a watcher, can be provided. The iterator then takes its listings from the
+    snapshot instead of listing and sorting directories on the file system. Without one listings come from the process wide
+    ListingCache, so iterators made one after the other (ex: one per page turn) only list directories that changed.
+
+    Old dates can be packed into segment files (see PackedSegments). When a SegmentStore is provided packed dates and their
+    time prompts are listed along with the directories, so iterating over packed dates is no different from unpacked ones.
+
+    Besides next, advance skips, take gets and count_remaining counts many prompt directories at once. They work off the length
+    of each date's listing so whole dates are skipped or counted without going through their prompt directories one by one.
     
     """
-    def __init__(self, pathToDirectories: Union[str, Path], startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD):
+    def __init__(self, pathToDirectories: Union[str, Path], startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD, snapshot: RepoSnapshot = None, segments: SegmentStore = None):
         self.pathToDirectories = Path(pathToDirectories)
-        self.sortedDateDirectories = get_reverse_sorted_directory_by_name(self.pathToDirectories)
+        # Get only the repo name. Not the full absolute path of the repo.
+        self.repo = os.path.basename(os.path.normpath(self.pathToDirectories))
+        self.snapshot = snapshot
+        self.segments = segments
+        self.sortedDateDirectories = self._list_dates()
         self.direction = direction
 
         if(startingDirectory is not None):
@@ -59,8 +82,7 @@ class DirectoryIterator:
             startingPromptWithTime = generate_file_name(startingDirectory.time, startingDirectory.prompt)
             self.currentDate = startingDirectory.date
             self.dateIndex = None
-            timePromptPath = self.pathToDirectories/self.currentDate
-            self.currentTimePromptDirectories = get_reverse_sorted_directory_by_name(timePromptPath) if timePromptPath.exists() else []
+            self.currentTimePromptDirectories = self._list_time_prompts(self.currentDate)
             self.currentTimePrompt = startingPromptWithTime
             self.timePromptIndex = None
         else:
@@ -75,6 +97,27 @@ class DirectoryIterator:
         return self
 
 
+    def _list_dates(self) -> List[str]:
+        if(self.snapshot is not None):
+            dates = self.snapshot.get_sorted_dates()
+        else:
+            dates = get_cached_listing(self.pathToDirectories, list_date_directories)
+        return merge_reverse_sorted(dates, self.segments.list_packed_dates()) if self.segments is not None else dates
+
+
+    def _list_time_prompts(self, date: str) -> List[str]:
+        if(self.snapshot is not None):
+            timePrompts = self.snapshot.get_sorted_time_prompts(date)
+        else:
+            try:
+                timePrompts = get_cached_listing(self.pathToDirectories/date, get_reverse_sorted_directory_by_name)
+            except (FileNotFoundError, NotADirectoryError):
+                # Packed or removed date
+                timePrompts = []
+        segment = self.segments.get(date) if self.segments is not None else None
+        return merge_reverse_sorted(timePrompts, segment.list_time_prompts()) if segment is not None else timePrompts
+
+
     def get_current_image_prompt_directory(self) -> ImagePromptDirectory:
         """
         Gets the current image prompt that this iterator is pointing to. 
@@ -93,19 +136,17 @@ class DirectoryIterator:
             self.pathToDirectories is not None and
             self.currentDate is not None
            ):
-            time, prompt = extract_file_name(self.currentTimePrompt) # split only the first instance!
-            dir = ImagePromptDirectory(
-                prompt=prompt,
-                time=time,
-                # Get only the repo name. Not the full absolute path of the repo.
-                repo=os.path.basename(os.path.normpath(self.pathToDirectories)),
-                date=self.currentDate,
-            )
+            dir = self._to_image_prompt_directory(self.currentTimePrompt)
             logging.info(f'Time Prompt Directory Found {dir}')
             return dir
         return None
 
 
+    def _to_image_prompt_directory(self, timePrompt: str) -> ImagePromptDirectory:
+        time, prompt = extract_file_name(timePrompt) # split only the first instance!
+        return ImagePromptDirectory(prompt=prompt, time=time, repo=self.repo, date=self.currentDate)
+
+
     def _iterate_time_prompt(self) -> ImagePromptDirectory:
         logging.debug(f'Iterating To Next Time Prompt')
 
@@ -133,24 +174,37 @@ class DirectoryIterator:
         return None
 
 
+    def _get_next_date_index(self) -> int:
+        if(self.dateIndex is None):
+            return get_next_string_index_from_reverse_sorted(theString=self.currentDate, reverseSortedStrings=self.sortedDateDirectories, direction=self.direction)
+        elif (self.direction is DIRECTION.FORWARD and self.dateIndex < len(self.sortedDateDirectories)-1):
+            return self.dateIndex + 1
+        elif (self.direction is DIRECTION.BACKWARD and self.dateIndex > 0):
+            return self.dateIndex - 1
+        return None
+
+
     def _iterate_date(self) -> ImagePromptDirectory:
         logging.debug(f'Iterating To Next Date')
         # attempt to get next time prompt within current date directory
         # Either
         # 1. Get next index from existing index
         # 2. Find next index from current date
-        nextDateIndex = None
-        if(self.dateIndex is None):
-            nextDateIndex =  get_next_string_index_from_reverse_sorted(theString=self.currentDate, reverseSortedStrings=self.sortedDateDirectories, direction=self.direction)
-        elif (self.direction is DIRECTION.FORWARD and self.dateIndex < len(self.sortedDateDirectories)-1):
-            nextDateIndex = self.dateIndex + 1
-        elif (self.direction is DIRECTION.BACKWARD and self.dateIndex > 0):
-            nextDateIndex = self.dateIndex - 1
+        nextDateIndex = self._get_next_date_index()
 
         if(nextDateIndex is not None):
             nextDate = self.sortedDateDirectories[nextDateIndex]
             logging.debug(f'Looking at date {nextDate}')
-            nextTimePromptDirectories = get_reverse_sorted_directory_by_name(self.pathToDirectories/nextDate)
+            nextTimePromptDirectories = self._list_time_prompts(nextDate)
+
+            if(len(nextTimePromptDirectories) == 0):
+                # Nothing under this date (ex: it was just made or is being emptied). Move onto the date after it.
+                self.currentDate = nextDate
+                self.dateIndex = nextDateIndex
+                self.currentTimePromptDirectories = []
+                self.currentTimePrompt = None
+                self.timePromptIndex = None
+                return None
 
             startIndexOfNextDateFolder = get_start_index(self.direction,  nextTimePromptDirectories)
             nextTimePrompt = nextTimePromptDirectories[startIndexOfNextDateFolder]
@@ -210,4 +264,112 @@ class DirectoryIterator:
         if(self._exhuasted_all_dates()):
             raise StopIteration
         
-        return candidate_time_prompt_directory 
\ No newline at end of file
+        return candidate_time_prompt_directory 
+
+
+    def _get_step(self) -> int:
+        return 1 if self.direction is not DIRECTION.BACKWARD else -1
+
+
+    def _remaining_in_date(self) -> int:
+        # Number of time prompts left in the current date in the direction of iteration
+        if(self.timePromptIndex is None):
+            if(self.currentTimePrompt is None):
+                return 0
+            # Started from a directory that may not exist, point at the time prompt just before the next one
+            nextTimePromptIndex = get_next_string_index_from_reverse_sorted(theString=self.currentTimePrompt, reverseSortedStrings=self.currentTimePromptDirectories, direction=self.direction)
+            if(nextTimePromptIndex is None):
+                return 0
+            self.timePromptIndex = nextTimePromptIndex - self._get_step()
+        if(self.direction is DIRECTION.BACKWARD):
+            return self.timePromptIndex
+        return len(self.currentTimePromptDirectories) - 1 - self.timePromptIndex
+
+
+    def _move_within_date(self, count: int):
+        self.timePromptIndex += count * self._get_step()
+        self.currentTimePrompt = self.currentTimePromptDirectories[self.timePromptIndex]
+
+
+    def _enter_next_date(self) -> bool:
+        # Points before the first time prompt of the next date without reading any of them. False if dates are exhausted.
+        nextDateIndex = self._get_next_date_index()
+        if(nextDateIndex is None):
+            self.dateIndex = None
+            self.currentDate = None
+            self.currentTimePromptDirectories = None
+            self.currentTimePrompt = None
+            self.timePromptIndex = None
+            return False
+        self.currentDate = self.sortedDateDirectories[nextDateIndex]
+        self.dateIndex = nextDateIndex
+        self.currentTimePromptDirectories = self._list_time_prompts(self.currentDate)
+        self.currentTimePrompt = None
+        self.timePromptIndex = get_before_start_index(self.direction, self.currentTimePromptDirectories)
+        return True
+
+
+    def advance(self, count: int) -> int:
+        """
+        Skips ahead as though next was called count times, without making a directory model for any of the skipped entries.
+        Whole dates are skipped by the length of their listing so skipping costs a listing per date rather then a call per
+        prompt directory.
+
+        Afterwards the iterator points at the last skipped entry (see get_current_image_prompt_directory), so next returns
+        the entry after it.
+
+        Parameters
+        ----------
+        count: (int):
+            Number of prompt directories to skip
+
+        Returns
+        -------
+        int
+            Number of prompt directories actually skipped. Less then count if the iterator was exhausted.
+        """
+        advanced = 0
+        while(advanced < count and not self._exhuasted_all_dates()):
+            remaining = self._remaining_in_date()
+            if(count - advanced <= remaining):
+                self._move_within_date(count - advanced)
+                return count
+            advanced += remaining
+            self._enter_next_date()
+        return advanced
+
+
+    def take(self, count: int) -> List[ImagePromptDirectory]:
+        """
+        Gets the next count prompt directories in one call (ex: a page), slicing them out of each date's listing rather then
+        iterating one at a time. Same as calling next count times, returning fewer if the iterator is exhausted.
+        """
+        taken: List[ImagePromptDirectory] = []
+        while(len(taken) < count and not self._exhuasted_all_dates()):
+            numInDate = min(self._remaining_in_date(), count - len(taken))
+            if(numInDate > 0):
+                start = self.timePromptIndex + self._get_step()
+                self._move_within_date(numInDate)
+                if(self.direction is DIRECTION.BACKWARD):
+                    timePrompts = self.currentTimePromptDirectories[start:self.timePromptIndex-1 if self.timePromptIndex > 0 else None:-1]
+                else:
+                    timePrompts = self.currentTimePromptDirectories[start:self.timePromptIndex+1]
+                taken.extend(self._to_image_prompt_directory(timePrompt) for timePrompt in timePrompts)
+            if(len(taken) < count):
+                self._enter_next_date()
+        return taken
+
+
+    def count_remaining(self) -> int:
+        """
+        Counts the prompt directories next would still return, from the lengths of the listings of the remaining dates. The
+        iterator's position is left as is.
+        """
+        if(self._exhuasted_all_dates()):
+            return 0
+        remaining = self._remaining_in_date()
+        nextDateIndex = self._get_next_date_index()
+        if(nextDateIndex is None):
+            return remaining
+        dateIndices = range(nextDateIndex, len(self.sortedDateDirectories)) if self.direction is not DIRECTION.BACKWARD else range(nextDateIndex, -1, -1)
+        return remaining + sum(len(self._list_time_prompts(self.sortedDateDirectories[dateIndex])) for dateIndex in dateIndices)
@@ -0,0 +1,221 @@
+import io
+import json
+import logging
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, List, Optional, Tuple, Union
+
+from decorators.decorators import auto_str
+from repoManager.Models import ImagePromptDirectory
+from repoManager.PackedSegments import PackedSegment
+from repoManager.SaveQueue import generate_temp_path
+from repoManager.utils import generate_file_name, generate_image_prompt_path, get_or_create_metadata_directory, list_image_files
+
+
+EXPORTS_DIRECTORY_NAME = "exports"
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Archive formats an export can be written as
+EXPORT_FORMATS = ["zip", "tar", "tar.gz"]
+
+# Files are copied into the archive this many bytes at a time so no image is ever fully in memory
+CHUNK_SIZE = 256 * 1024
+
+
+# A file to export. Its name within the prompt directory, its size and how to open it for reading.
+ExportFile = Tuple[str, int, Callable[[], BinaryIO]]
+
+
+@auto_str
+class ExportResult(object):
+    def __init__(self, repo: str, archiveFormat: str, entries: int = 0, files: int = 0, bytes: int = 0, newestExported: ImagePromptDirectory = None):
+        self.repo = repo
+        self.archiveFormat = archiveFormat
+        self.entries = entries
+        self.files = files
+        self.bytes = bytes
+        self.newestExported = newestExported
+
+
+class SegmentSliceReader(io.RawIOBase):
+    """
+    Reads a single file out of a packed segment's memory map without copying more then the buffer asked for.
+    """
+    def __init__(self, segment: PackedSegment, offset: int, size: int):
+        self.view = memoryview(segment.pack)[offset:offset + size]
+        self.position = 0
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def readinto(self, buffer) -> int:
+        numBytes = min(len(buffer), len(self.view) - self.position)
+        buffer[:numBytes] = self.view[self.position:self.position + numBytes]
+        self.position += numBytes
+        return numBytes
+
+
+    def close(self):
+        # The view has to be released before the segment can close its memory map
+        self.view.release()
+        super().close()
+
+
+def list_export_files(reposPath: Path, directory: ImagePromptDirectory, segment: Optional[PackedSegment] = None) -> List[ExportFile]:
+    """
+    Lists the images of a prompt directory to export, either from its directory or from the segment it's packed in.
+    Nothing is read until a file is opened.
+    """
+    promptPath = Path(reposPath)/generate_image_prompt_path(directory)
+    if(not promptPath.is_dir() and segment is not None):
+        timePrompt = generate_file_name(directory.time, directory.prompt)
+        files = []
+        for fileName in segment.list_image_files(timePrompt):
+            offset, size = segment.get_entry(timePrompt, fileName)
+            files.append((fileName, size, lambda offset=offset, size=size: io.BufferedReader(SegmentSliceReader(segment, offset, size), CHUNK_SIZE)))
+        return files
+    return [(fileName, os.stat(promptPath/fileName).st_size, lambda path=promptPath/fileName: open(path, "rb")) for fileName in list_image_files(promptPath)]
+
+
+class ArchiveWriter(object):
+    """
+    Writes files into a zip or tar archive one chunk at a time. Works with unseekable outputs (ex: a socket or stdout) too.
+
+    Zip archives are stored rather then compressed since images are already compressed.
+    """
+    def __init__(self, output: BinaryIO, archiveFormat: str):
+        if(archiveFormat not in EXPORT_FORMATS):
+            raise ValueError(f"Export format must be one of {EXPORT_FORMATS}")
+        self.archiveFormat = archiveFormat
+        if(archiveFormat == "zip"):
+            self.archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            # Stream modes never seek the output
+            self.archive = tarfile.open(fileobj=output, mode="w|gz" if archiveFormat == "tar.gz" else "w|")
+
+
+    def add(self, name: str, size: int, source: BinaryIO, modified: float = None):
+        modified = modified if modified is not None else time.time()
+        if(self.archiveFormat == "zip"):
+            info = zipfile.ZipInfo(name, date_time=time.localtime(modified)[:6])
+            info.file_size = size
+            with self.archive.open(info, "w") as destination:
+                shutil.copyfileobj(source, destination, CHUNK_SIZE)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = int(modified)
+            self.archive.addfile(info, source)
+
+
+    def add_bytes(self, name: str, data: bytes):
+        self.add(name, len(data), io.BytesIO(data))
+
+
+    def close(self):
+        self.archive.close()
+
+
+def generate_export_mark_path(reposPath: Union[str, Path], repo: str) -> Path:
+    return get_or_create_metadata_directory(reposPath)/EXPORTS_DIRECTORY_NAME/(repo + ".json")
+
+
+def read_export_mark(reposPath: Union[str, Path], repo: str) -> Optional[ImagePromptDirectory]:
+    """
+    Gets the newest prompt directory of a repo that was exported, or None if the repo was never exported.
+    """
+    try:
+        with open(generate_export_mark_path(reposPath, repo), "r") as f:
+            mark = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return ImagePromptDirectory(prompt=mark["prompt"], repo=repo, date=mark["date"], time=mark["time"])
+
+
+def write_export_mark(reposPath: Union[str, Path], directory: ImagePromptDirectory):
+    markPath = generate_export_mark_path(reposPath, directory.repo)
+    markPath.parent.mkdir(parents=True, exist_ok=True)
+    tempPath = generate_temp_path(markPath)
+    with open(tempPath, "w") as f:
+        json.dump({ "date": directory.date, "time": directory.time, "prompt": directory.prompt }, f)
+    os.replace(tempPath, markPath)
+
+
+def is_newer(directory: ImagePromptDirectory, than: ImagePromptDirectory) -> bool:
+    """
+    Whether a prompt directory comes before another in the order repos are iterated (most recent first).
+    """
+    return [directory.date, generate_file_name(directory.time, directory.prompt)] > [than.date, generate_file_name(than.time, than.prompt)]
+
+
+def write_archive(output: BinaryIO, archiveFormat: str, repo: str, entries: Iterable[Tuple[ImagePromptDirectory, List[ExportFile]]]) -> ExportResult:
+    """
+    Streams prompt directories into an archive as "<repo>/<date>/<time>_<prompt>/<file>" followed by a "manifest.json"
+    listing the prompt, date, time and archived files of every directory.
+
+    Parameters
+    ----------
+    output (BinaryIO):
+        Where the archive is written. Doesn't need to be seekable.
+
+    archiveFormat (str):
+        One of EXPORT_FORMATS
+
+    repo (str):
+        The repo the entries are from
+
+    entries (Iterable):
+        The prompt directories to export, most recent first, along with their files. Only iterated as the archive is written.
+
+    Returns
+    -------
+    ExportResult
+        How much was exported and the most recent prompt directory exported
+    """
+    result = ExportResult(repo, archiveFormat)
+    manifestEntries = []
+    archive = ArchiveWriter(output, archiveFormat)
+    try:
+        for directory, files in entries:
+            promptPath = generate_image_prompt_path(directory)
+            archivedFiles = []
+            for fileName, size, open_file in files:
+                name = (promptPath/fileName).as_posix()
+                with open_file() as source:
+                    archive.add(name, size, source)
+                archivedFiles.append(name)
+                result.files += 1
+                result.bytes += size
+            manifestEntries.append({ "repo": directory.repo, "date": directory.date, "time": directory.time, "prompt": directory.prompt, "files": archivedFiles })
+            if(result.newestExported is None):
+                result.newestExported = directory
+            result.entries += 1
+        # Written last so the directories are never held in memory, only their names
+        archive.add_bytes(MANIFEST_FILE_NAME, json.dumps({ "repo": repo, "entries": manifestEntries }, indent=1).encode("utf-8"))
+    finally:
+        archive.close()
+    logging.info(f"Exported {result.entries} prompt directories ({result.files} files, {result.bytes} bytes) of {repo} as {archiveFormat}")
+    return result
+
+
+def export_to_path(outputPath: Union[str, Path], archiveFormat: str, repo: str, entries: Iterable[Tuple[ImagePromptDirectory, List[ExportFile]]]) -> ExportResult:
+    """
+    Same as write_archive but into a file. The archive is written to a temp file first and only renamed into place once
+    complete so an interrupted export never leaves a truncated archive behind.
+    """
+    outputPath = Path(outputPath)
+    tempPath = generate_temp_path(outputPath)
+    try:
+        with open(tempPath, "wb") as output:
+            result = write_archive(output, archiveFormat, repo, entries)
+        os.replace(tempPath, outputPath)
+    except BaseException:
+        tempPath.unlink(missing_ok=True)
+        raise
+    return result
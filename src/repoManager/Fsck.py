@@ -0,0 +1,391 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from decorators.decorators import auto_str
+from repoManager.ImageMetadata import METADATA_FILE_NAME
+from repoManager.PackedSegments import PACK_EXTENSION, PackedSegment, SegmentStore, list_packed_dates
+from repoManager.SaveQueue import generate_temp_path
+from repoManager.utils import extract_file_name, get_or_create_metadata_directory, is_image_file_name, list_date_directories
+from utils.imageFormats import detect_image_format, has_valid_header
+from utils.imageUtils import THUMBNAIL_SIZES, generate_thumbnail_path
+
+
+FSCK_DIRECTORY_NAME = "fsck"
+QUARANTINE_DIRECTORY_NAME = "quarantine"
+
+# What can be done about the problems found. "repair" deletes them, "quarantine" moves them out of the repo.
+FSCK_ACTIONS = ["repair", "quarantine"]
+
+# Kinds of problems
+EMPTY_DIRECTORY = "empty directory"
+BAD_DIRECTORY = "bad directory"
+BAD_IMAGE = "bad image"
+CHECKSUM_MISMATCH = "checksum mismatch"
+STRAY_FILE = "stray file"
+
+# Files derived from images that are expected next to them, along with the metadata file
+THUMBNAIL_FILE_PATTERN = re.compile(r"^\d+\.thumb\d+\.png$")
+TIME_PATTERN = re.compile(r"^\d{2}:\d{2}:\d{2}\.\d{6}$")
+
+# Prompt directories changed this recently may still be being saved to so they're left for the next run
+GRACE_SECONDS = 60
+
+
+# Keyed by "<timePrompt>/<file>" within a date. Size, modification time and sha256 of the image when it was last checked.
+# Packed images are kept under "<date>.pack" with the modification time of the pack file, which changes whenever the pack is
+# rewritten (ex: compacted).
+ManifestEntries = Dict[str, Tuple[int, int, str]]
+
+
+@auto_str
+class FsckIssue(object):
+    def __init__(self, kind: str, date: str, timePrompt: str, fileName: str = None, detail: str = None, packed: bool = False):
+        self.kind = kind
+        self.date = date
+        self.timePrompt = timePrompt
+        self.fileName = fileName
+        self.detail = detail
+        # Whether the problem is in the date's segment rather then its directory
+        self.packed = packed
+
+
+    def relative_path(self) -> Path:
+        path = Path(self.date)/self.timePrompt
+        return path/self.fileName if self.fileName is not None else path
+
+
+@auto_str
+class FsckReport(object):
+    def __init__(self, repo: str, datesChecked: int = 0, imagesChecked: int = 0, imagesSkipped: int = 0, issues: List[FsckIssue] = None, fixed: int = 0):
+        self.repo = repo
+        self.datesChecked = datesChecked
+        self.imagesChecked = imagesChecked
+        self.imagesSkipped = imagesSkipped
+        self.issues = issues if issues is not None else []
+        self.fixed = fixed
+
+
+    def is_clean(self) -> bool:
+        return len(self.issues) == 0
+
+
+def generate_manifest_path(reposPath: Union[str, Path], repo: str) -> Path:
+    return get_or_create_metadata_directory(reposPath)/FSCK_DIRECTORY_NAME/(repo + ".json")
+
+
+def read_manifest(manifestPath: Path) -> Dict[str, ManifestEntries]:
+    try:
+        with open(manifestPath, "r") as f:
+            return json.load(f).get("dates", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_manifest(manifestPath: Path, manifest: Dict[str, ManifestEntries]):
+    manifestPath.parent.mkdir(parents=True, exist_ok=True)
+    tempPath = generate_temp_path(manifestPath)
+    with open(tempPath, "w") as f:
+        json.dump({ "dates": manifest }, f)
+    os.replace(tempPath, manifestPath)
+
+
+def check_image(imagePath: Path) -> Tuple[Optional[str], str]:
+    """
+    Reads an image and checks its header.
+
+    Returns
+    -------
+    Tuple[str, str]
+        What is wrong with the image (None if nothing) and its sha256
+    """
+    return check_image_bytes(imagePath.read_bytes())
+
+
+def check_image_bytes(data: bytes) -> Tuple[Optional[str], str]:
+    """
+    Same as check_image but for an image already read (ex: out of a segment).
+    """
+    checksum = hashlib.sha256(data).hexdigest()
+    format = detect_image_format(data)
+    if(format is None):
+        return "not a recognized image format", checksum
+    if(not has_valid_header(data, format)):
+        return f"truncated or corrupt {format}", checksum
+    return None, checksum
+
+
+def check_date(repoPath: Union[str, Path], date: str, manifestEntries: ManifestEntries = {}, full: bool = False, changedBefore: float = None) -> Tuple[List[FsckIssue], ManifestEntries, int, int]:
+    """
+    Checks every prompt directory of a date. Images whose size and modification time match the manifest were already checked
+    and are skipped unless doing a full check, in which case they're hashed again to catch images that changed on disk
+    without being written to (ex: a failing SD card). Prompt directories modified after changedBefore (a timestamp) are
+    skipped since they may still be being saved to.
+
+    Returns
+    -------
+    Tuple[List[FsckIssue], ManifestEntries, int, int]
+        The problems found, manifest entries of every good image, the number of images checked and the number skipped
+    """
+    datePath = Path(repoPath)/date
+    changedBefore = changedBefore if changedBefore is not None else time.time() - GRACE_SECONDS
+    issues: List[FsckIssue] = []
+    entries: ManifestEntries = {}
+    numChecked, numSkipped = 0, 0
+
+    with os.scandir(datePath) as dateEntries:
+        dateEntries = sorted(dateEntries, key=lambda entry: entry.name, reverse=True)
+    for promptEntry in dateEntries:
+        if(promptEntry.name.startswith(".") or not promptEntry.is_dir()):
+            issues.append(FsckIssue(STRAY_FILE, date, promptEntry.name, detail="not a prompt directory"))
+            continue
+        if(promptEntry.stat().st_mtime > changedBefore):
+            continue
+        timePrompt = promptEntry.name
+        parts = extract_file_name(timePrompt)
+        if(len(parts) != 2 or TIME_PATTERN.match(parts[0]) is None or parts[1] == ""):
+            issues.append(FsckIssue(BAD_DIRECTORY, date, timePrompt, detail="name is not <time>_<prompt>"))
+            continue
+
+        numImages = 0
+        with os.scandir(promptEntry.path) as fileEntries:
+            fileEntries = sorted(fileEntries, key=lambda entry: entry.name)
+        for fileEntry in fileEntries:
+            if(not is_image_file_name(fileEntry.name)):
+                if(not THUMBNAIL_FILE_PATTERN.match(fileEntry.name) and fileEntry.name != METADATA_FILE_NAME):
+                    issues.append(FsckIssue(STRAY_FILE, date, timePrompt, fileEntry.name))
+                continue
+            numImages += 1
+            key = timePrompt + "/" + fileEntry.name
+            stat = fileEntry.stat()
+            recorded = manifestEntries.get(key)
+            unchanged = recorded is not None and recorded[0] == stat.st_size and recorded[1] == stat.st_mtime_ns
+            if(unchanged and not full):
+                entries[key] = recorded
+                numSkipped += 1
+                continue
+
+            numChecked += 1
+            problem, checksum = check_image(Path(fileEntry.path))
+            if(problem is not None):
+                issues.append(FsckIssue(BAD_IMAGE, date, timePrompt, fileEntry.name, detail=problem))
+            elif(unchanged and recorded[2] != checksum):
+                issues.append(FsckIssue(CHECKSUM_MISMATCH, date, timePrompt, fileEntry.name, detail="changed since it was last checked"))
+                # Keep the checksum it should have so the mismatch keeps being reported until it's dealt with
+                entries[key] = recorded
+            else:
+                entries[key] = [stat.st_size, stat.st_mtime_ns, checksum]
+
+        if(numImages == 0):
+            issues.append(FsckIssue(EMPTY_DIRECTORY, date, timePrompt))
+
+    return issues, entries, numChecked, numSkipped
+
+
+def check_packed_date(repoPath: Union[str, Path], date: str, manifestEntries: ManifestEntries = {}, full: bool = False) -> Tuple[List[FsckIssue], ManifestEntries, int, int]:
+    """
+    Same as check_date but for the prompt directories packed in a date's segment. Images are checked straight out of the
+    segment's memory map. Segments don't change once written other then through deletes and compaction, so images are
+    only read again if the pack file was rewritten since they were last checked or when doing a full check.
+
+    Returns
+    -------
+    Tuple[List[FsckIssue], ManifestEntries, int, int]
+        The problems found, manifest entries of every good image, the number of images checked and the number skipped
+    """
+    segment = PackedSegment(repoPath, date)
+    issues: List[FsckIssue] = []
+    entries: ManifestEntries = {}
+    numChecked, numSkipped = 0, 0
+    try:
+        packVersion = os.stat(segment.packPath).st_mtime_ns
+        for timePrompt in segment.list_time_prompts():
+            parts = extract_file_name(timePrompt)
+            if(len(parts) != 2 or TIME_PATTERN.match(parts[0]) is None or parts[1] == ""):
+                issues.append(FsckIssue(BAD_DIRECTORY, date, timePrompt, detail="name is not <time>_<prompt>", packed=True))
+                continue
+
+            numImages = 0
+            for fileName in sorted(segment.list_files(timePrompt)):
+                if(not is_image_file_name(fileName)):
+                    if(not THUMBNAIL_FILE_PATTERN.match(fileName) and fileName != METADATA_FILE_NAME):
+                        issues.append(FsckIssue(STRAY_FILE, date, timePrompt, fileName, packed=True))
+                    continue
+                numImages += 1
+                key = timePrompt + "/" + fileName
+                _, size = segment.get_entry(timePrompt, fileName)
+                recorded = manifestEntries.get(key)
+                unchanged = recorded is not None and recorded[0] == size and recorded[1] == packVersion
+                if(unchanged and not full):
+                    entries[key] = recorded
+                    numSkipped += 1
+                    continue
+
+                numChecked += 1
+                problem, checksum = check_image_bytes(segment.read(timePrompt, fileName))
+                if(problem is not None):
+                    issues.append(FsckIssue(BAD_IMAGE, date, timePrompt, fileName, detail=problem, packed=True))
+                elif(unchanged and recorded[2] != checksum):
+                    issues.append(FsckIssue(CHECKSUM_MISMATCH, date, timePrompt, fileName, detail="changed since it was last checked", packed=True))
+                    entries[key] = recorded
+                else:
+                    entries[key] = [size, packVersion, checksum]
+
+            if(numImages == 0):
+                issues.append(FsckIssue(EMPTY_DIRECTORY, date, timePrompt, packed=True))
+    finally:
+        segment.close()
+
+    return issues, entries, numChecked, numSkipped
+
+
+def _check_date_safely(args: Tuple[Path, str, ManifestEntries, bool, float, bool]) -> Tuple[List[FsckIssue], ManifestEntries, int, int]:
+    repoPath, date, manifestEntries, full, changedBefore, packed = args
+    try:
+        if(packed):
+            return check_packed_date(repoPath, date, manifestEntries, full)
+        return check_date(repoPath, date, manifestEntries, full, changedBefore)
+    except BaseException as e:
+        logging.error(f"Could not check {repoPath/date} : {traceback.format_exc()}")
+        return [FsckIssue(BAD_DIRECTORY, date, "", detail=f"could not be checked : {e}", packed=packed)], manifestEntries, 0, 0
+
+
+def fix_packed_issue(segments: SegmentStore, issue: FsckIssue, action: str, quarantinePath: Path = None) -> bool:
+    """
+    Same as fix_issue but for a problem in a date's segment. What the issue is about is deleted from the segment, after
+    being written out into the quarantine if quarantining. Removing a bad image takes its thumbnails with it, along with
+    the rest of its prompt directory if it has no images left.
+    """
+    segment = segments.get(issue.date)
+    if(issue.timePrompt == "" or segment is None or not segment.has_time_prompt(issue.timePrompt)):
+        return False
+    fileNames = segment.list_files(issue.timePrompt)
+    if(issue.fileName is not None):
+        remainingImages = [fileName for fileName in segment.list_image_files(issue.timePrompt) if fileName != issue.fileName]
+        if(len(remainingImages) > 0 or not is_image_file_name(issue.fileName)):
+            derivedFileNames = [generate_thumbnail_path(Path(issue.fileName), size).name for size in THUMBNAIL_SIZES]
+            fileNames = [fileName for fileName in fileNames if fileName == issue.fileName or fileName in derivedFileNames]
+    if(action == "quarantine"):
+        for fileName in fileNames:
+            destination = quarantinePath/issue.date/issue.timePrompt/fileName
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(segment.read(issue.timePrompt, fileName))
+    return segments.delete(issue.date, issue.timePrompt, fileNames) > 0
+
+
+def fix_issue(repoPath: Path, issue: FsckIssue, action: str, quarantinePath: Path = None) -> bool:
+    """
+    Deletes whatever an issue is about or moves it into the quarantine, keeping its path relative to the repo.
+    Returns whether anything was changed.
+    """
+    path = repoPath/issue.relative_path()
+    if(issue.timePrompt == "" or not (path.exists() or path.is_symlink())):
+        return False
+    if(action == "quarantine"):
+        destination = quarantinePath/issue.relative_path()
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(destination))
+    elif(path.is_dir() and not path.is_symlink()):
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+    # Removing a bad image can leave its prompt directory with nothing but thumbnails
+    promptPath = repoPath/issue.date/issue.timePrompt
+    if(issue.fileName is not None and promptPath.is_dir() and not any(is_image_file_name(fileName) for fileName in os.listdir(promptPath))):
+        fix_issue(repoPath, FsckIssue(EMPTY_DIRECTORY, issue.date, issue.timePrompt), action, quarantinePath)
+    return True
+
+
+def fsck_repo(reposPath: Union[str, Path], repo: str, action: str = None, full: bool = False, maxWorkers: int = None, graceSeconds: float = GRACE_SECONDS, segments: SegmentStore = None) -> FsckReport:
+    """
+    Checks the integrity of every date directory and packed segment of a repo, spreading the dates across a pool of processes.
+
+    Finds prompt directories without images or with names that aren't "<time>_<prompt>", images that are truncated or not
+    images at all, images that changed on disk since they were last checked, and stray files that don't belong to a prompt.
+    Packed images are checked the same way straight out of their segment.
+
+    Every good image is recorded in a manifest (size, modification time and sha256) under the metadata directory. Later runs
+    only read images that aren't in the manifest or whose size or modification time changed, unless full is set.
+
+    Parameters
+    ----------
+    reposPath (Path):
+        Path to the directory containing all image repos
+
+    repo (str):
+        The repo to check
+
+    action (str):
+        Optional fix for the problems found. "repair" deletes them and "quarantine" moves them under the metadata directory
+        (as "quarantine/<repo>/<date>/..."). By default problems are only reported.
+
+    full (bool):
+        Read and hash every image, including ones the manifest says are unchanged
+
+    maxWorkers (int):
+        Optional number of processes to use. Defaults to the number of cores.
+
+    graceSeconds (float):
+        Prompt directories modified this recently are left for the next run since they may still be being saved to
+
+    segments (SegmentStore):
+        Optional segment store of the repo, used to fix problems in packed dates so they're deleted under its write lock.
+        One is made for the fix if not given.
+
+    Returns
+    -------
+    FsckReport
+        What was checked, the problems found and how many were fixed
+    """
+    if(action is not None and action not in FSCK_ACTIONS):
+        raise ValueError(f"Fsck action must be one of {FSCK_ACTIONS}")
+
+    repoPath = Path(reposPath)/repo
+    manifestPath = generate_manifest_path(reposPath, repo)
+    manifest = read_manifest(manifestPath)
+    dates = list_date_directories(repoPath) if repoPath.is_dir() else []
+    packedDates = list_packed_dates(repoPath)
+    changedBefore = time.time() - graceSeconds
+    logging.info(f"Checking {len(dates)} dates and {len(packedDates)} packed dates of {repoPath}")
+
+    report = FsckReport(repo, datesChecked=len(set(dates).union(packedDates)))
+    newManifest: Dict[str, ManifestEntries] = {}
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        # Packed dates are kept in the manifest under the name of their pack file so they never mix with a directory of the same date
+        manifestKeys = dates + [date + PACK_EXTENSION for date in packedDates]
+        work = [(repoPath, date, manifest.get(key, {}), full, changedBefore, key != date) for date, key in zip(dates + packedDates, manifestKeys)]
+        for key, (issues, entries, numChecked, numSkipped) in zip(manifestKeys, executor.map(_check_date_safely, work)):
+            report.issues += issues
+            report.imagesChecked += numChecked
+            report.imagesSkipped += numSkipped
+            if(len(entries) > 0):
+                newManifest[key] = entries
+
+    if(action is not None):
+        quarantinePath = get_or_create_metadata_directory(reposPath)/QUARANTINE_DIRECTORY_NAME/repo
+        fixSegments = segments if segments is not None else SegmentStore(repoPath)
+        try:
+            for issue in report.issues:
+                try:
+                    if(issue.packed):
+                        report.fixed += fix_packed_issue(fixSegments, issue, action, quarantinePath)
+                    else:
+                        report.fixed += fix_issue(repoPath, issue, action, quarantinePath)
+                except OSError:
+                    logging.error(f"Could not {action} {repoPath/issue.relative_path()} : {traceback.format_exc()}")
+        finally:
+            if(segments is None):
+                fixSegments.shutdown()
+
+    write_manifest(manifestPath, newManifest)
+    logging.info(f"Checked {report.imagesChecked} images of {repoPath}, skipped {report.imagesSkipped} unchanged, found {len(report.issues)} problems and fixed {report.fixed}")
+    return report
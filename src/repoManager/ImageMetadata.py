@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from decorators.decorators import auto_str
+from repoManager.SaveQueue import SaveJob, write_images
+from repoManager.utils import list_date_directories, list_image_files
+from utils.imageFormats import detect_image_format, read_image_dimensions
+from utils.pathingUtils import get_reverse_sorted_directory_by_name
+
+
+# Written in every prompt directory next to its images
+METADATA_FILE_NAME = "meta.json"
+
+# Enough of the start of an image to find its dimensions. JPEGs can have up to 64KB of EXIF data before them.
+HEADER_BYTES = 64 * 1024
+
+# Images are hashed this many bytes at a time
+HASH_CHUNK_SIZE = 256 * 1024
+
+
+@auto_str
+class ImageMetadata(object):
+    """
+    Properties of a saved image that are expensive to get from the image itself. Engine and latency are of the prompt the
+    image was generated for and are None when not known (ex: backfilled or imported images).
+    """
+    def __init__(self, fileName: str, width: int, height: int, bytes: int, format: str, sha256: str, engine: str = None, latencySeconds: float = None):
+        self.fileName = fileName
+        self.width = width
+        self.height = height
+        self.bytes = bytes
+        self.format = format
+        self.sha256 = sha256
+        self.engine = engine
+        self.latencySeconds = latencySeconds
+
+
+    def to_record(self) -> dict:
+        return { "width": self.width, "height": self.height, "bytes": self.bytes, "format": self.format, "sha256": self.sha256 }
+
+
+def generate_image_metadata(fileName: str, imageBytes: bytes, engine: str = None, latencySeconds: float = None) -> ImageMetadata:
+    """
+    Gets the metadata of an image already in memory. Only the header is parsed, the image is never decoded.
+    """
+    format = detect_image_format(imageBytes)
+    width, height = read_image_dimensions(imageBytes[:HEADER_BYTES], format) or (None, None)
+    return ImageMetadata(fileName, width, height, len(imageBytes), format, hashlib.sha256(imageBytes).hexdigest(), engine, latencySeconds)
+
+
+def read_image_file_metadata(imagePath: Union[str, Path], engine: str = None, latencySeconds: float = None) -> ImageMetadata:
+    """
+    Gets the metadata of an image file. Its header is parsed for the format and dimensions and the rest is only streamed
+    through the hash, so the image is never decoded or fully held in memory.
+    """
+    imagePath = Path(imagePath)
+    checksum = hashlib.sha256()
+    with open(imagePath, "rb") as f:
+        header = f.read(HEADER_BYTES)
+        checksum.update(header)
+        while(chunk := f.read(HASH_CHUNK_SIZE)):
+            checksum.update(chunk)
+        size = os.fstat(f.fileno()).st_size
+    format = detect_image_format(header)
+    width, height = read_image_dimensions(header, format) or (None, None)
+    return ImageMetadata(imagePath.name, width, height, size, format, checksum.hexdigest(), engine, latencySeconds)
+
+
+def parse_metadata(data: bytes) -> List[ImageMetadata]:
+    """
+    Parses the contents of a metadata file into the metadata of every image it has, in the order they were written.
+    """
+    stored = json.loads(data)
+    engine, latencySeconds = stored.get("engine"), stored.get("latencySeconds")
+    return [
+        ImageMetadata(fileName, record["width"], record["height"], record["bytes"], record["format"], record["sha256"], engine, latencySeconds)
+        for fileName, record in stored.get("images", {}).items()
+    ]
+
+
+def serialize_metadata(metadata: List[ImageMetadata]) -> bytes:
+    engine = next((imageMetadata.engine for imageMetadata in metadata if imageMetadata.engine is not None), None)
+    latencySeconds = next((imageMetadata.latencySeconds for imageMetadata in metadata if imageMetadata.latencySeconds is not None), None)
+    return json.dumps({
+        "engine": engine,
+        "latencySeconds": latencySeconds,
+        "images": dict((imageMetadata.fileName, imageMetadata.to_record()) for imageMetadata in metadata),
+    }).encode("utf-8")
+
+
+def read_metadata(promptPath: Union[str, Path]) -> Optional[List[ImageMetadata]]:
+    """
+    Reads the metadata file of a prompt directory. Returns None if it doesn't have one or it can't be read.
+    """
+    try:
+        return parse_metadata((Path(promptPath)/METADATA_FILE_NAME).read_bytes())
+    except (FileNotFoundError, NotADirectoryError, ValueError, KeyError):
+        return None
+
+
+def write_metadata(promptPath: Union[str, Path], metadata: List[ImageMetadata]):
+    """
+    Writes the metadata file of a prompt directory crash safely, replacing any it already had.
+    """
+    write_images([SaveJob(Path(promptPath)/METADATA_FILE_NAME, serialize_metadata(metadata))])
+
+
+def is_current(imageMetadata: ImageMetadata, promptPath: Path) -> bool:
+    # Images are only ever replaced by writing a whole new file, checking the size catches re-encoded or swapped images
+    try:
+        return os.stat(promptPath/imageMetadata.fileName).st_size == imageMetadata.bytes
+    except FileNotFoundError:
+        return False
+
+
+def get_or_create_metadata(promptPath: Union[str, Path]) -> List[ImageMetadata]:
+    """
+    Gets the metadata of every image in a prompt directory. Images missing from the metadata file, or that changed since it
+    was written, have their headers read and the file is rewritten. Images no longer in the directory are dropped.
+    """
+    promptPath = Path(promptPath)
+    stored = dict((imageMetadata.fileName, imageMetadata) for imageMetadata in (read_metadata(promptPath) or []))
+    engine = next((imageMetadata.engine for imageMetadata in stored.values()), None)
+    latencySeconds = next((imageMetadata.latencySeconds for imageMetadata in stored.values()), None)
+
+    metadata, changed = [], False
+    imageFiles = list_image_files(promptPath)
+    for imageFile in imageFiles:
+        imageMetadata = stored.get(imageFile)
+        if(imageMetadata is None or not is_current(imageMetadata, promptPath)):
+            imageMetadata = read_image_file_metadata(promptPath/imageFile, engine, latencySeconds)
+            changed = True
+        metadata.append(imageMetadata)
+    # A prompt directory without images is either being saved to or about to be removed
+    if(len(imageFiles) > 0 and (changed or len(stored) != len(imageFiles))):
+        write_metadata(promptPath, metadata)
+    return metadata
+
+
+def _backfill_metadata_safely(promptPath: Path) -> bool:
+    try:
+        get_or_create_metadata(promptPath)
+        return True
+    except BaseException as e:
+        logging.error(f'Could not write metadata for {promptPath} : {traceback.format_exc()}')
+        return False
+
+
+def find_prompts_missing_metadata(repoPath: Union[str, Path]) -> List[Path]:
+    """
+    Walks a repo and finds every prompt directory without a metadata file. Packed dates are left alone, their metadata is
+    made in memory when read.
+    """
+    repoPath = Path(repoPath)
+    missing = []
+    for date in list_date_directories(repoPath):
+        for timePrompt in get_reverse_sorted_directory_by_name(repoPath/date):
+            if(not (repoPath/date/timePrompt/METADATA_FILE_NAME).exists()):
+                missing.append(repoPath/date/timePrompt)
+    return missing
+
+
+def backfill_metadata(repoPath: Union[str, Path], maxWorkers: int = None) -> int:
+    """
+    Writes the metadata file of every prompt directory in a repo that doesn't have one yet. Mostly for repos that were made
+    before metadata was written at save time. Hashing is CPU bound so the work is spread across a pool of processes.
+
+    Parameters
+    ----------
+    repoPath (Path):
+        Absolute path to the repo
+
+    maxWorkers (int):
+        Optional number of processes to use. Defaults to the number of cores.
+
+    Returns
+    -------
+    int
+        The number of prompt directories that had metadata written for them
+    """
+    missing = find_prompts_missing_metadata(repoPath)
+    logging.info(f'Backfilling metadata for {len(missing)} prompt directories in {repoPath}')
+    if(len(missing) == 0):
+        return 0
+
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        results = list(executor.map(_backfill_metadata_safely, missing, chunksize=16))
+    return sum(results)
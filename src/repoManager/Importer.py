@@ -0,0 +1,323 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+from PIL import Image
+
+from decorators.decorators import auto_str
+from repoManager.Models import ImagePromptDirectory
+from repoManager.SaveQueue import generate_temp_path
+from repoManager.utils import generate_file_name, get_or_create_metadata_directory
+from utils.dateUtils import split_ios_date_time
+from utils.imageFormats import IMAGE_FORMAT_EXTENSIONS, can_pass_through, transcode_image
+
+
+IMPORTS_DIRECTORY_NAME = "imports"
+
+# Extensions of files considered images when walking a source tree. Anything Pillow can decode is transcoded if needed.
+SOURCE_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+
+# Ex: "2024-01-14 03-03-45_Shrek eat chips.png", "2024-01-14T03:03:45.522668_Shrek.png" or "20240114_030345_Shrek.png"
+FILE_NAME_PATTERN = re.compile(
+    r"^(?P<date>\d{4}-?\d{2}-?\d{2})[ T_]"
+    r"(?P<hour>\d{2})[:\-.]?(?P<minute>\d{2})[:\-.]?(?P<second>\d{2})(?:\.(?P<fraction>\d{1,6}))?"
+    r"(?:[ _\-]+(?P<prompt>.+))?$"
+)
+
+EXIF_IFD = 0x8769
+EXIF_DATE_TIME_ORIGINAL = 0x9003
+EXIF_DATE_TIME = 0x0132
+EXIF_IMAGE_DESCRIPTION = 0x010E
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+IMPORT_MODES = ["copy", "hardlink"]
+
+
+@auto_str
+class ImportCandidate(object):
+    def __init__(self, sourcePath: str, prompt: str, date: str, time: str, errorMessage: Union[str, None] = None):
+        self.sourcePath = sourcePath
+        self.prompt = prompt
+        self.date = date
+        self.time = time
+        self.errorMessage = errorMessage
+
+
+@auto_str
+class ImportResult(object):
+    def __init__(self, imported: int, skipped: int, failed: List[Tuple[str, str]], directories: List[ImagePromptDirectory]):
+        self.imported = imported
+        self.skipped = skipped
+        self.failed = failed
+        self.directories = directories
+
+
+def clean_prompt(prompt: str) -> str:
+    # Prompts become directory names so they can't contain path separators
+    prompt = prompt.replace(os.sep, " ").replace("/", " ").replace("\0", "")
+    return " ".join(prompt.split())
+
+
+def _read_sidecar(sourcePath: Path) -> Tuple[Optional[str], Optional[datetime]]:
+    jsonSidecar = sourcePath.with_suffix(".json")
+    if(jsonSidecar.is_file()):
+        meta = json.loads(jsonSidecar.read_text())
+        timestamp = meta.get("timestamp") or meta.get("datetime")
+        return meta.get("prompt"), datetime.fromisoformat(timestamp) if timestamp else None
+
+    textSidecar = sourcePath.with_suffix(".txt")
+    if(textSidecar.is_file()):
+        return textSidecar.read_text().strip() or None, None
+    return None, None
+
+
+def _read_exif(sourcePath: Path) -> Tuple[Optional[str], Optional[datetime]]:
+    # Opening only parses the headers, the image data itself isn't decoded
+    with Image.open(sourcePath) as image:
+        exif = image.getexif()
+        prompt = exif.get(EXIF_IMAGE_DESCRIPTION) or image.info.get("prompt") or image.info.get("Description")
+        dateTime = exif.get_ifd(EXIF_IFD).get(EXIF_DATE_TIME_ORIGINAL) or exif.get(EXIF_DATE_TIME)
+    timestamp = datetime.strptime(dateTime.strip("\0 "), EXIF_DATE_FORMAT) if dateTime else None
+    return prompt, timestamp
+
+
+def _read_file_name(sourcePath: Path) -> Tuple[Optional[str], Optional[datetime]]:
+    match = FILE_NAME_PATTERN.match(sourcePath.stem)
+    if(match is None):
+        return None, None
+    day = datetime.strptime(match.group("date").replace("-", ""), "%Y%m%d")
+    timestamp = day.replace(
+        hour=int(match.group("hour")),
+        minute=int(match.group("minute")),
+        second=int(match.group("second")),
+        microsecond=int((match.group("fraction") or "0").ljust(6, "0"))
+    )
+    prompt = match.group("prompt")
+    return prompt.replace("_", " ") if prompt else None, timestamp
+
+
+def read_import_metadata(sourcePath: Union[str, Path]) -> ImportCandidate:
+    """
+    Works out the prompt and timestamp of an image being imported. Sources are tried in order: a sidecar file next to the
+    image ("<name>.json" with "prompt" and "timestamp" keys, or "<name>.txt" holding the prompt), the EXIF or PNG text of
+    the image and finally the file name itself. If none of them have a timestamp the files modification time is used and
+    if none have a prompt the file name is.
+    """
+    sourcePath = Path(sourcePath)
+    try:
+        prompt, timestamp = None, None
+        for reader in [_read_sidecar, _read_exif, _read_file_name]:
+            try:
+                readPrompt, readTimestamp = reader(sourcePath)
+            except BaseException as e:
+                logging.debug(f"Could not read import metadata of {sourcePath} with {reader.__name__} : {e}")
+                continue
+            prompt = prompt or readPrompt
+            timestamp = timestamp or readTimestamp
+            if(prompt and timestamp):
+                break
+
+        timestamp = timestamp or datetime.fromtimestamp(sourcePath.stat().st_mtime)
+        date, time = split_ios_date_time(timestamp)
+        return ImportCandidate(str(sourcePath), clean_prompt(prompt or sourcePath.stem.replace("_", " ")) or "Untitled", date, time)
+    except BaseException as e:
+        return ImportCandidate(str(sourcePath), None, None, None, errorMessage=str(e))
+
+
+def find_source_images(sourcePath: Union[str, Path]) -> List[Path]:
+    """
+    Walks a source tree and finds every image in it, skipping hidden files and directories. Ordered by path.
+    """
+    images = []
+    for root, directories, files in os.walk(sourcePath):
+        directories[:] = [directory for directory in directories if not directory.startswith(".")]
+        for file in files:
+            if(not file.startswith(".") and Path(file).suffix.lower() in SOURCE_IMAGE_EXTENSIONS):
+                images.append(Path(root)/file)
+    return sorted(images)
+
+
+def place_image(sourcePath: str, targetPromptPath: str, num: int, mode: str = "copy") -> Tuple[Optional[str], Optional[str]]:
+    """
+    Validates an image and places it in a prompt directory as "<num>.<extension>". Images that can be saved as they are get
+    copied or hardlinked, anything else is transcoded to PNG. Images are placed through a temp file so a partial image is
+    never left behind.
+
+    Returns
+    -------
+    Tuple[str, str]
+        The file name the image was placed as and an error message if the image couldn't be placed
+    """
+    try:
+        sourcePath = Path(sourcePath)
+        with open(sourcePath, "rb") as f:
+            imageBytes = f.read()
+
+        imageFormat = can_pass_through(imageBytes)
+        # Transcode before making any directories so that images that can't be decoded leave nothing behind
+        transcodedBytes = transcode_image(imageBytes, "PNG") if imageFormat is None else None
+
+        targetPath = Path(targetPromptPath)/f"{num}.{IMAGE_FORMAT_EXTENSIONS[imageFormat or 'PNG']}"
+        targetPath.parent.mkdir(parents=True, exist_ok=True)
+        tempPath = generate_temp_path(targetPath)
+        if(tempPath.exists()):
+            tempPath.unlink()
+
+        if(transcodedBytes is not None):
+            tempPath.write_bytes(transcodedBytes)
+        elif(mode == "hardlink"):
+            try:
+                os.link(sourcePath, tempPath)
+            except OSError:
+                # Ex: the source is on another device
+                shutil.copyfile(sourcePath, tempPath)
+        else:
+            shutil.copyfile(sourcePath, tempPath)
+
+        os.replace(tempPath, targetPath)
+        return targetPath.name, None
+    except BaseException as e:
+        logging.error(f"Could not import {sourcePath} : {traceback.format_exc()}")
+        return None, str(e)
+
+
+def _place_image_star(args: Tuple[str, str, int, str]) -> Tuple[Optional[str], Optional[str]]:
+    return place_image(*args)
+
+
+class ImportProgress(object):
+    """
+    Records which source images were already imported so an interrupted import can pick up where it left off. Stored as
+    one line per imported source under the .paiid directory, keyed by the source tree and repo.
+    """
+    def __init__(self, reposPath: Union[str, Path], sourcePath: Union[str, Path], repo: str):
+        key = hashlib.sha256(f"{Path(sourcePath).resolve()}\n{repo}".encode()).hexdigest()[:16]
+        importsPath = get_or_create_metadata_directory(Path(reposPath))/IMPORTS_DIRECTORY_NAME
+        importsPath.mkdir(exist_ok=True)
+        self.progressPath = importsPath/f"{key}.progress"
+
+
+    def read_completed(self) -> Set[str]:
+        if(not self.progressPath.exists()):
+            return set()
+        return set(line.rstrip("\n") for line in self.progressPath.read_text().splitlines() if line)
+
+
+    def record(self, sourcePaths: List[str]):
+        with open(self.progressPath, "a") as f:
+            f.write("".join(sourcePath + "\n" for sourcePath in sourcePaths))
+
+
+    def finish(self):
+        if(self.progressPath.exists()):
+            self.progressPath.unlink()
+
+
+def plan_import(candidates: List[ImportCandidate]) -> Dict[Tuple[str, str, str], List[ImportCandidate]]:
+    """
+    Groups candidates into the prompt directories they'll be imported into. Images with the same prompt and timestamp share
+    a directory and are numbered in the order of their source paths so that reruns plan exactly the same way.
+    """
+    plan: Dict[Tuple[str, str, str], List[ImportCandidate]] = {}
+    for candidate in sorted(candidates, key=lambda candidate: candidate.sourcePath):
+        plan.setdefault((candidate.date, candidate.time, candidate.prompt), []).append(candidate)
+    return plan
+
+
+def import_images(
+        sourcePath: Union[str, Path],
+        reposPath: Union[str, Path],
+        repo: str,
+        mode: str = "copy",
+        maxWorkers: int = None,
+        onProgress: Callable[[int, int], None] = None
+    ) -> ImportResult:
+    """
+    Imports every image under a source tree into a repo, laid out as date/time_prompt directories like images saved by PAIID.
+
+    Reading metadata and placing images are spread across a pool of processes. Progress is recorded as images are placed so
+    rerunning an interrupted import skips the images it already imported.
+
+    Parameters
+    ----------
+    sourcePath (Path):
+        Root of the tree of images to import
+
+    reposPath (Path):
+        Path to the directory containing all image repos
+
+    repo (str):
+        The repo to import into
+
+    mode (str):
+        "copy" to copy images or "hardlink" to link them (falling back to copying across devices)
+
+    maxWorkers (int):
+        Optional number of processes to use. Defaults to the number of cores.
+
+    onProgress (Callable):
+        Optional callback given the number of images processed so far and the total
+
+    Returns
+    -------
+    ImportResult
+        Counts of imported and skipped images, failures and every prompt directory images were imported into
+    """
+    if(mode not in IMPORT_MODES):
+        raise ValueError(f"Import mode must be one of {IMPORT_MODES}")
+
+    repoPath = Path(reposPath)/repo
+    progress = ImportProgress(reposPath, sourcePath, repo)
+    completed = progress.read_completed()
+    sources = find_source_images(sourcePath)
+    logging.info(f"Importing {len(sources)} images from {sourcePath} into {repoPath} ({len(completed)} already imported)")
+
+    failed: List[Tuple[str, str]] = []
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        candidates = list(executor.map(read_import_metadata, sources, chunksize=32))
+        failed += [(candidate.sourcePath, candidate.errorMessage) for candidate in candidates if candidate.errorMessage is not None]
+        plan = plan_import([candidate for candidate in candidates if candidate.errorMessage is None])
+
+        directories: List[ImagePromptDirectory] = []
+        placements: List[Tuple[str, str, int, str]] = []
+        for (date, time, prompt), group in plan.items():
+            directories.append(ImagePromptDirectory(prompt=prompt, repo=repo, date=date, time=time))
+            promptPath = repoPath/date/generate_file_name(time, prompt)
+            for num, candidate in enumerate(group, start=1):
+                if(candidate.sourcePath in completed):
+                    continue
+                placements.append((candidate.sourcePath, str(promptPath), num, mode))
+
+        skipped = len(sources) - len(failed) - len(placements)
+        imported = 0
+        done = len(sources) - len(placements)
+        if(onProgress is not None):
+            onProgress(done, len(sources))
+
+        batch: List[str] = []
+        for placement, (_, errorMessage) in zip(placements, executor.map(_place_image_star, placements, chunksize=8)):
+            done += 1
+            if(errorMessage is None):
+                imported += 1
+                batch.append(placement[0])
+            else:
+                failed.append((placement[0], errorMessage))
+            if(len(batch) >= 64):
+                progress.record(batch)
+                batch = []
+            if(onProgress is not None):
+                onProgress(done, len(sources))
+        progress.record(batch)
+
+    if(len(failed) == 0):
+        progress.finish()
+    logging.info(f"Imported {imported} images, skipped {skipped} already imported and {len(failed)} failed")
+    return ImportResult(imported=imported, skipped=skipped, failed=failed, directories=directories)
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Sequence, Tuple, Union
+
+
+# Total number of names kept across every cached listing before the least recently used listings are evicted. A name
+# takes roughly 100 bytes so this keeps the cache to tens of megabytes at most.
+MAX_CACHED_NAMES = 500000
+
+# Directories modified this recently before they were listed aren't trusted to be unchanged on a later look. File systems
+# only keep modification times to some resolution (2 seconds on FAT drives) so an entry made right after the listing,
+# within the same tick, would leave the modification time as it was.
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+# Identifies the state of a directory when it was listed: device, inode, modification and change time
+DirectoryStamp = Tuple[int, int, int, int]
+
+
+def get_directory_stamp(path: Path) -> Optional[DirectoryStamp]:
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns)
+
+
+class ListingCache(object):
+    """
+    Sorted listings of directories shared by everything in the process that walks a repo (ex: every DirectoryIterator made
+    for a page turn), so unchanged directories aren't listed and sorted again each time.
+
+    A listing is kept with the stamp (inode, modification and change time) its directory had when it was listed. Adding,
+    removing or renaming anything in a directory changes its modification time so a listing is only handed out again while
+    its directory's stamp is the same, which takes a single stat. Listings of directories modified right before they were
+    listed are always listed again, see RACY_WINDOW_NS.
+
+    Listings are handed out as tuples since they're shared. The least recently used listings are evicted once more then
+    maxNames names are cached.
+
+    Methods
+    ----------
+    get_listing(path, lister)
+        Gets the listing of a directory made by lister, listing it only if it changed since it was cached
+
+    invalidate(path)
+        Drops the cached listings of a directory
+
+    clear()
+        Drops every cached listing
+    """
+    def __init__(self, maxNames: int = MAX_CACHED_NAMES):
+        self.maxNames = maxNames
+        self.lock = threading.Lock()
+        self.listings: OrderedDict[Tuple[str, Callable], Tuple[DirectoryStamp, Tuple[str, ...]]] = OrderedDict()
+        self.numNames = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    def get_listing(self, path: Union[str, Path], lister: Callable[[Path], Sequence[str]]) -> Tuple[str, ...]:
+        """
+        Gets the listing of a directory as made by lister (ex: list_date_directories). The same directory can be cached for
+        different listers. Whatever the lister raises for a directory that doesn't exist (ex: FileNotFoundError) is raised.
+        """
+        path = Path(path)
+        key = (str(path), lister)
+        stamp = get_directory_stamp(path)
+        if(stamp is None):
+            self.invalidate(path)
+            return tuple(lister(path))
+
+        with self.lock:
+            cached = self.listings.get(key)
+            if(cached is not None and cached[0] == stamp):
+                self.listings.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        listedAt = time.time_ns()
+        listing = tuple(lister(path))
+        if(listedAt - stamp[2] > RACY_WINDOW_NS):
+            self._put(key, stamp, listing)
+        return listing
+
+
+    def _put(self, key: Tuple[str, Callable], stamp: DirectoryStamp, listing: Tuple[str, ...]):
+        with self.lock:
+            previous = self.listings.pop(key, None)
+            if(previous is not None):
+                self.numNames -= len(previous[1])
+            if(len(listing) > self.maxNames):
+                return
+            self.listings[key] = (stamp, listing)
+            self.numNames += len(listing)
+            while(self.numNames > self.maxNames):
+                _, (_, evicted) = self.listings.popitem(last=False)
+                self.numNames -= len(evicted)
+
+
+    def invalidate(self, path: Union[str, Path]):
+        path = str(Path(path))
+        with self.lock:
+            for key in [key for key in self.listings.keys() if key[0] == path]:
+                self.numNames -= len(self.listings.pop(key)[1])
+
+
+    def clear(self):
+        with self.lock:
+            self.listings.clear()
+            self.numNames = 0
+            self.hits = 0
+            self.misses = 0
+
+
+    def __len__(self) -> int:
+        return len(self.listings)
+
+
+# Shared by the whole process
+LISTING_CACHE = ListingCache()
+
+
+def get_cached_listing(path: Union[str, Path], lister: Callable[[Path], Sequence[str]]) -> Tuple[str, ...]:
+    """
+    Gets the listing of a directory from the process wide listing cache
+    """
+    return LISTING_CACHE.get_listing(path, lister)
+
+
+def clear_listing_cache():
+    """
+    Drops every listing in the process wide listing cache (ex: between tests that reuse the same paths on different file
+    systems).
+    """
+    LISTING_CACHE.clear()
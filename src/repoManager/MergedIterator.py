@@ -0,0 +1,72 @@
+import heapq
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from repoManager.Models import ImagePromptDirectory
+from repoManager.utils import generate_file_name
+from utils.enums import DIRECTION
+
+
+def get_merge_key(directory: ImagePromptDirectory) -> Tuple[str, str, str]:
+    """
+    Global order of prompt directories across repos. Same order the DirectoryIterator uses within a repo with ties broken by repo.
+    """
+    return (directory.date, generate_file_name(directory.time, directory.prompt), directory.repo)
+
+
+class _MergeEntry(object):
+    def __init__(self, directory: ImagePromptDirectory, iterator: Iterator[ImagePromptDirectory], direction: DIRECTION):
+        self.directory = directory
+        self.iterator = iterator
+        self.direction = direction
+        self.key = get_merge_key(directory)
+
+
+    def __lt__(self, other: "_MergeEntry") -> bool:
+        # Forward goes from the most recent prompt directory to the oldest so the heap has to pop the biggest key first
+        return self.key > other.key if self.direction is not DIRECTION.BACKWARD else self.key < other.key
+
+
+class MergedIterator:
+    """
+    Iterates prompt directories of many repos as one, in global date/time order, with a k-way merge of an iterator per repo.
+
+    Only the next prompt directory of every repo is kept in a heap so getting the next prompt directory costs O(log repos)
+    no matter how big the repos are. Each repo iterator must already iterate in the given direction.
+    """
+    def __init__(self, iterators: Dict[str, Iterator[ImagePromptDirectory]], direction: DIRECTION = DIRECTION.FORWARD):
+        self.direction = direction
+        self.heap: List[_MergeEntry] = []
+        for iterator in iterators.values():
+            self._push_next(iterator)
+
+
+    def __iter__(self):
+        return self
+
+
+    def _push_next(self, iterator: Iterator[ImagePromptDirectory]):
+        directory = next(iterator, None)
+        if(directory is not None):
+            heapq.heappush(self.heap, _MergeEntry(directory, iterator, self.direction))
+
+
+    def __next__(self) -> ImagePromptDirectory:
+        if(len(self.heap) == 0):
+            raise StopIteration
+        entry = heapq.heappop(self.heap)
+        self._push_next(entry.iterator)
+        return entry.directory
+
+
+    def peek(self) -> Optional[ImagePromptDirectory]:
+        """
+        Gets the prompt directory the next call to next would return without moving the iterator.
+        """
+        return self.heap[0].directory if len(self.heap) > 0 else None
+
+
+    def get_heads(self) -> Dict[str, ImagePromptDirectory]:
+        """
+        Gets the next prompt directory of every repo that isn't exhausted yet.
+        """
+        return dict((entry.directory.repo, entry.directory) for entry in self.heap)
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import os
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from decorators.decorators import auto_str
+from repoManager.SaveQueue import fsync_directory, generate_temp_path
+from repoManager.utils import METADATA_DIRECTORY_NAME
+from utils.pathingUtils import get_file_size
+
+
+# Kept in the mirror itself so any machine the drive is plugged into can sync to it
+MIRROR_MANIFEST_NAME = "mirror.json"
+
+# Files are copied and hashed this many bytes at a time
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# The manifest is saved after this many files are copied so an interrupted sync only redoes the files since
+SAVE_EVERY = 100
+
+# Copying is bound by the drives rather then the CPU so a few threads are enough to keep them busy
+DEFAULT_WORKERS = 4
+
+
+# Keyed by the path of a file relative to the repo ("<date>/<time>_<prompt>/<file>" or "<date>.pack"). Size and
+# modification time of the file in the repo when it was copied and the sha256 of what was copied.
+MirrorManifest = Dict[str, Tuple[int, int, str]]
+
+
+@auto_str
+class SyncResult(object):
+    def __init__(self, copied: int = 0, unchanged: int = 0, deleted: int = 0, bytesCopied: int = 0, failed: List[Tuple[str, str]] = None):
+        self.copied = copied
+        self.unchanged = unchanged
+        self.deleted = deleted
+        self.bytesCopied = bytesCopied
+        self.failed = failed if failed is not None else []
+
+
+def generate_mirror_manifest_path(targetPath: Union[str, Path]) -> Path:
+    return Path(targetPath)/METADATA_DIRECTORY_NAME/MIRROR_MANIFEST_NAME
+
+
+def read_mirror_manifest(targetPath: Union[str, Path]) -> MirrorManifest:
+    try:
+        with open(generate_mirror_manifest_path(targetPath), "r") as f:
+            return json.load(f).get("files", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_mirror_manifest(targetPath: Union[str, Path], manifest: MirrorManifest):
+    manifestPath = generate_mirror_manifest_path(targetPath)
+    manifestPath.parent.mkdir(parents=True, exist_ok=True)
+    tempPath = generate_temp_path(manifestPath)
+    with open(tempPath, "w") as f:
+        json.dump({ "files": manifest }, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tempPath, manifestPath)
+
+
+def scan_repo(repoPath: Union[str, Path]) -> Dict[str, Tuple[int, int]]:
+    """
+    Lists every file of a repo with its size and modification time, keyed by its path relative to the repo. Hidden files
+    (temp files, bookkeeping) are left out.
+    """
+    repoPath = Path(repoPath)
+    files = {}
+    directories = [repoPath]
+    while(len(directories) > 0):
+        directory = directories.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if(entry.name.startswith(".")):
+                    continue
+                if(entry.is_dir(follow_symlinks=False)):
+                    directories.append(Path(entry.path))
+                elif(entry.is_file(follow_symlinks=False)):
+                    stat = entry.stat()
+                    files[Path(entry.path).relative_to(repoPath).as_posix()] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def hash_file(path: Path) -> str:
+    checksum = hashlib.sha256()
+    with open(path, "rb") as f:
+        while(chunk := f.read(COPY_CHUNK_SIZE)):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def copy_file(sourcePath: Path, destinationPath: Path) -> Tuple[int, int, str]:
+    """
+    Copies a file crash safely (temp file, fsync then rename), hashing it as it's copied. The copy keeps the modification
+    time of the source.
+
+    Returns
+    -------
+    Tuple[int, int, str]
+        Size and modification time of the source when it was copied and the sha256 of what was copied
+    """
+    destinationPath.parent.mkdir(parents=True, exist_ok=True)
+    tempPath = generate_temp_path(destinationPath)
+    checksum = hashlib.sha256()
+    with open(sourcePath, "rb") as source, open(tempPath, "wb") as destination:
+        stat = os.fstat(source.fileno())
+        while(chunk := source.read(COPY_CHUNK_SIZE)):
+            checksum.update(chunk)
+            destination.write(chunk)
+        destination.flush()
+        os.fsync(destination.fileno())
+    os.utime(tempPath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(tempPath, destinationPath)
+    return (stat.st_size, stat.st_mtime_ns, checksum.hexdigest())
+
+
+def _sync_file(repoPath: Path, targetPath: Path, relativePath: str, recorded: Optional[Tuple[int, int, str]]) -> Tuple[Tuple[int, int, str], bool]:
+    sourcePath = repoPath/relativePath
+    stat = os.stat(sourcePath)
+    # Files that were only touched (same size, new modification time) are hashed rather then copied again
+    if(
+        recorded is not None and recorded[0] == stat.st_size and get_file_size(targetPath/relativePath) == stat.st_size and
+        hash_file(sourcePath) == recorded[2]
+      ):
+        return (stat.st_size, stat.st_mtime_ns, recorded[2]), False
+    return copy_file(sourcePath, targetPath/relativePath), True
+
+
+def remove_mirrored_file(targetPath: Path, relativePath: str):
+    """
+    Removes a file from a mirror along with any directories it leaves empty.
+    """
+    path = targetPath/relativePath
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    parent = path.parent
+    while(parent != targetPath):
+        try:
+            parent.rmdir()
+        except OSError:
+            # Not empty
+            break
+        parent = parent.parent
+
+
+def sync_repo(repoPath: Union[str, Path], targetPath: Union[str, Path], maxWorkers: int = DEFAULT_WORKERS, verify: bool = False, onProgress: Callable[[int, int], None] = None) -> SyncResult:
+    """
+    Mirrors a repo into a target directory (ex: a USB drive or a NAS mount), copying only what changed since the last sync.
+
+    The target keeps a manifest of every file it was sent with its size, modification time and sha256. Files whose size and
+    modification time still match are skipped without touching the target. Only the remaining files are copied, across a
+    pool of threads. Files removed from the repo since the last sync are deleted from the target.
+
+    Every file is copied crash safely and the manifest is saved as files are copied, as well as when the sync stops for any
+    reason. Syncing again after an interruption picks up from the last saved manifest.
+
+    Parameters
+    ----------
+    repoPath (Path):
+        Absolute path to the repo
+
+    targetPath (Path):
+        Directory to mirror the repo into. Made if it doesn't exist.
+
+    maxWorkers (int):
+        Number of threads copying files
+
+    verify (bool):
+        Also check that every file in the manifest is still in the target with the size it was copied with, recopying any
+        that aren't (ex: removed from the drive by hand)
+
+    onProgress (Callable):
+        Optional callback given the number of files copied so far and the total to copy
+
+    Returns
+    -------
+    SyncResult
+        Counts of copied, unchanged and deleted files, bytes copied and failures
+    """
+    repoPath, targetPath = Path(repoPath), Path(targetPath)
+    targetPath.mkdir(parents=True, exist_ok=True)
+    manifest = read_mirror_manifest(targetPath)
+    files = scan_repo(repoPath)
+
+    result = SyncResult()
+    toCopy = []
+    for relativePath, (size, mtime) in sorted(files.items()):
+        recorded = manifest.get(relativePath)
+        unchanged = recorded is not None and recorded[0] == size and recorded[1] == mtime
+        if(unchanged and verify):
+            unchanged = (targetPath/relativePath).is_file() and get_file_size(targetPath/relativePath) == size
+        if(unchanged):
+            result.unchanged += 1
+        else:
+            toCopy.append(relativePath)
+    logging.info(f"Syncing {repoPath} to {targetPath}, {len(toCopy)} files to copy and {result.unchanged} unchanged")
+
+    try:
+        for relativePath in sorted(set(manifest.keys()) - set(files.keys())):
+            remove_mirrored_file(targetPath, relativePath)
+            del manifest[relativePath]
+            result.deleted += 1
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="mirror") as executor:
+            # Only a bounded number of copies are queued at once so stopping early doesn't wait on the whole backlog
+            remaining = iter(toCopy)
+            pending: Dict[Future, str] = {}
+            try:
+                while(True):
+                    while(len(pending) < maxWorkers * 2 and (relativePath := next(remaining, None)) is not None):
+                        pending[executor.submit(_sync_file, repoPath, targetPath, relativePath, manifest.get(relativePath))] = relativePath
+                    if(len(pending) == 0):
+                        break
+                    finished, _ = wait(list(pending.keys()), return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        relativePath = pending.pop(future)
+                        try:
+                            manifest[relativePath], copied = future.result()
+                            if(copied):
+                                result.copied += 1
+                                result.bytesCopied += manifest[relativePath][0]
+                            else:
+                                result.unchanged += 1
+                        except OSError as e:
+                            logging.error(f"Could not copy {repoPath/relativePath} : {traceback.format_exc()}")
+                            result.failed.append((relativePath, str(e)))
+                        done += 1
+                        if(done % SAVE_EVERY == 0):
+                            write_mirror_manifest(targetPath, manifest)
+                        if(onProgress is not None):
+                            onProgress(done, len(toCopy))
+            finally:
+                for future in pending.keys():
+                    future.cancel()
+    finally:
+        write_mirror_manifest(targetPath, manifest)
+        fsync_directory(targetPath)
+
+    logging.info(f"Synced {repoPath} to {targetPath}, copied {result.copied} files ({result.bytesCopied} bytes), deleted {result.deleted} and {len(result.failed)} failed")
+    return result
@@ -1,49 +1,170 @@
-from typing import List, Union
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
 from decorators.decorators import auto_str
+from utils.imageUtils import get_or_create_thumbnail
+from utils.pathingUtils import read_file_as_bytes
+
+
+class Record(object):
+    """
+    Base of the small value types repos are listed with. Fields are kept in __slots__ rather then a per instance __dict__,
+    which makes every instance several times smaller (see benchmarks/bench_model_memory.py). Records are immutable once
+    made, equal to records of the same type with equal fields and hashable, so they can be used as keys and in sets.
+
+    Subclasses declare their fields in __slots__, in the order their __init__ takes them, and set them with _set.
+    """
+    __slots__ = ()
+
+
+    def _set(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+    def _hash_values(self) -> tuple:
+        return self._values()
+
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self._values() == other._values()
+
+
+    def __hash__(self) -> int:
+        return hash((type(self).__name__,) + self._hash_values())
+
+
+    def __reduce__(self):
+        # Slots and the blocked __setattr__ keep the default pickling (used to send records to worker processes) from working
+        return (type(self), self._values())
 
 
 @auto_str
-class ImagePromptDirectory(object):
+class ImagePromptDirectory(Record):
+    __slots__ = ("prompt", "repo", "date", "time")
+
     def __init__(self, prompt: str, repo: str, date: str, time: str):
-        self.prompt = prompt
-        self.repo = repo
-        self.date = date
-        self.time = time
+        self._set(prompt, repo, date, time)
+
 
+@auto_str
+class NextToken(Record):
+    __slots__ = ("prompt", "repo", "date", "time")
 
-@auto_str 
-class NextToken(object):
     def __init__(self, prompt: str, repo: str, date: str, time: str):
-        self.prompt = prompt
-        self.repo = repo
-        self.date = date
-        self.time = time
+        self._set(prompt, repo, date, time)
+
+
+class MergedToken(object):
+    """
+    Token for paging across every repo at once. Holds the last prompt directory before the page boundary for every repo
+    (None if the repo has nothing before the boundary) so each repo can be resumed without re-sorting the others.
+    The boundary is the last prompt directory before the page across all repos. Repos that didn't exist when the token
+    was made are resumed from it.
+    """
+    def __init__(self, positions: Dict[str, NextToken], boundary: NextToken):
+        self.positions = positions
+        self.boundary = boundary
+
+
+def get_stat_version(stat: os.stat_result) -> Tuple[int, int]:
+    """
+    Version of a file derived from its stat. Changes whenever the file is rewritten.
+    """
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+@auto_str
+class ImageHandle(object):
+    """
+    Lightweight reference to an image file within a repo. Only the files path, size and version are kept in memory.
+    The actual image is only read from the file system when asked for.
+
+    Methods
+    ----------
+    read_bytes()
+        Reads the full image as bytes
+
+    read_thumbnail(size)
+        Reads a cached thumbnail of the image at least as big as the given size. Builds the thumbnail if it's missing.
+
+    is_current()
+        Whether the file on the file system is still the same version this handle was made from
+    """
+    def __init__(self, path: Path, size: int, version: Tuple[int, int]):
+        self.path = path
+        self.size = size
+        self.version = version
+
+
+    def read_bytes(self) -> bytes:
+        return read_file_as_bytes(self.path)
+
+
+    def read_thumbnail(self, size: int) -> bytes:
+        return get_or_create_thumbnail(self.path, size)
+
+
+    def is_current(self) -> bool:
+        try:
+            return get_stat_version(os.stat(self.path)) == self.version
+        except FileNotFoundError:
+            return False
+
+
+def get_image_handle(path: Path) -> ImageHandle:
+    stat = os.stat(path)
+    return ImageHandle(path=path, size=stat.st_size, version=get_stat_version(stat))
 
 
 @auto_str
-class ImagePrompResult(object):
-    def __init__(self, prompt: str, repo: str, date: str, time: str, num: int, images: List[bytes]):
-        self.prompt = prompt
-        self.repo = repo
-        self.date = date
-        self.time = time
-        self.num = num
-        self.images = images
+class ImagePrompResult(Record):
+    __slots__ = ("prompt", "repo", "date", "time", "num", "images")
+
+    def __init__(self, prompt: str, repo: str, date: str, time: str, num: int, images: List[Union[bytes, ImageHandle]]):
+        self._set(prompt, repo, date, time, num, images)
+
+
+    def _hash_values(self) -> tuple:
+        # Images are a list, results with equal images are still equal so leaving them out keeps hashes consistent
+        return (self.prompt, self.repo, self.date, self.time, self.num)
 
 
 @auto_str
 class GetImagePrompsResult(object):
-    def __init__(self, results: List[ImagePrompResult] = [], nextToken: NextToken = None, errorMessage: Union[str, None] = None):
+    def __init__(self, results: List[ImagePrompResult] = [], nextToken: NextToken = None, errorMessage: Union[str, None] = None, previousToken: NextToken = None):
         self.results = results
         self.nextToken = nextToken
         self.errorMessage = errorMessage
+        # Token to go backward from to get the page before this one. Only set when the page was gotten by its number.
+        self.previousToken = previousToken
 
 
 @auto_str
-class DeleteImagePrompsRequest(object):
+class DeleteImagePrompsRequest(Record):
+    __slots__ = ("prompt", "repo", "date", "time", "nums")
+
     def __init__(self, prompt: str, repo: str, date: str, time: str, nums: List[int]):
-        self.prompt = prompt
-        self.repo = repo
-        self.date = date
-        self.time = time
-        self.nums = nums
+        self._set(prompt, repo, date, time, tuple(nums))
+
+
+@auto_str
+class DeleteImagePrompsResult(object):
+    def __init__(self, request: DeleteImagePrompsRequest, numDeleted: int, remainingImages: int = 0, directoryRemoved: bool = False, errorMessage: Union[str, None] = None):
+        self.request = request
+        self.numDeleted = numDeleted
+        self.remainingImages = remainingImages
+        self.directoryRemoved = directoryRemoved
+        self.errorMessage = errorMessage
@@ -0,0 +1,521 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date as Date, timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from decorators.decorators import auto_str
+from repoManager.SaveQueue import fsync_directory, generate_temp_path
+from repoManager.utils import get_image_num, is_image_file_name, list_date_directories
+from utils.imageUtils import THUMBNAIL_SIZES, generate_thumbnail_bytes, generate_thumbnail_path
+
+
+PACK_EXTENSION = ".pack"
+INDEX_EXTENSION = ".pack.idx"
+SEGMENT_FORMAT_VERSION = 1
+
+# Segments with at least this fraction of their bytes deleted get compacted
+COMPACTION_THRESHOLD = 0.5
+
+
+SegmentEntry = Tuple[int, int] # offset and size within the pack file
+
+
+def generate_pack_path(repoPath: Path, date: str) -> Path:
+    return Path(repoPath)/(date + PACK_EXTENSION)
+
+
+def generate_index_path(repoPath: Path, date: str) -> Path:
+    return Path(repoPath)/(date + INDEX_EXTENSION)
+
+
+def list_packed_dates(repoPath: Path) -> List[str]:
+    """
+    Lists the dates of a repo that have a packed segment, most recent first. A segment only counts once its index exists.
+    """
+    try:
+        names = os.listdir(repoPath)
+    except FileNotFoundError:
+        return []
+    return sorted((name[:-len(INDEX_EXTENSION)] for name in names if name.endswith(INDEX_EXTENSION) and not name.startswith(".")), reverse=True)
+
+
+class PackedSegment(object):
+    """
+    Every file of every prompt directory of a single date, packed into one append only file ("<date>.pack") next to an index
+    of where each file is within it ("<date>.pack.idx").
+
+    The index is a json object per line. The first line is a header, every other line either records where a file is
+    ({"timePrompt", "file", "offset", "size"}) or that a file was deleted ({"timePrompt", "file", "deleted": true}).
+    Deleting only appends a tombstone to the index, the bytes are reclaimed later by compacting the segment.
+
+    Files are read straight out of a memory map of the pack file so reading never needs more then a slice of the pack.
+    """
+    def __init__(self, repoPath: Union[str, Path], date: str):
+        self.repoPath = Path(repoPath)
+        self.date = date
+        self.packPath = generate_pack_path(self.repoPath, date)
+        self.indexPath = generate_index_path(self.repoPath, date)
+        self.lock = threading.RLock()
+        self.entries: Dict[str, Dict[str, SegmentEntry]] = {}
+        self.deletedBytes = 0
+        self.totalBytes = 0
+        self._load_index()
+        self._open_pack()
+
+
+    def _load_index(self):
+        self.indexVersion = self._stat_index()
+        with open(self.indexPath, "r") as f:
+            for line in f.readlines()[1:]:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue # a tombstone cut short by a crash
+                files = self.entries.setdefault(record["timePrompt"], {})
+                if(record.get("deleted")):
+                    removed = files.pop(record["file"], None)
+                    if(removed is not None):
+                        self.deletedBytes += removed[1]
+                    if(len(files) == 0):
+                        self.entries.pop(record["timePrompt"])
+                else:
+                    files[record["file"]] = (record["offset"], record["size"])
+                    self.totalBytes += record["size"]
+
+
+    def _open_pack(self):
+        self.packFile = open(self.packPath, "rb")
+        size = os.fstat(self.packFile.fileno()).st_size
+        # Empty files can't be memory mapped
+        self.pack = mmap.mmap(self.packFile.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b""
+
+
+    def _stat_index(self) -> Tuple[int, int]:
+        stat = os.stat(self.indexPath)
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+    def is_current(self) -> bool:
+        try:
+            return self._stat_index() == self.indexVersion
+        except FileNotFoundError:
+            return False
+
+
+    def close(self):
+        with self.lock:
+            if(isinstance(self.pack, mmap.mmap)):
+                self.pack.close()
+            self.packFile.close()
+
+
+    def list_time_prompts(self) -> List[str]:
+        with self.lock:
+            return sorted(self.entries.keys(), reverse=True)
+
+
+    def has_time_prompt(self, timePrompt: str) -> bool:
+        with self.lock:
+            return timePrompt in self.entries
+
+
+    def list_files(self, timePrompt: str) -> List[str]:
+        with self.lock:
+            return list(self.entries.get(timePrompt, {}).keys())
+
+
+    def list_image_files(self, timePrompt: str) -> List[str]:
+        """
+        Same as repoManager.utils.list_image_files but for a packed prompt directory.
+        """
+        imageFiles = [fileName for fileName in self.list_files(timePrompt) if is_image_file_name(fileName)]
+        return sorted(imageFiles, key=lambda fileName: int(get_image_num(fileName)))
+
+
+    def get_entry(self, timePrompt: str, fileName: str) -> Optional[SegmentEntry]:
+        with self.lock:
+            return self.entries.get(timePrompt, {}).get(fileName)
+
+
+    def read(self, timePrompt: str, fileName: str) -> bytes:
+        entry = self.get_entry(timePrompt, fileName)
+        if(entry is None):
+            raise FileNotFoundError(f"{fileName} is not in {timePrompt} of {self.packPath}")
+        offset, size = entry
+        return bytes(self.pack[offset:offset + size])
+
+
+    def delete(self, timePrompt: str, fileNames: List[str]) -> int:
+        """
+        Records that files of a packed prompt directory are deleted by appending tombstones to the index.
+
+        Returns
+        -------
+        int
+            The number of files that were deleted
+        """
+        with self.lock:
+            files = self.entries.get(timePrompt, {})
+            deleted = [fileName for fileName in fileNames if fileName in files]
+            if(len(deleted) == 0):
+                return 0
+            with open(self.indexPath, "a") as f:
+                f.write("".join(json.dumps({ "timePrompt": timePrompt, "file": fileName, "deleted": True }) + "\n" for fileName in deleted))
+                f.flush()
+                os.fsync(f.fileno())
+            for fileName in deleted:
+                self.deletedBytes += files.pop(fileName)[1]
+            if(len(files) == 0):
+                self.entries.pop(timePrompt, None)
+            self.indexVersion = self._stat_index()
+            return len(deleted)
+
+
+    def deleted_ratio(self) -> float:
+        with self.lock:
+            return self.deletedBytes / self.totalBytes if self.totalBytes > 0 else 0.0
+
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            return len(self.entries) == 0
+
+
+@auto_str
+class PackedImageHandle(object):
+    """
+    Same interface as an ImageHandle but for an image within a packed segment. Thumbnails are read from the segment if they
+    were packed with the image, otherwise they are made in memory.
+    """
+    def __init__(self, segment: PackedSegment, timePrompt: str, fileName: str, size: int):
+        self.segment = segment
+        self.timePrompt = timePrompt
+        self.fileName = fileName
+        self.size = size
+        self.path = segment.packPath
+
+
+    def read_bytes(self) -> bytes:
+        return self.segment.read(self.timePrompt, self.fileName)
+
+
+    def read_thumbnail(self, size: int) -> bytes:
+        for thumbnailSize in THUMBNAIL_SIZES:
+            thumbnailName = generate_thumbnail_path(Path(self.fileName), thumbnailSize).name
+            if(thumbnailSize >= size and self.segment.get_entry(self.timePrompt, thumbnailName) is not None):
+                return self.segment.read(self.timePrompt, thumbnailName)
+        return generate_thumbnail_bytes(BytesIO(self.read_bytes()), size)
+
+
+    def is_current(self) -> bool:
+        return self.segment.is_current() and self.segment.get_entry(self.timePrompt, self.fileName) is not None
+
+
+def write_segment(repoPath: Path, date: str, files: Iterable[Tuple[str, str, Callable[[], bytes]]]) -> int:
+    """
+    Writes a segment for a date from (timePrompt, fileName, read) tuples, replacing any segment the date already had.
+    Both files are written to temp files and fsynced first. The pack is renamed into place before the index so an index
+    only ever points into a complete pack.
+
+    Returns
+    -------
+    int
+        The number of files packed
+    """
+    packPath, indexPath = generate_pack_path(repoPath, date), generate_index_path(repoPath, date)
+    tempPackPath, tempIndexPath = generate_temp_path(packPath), generate_temp_path(indexPath)
+
+    records = []
+    offset = 0
+    with open(tempPackPath, "wb") as pack:
+        for timePrompt, fileName, read in files:
+            contents = read()
+            pack.write(contents)
+            records.append({ "timePrompt": timePrompt, "file": fileName, "offset": offset, "size": len(contents) })
+            offset += len(contents)
+        pack.flush()
+        os.fsync(pack.fileno())
+
+    with open(tempIndexPath, "w") as index:
+        index.write(json.dumps({ "version": SEGMENT_FORMAT_VERSION, "date": date }) + "\n")
+        index.write("".join(json.dumps(record) + "\n" for record in records))
+        index.flush()
+        os.fsync(index.fileno())
+
+    os.replace(tempPackPath, packPath)
+    os.replace(tempIndexPath, indexPath)
+    fsync_directory(repoPath)
+    return len(records)
+
+
+def remove_segment(repoPath: Path, date: str):
+    # Index first so the segment stops being listed before its pack disappears
+    for path in [generate_index_path(repoPath, date), generate_pack_path(repoPath, date)]:
+        if(path.exists()):
+            path.unlink()
+
+
+def pack_date(repoPath: Union[str, Path], date: str) -> int:
+    """
+    Packs every prompt directory of a date into a segment and removes the date directory. If the date already has a segment
+    its live files are kept, with files from the directory winning if both have them.
+
+    Returns
+    -------
+    int
+        The number of files packed
+    """
+    repoPath = Path(repoPath)
+    datePath = repoPath/date
+    existing = PackedSegment(repoPath, date) if generate_index_path(repoPath, date).exists() else None
+
+    files: Dict[Tuple[str, str], Callable[[], bytes]] = {}
+    if(existing is not None):
+        for timePrompt in existing.list_time_prompts():
+            for fileName in existing.list_files(timePrompt):
+                files[(timePrompt, fileName)] = lambda timePrompt=timePrompt, fileName=fileName: existing.read(timePrompt, fileName)
+    if(datePath.is_dir()):
+        for timePrompt in list_date_directories(datePath):
+            for fileName in os.listdir(datePath/timePrompt):
+                if(not fileName.startswith(".")):
+                    files[(timePrompt, fileName)] = lambda path=datePath/timePrompt/fileName: path.read_bytes()
+
+    try:
+        numPacked = write_segment(repoPath, date, [(timePrompt, fileName, read) for (timePrompt, fileName), read in sorted(files.items())])
+    finally:
+        if(existing is not None):
+            existing.close()
+
+    # Only remove the directory once the segment is durable. Until then readers fall back to the directory.
+    if(datePath.is_dir()):
+        shutil.rmtree(datePath)
+    logging.info(f"Packed {numPacked} files of {date} in {repoPath}")
+    return numPacked
+
+
+def compact_segment(repoPath: Union[str, Path], date: str) -> int:
+    """
+    Rewrites a segment without the files that were deleted from it, or removes it entirely if nothing is left in it.
+    Readers holding the old segment keep reading the old pack until they reload.
+
+    Returns
+    -------
+    int
+        The number of bytes reclaimed
+    """
+    repoPath = Path(repoPath)
+    segment = PackedSegment(repoPath, date)
+    try:
+        reclaimed = segment.deletedBytes
+        if(segment.is_empty()):
+            remove_segment(repoPath, date)
+            reclaimed = segment.totalBytes
+        else:
+            write_segment(repoPath, date, [
+                (timePrompt, fileName, lambda timePrompt=timePrompt, fileName=fileName: segment.read(timePrompt, fileName))
+                for timePrompt in sorted(segment.list_time_prompts()) for fileName in sorted(segment.list_files(timePrompt))
+            ])
+    finally:
+        segment.close()
+    logging.info(f"Compacted segment {date} in {repoPath} reclaiming {reclaimed} bytes")
+    return reclaimed
+
+
+def unpack_date(repoPath: Union[str, Path], date: str) -> int:
+    """
+    Undoes pack_date, writing every file still live in a date's segment back into the date directory and removing the
+    segment. Files the directory already has (ex: saved after the date was packed) win over the segment's.
+
+    Returns
+    -------
+    int
+        The number of files unpacked
+    """
+    repoPath = Path(repoPath)
+    datePath = repoPath/date
+    segment = PackedSegment(repoPath, date)
+    numUnpacked = 0
+    try:
+        for timePrompt in segment.list_time_prompts():
+            promptPath = datePath/timePrompt
+            promptPath.mkdir(parents=True, exist_ok=True)
+            for fileName in segment.list_files(timePrompt):
+                path = promptPath/fileName
+                if(path.exists()):
+                    continue
+                tempPath = generate_temp_path(path)
+                with open(tempPath, "wb") as f:
+                    f.write(segment.read(timePrompt, fileName))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tempPath, path)
+                numUnpacked += 1
+            fsync_directory(promptPath)
+        fsync_directory(datePath)
+    finally:
+        segment.close()
+
+    # Only remove the segment once every file is durable in the directory. Until then readers keep using the segment.
+    remove_segment(repoPath, date)
+    fsync_directory(repoPath)
+    logging.info(f"Unpacked {numUnpacked} files of {date} in {repoPath}")
+    return numUnpacked
+
+
+def find_dates_to_pack(repoPath: Union[str, Path], olderThanDays: int, today: Date = None) -> List[str]:
+    """
+    Finds the date directories of a repo strictly older then the given number of days.
+    """
+    cutoff = ((today or Date.today()) - timedelta(days=olderThanDays)).isoformat()
+    return [date for date in list_date_directories(Path(repoPath)) if date < cutoff]
+
+
+class SegmentStore(object):
+    """
+    Keeps the packed segments of a repo open so reads don't have to reload indexes. Segments are reloaded whenever their
+    index changes (ex: compacted by another process) and the list of packed dates whenever the repo directory changes.
+
+    Compacting and packing happen on a single background thread.
+
+    Methods
+    ----------
+    list_packed_dates()
+        Gets every packed date, most recent first
+
+    get(date)
+        Gets the segment of a date or None if the date isn't packed
+
+    delete(date, timePrompt, fileNames)
+        Deletes files from a segment, queueing a compaction once enough of it is deleted
+
+    pack_old_dates(olderThanDays)
+        Packs every date directory older then the given age
+
+    unpack_dates(dates)
+        Unpacks dates back into date directories
+
+    wait()
+        Blocks until queued packing and compaction is done
+    """
+    def __init__(self, repoPath: Union[str, Path], onChange: Callable[[str], None] = None):
+        self.repoPath = Path(repoPath)
+        self.onChange = onChange
+        self.lock = threading.RLock()
+        # Held while a segment's index is written to so tombstones can't be lost to a concurrent compaction
+        self.writeLock = threading.Lock()
+        self.segments: Dict[str, PackedSegment] = {}
+        self.packedDates: List[str] = []
+        self.repoVersion: Optional[int] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segments")
+        self.pending: List[Future] = []
+
+
+    def list_packed_dates(self) -> List[str]:
+        with self.lock:
+            try:
+                repoVersion = os.stat(self.repoPath).st_mtime_ns
+            except FileNotFoundError:
+                return []
+            if(repoVersion != self.repoVersion):
+                self.repoVersion = repoVersion
+                self.packedDates = list_packed_dates(self.repoPath)
+            return list(self.packedDates)
+
+
+    def get(self, date: str) -> Optional[PackedSegment]:
+        with self.lock:
+            segment = self.segments.get(date)
+            if(segment is not None and segment.is_current()):
+                return segment
+            # Old segments aren't closed since handles may still be reading from them. Their maps close once unreferenced.
+            self.segments.pop(date, None)
+            if(not generate_index_path(self.repoPath, date).exists()):
+                return None
+            try:
+                segment = PackedSegment(self.repoPath, date)
+            except FileNotFoundError:
+                return None
+            self.segments[date] = segment
+            return segment
+
+
+    def delete(self, date: str, timePrompt: str, fileNames: List[str]) -> int:
+        with self.writeLock:
+            segment = self.get(date)
+            if(segment is None):
+                return 0
+            numDeleted = segment.delete(timePrompt, fileNames)
+        if(numDeleted > 0 and (segment.is_empty() or segment.deleted_ratio() >= COMPACTION_THRESHOLD)):
+            self._submit(lambda: self._locked(lambda: compact_segment(self.repoPath, date)), date)
+        return numDeleted
+
+
+    def pack_old_dates(self, olderThanDays: int, today: Date = None) -> Future:
+        def pack_all():
+            dates = find_dates_to_pack(self.repoPath, olderThanDays, today=today)
+            for date in dates:
+                self._locked(lambda: pack_date(self.repoPath, date))
+                self._notify(date)
+            return len(dates)
+        return self._submit(pack_all)
+
+
+    def unpack_dates(self, dates: List[str] = None) -> Future:
+        """
+        Unpacks the given dates, or every packed date if none are given, back into date directories in the background.
+        Dates that aren't packed are skipped. Resolves to the number of dates unpacked.
+        """
+        def unpack_all():
+            packedDates = list_packed_dates(self.repoPath)
+            datesToUnpack = packedDates if dates is None else [date for date in packedDates if date in dates]
+            for date in datesToUnpack:
+                self._locked(lambda: unpack_date(self.repoPath, date))
+                self._notify(date)
+            return len(datesToUnpack)
+        return self._submit(unpack_all)
+
+
+    def _locked(self, work: Callable[[], object]) -> object:
+        with self.writeLock:
+            return work()
+
+
+    def _submit(self, work: Callable[[], object], date: str = None) -> Future:
+        def run():
+            try:
+                result = work()
+                if(date is not None):
+                    self._notify(date)
+                return result
+            except BaseException as e:
+                logging.error(f"Segment maintenance failed for {self.repoPath} : {traceback.format_exc()}")
+        with self.lock:
+            future = self.executor.submit(run)
+            self.pending = [pending for pending in self.pending if not pending.done()] + [future]
+            return future
+
+
+    def _notify(self, date: str):
+        with self.lock:
+            self.repoVersion = None # force the packed dates to be relisted
+        if(self.onChange is not None):
+            self.onChange(date)
+
+
+    def wait(self):
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.result()
+
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,196 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from decorators.decorators import auto_str
+from repoManager.Models import GetImagePrompsResult, NextToken
+from utils.enums import DIRECTION, LOAD_MODE
+
+
+PageKey = Tuple[str, Optional[Tuple[str, str, str]], DIRECTION, int, LOAD_MODE]
+
+
+# Rough in-memory cost of the parts of a result that aren't image bytes. Only used to weigh entries against each other.
+RESULT_OVERHEAD_BYTES = 512
+HANDLE_OVERHEAD_BYTES = 256
+
+
+def generate_page_key(repo: str, token: NextToken, direction: DIRECTION, number: int, loadMode: LOAD_MODE) -> PageKey:
+    tokenKey = (token.date, token.time, token.prompt) if token is not None else None
+    return (repo, tokenKey, direction, number, loadMode)
+
+
+def estimate_result_bytes(result: GetImagePrompsResult) -> int:
+    """
+    Estimates how much memory a page of results holds onto. Dominated by image bytes for eagerly loaded pages.
+    """
+    size = 0
+    for imageResult in result.results:
+        size += RESULT_OVERHEAD_BYTES
+        for image in imageResult.images:
+            size += len(image) if isinstance(image, bytes) else HANDLE_OVERHEAD_BYTES
+    return size
+
+
+def get_page_date_range(token: NextToken, direction: DIRECTION, result: GetImagePrompsResult) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Gets the lowest and highest dates (inclusive) a page depends on. None means the page depends on every date in that direction.
+
+    Forward pages go from their token towards older entries and end at their last entry if the page was full.
+    Backward pages go from their token towards newer entries and end at the entry their next token points at if there are even newer
+    entries left. That entry isn't on the page but the page is requested again with it, so it can be on a later date then the
+    page's first entry.
+    """
+    isFullPage = result.nextToken is not None and len(result.results) > 0
+    if(direction is DIRECTION.BACKWARD):
+        lowestDate = token.date if token is not None else None
+        highestDate = result.nextToken.date if result.nextToken is not None else None
+    else:
+        highestDate = token.date if token is not None else None
+        lowestDate = result.results[-1].date if isFullPage else None
+    return (lowestDate, highestDate)
+
+
+@auto_str
+class PageCacheStats(object):
+    def __init__(self, hits: int, misses: int, evictions: int, invalidations: int, entries: int, bytes: int):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.invalidations = invalidations
+        self.entries = entries
+        self.bytes = bytes
+
+
+class _PageCacheEntry(object):
+    def __init__(self, result: GetImagePrompsResult, repo: str, lowestDate: Optional[str], highestDate: Optional[str], size: int):
+        self.result = result
+        self.repo = repo
+        self.lowestDate = lowestDate
+        self.highestDate = highestDate
+        self.size = size
+
+
+    def covers(self, repo: str, date: str) -> bool:
+        return (
+            self.repo == repo and
+            (self.lowestDate is None or date >= self.lowestDate) and
+            (self.highestDate is None or date <= self.highestDate)
+        )
+
+
+class PageCache(object):
+    """
+    A bounded LRU cache of pages returned by the RepoManager.
+
+    Every page is stored along with the range of dates it depends on. A page depends on every date between the token it was requested
+    with and the last entry it returned. Pages that ran out of entries depend on everything past their token as new entries there
+    would land on the page. When a date is modified only the pages whose range contains that date are invalidated.
+
+    The cache is bounded both by number of pages and by an estimate of the bytes the pages hold onto, evicting the least recently used
+    pages first.
+
+    Methods
+    ----------
+    get(key)
+        Gets a cached page or None
+
+    put(key, result, lowestDate, highestDate)
+        Caches a page along with the range of dates it depends on
+
+    invalidate_date(repo, date)
+        Removes every page depending on the date
+
+    invalidate_repo(repo)
+        Removes every page of the repo
+
+    stats()
+        Hit, miss and eviction counters along with current usage
+    """
+    def __init__(self, maxBytes: int, maxEntries: int = 64):
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        self.entries: "OrderedDict[PageKey, _PageCacheEntry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation. Lets callers loading a page detect if it went stale while it was being loaded.
+        self.version = 0
+        self.lock = threading.RLock()
+
+
+    def get(self, key: PageKey) -> Optional[GetImagePrompsResult]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if(entry is None):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+
+    def contains(self, key: PageKey) -> bool:
+        with self.lock:
+            return key in self.entries
+
+
+    def put(self, key: PageKey, result: GetImagePrompsResult, lowestDate: Optional[str], highestDate: Optional[str], version: int = None) -> bool:
+        """
+        Caches a page. If a version is provided the page is only cached if nothing was invalidated since that version was read.
+
+        Returns
+        -------
+        bool
+            Whether the page was cached
+        """
+        size = estimate_result_bytes(result)
+        with self.lock:
+            if(size > self.maxBytes or (version is not None and version != self.version)):
+                return False
+
+            self._remove(key)
+            self.entries[key] = _PageCacheEntry(result, key[0], lowestDate, highestDate, size)
+            self.bytes += size
+
+            while(self.bytes > self.maxBytes or len(self.entries) > self.maxEntries):
+                oldestKey = next(iter(self.entries))
+                self._remove(oldestKey)
+                self.evictions += 1
+            return True
+
+
+    def _remove(self, key: PageKey):
+        entry = self.entries.pop(key, None)
+        if(entry is not None):
+            self.bytes -= entry.size
+
+
+    def invalidate_date(self, repo: str, date: str):
+        with self.lock:
+            self.version += 1
+            for key in [key for key, entry in self.entries.items() if entry.covers(repo, date)]:
+                self._remove(key)
+                self.invalidations += 1
+
+
+    def invalidate_repo(self, repo: str):
+        with self.lock:
+            self.version += 1
+            for key in [key for key, entry in self.entries.items() if entry.repo == repo]:
+                self._remove(key)
+                self.invalidations += 1
+
+
+    def stats(self) -> PageCacheStats:
+        with self.lock:
+            return PageCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                invalidations=self.invalidations,
+                entries=len(self.entries),
+                bytes=self.bytes
+            )
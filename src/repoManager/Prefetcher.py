@@ -0,0 +1,90 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+from repoManager.PageCache import PageKey
+
+
+class PagePrefetcher(object):
+    """
+    Loads pages that are likely to be requested next on a pool of background threads.
+
+    Every load is tracked by the key of the page it loads so the same page is never loaded twice at once and foreground
+    requests can wait on a page that is already being loaded instead of loading it again.
+
+    Prefetching is purely speculative. When a client goes somewhere else every load that hasn't started yet is cancelled
+    so the pool doesn't fall behind on pages that are no longer relevant.
+
+    Methods
+    ----------
+    submit(key, load)
+        Queues a page to be loaded unless it's already queued or loading
+
+    get_in_flight(key)
+        Gets the future of a page that is queued or loading
+
+    cancel_pending()
+        Cancels every queued load that hasn't started yet
+
+    wait()
+        Blocks until every queued load is done
+
+    shutdown()
+        Cancels queued loads and stops the pool once running loads finish
+    """
+    def __init__(self, maxWorkers: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="prefetch")
+        # Reentrant since futures run their done callbacks on the thread that cancels them
+        self.lock = threading.RLock()
+        self.inFlight: Dict[PageKey, Future] = {}
+
+
+    def submit(self, key: PageKey, load: Callable[[], object]) -> Future:
+        with self.lock:
+            future = self.inFlight.get(key)
+            if(future is not None):
+                return future
+
+            future = self.executor.submit(load)
+            self.inFlight[key] = future
+            future.add_done_callback(lambda doneFuture: self._forget(key, doneFuture))
+            return future
+
+
+    def _forget(self, key: PageKey, future: Future):
+        with self.lock:
+            if(self.inFlight.get(key) is future):
+                del self.inFlight[key]
+
+
+    def get_in_flight(self, key: PageKey) -> Optional[Future]:
+        with self.lock:
+            return self.inFlight.get(key)
+
+
+    def cancel_pending(self) -> int:
+        """
+        Cancels every load that hasn't started yet. Loads that are already running are left to finish.
+
+        Returns
+        -------
+        int
+            The number of loads cancelled
+        """
+        with self.lock:
+            cancelled = sum(1 for future in list(self.inFlight.values()) if future.cancel())
+        if(cancelled > 0):
+            logging.debug(f"Cancelled {cancelled} page prefetches")
+        return cancelled
+
+
+    def wait(self):
+        with self.lock:
+            futures = list(self.inFlight.values())
+        wait(futures)
+
+
+    def shutdown(self):
+        self.cancel_pending()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,81 @@
+import re
+import unicodedata
+from typing import List
+
+from repoManager.Catalog import BatchedCatalogIterator, RepoCatalog
+from repoManager.Models import ImagePromptDirectory
+from utils.enums import DIRECTION
+
+
+# Splits ascii text the way the unicode61 tokenizer would, the common case for prompts
+ASCII_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def fold_character(character: str) -> str:
+    """
+    Lower cases a character and strips the diacritic off of latin letters (ex: é -> e), same as the catalog's full text
+    tokenizer (SQLite's unicode61 with its default remove_diacritics=1).
+    """
+    lowered = character.lower()
+    decomposed = unicodedata.normalize("NFD", lowered)
+    if(len(decomposed) == 2 and unicodedata.category(decomposed[1]) == "Mn" and unicodedata.name(decomposed[0], "").startswith("LATIN")):
+        return decomposed[0]
+    return lowered
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lower cased words the same way the catalog's full text tokenizer splits prompts, so searching in
+    memory matches what searching the catalog would. Letters, numbers and private use characters make up words,
+    combining marks are dropped and everything else (including "_") separates words.
+    """
+    if(text.isascii()):
+        return ASCII_TOKEN_PATTERN.findall(text.lower())
+
+    tokens: List[str] = []
+    token: List[str] = []
+    for character in text:
+        category = unicodedata.category(character)
+        if(category == "Mn"):
+            continue
+        if(category[0] in "LN" or category == "Co"):
+            token.append(fold_character(character))
+        elif(len(token) > 0):
+            tokens.append("".join(token))
+            token = []
+    if(len(token) > 0):
+        tokens.append("".join(token))
+    return tokens
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turns what a user typed into a full text MATCH expression where every word has to prefix a word of the prompt.
+    Words are quoted so nothing typed is treated as query syntax. Returns None if nothing searchable was typed.
+    """
+    tokens = tokenize(query)
+    if(len(tokens) == 0):
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def prompt_matches(prompt: str, query: str) -> bool:
+    """
+    Same matching as the catalog's full text search but done in memory for a single prompt.
+    """
+    promptTokens = tokenize(prompt)
+    return all(any(promptToken.startswith(token) for promptToken in promptTokens) for token in tokenize(query))
+
+
+class SearchIterator(BatchedCatalogIterator):
+    """
+    An iterator with the same behavior as the CatalogIterator but only over prompt directories whose prompt matches a query.
+    Matches are fetched from the catalog's full text index in batches.
+    """
+    def __init__(self, catalog: RepoCatalog, repo: str, query: str, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD, batchSize: int = 32):
+        super().__init__(catalog, repo, startingDirectory=startingDirectory, direction=direction, batchSize=batchSize)
+        self.matchQuery = build_match_query(query)
+
+
+    def fetch(self, number: int, startingDirectory: ImagePromptDirectory) -> List[ImagePromptDirectory]:
+        return self.catalog.search(self.repo, self.matchQuery, number, startingDirectory=startingDirectory, direction=self.direction)
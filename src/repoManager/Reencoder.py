@@ -0,0 +1,144 @@
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from decorators.decorators import auto_str
+from repoManager.SaveQueue import SaveJob, write_images
+from repoManager.utils import list_date_directories, list_image_files
+from utils.imageFormats import IMAGE_FORMAT_EXTENSIONS, detect_image_format, get_storage_format, transcode_image
+from utils.pathingUtils import get_reverse_sorted_directory_by_name
+
+
+@auto_str
+class ReencodeResult(object):
+    def __init__(self, reencoded: int, skipped: int, failed: List[Tuple[str, str]], bytesBefore: int, bytesAfter: int, decodeSecondsBefore: float, decodeSecondsAfter: float):
+        self.reencoded = reencoded
+        self.skipped = skipped
+        self.failed = failed
+        self.bytesBefore = bytesBefore
+        self.bytesAfter = bytesAfter
+        self.decodeSecondsBefore = decodeSecondsBefore
+        self.decodeSecondsAfter = decodeSecondsAfter
+
+
+    def bytes_saved(self) -> int:
+        return self.bytesBefore - self.bytesAfter
+
+
+def time_decode(data: bytes) -> float:
+    """
+    Seconds it takes to fully decode image bytes.
+    """
+    start = time.perf_counter()
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+    return time.perf_counter() - start
+
+
+def find_images_to_reencode(repoPath: Union[str, Path]) -> List[Path]:
+    """
+    Walks the date directories of a repo and finds every image in it. Packed dates are left alone since their images
+    can't be rewritten in place.
+    """
+    repoPath = Path(repoPath)
+    images = []
+    for date in list_date_directories(repoPath):
+        for timePrompt in get_reverse_sorted_directory_by_name(repoPath/date):
+            images += [repoPath/date/timePrompt/imageFile for imageFile in list_image_files(repoPath/date/timePrompt)]
+    return images
+
+
+def reencode_image(imagePath: Union[str, Path], storageFormat: str) -> Optional[Tuple[int, int, float, float]]:
+    """
+    Re-encodes an image in a storage format. The re-encoded image is written crash safely next to the original (ex: "1.png"
+    -> "1.webp") and only then is the original removed. If interrupted in between, re-encoding again finishes the job.
+
+    Returns
+    -------
+    Tuple[int, int, float, float]
+        Size in bytes and decode time in seconds of the image before and after, or None if it was already in the format
+    """
+    imagePath = Path(imagePath)
+    format, options = get_storage_format(storageFormat)
+    imageBytes = imagePath.read_bytes()
+    if(detect_image_format(imageBytes) == format):
+        return None
+
+    reencodedBytes = transcode_image(imageBytes, format, options)
+    reencodedPath = imagePath.with_suffix("." + IMAGE_FORMAT_EXTENSIONS[format])
+    write_images([SaveJob(reencodedPath, reencodedBytes)])
+    if(reencodedPath != imagePath):
+        os.remove(imagePath)
+    return (len(imageBytes), len(reencodedBytes), time_decode(imageBytes), time_decode(reencodedBytes))
+
+
+def _reencode_image_safely(imagePath: Path, storageFormat: str) -> Tuple[Optional[Tuple[int, int, float, float]], Optional[str]]:
+    try:
+        return reencode_image(imagePath, storageFormat), None
+    except BaseException as e:
+        logging.error(f'Could not re-encode {imagePath} : {traceback.format_exc()}')
+        return None, str(e)
+
+
+def _reencode_image_star(args: Tuple[Path, str]):
+    return _reencode_image_safely(*args)
+
+
+def reencode_repo(repoPath: Union[str, Path], storageFormat: str, maxWorkers: int = None, onProgress: Callable[[int, int], None] = None) -> ReencodeResult:
+    """
+    Re-encodes every image of a repo that isn't in a storage format yet. Mostly for shrinking repos saved before the
+    storage format was configured. Decoding and encoding are CPU bound so the work is spread across a pool of processes.
+
+    Thumbnails of re-encoded images are rebuilt the next time they're read since the image is newer then them.
+
+    Parameters
+    ----------
+    repoPath (Path):
+        Absolute path to the repo
+
+    storageFormat (str):
+        The storage format to re-encode images in (one of STORAGE_FORMATS)
+
+    maxWorkers (int):
+        Optional number of processes to use. Defaults to the number of cores.
+
+    onProgress (Callable):
+        Optional callback given the number of images processed so far and the total
+
+    Returns
+    -------
+    ReencodeResult
+        Counts of re-encoded and skipped images, failures, and the total size and decode time of the re-encoded images
+        before and after
+    """
+    get_storage_format(storageFormat) # Fail before doing any work
+    images = find_images_to_reencode(repoPath)
+    logging.info(f'Re-encoding {len(images)} images in {repoPath} as {storageFormat}')
+
+    result = ReencodeResult(reencoded=0, skipped=0, failed=[], bytesBefore=0, bytesAfter=0, decodeSecondsBefore=0, decodeSecondsAfter=0)
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        work = [(imagePath, storageFormat) for imagePath in images]
+        for done, (imagePath, (sizes, errorMessage)) in enumerate(zip(images, executor.map(_reencode_image_star, work, chunksize=8)), start=1):
+            if(errorMessage is not None):
+                result.failed.append((str(imagePath), errorMessage))
+            elif(sizes is None):
+                result.skipped += 1
+            else:
+                bytesBefore, bytesAfter, decodeSecondsBefore, decodeSecondsAfter = sizes
+                result.reencoded += 1
+                result.bytesBefore += bytesBefore
+                result.bytesAfter += bytesAfter
+                result.decodeSecondsBefore += decodeSecondsBefore
+                result.decodeSecondsAfter += decodeSecondsAfter
+            if(onProgress is not None):
+                onProgress(done, len(images))
+
+    logging.info(f'Re-encoded {result.reencoded} images saving {result.bytes_saved()} bytes, skipped {result.skipped} and {len(result.failed)} failed')
+    return result
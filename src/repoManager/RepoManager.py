@@ -1,18 +1,50 @@
 import logging
+import shutil
 import traceback
 import os
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from itertools import chain, takewhile
 from pathlib import Path
-from typing import Union, List
+from typing import BinaryIO, Callable, Dict, Iterator, Tuple, Union, List
+from repoManager.Catalog import CATALOG_FILE_NAME, CatalogConsistencyReport, CatalogIterator, RepoCatalog
+from repoManager.DateCounts import COUNTS_DIRECTORY_NAME, DateCountIndex
+from repoManager.DirectoryColumns import DirectoryColumns
 from repoManager.DirectoryIterator import DirectoryIterator
-from repoManager.Models import DeleteImagePrompsRequest, ImagePrompResult, NextToken, ImagePromptDirectory, GetImagePrompsResult
+from repoManager.Exporter import EXPORT_FORMATS, ExportResult, export_to_path, is_newer, list_export_files, read_export_mark, write_archive, write_export_mark
+from repoManager.Fsck import GRACE_SECONDS, FsckReport, fsck_repo
+from repoManager.Models import DeleteImagePrompsRequest, DeleteImagePrompsResult, ImagePrompResult, MergedToken, NextToken, ImagePromptDirectory, GetImagePrompsResult, get_image_handle
 
-from repoManager.utils import generate_file_name, generate_image_prompt_path
-from utils.dateUtils import generate_ios_date_time_strs
+from repoManager.ImageMetadata import METADATA_FILE_NAME, ImageMetadata, backfill_metadata, generate_image_metadata, get_or_create_metadata, parse_metadata, write_metadata
+from repoManager.Importer import ImportResult, import_images
+from repoManager.MergedIterator import MergedIterator
+from repoManager.Mirror import DEFAULT_WORKERS as MIRROR_WORKERS, SyncResult, sync_repo
+from repoManager.PackedSegments import PackedImageHandle, PackedSegment, SegmentStore
+from repoManager.PageCache import PageCache, PageCacheStats, PageKey, generate_page_key, get_page_date_range
+from repoManager.Prefetcher import PagePrefetcher
+from repoManager.PromptSearch import SearchIterator, build_match_query, prompt_matches
+from repoManager.RepoSnapshot import RepoSnapshot
+from repoManager.RepoWatcher import create_repo_watcher
+from repoManager.SaveQueue import SAVE_JOURNAL_FILE_NAME, SaveJob, SaveJournal, SaveQueue
+from repoManager.StorageBudget import StorageBudget, StorageJanitor, StorageUsage, get_usage
+from repoManager.Thumbnails import ThumbnailWorker, backfill_thumbnails
+from repoManager.utils import generate_file_name, generate_image_prompt_path, get_image_num, get_or_create_metadata_directory, list_image_files, list_repos
+from utils.dateUtils import generate_ios_date_time_strs, split_ios_date_time
 
-from utils.pathingUtils import read_file_as_bytes
-from utils.enums import DIRECTION
+from utils.imageFormats import IMAGE_FORMAT_EXTENSIONS, can_pass_through, get_storage_format
+from utils.imageUtils import THUMBNAIL_SIZES, generate_thumbnail_path, get_or_create_thumbnail, remove_thumbnails
+from utils.pathingUtils import get_file_size, read_file_as_bytes
+from utils.enums import DIRECTION, LOAD_MODE
 
-from PIL import Image
+
+
+# Format images are re-encoded in when they can't be saved as they are
+DEFAULT_SAVE_FORMAT = "PNG"
+
+
+# Prompts that sort before and after any real prompt saved at the same time. Used to make tokens at a point in time.
+EARLIEST_PROMPT = ""
+LATEST_PROMPT = "\uffff"
 
 
 def generate_nextToken(directoryToTokenize: ImagePromptDirectory):
@@ -47,6 +79,32 @@ def generate_nextToken(directoryToTokenize: ImagePromptDirectory):
     return nextToken
 
 
+def generate_time_token(timestamp: datetime, repo: str = None, prompt: str = LATEST_PROMPT) -> NextToken:
+    """
+    Generates a token for a point in time rather then for a prompt directory. Going forward from the token starts at the
+    most recent prompt directory saved at or before the timestamp. Going backward from it (with EARLIEST_PROMPT) starts at
+    the oldest prompt directory saved at or after the timestamp.
+
+    Parameters
+    ----------
+    timestamp (datetime):
+        The point in time to bookmark
+
+    repo (str):
+        The repo the token is for
+
+    prompt (str):
+        Where the token sorts amongst prompts saved at exactly the timestamp
+
+    Returns
+    -------
+    NextToken
+        A token that doesn't represent a real prompt directory
+    """
+    date, time = split_ios_date_time(timestamp)
+    return NextToken(prompt=prompt, repo=repo, date=date, time=time)
+
+
 class RepoManager(object):
     """
     Class that manages a colleciton of AI image repositories set in a local file system.
@@ -60,11 +118,71 @@ class RepoManager(object):
     cannot make the provided reposPath for any reason it will throw an exception.
 
     Accessing images supports pagination.
+
+    Optionally the repo manager can keep a catalog (a SQLite index stored under the reposPath) of every prompt directory.
+    When enabled, pages are answered from the catalog instead of listing and sorting directories on the file system.
+    Repos that were never catalogued before are scanned into the catalog the first time the manager switches to them. Repos
+    that were are reconciled instead, rescanning only the dates that changed on the file system since they were catalogued.
+
+    Small thumbnails of every saved image are built in the background and kept next to the image (ex: "1.thumb96.png").
+
+    Pages can also be cached in memory (bounded by an estimate of their size in bytes). Saving or deleting images only invalidates
+    the cached pages that depend on the date that was modified. With the page cache enabled clients can also have the pages next to
+    the one they are on loaded in the background ahead of time.
+
+    Optionally the manager can watch the current repo (with inotify where available, otherwise by polling) and keep an in memory
+    listing of its directories current, even when other tools modify the repo. Pages are then iterated from that listing instead of
+    rescanning directories.
+
+    Saved images are written crash safely, optionally on a background queue. Writes interrupted by a crash are finished or
+    cleaned up from a journal the next time a manager is made while no other process is using the repos. Images can be stored in a more compact format then they were
+    generated in (see STORAGE_FORMATS), in which case they are re-encoded on the save queue. Readers work out the format of
+    every image from its contents so repos can mix formats.
+
+    The number of prompt directories per date is kept up to date (and stored under the reposPath) so pages can be gotten by
+    their number without paging to them.
+
+    Pages can be limited to a range of time, starting straight at the range rather then paging through everything newer.
+
+    Prompts of the current repo can be searched, through the catalog's full text index when there is a catalog.
+
+    Besides paging through the current repo, pages can be taken across every repo at once in a single timeline.
+
+    Repos can be given a storage budget (bytes and/or number of images). A background janitor evicts, or archives, the oldest
+    dates of the current repo whenever a save puts it over budget. Usage is kept per date along with the counts so it's
+    known without walking the repo.
+
+    The current repo can be checked for damage left by interrupted saves or failing storage (see fsck), and the damage
+    deleted or quarantined.
+
+    Dates older then a configurable age can be packed into a single segment file per date (see PackedSegments), off by
+    default. Packed dates stay browsable and deletable like any other date, their images are read straight out of the
+    segment. Packed dates can be unpacked back into date directories (see unpack_dates).
     
     """
-    def __init__(self, reposPath: Union[str, Path], startingRepo: str):
+    def __init__(self, reposPath: Union[str, Path], startingRepo: str, useCatalog: bool = False, pageCacheBytes: int = None, prefetchWorkers: int = 2, watchRepo: bool = False, asyncSaves: bool = False, packAfterDays: int = None, storageFormat: str = None, storageBudget: StorageBudget = None):
         self.reposPath = Path(reposPath)
+        self.storageFormat: Tuple[str, dict] = get_storage_format(storageFormat) if storageFormat is not None else None
         os.makedirs(self.reposPath, exist_ok=True)
+        self.catalog: RepoCatalog = RepoCatalog(get_or_create_metadata_directory(self.reposPath)/CATALOG_FILE_NAME) if useCatalog else None
+        self.thumbnailWorker = ThumbnailWorker()
+        self.asyncSaves = asyncSaves
+        self.saveJournal = SaveJournal(get_or_create_metadata_directory(self.reposPath)/SAVE_JOURNAL_FILE_NAME)
+        numRecovered = self.saveJournal.replay()
+        if(numRecovered > 0):
+            logging.info(f"Recovered {numRecovered} interrupted saves")
+        self.saveQueue = SaveQueue(journal=self.saveJournal)
+        self.pageCache: PageCache = PageCache(maxBytes=pageCacheBytes) if pageCacheBytes else None
+        self.prefetcher: PagePrefetcher = PagePrefetcher(maxWorkers=prefetchWorkers) if self.pageCache is not None else None
+        self.watchRepo = watchRepo
+        self.snapshot: RepoSnapshot = None
+        self.repoWatcher = None
+        self.packAfterDays = packAfterDays
+        self.segments: SegmentStore = None
+        self.segmentStores: Dict[str, SegmentStore] = {}
+        self.dateCounts: DateCountIndex = None
+        self.storageBudget = storageBudget
+        self.janitor: StorageJanitor = None
         self.switch_repo(startingRepo)
 
 
@@ -91,14 +209,350 @@ class RepoManager(object):
         self.imageRepo: Path = self.reposPath/newRepo
         os.makedirs(self.imageRepo, exist_ok=True)
 
+        if(self.catalog is not None):
+            if(not self.catalog.is_catalogued(newRepo)):
+                self.catalog.rebuild(self.imageRepo)
+            else:
+                # Picks up changes made while the repo wasn't open here (ex: by the importer or a restored mirror)
+                self.catalog.reconcile(self.imageRepo)
+
+        # Made before the watcher so changes it sees are counted for the new repo. Dates are counted in the background so
+        # switching repos doesn't wait on the repo being walked.
+        if(self.dateCounts is not None):
+            self.dateCounts.close(wait=False)
+        self.segments = self._get_segment_store(newRepo)
+        self.dateCounts = DateCountIndex(self.imageRepo, get_or_create_metadata_directory(self.reposPath)/COUNTS_DIRECTORY_NAME/(newRepo + ".json"))
+        self.dateCounts.count_in_background(onCounted=lambda repo=newRepo: self._on_counted(repo))
+
+        if(self.watchRepo):
+            self.stop_watching()
+            self.snapshot = RepoSnapshot(self.imageRepo, onChange=lambda date, repo=newRepo: self._on_snapshot_change(repo, date))
+            self.repoWatcher = create_repo_watcher(self.snapshot)
+
+        if(self.janitor is not None):
+            self.janitor.shutdown(wait=False)
+        self.janitor = None
+        if(self.storageBudget is not None and self.storageBudget.is_limited()):
+            self.janitor = StorageJanitor(self.dateCounts, self.storageBudget, segments=self.segments, onEvicted=lambda date, repo=newRepo: self._on_date_evicted(repo, date))
+            self.janitor.request()
+
+        # Switching repos is when clients reload everything so drop whatever was cached while the repo wasn't being watched
+        self._invalidate_repo(newRepo)
+        if(self.prefetcher is not None):
+            self.prefetcher.cancel_pending()
+
+
+    def stop_watching(self):
+        """
+        Stops watching the current repo. Pages go back to being read straight from the file system.
+        """
+        if(self.repoWatcher is not None):
+            self.repoWatcher.stop()
+        self.repoWatcher = None
+        self.snapshot = None
+
+
+    def _on_snapshot_change(self, repo: str, date: str):
+        # Directories can be changed by other tools so any cached page over the changed date is stale
+        if(date is None):
+            self._invalidate_repo(repo)
+        else:
+            self._invalidate_date(repo, date)
+        if(repo == self.current_repo() and date is None):
+            self.dateCounts.refresh()
+        elif(repo == self.current_repo()):
+            self.dateCounts.refresh_date(date)
+
+
+    def _on_date_evicted(self, repo: str, date: str):
+        if(self.catalog is not None):
+            self.catalog.remove_date(repo, date)
+        if(self.snapshot is not None and repo == self.current_repo()):
+            self.snapshot.remove_date(date)
+        self._invalidate_date(repo, date)
+
+
+    def fsck(self, action: str = None, full: bool = False, maxWorkers: int = None, graceSeconds: float = GRACE_SECONDS) -> FsckReport:
+        """
+        Checks the integrity of the current repo across a pool of processes, optionally fixing what it finds. See fsck_repo.
+
+        Dates with fixed problems are rescanned into the catalog and counts, and their cached pages are dropped.
+
+        Parameters
+        ----------
+        action (str):
+            Optional fix for the problems found, "repair" to delete them or "quarantine" to move them out of the repo
+
+        full (bool):
+            Read and hash every image, including ones that didn't change since the last check
+
+        maxWorkers (int):
+            Optional number of processes to use. Defaults to the number of cores.
+
+        graceSeconds (float):
+            Prompt directories modified this recently are skipped since they may still be being saved to
+
+        Returns
+        -------
+        FsckReport
+            What was checked, the problems found and how many were fixed
+        """
+        repo = self.current_repo()
+        report = fsck_repo(self.reposPath, repo, action=action, full=full, maxWorkers=maxWorkers, graceSeconds=graceSeconds, segments=self.segments)
+        if(report.fixed > 0):
+            for date in sorted(set(issue.date for issue in report.issues)):
+                if(self.catalog is not None):
+                    self.catalog.rescan_date(self.imageRepo, date)
+                if(self.snapshot is not None):
+                    self.snapshot.refresh_date(date)
+                self.dateCounts.refresh_date(date)
+                self._invalidate_date(repo, date)
+        return report
+
+
+    def get_storage_usage(self) -> StorageUsage:
+        """
+        Gets how much the current repo stores, and its budget if it has one, without walking the repo.
+        """
+        return get_usage(self.dateCounts, self.storageBudget)
+
+
+    def wait_for_janitor(self):
+        """
+        Blocks until every queued check of the storage budget is done.
+        """
+        if(self.janitor is not None):
+            self.janitor.wait()
+
+
+    def export(self, output: Union[str, Path, BinaryIO], archiveFormat: str = "zip", start: datetime = None, end: datetime = None, query: str = None, incremental: bool = False) -> ExportResult:
+        """
+        Streams the current repo, or part of it, into a single zip or tar archive along with a manifest of the prompt, date
+        and time of every prompt directory exported. Images are copied in chunks straight from their files or segments so
+        exporting never holds a whole image in memory. See write_archive for the layout of the archive.
+
+        Parameters
+        ----------
+        output (Union[str, Path, BinaryIO]):
+            Path of the archive to write, or a binary stream (doesn't need to be seekable) to write it to
+
+        archiveFormat (str):
+            One of EXPORT_FORMATS. Default is zip.
+
+        start (datetime):
+            Optional earliest time to export prompt directories from (inclusive)
+
+        end (datetime):
+            Optional latest time to export prompt directories from (inclusive)
+
+        query (str):
+            Optional query to only export prompt directories whose prompt matches. See search_images.
+
+        incremental (bool):
+            Only export prompt directories newer then the newest one of the last export
+
+        Returns
+        -------
+        ExportResult
+            How much was exported
+
+        Notes
+        -----
+        Only exports of the whole repo (no range or query) move the mark incremental exports start from, since a filtered
+        export leaves older prompt directories out.
+        """
+        if(archiveFormat not in EXPORT_FORMATS):
+            raise ValueError(f"Export format must be one of {EXPORT_FORMATS}")
+        repo = self.current_repo()
+        startingDirectory, inRange = None, None
+        if(start is not None or end is not None):
+            startingDirectory, inRange = self._get_range_bounds(start or datetime.min, end or datetime.max)
+        if(query is not None and build_match_query(query) is None):
+            query = None
+
+        directories = self._iter_directories(startingDirectory=startingDirectory, query=query, inRange=inRange)
+        lastExported = read_export_mark(self.reposPath, repo) if incremental else None
+        if(lastExported is not None):
+            # Directories come most recent first so the first one already exported ends the export
+            directories = takewhile(lambda directory: is_newer(directory, lastExported), directories)
+        entries = ((directory, list_export_files(self.reposPath, directory, self._get_segment(directory))) for directory in directories)
+
+        if(isinstance(output, (str, Path))):
+            result = export_to_path(output, archiveFormat, repo, entries)
+        else:
+            result = write_archive(output, archiveFormat, repo, entries)
+
+        wholeRepo = startingDirectory is None and query is None
+        if(wholeRepo and result.newestExported is not None):
+            write_export_mark(self.reposPath, result.newestExported)
+        return result
+
+
+    def mirror(self, targetPath: Union[str, Path], maxWorkers: int = MIRROR_WORKERS, verify: bool = False, onProgress: Callable[[int, int], None] = None) -> SyncResult:
+        """
+        Incrementally mirrors the current repo into a target directory (ex: a USB drive or NAS mount) for backups. Only files
+        that are new or changed since the last sync to the target are copied and files since removed from the repo are
+        deleted from it. See sync_repo.
+
+        Parameters
+        ----------
+        targetPath (Path):
+            Directory to mirror the repo into. Must not be within the repo.
+
+        maxWorkers (int):
+            Number of threads copying files
+
+        verify (bool):
+            Also recopy files that went missing from the target since they were copied
+
+        onProgress (Callable):
+            Optional callback given the number of files copied so far and the total to copy
+
+        Returns
+        -------
+        SyncResult
+            Counts of copied, unchanged and deleted files, bytes copied and failures
+        """
+        targetPath = Path(targetPath).resolve()
+        if(targetPath == self.imageRepo.resolve() or self.imageRepo.resolve() in targetPath.parents):
+            raise ValueError(f"Can not mirror {self.imageRepo} into itself")
+        return sync_repo(self.imageRepo, targetPath, maxWorkers=maxWorkers, verify=verify, onProgress=onProgress)
+
+
+    def _invalidate_date(self, repo: str, date: str):
+        if(self.pageCache is not None):
+            self.pageCache.invalidate_date(repo, date)
+
+
+    def _invalidate_repo(self, repo: str):
+        if(self.pageCache is not None):
+            self.pageCache.invalidate_repo(repo)
+
+
+    def _on_counted(self, repo: str):
+        # Old dates are only packed once the repo they're in is counted so opening a repo never waits on packing. Packing
+        # itself happens on the segment store's background thread.
+        if(self.packAfterDays is not None and repo == self.current_repo()):
+            self._get_segment_store(repo).pack_old_dates(self.packAfterDays)
+
+
+    def pack_old_dates(self, olderThanDays: int) -> Future:
+        """
+        Packs every date directory of the current repo older then the given number of days into segment files. Packing happens
+        in the background.
+
+        Returns
+        -------
+        Future
+            Resolves to the number of dates packed once they are all packed
+        """
+        return self.segments.pack_old_dates(olderThanDays)
+
+
+    def unpack_dates(self, dates: List[str] = None) -> Future:
+        """
+        Unpacks the given dates of the current repo, or every packed date if none are given, back into date directories so
+        tools that only read directories see their images again. Unpacking happens in the background.
+
+        Returns
+        -------
+        Future
+            Resolves to the number of dates unpacked once they are all unpacked
+        """
+        return self.segments.unpack_dates(dates)
+
+
+    def _get_segment_store(self, repo: str) -> SegmentStore:
+        if(repo not in self.segmentStores):
+            self.segmentStores[repo] = SegmentStore(self.reposPath/repo, onChange=lambda date, repo=repo: self._invalidate_date(repo, date))
+        return self.segmentStores[repo]
+
+
+    def _get_segment(self, directory: ImagePromptDirectory) -> PackedSegment:
+        """
+        Gets the segment a prompt directory is packed in or None if it isn't packed.
+        """
+        if(directory is None):
+            return None
+        segment = self._get_segment_store(directory.repo).get(directory.date)
+        if(segment is not None and segment.has_time_prompt(generate_file_name(directory.time, directory.prompt))):
+            return segment
+        return None
+
+
+    def page_cache_stats(self) -> PageCacheStats:
+        """
+        Gets the hit, miss and eviction counters of the page cache. Returns None if the manager wasn't made with a page cache.
+        """
+        return self.pageCache.stats() if self.pageCache is not None else None
+
+
+    def import_images(self, sourcePath: Union[str, Path], mode: str = "copy", maxWorkers: int = None, onProgress: Callable[[int, int], None] = None) -> ImportResult:
+        """
+        Imports every image under a source tree into the current repo. See Importer.import_images for how prompts and timestamps
+        are worked out. The catalog is updated with every imported prompt directory in one transaction at the end.
+        """
+        result = import_images(sourcePath, self.reposPath, self.current_repo(), mode=mode, maxWorkers=maxWorkers, onProgress=onProgress)
+
+        if(self.catalog is not None):
+            self.catalog.apply_changes(updated=[
+                (directory, len(list_image_files(self._generate_abs_image_prompt_path(directory))))
+                for directory in result.directories if self._directory_exists(directory)
+            ])
+        if(self.snapshot is not None):
+            self.snapshot.refresh()
+        self.dateCounts.refresh()
+        self._invalidate_repo(self.current_repo())
+        return result
+
+
+    def rebuild_catalog(self, maxWorkers: int = None) -> int:
+        """
+        Rescans the current repo from the file system into the catalog. Date directories are scanned in parallel.
+
+        Returns
+        -------
+        int
+            Number of prompt directories catalogued.
+        """
+        if(self.catalog is None):
+            raise ValueError("Repo manager was not created with a catalog")
+        return self.catalog.rebuild(self.imageRepo, maxWorkers=maxWorkers)
+
+
+    def check_catalog(self, maxWorkers: int = None) -> CatalogConsistencyReport:
+        """
+        Compares the catalog of the current repo against the file system.
+
+        Returns
+        -------
+        CatalogConsistencyReport
+            The prompt directories the catalog is missing, has but shouldn't or has with the wrong image count.
+        """
+        if(self.catalog is None):
+            raise ValueError("Repo manager was not created with a catalog")
+        return self.catalog.check_consistency(self.imageRepo, maxWorkers=maxWorkers)
+
+
+    def _create_directory_iterator(self, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD):
+        return self._create_repo_iterator(self.current_repo(), startingDirectory=startingDirectory, direction=direction)
+
+
+    def _create_repo_iterator(self, repo: str, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD):
+        if(self.catalog is not None and (repo == self.current_repo() or self.catalog.is_catalogued(repo))):
+            return CatalogIterator(self.catalog, repo, startingDirectory=startingDirectory, direction=direction)
+        # Only the current repo is watched
+        snapshot = self.snapshot if repo == self.current_repo() else None
+        return DirectoryIterator(pathToDirectories=self.reposPath/repo, startingDirectory=startingDirectory, direction=direction, snapshot=snapshot, segments=self._get_segment_store(repo))
+
 
     def generate_image_prompt_directory(self, prompt: str) -> [ImagePromptDirectory, str]:
         """
         Take the given prompt and generate a date/time-prompt entry within the given repo directory.
         Will use the current date and time this method was called to generate the directory.
 
-        Will atempt to create the entries absolute path of the entry if fs permissions allow it. This 
-        should be safe as RepoManager will error out 
+        Nothing is created on the file system. The directory is made when the first image is written into it (see save_image)
+        so a save that fails doesn't leave an empty prompt directory behind.
 
         Parameters
         ----------
@@ -108,7 +562,7 @@ class RepoManager(object):
         Returns
         -------
         ImagePromptDirectory
-            A model representing the newly generate image prompt directory.
+            A model representing the newly generate image prompt directory, and its absolute path.
         
         """
         date, time = generate_ios_date_time_strs()
@@ -116,7 +570,6 @@ class RepoManager(object):
 
         promptWithTime = generate_file_name(time, prompt)
         promptAbsPath = dayDirectory/promptWithTime
-        promptAbsPath.mkdir( parents=True, exist_ok=True )
 
         return [
             ImagePromptDirectory(
@@ -134,11 +587,18 @@ class RepoManager(object):
         return self.reposPath/directorySubPath
 
 
-    def _get_files(self, directory: ImagePromptDirectory) -> ImagePrompResult:
+    def _get_files(self, directory: ImagePromptDirectory, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> ImagePrompResult:
         logging.info(f"Attempting to load images from path {self.reposPath} and directory {directory}")
         fullPathToImagePromptFolder = self._generate_abs_image_prompt_path(directory)
 
-        images = [read_file_as_bytes(fullPathToImagePromptFolder/img_file) for img_file in os.listdir(fullPathToImagePromptFolder)]
+        if(loadMode is LOAD_MODE.METADATA):
+            images = []
+        elif(not fullPathToImagePromptFolder.is_dir() and (segment := self._get_segment(directory)) is not None):
+            images = self._get_packed_files(segment, generate_file_name(directory.time, directory.prompt), loadMode)
+        elif(loadMode is LOAD_MODE.LAZY):
+            images = [get_image_handle(fullPathToImagePromptFolder/img_file) for img_file in list_image_files(fullPathToImagePromptFolder)]
+        else:
+            images = [read_file_as_bytes(fullPathToImagePromptFolder/img_file) for img_file in list_image_files(fullPathToImagePromptFolder)]
 
         logging.info(f"Found {len(images)} images")
         return ImagePrompResult(
@@ -151,6 +611,88 @@ class RepoManager(object):
         )
 
 
+    def _get_packed_files(self, segment: PackedSegment, timePrompt: str, loadMode: LOAD_MODE) -> List[Union[bytes, PackedImageHandle]]:
+        imageFiles = segment.list_image_files(timePrompt)
+        if(loadMode is LOAD_MODE.LAZY):
+            return [PackedImageHandle(segment, timePrompt, img_file, segment.get_entry(timePrompt, img_file)[1]) for img_file in imageFiles]
+        return [segment.read(timePrompt, img_file) for img_file in imageFiles]
+
+
+    def get_thumbnails(self, directory: ImagePromptDirectory, size: int = THUMBNAIL_SIZES[0]) -> List[bytes]:
+        """
+        Gets a thumbnail of every image within a prompt directory. Thumbnails that don't exist yet (for example for images
+        saved before thumbnails were made at save time) are built and cached next to their image.
+
+        Parameters
+        ----------
+        directory (ImagePromptDirectory):
+            The prompt directory to get thumbnails for
+
+        size (int):
+            The minimum width/height the thumbnails should have. The smallest cached thumbnail at least this size is returned.
+
+        Returns
+        -------
+        List[bytes]
+            Encoded thumbnails ordered by image number
+        """
+        fullPathToImagePromptFolder = self._generate_abs_image_prompt_path(directory)
+        if(not fullPathToImagePromptFolder.is_dir() and (segment := self._get_segment(directory)) is not None):
+            return [handle.read_thumbnail(size) for handle in self._get_packed_files(segment, generate_file_name(directory.time, directory.prompt), LOAD_MODE.LAZY)]
+        return [get_or_create_thumbnail(fullPathToImagePromptFolder/img_file, size) for img_file in list_image_files(fullPathToImagePromptFolder)]
+
+
+    def backfill_thumbnails(self, maxWorkers: int = None) -> int:
+        """
+        Builds the missing thumbnails for every image in the current repo using a pool of processes.
+
+        Returns
+        -------
+        int
+            The number of images thumbnails were built for
+        """
+        return backfill_thumbnails(self.imageRepo, maxWorkers=maxWorkers)
+
+
+    def get_image_metadata(self, directory: ImagePromptDirectory) -> List[ImageMetadata]:
+        """
+        Gets the dimensions, size, format, hash, engine and generation latency of every image of a prompt directory from its
+        metadata file, without reading any pixel data.
+
+        Prompt directories saved before metadata was written get their metadata file on first read, from only the headers of
+        their images. Packed prompt directories without one have their metadata made in memory.
+
+        Returns
+        -------
+        List[ImageMetadata]
+            Metadata of every image of the prompt directory, ordered by image number. Empty if the directory doesn't exist.
+        """
+        promptPath = self._generate_abs_image_prompt_path(directory)
+        if(promptPath.is_dir()):
+            return get_or_create_metadata(promptPath)
+        segment = self._get_segment(directory)
+        if(segment is None):
+            return []
+        timePrompt = generate_file_name(directory.time, directory.prompt)
+        imageFiles = segment.list_image_files(timePrompt)
+        if(segment.get_entry(timePrompt, METADATA_FILE_NAME) is not None):
+            # Deleting from a segment leaves its metadata file as it was packed
+            return [imageMetadata for imageMetadata in parse_metadata(segment.read(timePrompt, METADATA_FILE_NAME)) if imageMetadata.fileName in imageFiles]
+        return [generate_image_metadata(imageFile, segment.read(timePrompt, imageFile)) for imageFile in imageFiles]
+
+
+    def backfill_metadata(self, maxWorkers: int = None) -> int:
+        """
+        Writes the missing metadata file of every prompt directory in the current repo using a pool of processes.
+
+        Returns
+        -------
+        int
+            The number of prompt directories metadata was written for
+        """
+        return backfill_metadata(self.imageRepo, maxWorkers=maxWorkers)
+
+
     def get_latest_images_in_repo(self) -> ImagePrompResult:
         """
         Gets the very first prompt_time images from the repo if possible.
@@ -170,7 +712,7 @@ class RepoManager(object):
             return None
 
 
-    def get_images(self, number: int, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD) -> GetImagePrompsResult:
+    def get_images(self, number: int, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> GetImagePrompsResult:
         """
         Pagination call to get prompts and their images from the repo. Results will be returned in order by the most recent date 
         and time.
@@ -203,6 +745,11 @@ class RepoManager(object):
         direction: (DIRECTION):
             The direciton to get page results from. Supports "forward" or "backward". Default is to go forward.
 
+        loadMode: (LOAD_MODE):
+            How images are loaded into the results. "eager" reads every image as bytes, "lazy" returns ImageHandles that only
+            read the image when asked and "metadata" doesn't touch the image files at all (results will have no images).
+            Default is eager.
+
         Returns
         -------
         GetImagePrompsResult
@@ -213,7 +760,9 @@ class RepoManager(object):
         """
         try:
             logging.debug(f"Provided token : {token}")
-            return self._get_images(number, startingDirectory=token, direction=direction)
+            if(self.pageCache is None):
+                return self._get_images(number, startingDirectory=token, direction=direction, loadMode=loadMode)
+            return self._get_cached_images(number, token=token, direction=direction, loadMode=loadMode)
         except BaseException as e:
             logging.error(traceback.format_exc())
             return GetImagePrompsResult(
@@ -222,30 +771,247 @@ class RepoManager(object):
             )
 
 
+    def total_count(self) -> int:
+        """
+        Gets the number of prompt directories in the current repo in O(log dates). Waits for the repo to be counted if it's
+        still being counted after being switched to (see is_counted).
+        """
+        return self.dateCounts.total()
+
+
+    def is_counted(self) -> bool:
+        """
+        Whether the prompt directories of the current repo are counted, meaning total_count and get_page return right away.
+        """
+        return self.dateCounts.is_counted()
+
+
+    def get_page(self, pageNumber: int, number: int, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> GetImagePrompsResult:
+        """
+        Gets a page by its number rather then by paging to it. Pages are numbered from 1 and are the same as the ones get_images
+        would return paging forward from the first page with the same number of prompt directories per page.
+
+        The date the page starts in is found from the per date counts in O(log dates), then only that date is iterated to
+        where the page starts.
+
+        Parameters
+        ----------
+        pageNumber (int):
+            The page to get, starting at 1
+
+        number (int):
+            The number of prompt directories per page
+
+        loadMode: (LOAD_MODE):
+            How images are loaded into the results. See get_images.
+
+        Returns
+        -------
+        GetImagePrompsResult
+            The page with a nextToken for the page after it and a previousToken to go backward to the page before it
+        """
+        if(pageNumber < 1 or number < 1):
+            return GetImagePrompsResult(results=[], errorMessage="Page and number must be greater then 0")
+        try:
+            previousToken = self._get_token_before((pageNumber - 1) * number)
+        except BaseException as e:
+            logging.error(traceback.format_exc())
+            return GetImagePrompsResult(results=[], errorMessage=f'Critical error finding page {pageNumber} : {str(e)}')
+        if(pageNumber > 1 and previousToken is None):
+            return GetImagePrompsResult(results=[], errorMessage=f'Page {pageNumber} is past the last page')
+
+        result = self.get_images(number, token=previousToken, loadMode=loadMode)
+        # The result may be the one held by the page cache so the page is returned as a new result
+        return GetImagePrompsResult(
+            results=result.results,
+            nextToken=result.nextToken,
+            errorMessage=result.errorMessage,
+            previousToken=previousToken,
+        )
+
+
+    def _get_token_before(self, position: int) -> NextToken:
+        # Token going forward from which starts at the prompt directory at the position
+        if(position == 0):
+            return None
+        located = self.dateCounts.locate(position)
+        if(located is None):
+            return None
+        date, offset = located
+        # Sorts before every time prompt of the date going forward
+        dateStart = NextToken(prompt=EARLIEST_PROMPT, repo=self.current_repo(), date=date, time=LATEST_PROMPT)
+        if(offset == 0):
+            return dateStart
+        directoryIterator = self._create_directory_iterator(startingDirectory=dateStart)
+        directoryIterator.advance(offset - 1)
+        return generate_nextToken(next(directoryIterator, None))
+
+
+    def get_images_between(self, start: datetime, end: datetime, number: int, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> GetImagePrompsResult:
+        """
+        Same as get_images but only for prompt directories saved between two timestamps (both inclusive).
+
+        Without a token forward pages start at the end timestamp and backward pages at the start timestamp. The iterators
+        binary search straight to that point so nothing outside the range is listed or read. Paging stops at the other end
+        of the range. Tokens work the same as get_images.
+
+        Parameters
+        ----------
+        start (datetime):
+            The earliest time to get prompt directories from
+
+        end (datetime):
+            The latest time to get prompt directories from
+
+        Returns
+        -------
+        GetImagePrompsResult
+            Prompt directories within the range, most recent first
+        """
+        if(start > end):
+            return GetImagePrompsResult(results=[], errorMessage="Start must not be after end")
+        startingDirectory, inRange = self._get_range_bounds(start, end, token, direction)
+        try:
+            return self._get_images(number, startingDirectory=startingDirectory, direction=direction, loadMode=loadMode, inRange=inRange)
+        except BaseException as e:
+            logging.error(traceback.format_exc())
+            return GetImagePrompsResult(
+                results=[],
+                errorMessage = f'Critical error retrieving any results : {str(e)}',
+            )
+
+
+    def _get_range_bounds(self, start: datetime, end: datetime, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD) -> Tuple[ImagePromptDirectory, Callable[[ImagePromptDirectory], bool]]:
+        # Where to start iterating a range from and whether directories iterated are still within it
+        lowerBound, upperBound = split_ios_date_time(start), split_ios_date_time(end)
+        if(direction is DIRECTION.BACKWARD):
+            startingDirectory = token if token is not None else generate_time_token(start, self.current_repo(), EARLIEST_PROMPT)
+            return startingDirectory, lambda directory: [directory.date, directory.time] <= upperBound
+        startingDirectory = token if token is not None else generate_time_token(end, self.current_repo(), LATEST_PROMPT)
+        return startingDirectory, lambda directory: [directory.date, directory.time] >= lowerBound
+
+
+    def get_images_around(self, timestamp: datetime, radius: timedelta, number: int, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> GetImagePrompsResult:
+        """
+        Same as get_images_between for every prompt directory saved within the radius of the timestamp.
+        """
+        return self.get_images_between(timestamp - radius, timestamp + radius, number, token=token, direction=direction, loadMode=loadMode)
+
+
+    def search_images(self, query: str, number: int, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> GetImagePrompsResult:
+        """
+        Same as get_images but only for prompt directories of the current repo whose prompt matches a query. Every word of the
+        query has to be the start of a word in the prompt (ex: "sad ra" matches "Sad rat"). Tokens work the same as get_images.
+
+        With a catalog matches come from its full text index. Without one the repo is iterated and prompts matched in memory.
+        A query without any words gets the same pages as get_images.
+        """
+        if(build_match_query(query) is None):
+            return self.get_images(number, token=token, direction=direction, loadMode=loadMode)
+        try:
+            return self._get_images(number, startingDirectory=token, direction=direction, loadMode=loadMode, query=query)
+        except BaseException as e:
+            logging.error(traceback.format_exc())
+            return GetImagePrompsResult(
+                results=[],
+                errorMessage = f'Critical error searching for results : {str(e)}',
+            )
+
+
+    def _create_search_iterator(self, query: str, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD):
+        if(self.catalog is not None):
+            return SearchIterator(self.catalog, self.current_repo(), query, startingDirectory=startingDirectory, direction=direction)
+        return filter(lambda directory: prompt_matches(directory.prompt, query), self._create_directory_iterator(startingDirectory=startingDirectory, direction=direction))
+
+
+    def _get_cached_images(self, number: int, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> GetImagePrompsResult:
+        key = generate_page_key(self.current_repo(), token, direction, number, loadMode)
+
+        # Any foreground request means the client moved. Drop prefetches that haven't started but wait on this page if it's
+        # already being loaded in the background rather then loading it twice.
+        inFlight = self.prefetcher.get_in_flight(key)
+        self.prefetcher.cancel_pending()
+        if(inFlight is not None and not inFlight.cancelled()):
+            inFlight.result()
+
+        cachedResult = self.pageCache.get(key)
+        if(cachedResult is not None):
+            logging.debug(f"Page cache hit for {key}")
+            return cachedResult
+
+        return self._load_page(key, number, token, direction, loadMode)
+
+
+    def _load_page(self, key: PageKey, number: int, token: NextToken, direction: DIRECTION, loadMode: LOAD_MODE) -> GetImagePrompsResult:
+        # Remember what the cache looked like before loading so a page invalidated mid-load is never cached
+        version = self.pageCache.version
+        result = self._get_images(number, startingDirectory=token, direction=direction, loadMode=loadMode)
+        if(result.errorMessage is None):
+            lowestDate, highestDate = get_page_date_range(token, direction, result)
+            self.pageCache.put(key, result, lowestDate, highestDate, version=version)
+        return result
+
+
+    def _prefetch_page(self, key: PageKey, number: int, token: NextToken, direction: DIRECTION, loadMode: LOAD_MODE):
+        # The client may have switched repos or the page loaded by someone else since it was queued
+        if(key[0] != self.current_repo() or self.pageCache.contains(key)):
+            return
+        try:
+            self._load_page(key, number, token, direction, loadMode)
+            logging.debug(f"Prefetched page {key}")
+        except BaseException as e:
+            logging.warning(f"Could not prefetch page {key} : {traceback.format_exc()}")
+
+
+    def prefetch_adjacent_pages(self, number: int, forwardToken: NextToken = None, backwardToken: NextToken = None, loadMode: LOAD_MODE = LOAD_MODE.EAGER):
+        """
+        Speculatively loads the pages next to the one a client is on into the page cache using background threads so the
+        pages are already cached when the client asks for them. Does nothing if the manager wasn't made with a page cache.
+
+        Parameters
+        ----------
+        number (int):
+            The page size the client uses
+
+        forwardToken (NextToken):
+            The token the client would use to get the next page. None if there is no next page.
+
+        backwardToken (NextToken):
+            The token the client would use to get the previous page. None if there is no previous page.
+
+        loadMode (LOAD_MODE):
+            The load mode the client uses
+        """
+        if(self.prefetcher is None):
+            return
+
+        for token, direction in [(forwardToken, DIRECTION.FORWARD), (backwardToken, DIRECTION.BACKWARD)]:
+            if(token is None):
+                continue
+            key = generate_page_key(self.current_repo(), token, direction, number, loadMode)
+            if(not self.pageCache.contains(key)):
+                self.prefetcher.submit(key, lambda key=key, token=token, direction=direction: self._prefetch_page(key, number, token, direction, loadMode))
+
+
     def _directory_exists(self, directory: ImagePromptDirectory):
-        return directory is not None and os.path.exists(self._generate_abs_image_prompt_path(directory))
+        return directory is not None and (os.path.exists(self._generate_abs_image_prompt_path(directory)) or self._get_segment(directory) is not None)
 
 
-    def _get_images(self, number: int, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD) -> GetImagePrompsResult:
+    def _get_images(self, number: int, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER, query: str = None, inRange: Callable[[ImagePromptDirectory], bool] = None) -> GetImagePrompsResult:
         logging.info(msg="Getting images")
         if(number < 1):
             return GetImagePrompsResult(results=[], errorMessage="Number must be greater then 0")
 
         imagePromptResults: List[ImagePrompResult] = []
         errorMessage = None
+        directoryIterator = self._iter_directories(startingDirectory=startingDirectory, direction=direction, query=query, inRange=inRange)
 
         try:
-            # If going backwards add the current directory but only if it actually exists. Otherwise continue iterating from the start directory.
-            if(direction is DIRECTION.BACKWARD and self._directory_exists(startingDirectory)):
-                imagePromptResults.append(self._get_files(directory=startingDirectory))
-
-            directoryIterator = DirectoryIterator(pathToDirectories=self.imageRepo, startingDirectory=startingDirectory, direction=direction)
-
             # Iterate prompt directories until either we found enough prompt directories to match the number requested or until there are none left in the direction we are iterating
             # Utilize assignment expressions to use an iterator in a while loop with other short circuit conditions. Should be safe since "None" is effectively exhausting the iterator in this case anyways
             # See : https://stackoverflow.com/questions/59092561/how-to-use-iterator-in-while-loop-statement-in-python
             while (len(imagePromptResults) < number) and (nextTimeWithPromptDirectory := next(directoryIterator, None)):
-                imagePromptResults.append(self._get_files(directory=nextTimeWithPromptDirectory))
+                imagePromptResults.append(self._get_files(directory=nextTimeWithPromptDirectory, loadMode=loadMode))
 
         except BaseException as e:
             logging.error(traceback.format_exc())
@@ -266,12 +1032,174 @@ class RepoManager(object):
             )
     
 
-    def save_image(self, prompt: str, imageBytes: bytes) -> ImagePrompResult:
+    def _iter_directories(self, startingDirectory: ImagePromptDirectory = None, direction: DIRECTION = DIRECTION.FORWARD, query: str = None, inRange: Callable[[ImagePromptDirectory], bool] = None) -> Iterator[ImagePromptDirectory]:
+        # If going backwards include the current directory but only if it actually exists. Otherwise continue iterating from the start directory.
+        if(
+            direction is DIRECTION.BACKWARD and self._directory_exists(startingDirectory) and
+            (query is None or prompt_matches(startingDirectory.prompt, query)) and
+            (inRange is None or inRange(startingDirectory))
+          ):
+            yield startingDirectory
+
+        if(query is None):
+            directoryIterator = self._create_directory_iterator(startingDirectory=startingDirectory, direction=direction)
+        else:
+            directoryIterator = self._create_search_iterator(query, startingDirectory=startingDirectory, direction=direction)
+        if(inRange is not None):
+            # Directories come in order so the first one out of range ends the range
+            directoryIterator = takewhile(inRange, directoryIterator)
+        yield from directoryIterator
+
+
+    def iter_images(self, token: NextToken = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> Iterator[ImagePrompResult]:
+        """
+        Streaming version of get_images. Yields the result of each prompt directory as soon as it's read instead of building a
+        whole page first, so clients can show results while the rest are still being read. Iterates until the repo is exhausted
+        in the given direction so clients decide how many to take (ex: with itertools.islice).
+
+        Results come in the order they are iterated, meaning going backward yields the oldest result first. Any result can be
+        turned into a token for get_images with generate_nextToken. Unlike get_images, errors are raised to the client.
+
+        Parameters
+        ----------
+        token: (NextToken):
+            Where to start iterating from. See get_images.
+
+        direction: (DIRECTION):
+            The direction to iterate in. Default is forward.
+
+        loadMode: (LOAD_MODE):
+            How images are loaded into the results. See get_images.
+
+        Returns
+        -------
+        Iterator[ImagePrompResult]
+            The results of every prompt directory from the token on
+        """
+        for directory in self._iter_directories(startingDirectory=token, direction=direction):
+            yield self._get_files(directory=directory, loadMode=loadMode)
+
+
+    def list_directories(self) -> DirectoryColumns:
+        """
+        Lists every prompt directory of the current repo, most recent first, in a compact column oriented listing. Meant for
+        whole repo listings (ex: tens of thousands of prompt directories) that would take far more memory as records.
+
+        Read from the catalog if the manager has one, otherwise the repo is iterated.
+        """
+        if(self.catalog is not None):
+            return self.catalog.list_directories(self.current_repo())
+        return DirectoryColumns(self.current_repo(), self._create_directory_iterator())
+
+
+    def get_merged_images(self, number: int, token: MergedToken = None, direction: DIRECTION = DIRECTION.FORWARD, loadMode: LOAD_MODE = LOAD_MODE.EAGER) -> GetImagePrompsResult:
+        """
+        Same as get_images but pages across every repo under the repos path at once, in global date/time order.
+
+        Each repo is iterated from its own position in the token and the repos are merged with a heap, so a page costs
+        O(number * log repos) instead of listing and sorting every repo.
+
+        Parameters
+        ----------
+        number (int):
+            The max number of prompt directories to get
+
+        token (MergedToken):
+            A token from a previous call to get_merged_images. Start from the most recent prompt directory if not provided.
+
+        direction (DIRECTION):
+            The direction to page in from the token
+
+        loadMode (LOAD_MODE):
+            How much of every image to load
+
+        Returns
+        -------
+        GetImagePrompsResult
+            A page of prompt directories from any repo with a MergedToken as its next token
+        """
+        logging.info(msg="Getting merged images")
+        if(number < 1):
+            return GetImagePrompsResult(results=[], errorMessage="Number must be greater then 0")
+
+        repos = list_repos(self.reposPath)
+        positions = dict((repo, self._get_merged_position(repo, token)) for repo in repos)
+        imagePromptResults: List[ImagePrompResult] = []
+        errorMessage = None
+        mergedIterator = None
+
+        try:
+            iterators = {}
+            for repo, position in positions.items():
+                if(direction is not DIRECTION.BACKWARD):
+                    iterators[repo] = self._create_repo_iterator(repo, startingDirectory=position, direction=direction)
+                elif(position is not None):
+                    # Like get_images, going backwards includes the position itself if it actually exists
+                    repoIterator = self._create_repo_iterator(repo, startingDirectory=position, direction=direction)
+                    iterators[repo] = chain([position], repoIterator) if self._directory_exists(position) else repoIterator
+            mergedIterator = MergedIterator(iterators, direction=direction)
+
+            while (len(imagePromptResults) < number) and (nextDirectory := next(mergedIterator, None)):
+                imagePromptResults.append(self._get_files(directory=nextDirectory, loadMode=loadMode))
+                positions[nextDirectory.repo] = nextDirectory
+
+        except BaseException as e:
+            logging.error(traceback.format_exc())
+            errorMessage = f'Critical error while retrieving results : {str(e)}'
+        finally:
+            nextToken = None
+            if direction is DIRECTION.BACKWARD:
+                imagePromptResults.reverse()
+                # The token for the page before is whatever each repo would of given next
+                if(mergedIterator is not None and mergedIterator.peek() is not None):
+                    heads = mergedIterator.get_heads()
+                    nextToken = MergedToken(
+                        positions=dict((repo, generate_nextToken(heads.get(repo))) for repo in repos),
+                        boundary=generate_nextToken(mergedIterator.peek())
+                    )
+            elif len(imagePromptResults) >= number:
+                nextToken = MergedToken(
+                    positions=dict((repo, generate_nextToken(position)) for repo, position in positions.items()),
+                    boundary=generate_nextToken(imagePromptResults[-1])
+                )
+
+            return GetImagePrompsResult(
+                imagePromptResults,
+                nextToken=nextToken,
+                errorMessage=errorMessage,
+            )
+
+
+    def _get_merged_position(self, repo: str, token: MergedToken) -> ImagePromptDirectory:
+        if(token is None):
+            return None
+        if(repo in token.positions):
+            position = token.positions[repo]
+        elif(token.boundary is not None):
+            # Repo made after the token was. Resume it from where the token left off across all repos.
+            position = token.boundary
+        else:
+            return None
+        return ImagePromptDirectory(prompt=position.prompt, repo=repo, date=position.date, time=position.time) if position is not None else None
+
+
+    def save_image(self, prompt: str, imageBytes: bytes, onSaved: Callable[[ImagePrompResult], None] = None, engine: str = None, latencySeconds: float = None, onFailed: Callable[[BaseException], None] = None) -> ImagePrompResult:
         """
         Method to save images and their associated prompt to the file system. Images will be stored and indexed by the
         date and time in which they were saved. Additionally the image will be saved to whatever repo this repo manager
         is currently set to.
 
+        PNG, JPEG and WEBP images are written exactly as provided (as "1.png", "1.jpg" or "1.webp"). Anything else, including
+        images whose header looks broken, is re-encoded as PNG. If the manager was made with a storageFormat, images already
+        in that format are written as provided and every other image is re-encoded in it instead. Bytes that can't be decoded
+        at all are written as provided rather then lost.
+
+        Images are written crash safely (temp file, fsync then rename). If the manager was made with asyncSaves the image
+        is written in the background and this method returns right away, otherwise it returns once the image is written.
+        The prompt directory only appears in the repo (and is counted) once its image is written.
+
+        Once written, a metadata file (see get_image_metadata) is written next to the image from the bytes that were saved.
+
         Parameters
         ----------
         prompt (str):
@@ -280,26 +1208,38 @@ class RepoManager(object):
         image: (Image):
             The actual image to be saved
 
+        onSaved (Callable):
+            Optional callback given the ImagePrompResult once the image is written to the file system. Called from the
+            background thread when saving asynchronously.
+
+        onFailed (Callable):
+            Optional callback given the error if the image couldn't be written in the background (ex: the disk is full).
+            Only called when saving asynchronously, saving synchronously raises the error instead.
+
+        engine (str):
+            Optional name of the engine that generated the image. Defaults to the current repo, which is named after its engine.
+
+        latencySeconds (float):
+            Optional number of seconds the engine took to generate the image
+
         Returns
         -------
         ImagePrompResult
-            The meta information after the image was saved.
+            The meta information of the image. The image may not be written yet when saving asynchronously.
         """
-        directoryResult, absolutePath = self.generate_image_prompt_directory(prompt)
+        # Already encoded images are written exactly as provided. Only images in other (or broken) formats are re-encoded.
+        if(self.storageFormat is None):
+            imageFormat = can_pass_through(imageBytes)
+            transcodeTo, transcodeOptions = DEFAULT_SAVE_FORMAT, None
+        else:
+            transcodeTo, transcodeOptions = self.storageFormat
+            imageFormat = can_pass_through(imageBytes, allowedFormats={transcodeTo})
+        if(imageFormat is not None):
+            transcodeTo, transcodeOptions = None, None
+        imagePathName = "1." + IMAGE_FORMAT_EXTENSIONS[imageFormat or transcodeTo]
 
-        try:
-            with Image.open(imageBytes) as image:
-                image.save(absolutePath/"1.png", "PNG") 
-                logging.info(f'Saved {absolutePath/"1.png"}')
-        except BaseException as e:
-            # In scenarios where the Pillow libraries encoder doesn't work 
-            # (fake filesystem issues : https://github.com/pytest-dev/pyfakefs/discussions/858)
-            # attempt to save the file via native os API
-            with open(absolutePath/"1.png", 'wb') as f:
-                f.write(imageBytes)
-                logging.info(f'Saved {absolutePath/"1.png"}')
-
-        return ImagePrompResult(
+        directoryResult, absolutePath = self.generate_image_prompt_directory(prompt)
+        saveResult = ImagePrompResult(
             prompt = directoryResult.prompt,
             repo = directoryResult.repo,
             date = directoryResult.date,
@@ -308,6 +1248,71 @@ class RepoManager(object):
             images = [imageBytes]
         )
 
+        def on_written():
+            # The job holds the bytes as written, after any re-encoding
+            write_metadata(absolutePath, [generate_image_metadata(imagePathName, job.imageBytes, engine or directoryResult.repo, latencySeconds)])
+            self._on_image_written(directoryResult, absolutePath/imagePathName)
+            if(onSaved is not None):
+                onSaved(saveResult)
+
+        job = SaveJob(absolutePath/imagePathName, imageBytes, onWritten=on_written, transcodeTo=transcodeTo, transcodeOptions=transcodeOptions, onFailed=onFailed, makeDirectories=True)
+        if(self.asyncSaves):
+            self.saveQueue.submit(job)
+        else:
+            self.saveQueue.save(job)
+
+        return saveResult
+
+
+    def _on_image_written(self, directory: ImagePromptDirectory, imagePath: Path):
+        thumbnailsBuilt = self.thumbnailWorker.submit(imagePath)
+        if(directory.repo == self.current_repo()):
+            if(self.snapshot is not None):
+                self.snapshot.add_time_prompt(directory.date, imagePath.parent.name)
+            dateCounts = self.dateCounts
+            dateCounts.add(directory.date, 1)
+            dateCounts.add_bytes(directory.date, imagePath.stat().st_size + get_file_size(imagePath.parent/METADATA_FILE_NAME))
+            thumbnailsBuilt.add_done_callback(
+                lambda _: dateCounts.add_bytes(directory.date, sum(get_file_size(generate_thumbnail_path(imagePath, size)) for size in THUMBNAIL_SIZES))
+            )
+            if(self.janitor is not None):
+                self.janitor.request()
+
+        if(self.catalog is not None):
+            self.catalog.add_directory(directory, imageCount=1)
+        self._invalidate_date(directory.repo, directory.date)
+
+
+    def wait_for_saves(self):
+        """
+        Blocks until every image queued to be saved is written.
+        """
+        self.saveQueue.wait()
+
+
+    def close(self):
+        """
+        Finishes everything the manager is doing in the background and releases its resources. Every queued save is written,
+        then the thumbnails, storage budget checks and packing they started finish, so nothing is lost when the application
+        exits. Counts not yet written to disk are written too. The manager can't be used after it's closed.
+        """
+        logging.info("Closing repo manager")
+        # Saves queue up thumbnails and budget checks so they are drained first
+        self.saveQueue.shutdown()
+        self.saveJournal.close()
+        self.thumbnailWorker.shutdown()
+        if(self.janitor is not None):
+            self.janitor.shutdown(wait=True)
+        # Counting may still queue up packing once it's done so it's waited for before the segment stores stop
+        self.dateCounts.close()
+        for segments in self.segmentStores.values():
+            segments.shutdown()
+        if(self.prefetcher is not None):
+            self.prefetcher.shutdown()
+        self.stop_watching()
+        if(self.catalog is not None):
+            self.catalog.close()
+
 
     def delete_image(self, deleteImagePrompsRequest: DeleteImagePrompsRequest) -> int:
         """
@@ -316,34 +1321,121 @@ class RepoManager(object):
 
         Parameters
         ----------
-        prompt (str):
-            The prompt used to save the image
-
-        image: (Image):
-            The actual image to be saved
+        deleteImagePrompsRequest (DeleteImagePrompsRequest):
+            The prompt directory and the numbers of the images in it to delete
 
         Returns
         -------
-        ImagePrompResult
-            The meta information after the image was saved.
+        int
+            The number of images deleted
         """
-        absImageDirPath = self._generate_abs_image_prompt_path(deleteImagePrompsRequest)
-        numDeleted = 0
+        return self.delete_images([deleteImagePrompsRequest])[0].numDeleted
+
+
+    def _delete_from_directory(self, request: DeleteImagePrompsRequest) -> DeleteImagePrompsResult:
+        absImageDirPath = self._generate_abs_image_prompt_path(request)
+        # Packing reads a date directory, writes its segment and then removes the directory all under the write lock. Deleting
+        # under it too keeps a delete from landing in between and coming back with the segment.
+        with self._get_segment_store(request.repo).writeLock:
+            if(absImageDirPath.is_dir()):
+                return self._delete_from_unpacked_directory(request, absImageDirPath)
+        if(self._get_segment(request) is not None):
+            return self._delete_from_segment(request)
+        return DeleteImagePrompsResult(request, numDeleted=0, errorMessage=f'{absImageDirPath} does not exist')
 
-        for num in deleteImagePrompsRequest.nums:
-            path = absImageDirPath/(num + ".png")
+
+    def _delete_from_unpacked_directory(self, request: DeleteImagePrompsRequest, absImageDirPath: Path) -> DeleteImagePrompsResult:
+        numDeleted = 0
+        imageFilesByNum = dict((get_image_num(imageFile), imageFile) for imageFile in list_image_files(absImageDirPath))
+        for num in request.nums:
+            path = absImageDirPath/imageFilesByNum.get(num, num + ".png")
             try:
                 path.unlink()
                 numDeleted += 1
+                remove_thumbnails(path)
             except BaseException as e:
                 logging.info(f'Could not delete {path}')
 
-        # Delete the directory if its now empty
-        if not any(Path(absImageDirPath).iterdir()):
-           absImageDirPath.rmdir()
+        # Delete the directory (and anything derived from its images) if it has no images left
+        remainingImages = list_image_files(absImageDirPath)
+        if len(remainingImages) == 0:
+           shutil.rmtree(absImageDirPath)
+           if(self.snapshot is not None and request.repo == self.current_repo()):
+               self.snapshot.remove_time_prompt(request.date, absImageDirPath.name)
+           return DeleteImagePrompsResult(request, numDeleted=numDeleted, directoryRemoved=True)
+        if((absImageDirPath/METADATA_FILE_NAME).exists()):
+            # Drops the deleted images from the metadata
+            get_or_create_metadata(absImageDirPath)
+        return DeleteImagePrompsResult(request, numDeleted=numDeleted, remainingImages=len(remainingImages))
+
+
+    def _delete_from_segment(self, request: DeleteImagePrompsRequest) -> DeleteImagePrompsResult:
+        # Deleting from a segment only records tombstones. The segment store compacts the segment once enough of it is deleted.
+        timePrompt = generate_file_name(request.time, request.prompt)
+        segment = self._get_segment(request)
+        imageFilesByNum = dict((get_image_num(imageFile), imageFile) for imageFile in segment.list_image_files(timePrompt))
+        imageFiles = [imageFilesByNum[num] for num in request.nums if num in imageFilesByNum]
+        remainingImages = [imageFile for imageFile in imageFilesByNum.values() if imageFile not in imageFiles]
+        if(len(remainingImages) > 0):
+            self._get_segment_store(request.repo).delete(request.date, timePrompt, imageFiles + [generate_thumbnail_path(Path(imageFile), size).name for imageFile in imageFiles for size in THUMBNAIL_SIZES])
+            return DeleteImagePrompsResult(request, numDeleted=len(imageFiles), remainingImages=len(remainingImages))
+
+        # Nothing left for the prompt so drop everything packed for it, thumbnails included
+        self._get_segment_store(request.repo).delete(request.date, timePrompt, segment.list_files(timePrompt))
+        return DeleteImagePrompsResult(request, numDeleted=len(imageFiles), directoryRemoved=True)
+
+
+    def delete_images(self, deleteImagePrompsRequests: List[DeleteImagePrompsRequest]) -> List[DeleteImagePrompsResult]:
+        """
+        Deletes images from many prompt directories at once. Works like delete_image for every request but requests are grouped
+        by date directory so that emptied date directories are pruned once per date, and the catalog and page cache are
+        updated once for the whole batch.
+
+        Parameters
+        ----------
+        deleteImagePrompsRequests (List[DeleteImagePrompsRequest]):
+            The prompt directories and the numbers of the images in them to delete
 
-        # Delete the directory if its now empty
-        if not any(Path(absImageDirPath.parent).iterdir()):
-           absImageDirPath.parent.rmdir()
+        Returns
+        -------
+        List[DeleteImagePrompsResult]
+            One result per request, in the same order as the requests. Failures are reported per request rather then stopping
+            the rest of the batch.
+        """
+        results: List[DeleteImagePrompsResult] = [None] * len(deleteImagePrompsRequests)
+        requestIndexesByDate: Dict[Tuple[str, str], List[int]] = {}
+        for index, request in enumerate(deleteImagePrompsRequests):
+            requestIndexesByDate.setdefault((request.repo, request.date), []).append(index)
+
+        for (repo, date), indexes in requestIndexesByDate.items():
+            for index in indexes:
+                request = deleteImagePrompsRequests[index]
+                try:
+                    results[index] = self._delete_from_directory(request)
+                except BaseException as e:
+                    logging.error(traceback.format_exc())
+                    results[index] = DeleteImagePrompsResult(request, numDeleted=0, errorMessage=f'Critical error while deleting : {str(e)}')
+
+            # Delete the date directory if its now empty
+            datePath = self.reposPath/repo/date
+            try:
+                with self._get_segment_store(repo).writeLock:
+                    if datePath.is_dir() and not any(datePath.iterdir()):
+                       datePath.rmdir()
+                       if(self.snapshot is not None and repo == self.current_repo()):
+                           self.snapshot.remove_date(date)
+            except OSError as e:
+                logging.info(f'Could not prune {datePath}')
+            self._invalidate_date(repo, date)
+
+        # Only the touched dates are recounted, both their counts and the bytes they still take up
+        for date in set(result.request.date for result in results if result.numDeleted > 0 and result.request.repo == self.current_repo()):
+            self.dateCounts.refresh_date(date)
+
+        if(self.catalog is not None):
+            self.catalog.apply_changes(
+                updated=[(result.request, result.remainingImages) for result in results if result.errorMessage is None and not result.directoryRemoved],
+                removed=[result.request for result in results if result.directoryRemoved]
+            )
 
-        return numDeleted
\ No newline at end of file
+        return results
\ No newline at end of file
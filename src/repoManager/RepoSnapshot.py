@@ -0,0 +1,200 @@
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from repoManager.utils import list_visible_directories
+from utils.algoUtils import reverse_bisect_left
+
+
+def get_reverse_sorted_subdirectory_names(path: Path) -> List[str]:
+    """
+    Gets the names of every visible directory directly under the path ordered in reverse. Hidden directories (bookkeeping and
+    temp directories) are left out like they are by list_visible_directories. Returns an empty list if the path doesn't exist.
+    """
+    try:
+        return list_visible_directories(path)
+    except FileNotFoundError:
+        return []
+
+
+def is_hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+def get_mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _insert_reverse_sorted(reverseSorted: List[str], name: str):
+    index = reverse_bisect_left(reverseSorted, name)
+    if(index >= len(reverseSorted) or reverseSorted[index] != name):
+        reverseSorted.insert(index, name)
+
+
+def _remove_reverse_sorted(reverseSorted: List[str], name: str):
+    index = reverse_bisect_left(reverseSorted, name)
+    if(index < len(reverseSorted) and reverseSorted[index] == name):
+        del reverseSorted[index]
+
+
+class RepoSnapshot(object):
+    """
+    An in memory listing of the date and time_prompt directories of a single repo, kept in the same reverse sorted order the
+    DirectoryIterator walks them in.
+
+    Date directories are listed when the snapshot is made. The time_prompt directories of a date are only listed the first
+    time they are asked for and then kept. The snapshot is updated incrementally, either by whoever creates or removes
+    directories (ex: the RepoManager) or by a watcher observing the file system, so iterators can reuse the listing instead
+    of rescanning and resorting directories on every query.
+
+    Getters return copies so iterators hold a stable view while the snapshot keeps changing underneath them.
+
+    An optional onChange callback is called with the date whose listing changed, or None when the whole repo was rescanned.
+
+    Hidden directories are never part of the snapshot. Adding or removing one is ignored without calling onChange, so writes
+    to bookkeeping and temp directories don't look like changes to the repo.
+
+    Methods
+    ----------
+    get_sorted_dates()
+        Gets every date directory most recent first
+
+    get_sorted_time_prompts(date)
+        Gets every time_prompt directory of a date most recent first
+
+    add_time_prompt(date, timePrompt) / remove_time_prompt(date, timePrompt)
+        Records a created or removed time_prompt directory
+
+    add_date(date) / remove_date(date)
+        Records a created or removed date directory
+
+    refresh() / refresh_date(date)
+        Rescans the file system
+
+    refresh_if_changed()
+        Rescans only the directories whose modification time changed since they were last listed
+    """
+    def __init__(self, repoPath: Union[str, Path], onChange: Callable[[Optional[str]], None] = None):
+        self.repoPath = Path(repoPath)
+        self.onChange = onChange
+        self.lock = threading.RLock()
+        self.sortedDates: List[str] = []
+        self.timePrompts: Dict[str, List[str]] = {}
+        self.repoMtime: Optional[int] = None
+        self.dateMtimes: Dict[str, Optional[int]] = {}
+        self.refresh()
+
+
+    def refresh(self):
+        with self.lock:
+            self.repoMtime = get_mtime_ns(self.repoPath)
+            self.sortedDates = get_reverse_sorted_subdirectory_names(self.repoPath)
+            self.timePrompts = {}
+            self.dateMtimes = {}
+        self._notify(None)
+
+
+    def _notify(self, date: Optional[str]):
+        if(self.onChange is not None):
+            self.onChange(date)
+
+
+    def refresh_date(self, date: str):
+        """
+        Relists the time_prompt directories of a date, but only if they were listed before.
+        """
+        with self.lock:
+            if(date in self.timePrompts):
+                self._load_date(date)
+        self._notify(date)
+
+
+    def _load_date(self, date: str) -> List[str]:
+        self.dateMtimes[date] = get_mtime_ns(self.repoPath/date)
+        self.timePrompts[date] = get_reverse_sorted_subdirectory_names(self.repoPath/date)
+        return self.timePrompts[date]
+
+
+    def get_sorted_dates(self) -> List[str]:
+        with self.lock:
+            return list(self.sortedDates)
+
+
+    def get_sorted_time_prompts(self, date: str) -> List[str]:
+        with self.lock:
+            timePrompts = self.timePrompts.get(date)
+            if(timePrompts is None):
+                timePrompts = self._load_date(date)
+            return list(timePrompts)
+
+
+    def add_date(self, date: str):
+        if(is_hidden(date)):
+            return
+        with self.lock:
+            _insert_reverse_sorted(self.sortedDates, date)
+        self._notify(date)
+
+
+    def remove_date(self, date: str):
+        if(is_hidden(date)):
+            return
+        with self.lock:
+            _remove_reverse_sorted(self.sortedDates, date)
+            self.timePrompts.pop(date, None)
+            self.dateMtimes.pop(date, None)
+        self._notify(date)
+
+
+    def add_time_prompt(self, date: str, timePrompt: str):
+        if(is_hidden(date) or is_hidden(timePrompt)):
+            return
+        with self.lock:
+            _insert_reverse_sorted(self.sortedDates, date)
+            if(date in self.timePrompts):
+                _insert_reverse_sorted(self.timePrompts[date], timePrompt)
+        self._notify(date)
+
+
+    def remove_time_prompt(self, date: str, timePrompt: str):
+        if(is_hidden(date) or is_hidden(timePrompt)):
+            return
+        with self.lock:
+            if(date in self.timePrompts):
+                _remove_reverse_sorted(self.timePrompts[date], timePrompt)
+        self._notify(date)
+
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Compares the modification time of the repo and every listed date directory with the time they had when listed and
+        rescans the ones that changed. Much cheaper then a full rescan since only a stat per listed directory is needed.
+
+        Returns
+        -------
+        bool
+            Whether anything was rescanned
+        """
+        changedDates = set()
+        with self.lock:
+            if(get_mtime_ns(self.repoPath) != self.repoMtime):
+                previousDates = set(self.sortedDates)
+                self.repoMtime = get_mtime_ns(self.repoPath)
+                self.sortedDates = get_reverse_sorted_subdirectory_names(self.repoPath)
+                changedDates |= previousDates.symmetric_difference(self.sortedDates)
+                for date in [date for date in self.timePrompts if date not in self.sortedDates]:
+                    self.timePrompts.pop(date)
+                    self.dateMtimes.pop(date, None)
+
+            for date in list(self.timePrompts):
+                if(get_mtime_ns(self.repoPath/date) != self.dateMtimes.get(date)):
+                    self._load_date(date)
+                    changedDates.add(date)
+
+        for date in sorted(changedDates):
+            self._notify(date)
+        return len(changedDates) > 0
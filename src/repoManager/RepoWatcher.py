@@ -0,0 +1,204 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import Dict, Optional
+
+from repoManager.RepoSnapshot import RepoSnapshot, is_hidden
+
+
+# Values from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+ADDED_MASK = IN_CREATE | IN_MOVED_TO
+REMOVED_MASK = IN_DELETE | IN_MOVED_FROM
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyRepoWatcher(object):
+    """
+    Keeps a RepoSnapshot current by listening to inotify events (linux only) for the repo directory and every date directory
+    in it. Only directory events matter: dates being created or removed under the repo and time_prompts being created or
+    removed under a date.
+
+    Raises an OSError when made if inotify isn't available (ex: not on linux or out of inotify instances).
+    """
+    def __init__(self, snapshot: RepoSnapshot):
+        if(not sys.platform.startswith("linux")):
+            raise OSError("inotify is only available on linux")
+
+        self.snapshot = snapshot
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if(self.fd < 0):
+            raise OSError(ctypes.get_errno(), "Could not initialize inotify")
+
+        # Watch descriptor to the date it watches. The repo directory itself maps to None.
+        self.watches: Dict[int, Optional[str]] = {}
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="repoWatcher", daemon=True)
+
+
+    def _add_watch(self, path: Path, date: Optional[str]):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if(wd < 0):
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Could not watch {path} : {os.strerror(errno)}")
+        self.watches[wd] = date
+
+
+    def _watch_all_dates(self):
+        watchedDates = set(self.watches.values())
+        for date in self.snapshot.get_sorted_dates():
+            if(date not in watchedDates):
+                try:
+                    self._add_watch(self.snapshot.repoPath/date, date)
+                except FileNotFoundError:
+                    pass
+
+
+    def start(self):
+        # Watch first and list second so nothing created in between is missed
+        self._add_watch(self.snapshot.repoPath, None)
+        self.snapshot.refresh()
+        self._watch_all_dates()
+        self.thread.start()
+
+
+    def stop(self):
+        self.stopEvent.set()
+        if(self.thread.is_alive()):
+            self.thread.join()
+        os.close(self.fd)
+
+
+    def _run(self):
+        while(not self.stopEvent.is_set()):
+            try:
+                readable, _, _ = select.select([self.fd], [], [], 0.5)
+                if(readable):
+                    self._handle_events(os.read(self.fd, 64 * 1024))
+            except BlockingIOError:
+                continue
+            except BaseException as e:
+                logging.error(f"Repo watcher failed, rescanning {self.snapshot.repoPath} : {traceback.format_exc()}")
+                self.snapshot.refresh()
+
+
+    def _handle_events(self, buffer: bytes):
+        offset = 0
+        while(offset < len(buffer)):
+            wd, mask, _, nameLength = EVENT_HEADER.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + nameLength].rstrip(b"\0"))
+            offset += EVENT_HEADER.size + nameLength
+            self._handle_event(wd, mask, name)
+
+
+    def _handle_event(self, wd: int, mask: int, name: str):
+        if(mask & IN_Q_OVERFLOW):
+            logging.warning(f"Repo watcher missed events, rescanning {self.snapshot.repoPath}")
+            self.snapshot.refresh()
+            self._watch_all_dates()
+            return
+
+        if(mask & IN_IGNORED):
+            self.watches.pop(wd, None)
+            return
+
+        if(wd not in self.watches):
+            return
+        date = self.watches[wd]
+
+        if(mask & (IN_DELETE_SELF | IN_MOVE_SELF)):
+            if(date is None):
+                self.snapshot.refresh()
+            return
+
+        if(not mask & IN_ISDIR or is_hidden(name)):
+            return
+
+        if(date is None):
+            if(mask & ADDED_MASK):
+                self.snapshot.add_date(name)
+                try:
+                    self._add_watch(self.snapshot.repoPath/name, name)
+                except FileNotFoundError:
+                    pass
+                # Time prompts may have been made before the date was watched
+                self.snapshot.refresh_date(name)
+            elif(mask & REMOVED_MASK):
+                self.snapshot.remove_date(name)
+        else:
+            if(mask & ADDED_MASK):
+                self.snapshot.add_time_prompt(date, name)
+            elif(mask & REMOVED_MASK):
+                self.snapshot.remove_time_prompt(date, name)
+
+
+class PollingRepoWatcher(object):
+    """
+    Keeps a RepoSnapshot current by periodically checking the modification time of the repo and its listed date directories.
+    Used wherever inotify isn't available. Changes show up within one poll interval.
+    """
+    def __init__(self, snapshot: RepoSnapshot, pollInterval: float = 2.0):
+        self.snapshot = snapshot
+        self.pollInterval = pollInterval
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="repoWatcher", daemon=True)
+
+
+    def start(self):
+        self.thread.start()
+
+
+    def stop(self):
+        self.stopEvent.set()
+        if(self.thread.is_alive()):
+            self.thread.join()
+
+
+    def _run(self):
+        while(not self.stopEvent.wait(self.pollInterval)):
+            try:
+                self.snapshot.refresh_if_changed()
+            except BaseException as e:
+                logging.error(f"Could not poll {self.snapshot.repoPath} : {traceback.format_exc()}")
+
+
+def create_repo_watcher(snapshot: RepoSnapshot, pollInterval: float = 2.0):
+    """
+    Makes and starts a watcher for the repo of the snapshot. Prefers inotify and falls back to polling if inotify can't be used.
+    """
+    try:
+        watcher = InotifyRepoWatcher(snapshot)
+        try:
+            watcher.start()
+        except BaseException:
+            os.close(watcher.fd)
+            raise
+        logging.info(f"Watching {snapshot.repoPath} with inotify")
+        return watcher
+    except (OSError, AttributeError) as e:
+        logging.info(f"Could not use inotify ({e}), polling {snapshot.repoPath} every {pollInterval} seconds instead")
+        watcher = PollingRepoWatcher(snapshot, pollInterval=pollInterval)
+        watcher.start()
+        return watcher
@@ -0,0 +1,434 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import traceback
+import uuid
+from pathlib import Path
+from typing import Callable, IO, List, Optional, Set, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where a journal is always treated as used by a single process
+    fcntl = None
+
+from utils.imageFormats import transcode_image
+
+
+SAVE_JOURNAL_FILE_NAME = "save_journal.jsonl"
+
+
+def generate_temp_path(path: Path) -> Path:
+    return path.parent/("." + path.name + ".tmp")
+
+
+def fsync_directory(directory: Path):
+    """
+    Flushes the entries of a directory (ex: a rename into it) to disk. Not every platform or file system allows opening
+    directories, in which case there is nothing more that can be done.
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SaveJob(object):
+    """
+    A single image waiting to be written. onWritten is called once the image is durably in place. If it's written in the
+    background and couldn't be, onFailed is called with the error instead.
+
+    If makeDirectories is set the directories of the image are made when it's written, so nothing is left behind for an
+    image that never makes it to disk.
+
+    If transcodeTo is set the image is re-encoded in that format (with the Pillow encoder options in transcodeOptions) right
+    before it's written, keeping the decoding and encoding off of the caller's thread.
+    """
+    def __init__(self, imagePath: Union[str, Path], imageBytes: bytes, onWritten: Callable[[], None] = None, transcodeTo: str = None, transcodeOptions: dict = None, onFailed: Callable[[BaseException], None] = None, makeDirectories: bool = False):
+        self.id = uuid.uuid4().hex
+        self.imagePath = Path(imagePath)
+        self.imageBytes = imageBytes
+        self.onWritten = onWritten
+        self.onFailed = onFailed
+        self.makeDirectories = makeDirectories
+        self.transcodeTo = transcodeTo
+        self.transcodeOptions = transcodeOptions
+
+
+    def to_intent(self) -> dict:
+        return {
+            "op": "begin",
+            "id": self.id,
+            "path": str(self.imagePath),
+            "size": len(self.imageBytes),
+            "sha256": hashlib.sha256(self.imageBytes).hexdigest(),
+        }
+
+
+class SaveError(Exception):
+    """
+    Raised once a batch is written if any of its images couldn't be, with every image that failed and why. The other images
+    of the batch are written regardless.
+    """
+    def __init__(self, failures: List[Tuple[SaveJob, BaseException]]):
+        super().__init__(f"Could not save {', '.join(str(job.imagePath) + ' : ' + str(error) for job, error in failures)}")
+        self.failures = failures
+
+
+class SaveJournal(object):
+    """
+    An append only log of the images that are about to be written, stored as one json object per line.
+
+    Every write is recorded as a "begin" intent (destination, size and hash of the image) before anything is written and
+    as a "commit" once the image was renamed into place. Intents without a commit after a crash are replayed on startup:
+    fully written temp files are moved into place and partial ones are cleaned up.
+
+    Several processes can use the same journal (ex: the application and a repoCli import). Every journal holds a shared
+    lock on a lock file next to the journal until it's closed. The journal is only replayed or truncated while holding that
+    lock exclusively, meaning no other live process is using it, so the saves another process has in flight are never
+    taken for interrupted ones.
+    """
+    def __init__(self, journalPath: Union[str, Path]):
+        self.journalPath = Path(journalPath)
+        self.lock = threading.Lock()
+        self.lockFile: Optional[IO] = None
+        if(fcntl is not None):
+            self.lockFile = open(self.journalPath.with_name(self.journalPath.name + ".lock"), "a")
+            fcntl.flock(self.lockFile, fcntl.LOCK_SH)
+
+
+    def _lock_exclusively(self) -> bool:
+        """
+        Tries to take the lock file exclusively, only possible if no other journal has it open. Returns whether it was taken.
+        """
+        if(self.lockFile is None):
+            return True
+        try:
+            fcntl.flock(self.lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            # A failed conversion may have dropped the shared lock so it's taken again
+            fcntl.flock(self.lockFile, fcntl.LOCK_SH)
+            return False
+
+
+    def _unlock_exclusively(self):
+        if(self.lockFile is not None):
+            fcntl.flock(self.lockFile, fcntl.LOCK_SH)
+
+
+    def close(self):
+        """
+        Stops using the journal, letting other processes replay or truncate it.
+        """
+        with self.lock:
+            if(self.lockFile is not None):
+                self.lockFile.close()
+            self.lockFile = None
+
+
+    def _append(self, records: List[dict]):
+        with self.lock, open(self.journalPath, "a") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+    def begin(self, jobs: List[SaveJob]):
+        self._append([job.to_intent() for job in jobs])
+
+
+    def commit(self, jobs: List[SaveJob]):
+        self._append([{ "op": "commit", "id": job.id } for job in jobs])
+
+
+    def truncate(self) -> bool:
+        """
+        Empties the journal unless another process is using it, since its intents may not be committed yet. Returns whether
+        the journal was emptied.
+        """
+        with self.lock:
+            if(not self._lock_exclusively()):
+                return False
+            try:
+                if(self.journalPath.exists()):
+                    os.truncate(self.journalPath, 0)
+                return True
+            finally:
+                self._unlock_exclusively()
+
+
+    def read_uncommitted(self) -> List[dict]:
+        if(not self.journalPath.exists()):
+            return []
+        intents = {}
+        with self.lock, open(self.journalPath, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may have been cut short by the crash
+                    continue
+                if(record.get("op") == "begin"):
+                    intents[record["id"]] = record
+                elif(record.get("op") == "commit"):
+                    intents.pop(record["id"], None)
+        return list(intents.values())
+
+
+    def replay(self) -> int:
+        """
+        Finishes or cleans up every write that was interrupted and empties the journal. Nothing is replayed while another
+        process is using the journal since its uncommitted intents may be saves still in flight, they're replayed by
+        whichever process next has the journal to itself.
+
+        Returns
+        -------
+        int
+            The number of interrupted writes that were recovered
+        """
+        with self.lock:
+            if(not self._lock_exclusively()):
+                logging.info(f"{self.journalPath} is in use by another process, leaving its interrupted saves for later")
+                return 0
+        try:
+            return self._replay()
+        finally:
+            with self.lock:
+                self._unlock_exclusively()
+
+
+    def _replay(self) -> int:
+        recovered = 0
+        for intent in self.read_uncommitted():
+            imagePath = Path(intent["path"])
+            tempPath = generate_temp_path(imagePath)
+            try:
+                if(tempPath.exists()):
+                    contents = tempPath.read_bytes()
+                    if(len(contents) == intent["size"] and hashlib.sha256(contents).hexdigest() == intent["sha256"]):
+                        os.replace(tempPath, imagePath)
+                        fsync_directory(imagePath.parent)
+                        recovered += 1
+                        logging.info(f"Recovered interrupted save of {imagePath}")
+                        continue
+                    tempPath.unlink()
+
+                if(imagePath.exists()):
+                    continue # the rename happened but the commit never made it to the journal
+
+                logging.warning(f"Save of {imagePath} was interrupted before it was written and is lost")
+                # Don't leave an empty prompt directory behind
+                if(imagePath.parent.exists() and not any(imagePath.parent.iterdir())):
+                    imagePath.parent.rmdir()
+            except OSError:
+                logging.error(f"Could not replay save of {imagePath} : {traceback.format_exc()}")
+        with self.lock:
+            if(self.journalPath.exists()):
+                os.truncate(self.journalPath, 0)
+        return recovered
+
+
+def transcode_job(job: SaveJob):
+    """
+    Re-encodes the image of a job in its transcodeTo format. Images Pillow can't decode (ex: truncated or not an image at
+    all) are kept as they are so they're still written rather then lost, and a failed image never fails the rest of its batch.
+    """
+    if(job.transcodeTo is None):
+        return
+    try:
+        job.imageBytes = transcode_image(job.imageBytes, job.transcodeTo, job.transcodeOptions)
+    except Exception as e:
+        logging.warning(f'Could not re-encode {job.imagePath} as {job.transcodeTo}, writing it as provided : {str(e)}')
+    job.transcodeTo = None
+
+
+def write_image(job: SaveJob):
+    """
+    Writes a single image to a temp file, fsyncs it and renames it into place. If the write fails the temp file, and the
+    directory if nothing else is in it, are removed before the error is raised.
+    """
+    tempPath = generate_temp_path(job.imagePath)
+    try:
+        if(job.makeDirectories):
+            job.imagePath.parent.mkdir(parents=True, exist_ok=True)
+        with open(tempPath, "wb") as f:
+            f.write(job.imageBytes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, job.imagePath)
+    except BaseException:
+        try:
+            tempPath.unlink(missing_ok=True)
+            if(job.makeDirectories and job.imagePath.parent.exists() and not any(job.imagePath.parent.iterdir())):
+                job.imagePath.parent.rmdir()
+        except OSError:
+            logging.error(f"Could not clean up failed save of {job.imagePath} : {traceback.format_exc()}")
+        raise
+    logging.info(f'Saved {job.imagePath}')
+
+
+def write_images(jobs: List[SaveJob], journal: SaveJournal = None):
+    """
+    Writes a batch of images crash safely. Each image is written to a temp file, fsynced and then atomically renamed into
+    place so readers only ever see a complete image or no image at all. Directories are fsynced once per batch rather then
+    once per image.
+
+    An image that fails to be written (ex: the disk is full) doesn't stop the rest of the batch from being written. Once
+    the batch is done a SaveError with every image that failed is raised.
+
+    Parameters
+    ----------
+    jobs (List[SaveJob]):
+        The images to write
+
+    journal (SaveJournal):
+        Optional journal recording the intent to write each image
+    """
+    for job in jobs:
+        transcode_job(job)
+
+    if(journal is not None):
+        journal.begin(jobs)
+
+    directories: Set[Path] = set()
+    failures: List[Tuple[SaveJob, BaseException]] = []
+    for job in jobs:
+        try:
+            write_image(job)
+        except Exception as e:
+            failures.append((job, e))
+            continue
+        # The prompt and date directories may be new too
+        directories.update([job.imagePath.parent, job.imagePath.parent.parent, job.imagePath.parent.parent.parent])
+
+    for directory in directories:
+        fsync_directory(directory)
+
+    # Failed images were cleaned up so there is nothing left to replay for them either
+    if(journal is not None):
+        journal.commit(jobs)
+    if(len(failures) > 0):
+        raise SaveError(failures)
+
+
+class SaveQueue(object):
+    """
+    Writes images on a background thread so that callers don't wait on encoding, writing and fsyncing images.
+
+    Saves that arrive while a batch is being written are grouped into the next batch so that the journal and directories
+    are only fsynced once per batch.
+
+    Methods
+    ----------
+    submit(job)
+        Queues an image to be written
+
+    save(job)
+        Writes an image on the calling thread, raising any error writing it rather then calling its onFailed
+
+    wait()
+        Blocks until every queued image is written
+
+    shutdown()
+        Writes every queued image and stops the background thread
+    """
+    def __init__(self, journal: SaveJournal = None, maxBatch: int = 16):
+        self.journal = journal
+        self.maxBatch = maxBatch
+        self.jobs: "queue.Queue[SaveJob]" = queue.Queue()
+        # Batches are written one at a time so that once a batch commits every intent in the journal is committed
+        self.writeLock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="saveQueue", daemon=True)
+        self.thread.start()
+
+
+    def submit(self, job: SaveJob):
+        self.jobs.put(job)
+
+
+    def save(self, job: SaveJob):
+        self._write_batch([job], raiseErrors=True)
+
+
+    def wait(self):
+        self.jobs.join()
+
+
+    def shutdown(self):
+        if(not self.thread.is_alive()):
+            return
+        self.jobs.put(None)
+        self.thread.join()
+
+
+    def _run(self):
+        while(True):
+            job = self.jobs.get()
+            if(job is None):
+                self.jobs.task_done()
+                return
+
+            batch = [job]
+            stopping = False
+            while(len(batch) < self.maxBatch):
+                try:
+                    nextJob = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if(nextJob is None):
+                    stopping = True
+                    break
+                batch.append(nextJob)
+
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in range(len(batch) + (1 if stopping else 0)):
+                    self.jobs.task_done()
+            if(stopping):
+                return
+
+
+    def _write_batch(self, batch: List[SaveJob], raiseErrors: bool = False):
+        failures: List[Tuple[SaveJob, BaseException]] = []
+        committed = True
+        with self.writeLock:
+            try:
+                write_images(batch, journal=self.journal)
+            except SaveError as e:
+                failures = e.failures
+            except Exception as e:
+                # Nothing was written (ex: the journal itself couldn't be written to), leave the journal for the next replay
+                failures = [(job, e) for job in batch]
+                committed = False
+            if(self.journal is not None and committed):
+                self.journal.truncate()
+
+        if(raiseErrors and len(failures) > 0):
+            raise failures[0][1]
+
+        failedJobs = set(job.id for job, _ in failures)
+        for job, error in failures:
+            logging.error(f'Could not save {job.imagePath} : {"".join(traceback.format_exception(type(error), error, error.__traceback__))}')
+            if(job.onFailed is not None):
+                try:
+                    job.onFailed(error)
+                except BaseException as e:
+                    logging.error(f'Failed save step failed for {job.imagePath} : {traceback.format_exc()}')
+
+        for job in batch:
+            if(job.onWritten is not None and job.id not in failedJobs):
+                try:
+                    job.onWritten()
+                except BaseException as e:
+                    logging.error(f'Post save step failed for {job.imagePath} : {traceback.format_exc()}')
@@ -0,0 +1,171 @@
+import logging
+import shutil
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+from decorators.decorators import auto_str
+from repoManager.DateCounts import DateCountIndex
+from repoManager.PackedSegments import SegmentStore, generate_index_path, generate_pack_path
+
+
+@auto_str
+class StorageUsage(object):
+    def __init__(self, repo: str, bytes: int, images: int, dates: int, maxBytes: Optional[int] = None, maxImages: Optional[int] = None):
+        self.repo = repo
+        self.bytes = bytes
+        self.images = images
+        self.dates = dates
+        self.maxBytes = maxBytes
+        self.maxImages = maxImages
+
+
+@auto_str
+class StorageBudget(object):
+    """
+    How much a single repo is allowed to store. Either limit can be left out. Images are counted by prompt directory, PAIID
+    saves one image per prompt.
+
+    Dates evicted to stay within the budget are deleted, or moved under archivePath (as "<archivePath>/<repo>/<date>") if
+    one is given.
+    """
+    def __init__(self, maxBytes: int = None, maxImages: int = None, archivePath: Union[str, Path] = None):
+        self.maxBytes = maxBytes
+        self.maxImages = maxImages
+        self.archivePath = Path(archivePath) if archivePath is not None else None
+
+
+    def is_limited(self) -> bool:
+        return self.maxBytes is not None or self.maxImages is not None
+
+
+    def is_exceeded(self, usage: StorageUsage) -> bool:
+        return (
+            (self.maxBytes is not None and usage.bytes > self.maxBytes) or
+            (self.maxImages is not None and usage.images > self.maxImages)
+        )
+
+
+def evict_date(repoPath: Union[str, Path], date: str, archivePath: Union[str, Path] = None):
+    """
+    Removes a date, both its directory and its segment, from a repo. Moves it into the archive instead if one is given.
+    """
+    repoPath = Path(repoPath)
+    paths = [path for path in [repoPath/date, generate_pack_path(repoPath, date), generate_index_path(repoPath, date)] if path.exists()]
+    if(archivePath is not None):
+        archiveRepoPath = Path(archivePath)/repoPath.name
+        archiveRepoPath.mkdir(parents=True, exist_ok=True)
+        # The index goes last so a half moved segment is never seen as a complete one in either place
+        for path in sorted(paths, key=lambda path: path.name.endswith(".idx")):
+            shutil.move(str(path), str(archiveRepoPath/path.name))
+        return
+    for path in sorted(paths, key=lambda path: not path.name.endswith(".idx")):
+        if(path.is_dir()):
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+
+def get_usage(dateCounts: DateCountIndex, budget: StorageBudget = None) -> StorageUsage:
+    """
+    Gets the usage of a repo from its date counts without touching the file system.
+    """
+    return StorageUsage(
+        repo=dateCounts.repoPath.name,
+        bytes=dateCounts.total_bytes(),
+        images=dateCounts.total(),
+        dates=dateCounts.num_dates(),
+        maxBytes=budget.maxBytes if budget is not None else None,
+        maxImages=budget.maxImages if budget is not None else None
+    )
+
+
+class StorageJanitor(object):
+    """
+    Keeps a repo within a storage budget by evicting its oldest dates on a background thread.
+
+    Usage comes from the repo's date counts so checking the budget never walks the repo. Callers only ever queue a check
+    (ex: after every save) and never wait on evictions. Checks queued while one is waiting to run are merged into it.
+
+    The most recent date is never evicted since new images are being saved to it, so a budget smaller then a single day
+    of images isn't kept.
+
+    Methods
+    ----------
+    request()
+        Queues a check of the budget
+
+    enforce()
+        Evicts the oldest dates until the repo is within budget
+
+    wait()
+        Blocks until queued checks are done
+    """
+    def __init__(self, dateCounts: DateCountIndex, budget: StorageBudget, segments: SegmentStore = None, onEvicted: Callable[[str], None] = None):
+        self.dateCounts = dateCounts
+        self.budget = budget
+        self.segments = segments
+        self.onEvicted = onEvicted
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="janitor")
+        self.queued: Future = None
+        self.pending: List[Future] = []
+
+
+    def request(self) -> Future:
+        with self.lock:
+            if(self.queued is not None and not self.queued.running() and not self.queued.done()):
+                return self.queued
+            self.queued = self.executor.submit(self._enforce_safely)
+            self.pending = [pending for pending in self.pending if not pending.done()] + [self.queued]
+            return self.queued
+
+
+    def _enforce_safely(self) -> List[str]:
+        try:
+            return self.enforce()
+        except BaseException:
+            logging.error(f"Could not enforce storage budget of {self.dateCounts.repoPath} : {traceback.format_exc()}")
+            return []
+
+
+    def enforce(self) -> List[str]:
+        """
+        Evicts the oldest dates of the repo, one at a time, until it's within budget.
+
+        Returns
+        -------
+        List[str]
+            The dates evicted, oldest first
+        """
+        evicted = []
+        while(self.budget.is_exceeded(get_usage(self.dateCounts, self.budget))):
+            date = self.dateCounts.oldest_date()
+            if(date is None or date == self.dateCounts.newest_date()):
+                logging.warning(f"{self.dateCounts.repoPath} is over its storage budget but only has its most recent date left")
+                break
+            if(self.segments is not None):
+                # Packing and compaction rewrite segments under the write lock
+                with self.segments.writeLock:
+                    evict_date(self.dateCounts.repoPath, date, self.budget.archivePath)
+            else:
+                evict_date(self.dateCounts.repoPath, date, self.budget.archivePath)
+            self.dateCounts.remove_date(date)
+            evicted.append(date)
+            logging.info(f"Evicted {date} from {self.dateCounts.repoPath} to stay within its storage budget")
+            if(self.onEvicted is not None):
+                self.onEvicted(date)
+        return evicted
+
+
+    def wait(self):
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.result()
+
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
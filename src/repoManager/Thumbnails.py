@@ -0,0 +1,100 @@
+import logging
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import List, Set, Union
+
+from repoManager.utils import list_date_directories, list_image_files
+from utils.imageUtils import THUMBNAIL_SIZES, build_thumbnails, has_current_thumbnail
+from utils.pathingUtils import get_reverse_sorted_directory_by_name
+
+
+def _build_thumbnails_safely(imagePath: Path) -> bool:
+    try:
+        build_thumbnails(imagePath)
+        logging.info(f'Built thumbnails for {imagePath}')
+        return True
+    except BaseException as e:
+        logging.error(f'Could not build thumbnails for {imagePath} : {traceback.format_exc()}')
+        return False
+
+
+class ThumbnailWorker(object):
+    """
+    Builds thumbnails of newly saved images on a background thread so that saving never waits on decoding and
+    scaling images.
+
+    Methods
+    ----------
+    submit(imagePath)
+        Queues the thumbnails of an image to be built
+
+    wait()
+        Blocks until every queued image has its thumbnails built
+
+    shutdown()
+        Stops the worker after all queued images are processed
+    """
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        self.pending: Set[Future] = set()
+
+
+    def submit(self, imagePath: Path) -> Future:
+        future = self.executor.submit(_build_thumbnails_safely, imagePath)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        return future
+
+
+    def wait(self):
+        wait(list(self.pending))
+
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def find_images_missing_thumbnails(repoPath: Union[str, Path]) -> List[Path]:
+    """
+    Walks a repo and finds every image that is missing at least one of its thumbnails (or has an outdated one).
+    """
+    repoPath = Path(repoPath)
+    missing = []
+    for date in list_date_directories(repoPath):
+        for timePrompt in get_reverse_sorted_directory_by_name(repoPath/date):
+            for imageFile in list_image_files(repoPath/date/timePrompt):
+                imagePath = repoPath/date/timePrompt/imageFile
+                if(not all(has_current_thumbnail(imagePath, size) for size in THUMBNAIL_SIZES)):
+                    missing.append(imagePath)
+    return missing
+
+
+def backfill_thumbnails(repoPath: Union[str, Path], maxWorkers: int = None) -> int:
+    """
+    Builds the thumbnails of every image in a repo that doesn't have them yet. Mostly for repos that were made before
+    thumbnails were generated at save time.
+
+    Decoding and scaling images is CPU bound so the work is spread across a pool of processes.
+
+    Parameters
+    ----------
+    repoPath (Path):
+        Absolute path to the repo
+
+    maxWorkers (int):
+        Optional number of processes to use. Defaults to the number of cores.
+
+    Returns
+    -------
+    int
+        The number of images that had thumbnails built for them
+    """
+    missing = find_images_missing_thumbnails(repoPath)
+    logging.info(f'Backfilling thumbnails for {len(missing)} images in {repoPath}')
+    if(len(missing) == 0):
+        return 0
+
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        results = list(executor.map(_build_thumbnails_safely, missing, chunksize=16))
+    return sum(results)
@@ -1,5 +1,18 @@
+import os
+import re
 from repoManager.Models import ImagePromptDirectory
 from pathlib import Path
+from typing import List
+
+
+# Directory under the repos path where PAIID keeps its own bookkeeping files (catalogs, journals, manifests...).
+# Starts with a "." so it can never be mistaken for a repo.
+METADATA_DIRECTORY_NAME = ".paiid"
+
+
+# Generated images are saved by their number within the prompt (ex: "1.png"). Anything else in a prompt directory
+# (thumbnails, temp files...) is derived from those images and is not an image of the prompt itself.
+IMAGE_FILE_PATTERN = re.compile(r"^(\d+)\.(png|jpg|jpeg|webp|avif)$", re.IGNORECASE)
 
 
 def extract_file_name(timePrompt: str):
@@ -35,4 +48,56 @@ def generate_image_prompt_path(directory: ImagePromptDirectory) -> Path:
         Can be used to do filesystem operations on the directory.
     
     """
-    return Path(directory.repo)/directory.date/generate_file_name(directory.time, directory.prompt)
\ No newline at end of file
+    return Path(directory.repo)/directory.date/generate_file_name(directory.time, directory.prompt)
+
+
+def get_or_create_metadata_directory(reposPath: Path) -> Path:
+    """
+    Gets the directory PAIID uses to store bookkeeping files for all the repos under the given repos path.
+    """
+    metadataPath = Path(reposPath)/METADATA_DIRECTORY_NAME
+    metadataPath.mkdir( parents=True, exist_ok=True )
+    return metadataPath
+
+
+def list_visible_directories(path: Path) -> List[str]:
+    """
+    Lists the names of the directories directly under a path in reverse order. Files and hidden directories are not included.
+    """
+    with os.scandir(path) as entries:
+        return sorted((entry.name for entry in entries if entry.is_dir() and not entry.name.startswith(".")), reverse=True)
+
+
+def list_date_directories(repoPath: Path) -> List[str]:
+    """
+    Lists the names of the date directories of a repo, most recent first. Files (like packed segments) and hidden directories
+    are not included.
+    """
+    return list_visible_directories(repoPath)
+
+
+def list_repos(reposPath: Path) -> List[str]:
+    """
+    Lists the names of every repo under the repos path ordered by name. The metadata directory is not a repo.
+    """
+    return sorted(list_visible_directories(reposPath))
+
+
+def is_image_file_name(fileName: str) -> bool:
+    return IMAGE_FILE_PATTERN.match(fileName) is not None
+
+
+def get_image_num(fileName: str) -> str:
+    """
+    Gets the number of an image from its file name (ex: "1" from "1.png")
+    """
+    return IMAGE_FILE_PATTERN.match(fileName).group(1)
+
+
+def list_image_files(imagePromptPath: Path) -> List[str]:
+    """
+    Lists the names of the images within a prompt directory, ordered by their image number.
+    Files derived from images (like thumbnails) are not included.
+    """
+    imageFiles = [fileName for fileName in os.listdir(imagePromptPath) if is_image_file_name(fileName)]
+    return sorted(imageFiles, key=lambda fileName: int(get_image_num(fileName)))
@@ -4,6 +4,7 @@ import sys
 
 from PyQt5.QtGui import QImage
 
+from repoManager.RepoManager import RepoManager
 from ui.widgets.MainWindow import MainWindow
 from ui.QApplicationManager import QApplicationManager
 from ui.widgets.gallery.GalleryPage import GalleryPage
@@ -39,11 +40,16 @@ class UIOrchestrator():
         Does not close the python interpreter.
     """
 
-    def __init__(self, qApplicationManager: QApplicationManager, homePage: HomePage, galleryPage: GalleryPage, mainWindow: MainWindow):
+    def __init__(self, qApplicationManager: QApplicationManager, homePage: HomePage, galleryPage: GalleryPage, mainWindow: MainWindow, repoManager: RepoManager = None):
         self.app = qApplicationManager.getQApp()
         self.homePage = homePage
         self.galleryPage = galleryPage
         self.mainWindow = mainWindow
+        self.repoManager = repoManager
+
+        # Images may still be waiting to be saved in the background when the application quits
+        if(self.repoManager is not None):
+            self.app.aboutToQuit.connect(self.repoManager.close)
 
         # Clicking on gallery images refocuses them on the homepage
         def loadImageToMainPage(metaInfo: ImageMetaInfo, image: QImage):
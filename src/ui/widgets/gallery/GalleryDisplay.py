@@ -1,21 +1,31 @@
 
 import logging
+import traceback
+from collections import deque
 from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QScrollArea
-from PyQt5.QtCore import pyqtSignal, Qt
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer
 from PyQt5.QtGui import QPixmap
 
-from typing import List
+from typing import Callable, Deque, Iterable, Iterator, List, Tuple
 
+from repoManager.Models import ImageHandle
 from repoManager.RepoManager import ImagePrompResult
 from ui.widgets.common.QLine import QHLine
 from ui.widgets.home.ImageMeta import ImageMetaInfo
 
 
+THUMBNAIL_SIZE = 75
+
+
 class ImagesDisplay(QWidget):
     """
     QT Widget to display a singular image prompt.
     This inculdes meta data of the image prompt like date, time, images generated and prompt used.
 
+    Images are expected as ImageHandles. Only a thumbnail of each image is loaded for display, the full image
+    is only read when it is clicked. Thumbnails aren't loaded until load_thumbnails is called so the display can be shown
+    before any image is read.
+
     Attributes
     ----------
     imageClickedSignal
@@ -23,11 +33,14 @@ class ImagesDisplay(QWidget):
 
     Methods
     ----------
+    load_thumbnails()
+        Reads and shows the thumbnail of every image
     """
     imageClickedSignal =  pyqtSignal(ImageMetaInfo, bytes)
 
     def __init__(self, imageResult: ImagePrompResult):
         super().__init__()
+        self.pendingThumbnails: List[Tuple[QLabel, ImageHandle]] = []
 
         self.init_ui(imageResult)
 
@@ -67,28 +80,39 @@ class ImagesDisplay(QWidget):
         return headerLayout
     
 
-    def create_image(self, imageResult: ImagePrompResult, imageBytes: bytes) -> QLabel:
-        pixmap = QPixmap()
-        pixmap.loadFromData(imageBytes)
+    def create_image(self, imageResult: ImagePrompResult, image: ImageHandle) -> QLabel:
         label = QLabel()
-        label.resize(75, 75)
-        label.setPixmap(pixmap.scaled(label.size(), Qt.IgnoreAspectRatio))
+        label.setFixedSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        self.pendingThumbnails.append((label, image))
         def leftClickEvent(event):
             if event.button() == Qt.LeftButton:
                 self.imageClickedSignal.emit(
                     ImageMetaInfo(
                         prompt=imageResult.prompt, date=imageResult.date, time=imageResult.time, engine=imageResult.repo, num="1"
                     ), 
-                    imageBytes
+                    image.read_bytes()
                 )
         label.mousePressEvent = leftClickEvent
         return label
 
 
+    def load_thumbnails(self):
+        while(len(self.pendingThumbnails) > 0):
+            label, image = self.pendingThumbnails.pop(0)
+            pixmap = QPixmap()
+            pixmap.loadFromData(image.read_thumbnail(THUMBNAIL_SIZE))
+            label.setPixmap(pixmap.scaled(label.size(), Qt.IgnoreAspectRatio))
+
+
 class GalleryDisplay(QScrollArea):
     """
     QT Widget to display a single page worth of image prompts.
 
+    Image prompts can come from any iterable, like the generator from RepoManager.iter_images. A row is added per tick of
+    the event loop as each one is yielded, so the first rows show up while later ones are still being read. Reading
+    thumbnails is what takes the longest so they are also loaded a row at a time on later ticks of the event loop. This way
+    the rows show up right away and fill in with images from the top down instead of the page waiting on its slowest image.
+
     Attributes
     ----------
     imageClickedSignal
@@ -98,38 +122,97 @@ class GalleryDisplay(QScrollArea):
     ----------
     replace_display()
         Replaces the page with a new page worth of image prompts
+
+    is_loading()
+        Whether rows of the page are still being added
     """
     imageClickedSignal = pyqtSignal(ImageMetaInfo, object)
 
 
-    def __init__(self, images: List[ImagePrompResult] = []):
+    def __init__(self, images: Iterable[ImagePrompResult] = []):
         super().__init__()
+        self.pendingResults: Iterator[ImagePrompResult] = iter([])
+        self.onDisplayed: Callable[[], None] = None
+        self.rowTimer = QTimer(self)
+        self.rowTimer.setInterval(0)
+        self.rowTimer.timeout.connect(self.add_next_row)
+        self.pendingDisplays: Deque[ImagesDisplay] = deque()
+        self.thumbnailTimer = QTimer(self)
+        self.thumbnailTimer.setInterval(0)
+        self.thumbnailTimer.timeout.connect(self.load_next_thumbnails)
 
         self.init_ui(images)
 
 
-    def init_ui(self, images: List[ImagePrompResult] = []):
+    def init_ui(self, images: Iterable[ImagePrompResult] = []):
         self.replace_display(images)
 
 
-    def replace_display(self, images: List[ImagePrompResult]):
+    def replace_display(self, images: Iterable[ImagePrompResult], onDisplayed: Callable[[], None] = None):
+        """
+        Replaces the page with new image prompts, adding a row for each on later ticks of the event loop. onDisplayed is
+        called once every row was added. Rows of the old page that weren't added yet are dropped.
+        """
+        self.pendingDisplays.clear()
+        self.pendingResults = iter(images)
+        self.onDisplayed = onDisplayed
         # First remove widget
         self.takeWidget()
         # Add in new widget
-        self.contentWidget = self.create_scrollable_widget(images)
+        self.contentWidget = self.create_scrollable_widget()
         self.setWidget( self.contentWidget)
+        self.rowTimer.start()
 
 
-    def create_scrollable_widget(self, imageResults: List[ImagePrompResult]):
+    def create_scrollable_widget(self) -> QWidget:
         layout = QVBoxLayout()
-
-        logging.debug(f'Recieving {len(imageResults)} images')
-
-        for imageResult in imageResults:
-            imageDisplay = ImagesDisplay(imageResult)
-            imageDisplay.imageClickedSignal.connect(self.imageClickedSignal.emit)
-            layout.addWidget(imageDisplay)
-
         childWidget = QWidget()
         childWidget.setLayout(layout)
-        return childWidget
\ No newline at end of file
+        return childWidget
+
+
+    def is_loading(self) -> bool:
+        return self.rowTimer.isActive()
+
+
+    def add_next_row(self):
+        """
+        Adds the row of the next image prompt. Called once per tick of the event loop until the page has every row.
+        """
+        try:
+            imageResult = next(self.pendingResults, None)
+        except BaseException:
+            logging.error(traceback.format_exc())
+            imageResult = None
+
+        if(imageResult is None):
+            self.rowTimer.stop()
+            logging.debug(f'Recieved {self.contentWidget.layout().count()} images')
+            onDisplayed, self.onDisplayed = self.onDisplayed, None
+            if(onDisplayed is not None):
+                onDisplayed()
+            return
+
+        imageDisplay = ImagesDisplay(imageResult)
+        imageDisplay.imageClickedSignal.connect(self.imageClickedSignal.emit)
+        self.contentWidget.layout().addWidget(imageDisplay)
+        # The scroll area doesn't resize its widget so it's grown to fit every new row
+        self.contentWidget.adjustSize()
+        self.pendingDisplays.append(imageDisplay)
+        if(not self.thumbnailTimer.isActive()):
+            self.thumbnailTimer.start()
+
+
+    def load_next_thumbnails(self):
+        """
+        Loads the thumbnails of the next row waiting on them. Called once per tick of the event loop until every row has its
+        thumbnails.
+        """
+        if(len(self.pendingDisplays) == 0):
+            self.thumbnailTimer.stop()
+            return
+        try:
+            self.pendingDisplays.popleft().load_thumbnails()
+        except BaseException:
+            # An unreadable image shouldn't stop the rest of the page from loading
+            logging.error(traceback.format_exc())
@@ -1,16 +1,19 @@
 import logging
-from typing import Callable
-from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton
-from PyQt5.QtCore import pyqtSignal, Qt
-from repoManager.Models import NextToken
+import math
+from datetime import date as Date, datetime, time as Time
+from itertools import islice
+from typing import Callable, Iterator, List
+from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QLineEdit, QDateEdit
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer, QDate
+from repoManager.Models import GetImagePrompsResult, ImagePrompResult, MergedToken, NextToken
 
 from ui.dialogs.ErrorMessage import ErrorMessage
 from ui.widgets.home.ImageMeta import ImageMetaInfo
 
-from repoManager.RepoManager import RepoManager
+from repoManager.RepoManager import RepoManager, generate_nextToken, generate_time_token
 from ui.widgets.gallery.GalleryDisplay import GalleryDisplay
 from utils.qtUtils import clear_layout
-from utils.enums import DIRECTION
+from utils.enums import DIRECTION, LOAD_MODE
 
 
 def generateWiderButton(text: str, callback: Callable = None) -> QPushButton:
@@ -34,11 +37,30 @@ class PageLink(QLabel):
         # self.setFont(QFont())
 
     def mousePressEvent(self, event):
-        self.clicked.emit(self.text())   # emit the clicked signal when pressed
+        self.clicked.emit(self.text)   # emit the clicked signal when pressed
         return super().mousePressEvent(event)
 
 
 PAGE_SIZE = 10
+# Number of page links shown on each side of the current page
+PAGE_LINK_RADIUS = 2
+# How long typing has to pause before a search runs
+SEARCH_DELAY_MS = 300
+
+
+def get_page_links(pageNumber: int, numPages: int = None, radius: int = PAGE_LINK_RADIUS) -> List[int]:
+    """
+    Gets the page numbers to link to around the current page. The first and last pages are always included and gaps between
+    them and the pages around the current page are None. Without the number of pages only the current page is returned.
+    """
+    if(numPages is None):
+        return [pageNumber]
+    # Counts can lag behind changes made outside the app so never drop the current page
+    numPages = max(numPages, pageNumber)
+    aroundPages = list(range(max(1, pageNumber - radius), min(numPages, pageNumber + radius) + 1))
+    links = ([1] if aroundPages[0] > 1 else []) + ([None] if aroundPages[0] > 2 else []) + aroundPages
+    links += ([None] if aroundPages[-1] < numPages - 1 else []) + ([numPages] if aroundPages[-1] < numPages else [])
+    return links
 
 
 class GalleryPage(QWidget):
@@ -58,6 +80,21 @@ class GalleryPage(QWidget):
     ----------
     change_page()
         Changes the contents of the current page to another pages contents 
+
+    prefetch_adjacent_pages()
+        Loads the previous and next pages in the background
+
+    set_merged_view(mergedView)
+        Switches between showing only the current repo and every repo merged into one timeline
+
+    set_search_query(query)
+        Only shows prompts of the current repo matching the query. An empty query shows everything again.
+
+    jump_to_date(date)
+        Shows the page starting at the most recent prompt of the date (or the closest older one)
+
+    go_to_page(pageNumber)
+        Shows a page by its number without paging through the pages before it
     """
     imageClickedSignal = pyqtSignal(ImageMetaInfo, object)
     galleryRefreshSignal = pyqtSignal()
@@ -70,6 +107,9 @@ class GalleryPage(QWidget):
         # Set bookmark variables
         self.leftBookmarkPageToken = None
         self.rightBookmarkPageToken = None
+        self.mergedView = False
+        self.pageNumber = 1
+        self.searchQuery = ""
 
         self.init_ui()
 
@@ -93,6 +133,17 @@ class GalleryPage(QWidget):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
+        # Searches only run once typing pauses so every key press doesn't hit the repo
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search prompts")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(lambda : self.set_search_query(self.search_box.text()))
+        self.search_box.textChanged.connect(lambda _ : self.search_timer.start())
+        layout.addWidget(self.search_box)
+
         # create the stacked widget that will contain each page...       
         self.gallery = GalleryDisplay()
         layout.addWidget(self.gallery)
@@ -105,45 +156,183 @@ class GalleryPage(QWidget):
         self.pagination_layout.addWidget(self.backward_page_button)
 
         self.page_num_layout = QHBoxLayout()
-        self.change_page_nums(DIRECTION.FORWARD)
         self.pagination_layout.addLayout(self.page_num_layout)
 
         self.forward_page_button = generateWiderButton(">", lambda _ : self.change_page(self.rightBookmarkPageToken, DIRECTION.FORWARD))
         self.pagination_layout.addWidget(self.forward_page_button)
+
+        self.jump_date_edit = QDateEdit(QDate.currentDate())
+        self.jump_date_edit.setCalendarPopup(True)
+        self.pagination_layout.addWidget(self.jump_date_edit)
+        self.pagination_layout.addWidget(generateWiderButton("Go", lambda _ : self.jump_to_date(self.jump_date_edit.date().toPyDate())))
+
+        self.merged_view_checkbox = QCheckBox("All repos")
+        self.merged_view_checkbox.stateChanged.connect(lambda state : self.set_merged_view(state == Qt.Checked))
+        self.pagination_layout.addWidget(self.merged_view_checkbox)
         layout.addLayout(self.pagination_layout)
 
         self.init_page()
 
 
-    def init_page(self):
-        logging.info("Init First Page")
-        getImagesResult = self.repoManager.get_images(PAGE_SIZE)
+    def set_merged_view(self, mergedView: bool):
+        # Tokens of one view mean nothing to the other so start over from the first page
+        self.mergedView = mergedView
+        self.init_page()
+
+
+    def set_search_query(self, query: str):
+        if(query.strip() == self.searchQuery):
+            return
+        self.searchQuery = query.strip()
+        self.init_page()
+
+
+    def jump_to_date(self, date: Date):
+        logging.info(f"Jumping to {date}")
+        # Token for the very end of the date. Paging forward from it starts the page on the date without paging through newer ones.
+        token = generate_time_token(datetime.combine(date, Time.max), self.repoManager.current_repo())
+        if(self.mergedView and self.searchQuery == ""):
+            token = MergedToken(positions={}, boundary=token)
+        getImagesResult = self.get_page(token)
 
         if(getImagesResult is not None):
             if(getImagesResult.errorMessage is not None):
                 ErrorMessage(getImagesResult.errorMessage).exec()
-        
+
+            self.gallery.replace_display(getImagesResult.results)
+            self.set_left_bookmark(token)
             self.set_right_bookmark(getImagesResult.nextToken)
+
+            # Pages from a date aren't lined up with numbered pages so show the date instead of a page number
+            self.pageNumber = None
+            self.update_page_links(date.isoformat())
+            self.prefetch_adjacent_pages()
+
+
+    def go_to_page(self, pageNumber: int):
+        logging.info(f"Going to page {pageNumber}")
+        getImagesResult = self.repoManager.get_page(pageNumber, PAGE_SIZE, loadMode=LOAD_MODE.LAZY)
+
+        if(getImagesResult is not None):
+            if(getImagesResult.errorMessage is not None):
+                ErrorMessage(getImagesResult.errorMessage).exec()
+                return
+
             self.gallery.replace_display(getImagesResult.results)
-        
+            self.set_left_bookmark(getImagesResult.previousToken)
+            self.set_right_bookmark(getImagesResult.nextToken)
+            self.pageNumber = pageNumber
+            self.update_page_links()
+            self.prefetch_adjacent_pages()
+
+
+    def get_page(self, token = None, direction: DIRECTION = DIRECTION.FORWARD) -> GetImagePrompsResult:
+        if(self.searchQuery != ""):
+            return self.repoManager.search_images(self.searchQuery, PAGE_SIZE, token=token, direction=direction, loadMode=LOAD_MODE.LAZY)
+        if(self.mergedView):
+            return self.repoManager.get_merged_images(PAGE_SIZE, token=token, direction=direction, loadMode=LOAD_MODE.LAZY)
+        return self.repoManager.get_images(PAGE_SIZE, token=token, direction=direction, loadMode=LOAD_MODE.LAZY)
+
+
+    def init_page(self):
+        logging.info("Init First Page")
+        if(self.mergedView or self.searchQuery != ""):
+            getImagesResult = self.get_page()
+
+            if(getImagesResult is not None):
+                if(getImagesResult.errorMessage is not None):
+                    ErrorMessage(getImagesResult.errorMessage).exec()
+
+                self.set_right_bookmark(getImagesResult.nextToken)
+                self.gallery.replace_display(getImagesResult.results)
+        else:
+            # Nothing is cached for the first page of a repo yet so show each prompt as soon as it's read. The next page isn't
+            # known until the whole page is read so paging forward and prefetching wait on it.
+            errorMessages = []
+            def on_first_page_displayed():
+                for errorMessage in errorMessages:
+                    ErrorMessage(errorMessage).exec()
+                self.prefetch_adjacent_pages()
+            self.set_right_bookmark(None)
+            self.gallery.replace_display(self.stream_first_page(errorMessages), onDisplayed=on_first_page_displayed)
+
         self.set_left_bookmark(None)
+        self.pageNumber = 1
+        self.update_page_links()
+        if(self.mergedView or self.searchQuery != ""):
+            self.prefetch_adjacent_pages()
+
+
+    def stream_first_page(self, errorMessages: List[str]) -> Iterator[ImagePrompResult]:
+        """
+        Yields the first page of the current repo a prompt at a time. Sets the right bookmark once the page is done, the same
+        way get_images would set its nextToken. Errors are collected in errorMessages rather then shown since a dialog's
+        event loop would try to resume the generator while it's still running.
+        """
+        imagePromptResults = []
+        try:
+            for imagePromptResult in islice(self.repoManager.iter_images(loadMode=LOAD_MODE.LAZY), PAGE_SIZE):
+                imagePromptResults.append(imagePromptResult)
+                yield imagePromptResult
+        except Exception as e:
+            logging.error(f"Error streaming first page: {e}")
+            errorMessages.append(f'Critical error while retrieving results : {str(e)}')
+        self.set_right_bookmark(generate_nextToken(imagePromptResults[-1]) if len(imagePromptResults) >= PAGE_SIZE else None)
+
+
+    def prefetch_adjacent_pages(self):
+        """
+        Has the repo manager load the previous and next pages in the background so changing pages doesn't wait on storage.
+        Only pages of the current repo are prefetched and not while searching.
+        """
+        if(self.mergedView or self.searchQuery != ""):
+            return
+        self.repoManager.prefetch_adjacent_pages(
+            PAGE_SIZE,
+            forwardToken=self.rightBookmarkPageToken,
+            backwardToken=self.leftBookmarkPageToken,
+            loadMode=LOAD_MODE.LAZY
+        )
 
 
     def change_page_nums(self, direction: DIRECTION):
-
         if(self.leftBookmarkPageToken is None):
-            self.current_page = PageLink(str(1), parent=self)
-        else:
-            num = int(self.current_page.text)
-            nextNum = num + 1 if direction is DIRECTION.FORWARD else num - 1
-            self.current_page = PageLink(str(nextNum), parent=self)
+            self.pageNumber = 1
+        elif(self.pageNumber is not None):
+            self.pageNumber = self.pageNumber + 1 if direction is DIRECTION.FORWARD else self.pageNumber - 1
+        self.update_page_links()
+
 
+    def update_page_links(self, label: str = None):
+        """
+        Shows links to the pages around the current one along with the first and last pages. The number of pages is only known
+        for the current repo so searches and the merged view only show the current page number.
+        """
         clear_layout(self.page_num_layout)
-        self.page_num_layout.addWidget(self.current_page)
+        if(self.pageNumber is None):
+            self.current_page = PageLink(label if label is not None else "?", parent=self)
+            self.page_num_layout.addWidget(self.current_page)
+            return
+
+        # The last page isn't shown until the repo is counted rather then waiting on it being walked
+        numPages = None
+        if(not self.mergedView and self.searchQuery == "" and self.repoManager.is_counted()):
+            numPages = max(1, math.ceil(self.repoManager.total_count() / PAGE_SIZE))
+        for pageNumber in get_page_links(self.pageNumber, numPages):
+            if(pageNumber is None):
+                self.page_num_layout.addWidget(QLabel("...", parent=self))
+            elif(pageNumber == self.pageNumber):
+                self.current_page = PageLink(str(pageNumber), parent=self)
+                self.current_page.setStyleSheet("font-weight: bold;")
+                self.page_num_layout.addWidget(self.current_page)
+            else:
+                pageLink = PageLink(str(pageNumber), parent=self)
+                pageLink.clicked.connect(lambda text : self.go_to_page(int(text)))
+                self.page_num_layout.addWidget(pageLink)
 
 
     def change_page(self, currentNextToken = None, direction: DIRECTION = DIRECTION.FORWARD):
-        getImagesResult = self.repoManager.get_images(PAGE_SIZE, token=currentNextToken, direction=direction)
+        getImagesResult = self.get_page(currentNextToken, direction)
 
         if(getImagesResult is not None):
             if(getImagesResult.errorMessage is not None):
@@ -160,6 +349,7 @@ class GalleryPage(QWidget):
 
             # Update page num
             self.change_page_nums(direction)
+            self.prefetch_adjacent_pages()
 
 
     def refresh_page(self):
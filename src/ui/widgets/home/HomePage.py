@@ -1,9 +1,10 @@
 import logging
+import time
 from PyQt5.QtWidgets import QSplitter
 from PyQt5.QtCore import pyqtSignal, QRunnable, QThreadPool
 
 from imageProviders.ImageProvider import ImageProvider, ImageProviderResult
-from repoManager.Models import DeleteImagePrompsRequest
+from repoManager.Models import DeleteImagePrompsRequest, ImagePromptDirectory
 from repoManager.RepoManager import RepoManager, ImagePrompResult
 from ui.dialogs.ErrorMessage import ErrorMessage
 from ui.dialogs.LoadingPopup import LoadingPopup
@@ -29,7 +30,10 @@ class ProcessRunnable(QRunnable):
 
 def background_create_image_process(imageProvider: ImageProvider, prompt: str, loadSignal: pyqtSignal(str, object)):
     if(prompt is not None):
+        start = time.perf_counter()
         response = imageProvider.get_image_from_string(prompt)
+        # Kept with the image's metadata when it's saved
+        response['latencySeconds'] = time.perf_counter() - start
 
         loadSignal.emit(prompt, response)
     else:
@@ -41,6 +45,7 @@ class HomePage(QSplitter):
     loadNewImageSignal = pyqtSignal(str, dict)
     loadImageSignal = pyqtSignal(ImageMetaInfo, bytes)
     successfulSavedImageSignal = pyqtSignal()
+    failedSavedImageSignal = pyqtSignal(str)
     trashImageSignal = pyqtSignal()
     successfulTrashImageSignal = pyqtSignal()
 
@@ -70,6 +75,9 @@ class HomePage(QSplitter):
         self.loadNewImageSignal.connect(self.load_new_image_response)
         self.loadImageSignal.connect(self.load_image_response)
         self.trashImageSignal.connect(self.trash_image)
+        # Saved images only have metadata once they're written
+        self.successfulSavedImageSignal.connect(self.load_image_metadata)
+        self.failedSavedImageSignal.connect(self.show_save_error)
 
         loadResult = self.repoManager.get_latest_images_in_repo()
         self.init_ui(loadResult, speechRecognizer)
@@ -91,6 +99,7 @@ class HomePage(QSplitter):
         self.imageMeta = ImageMeta(self.trashImageSignal, self.imageMetaInfo)
         self.addWidget(self.imageMeta)
         self.setSizes([200, 800, 0])
+        self.load_image_metadata()
 
 
     def load_new_image_response(self, prompt: str, response: ImageProviderResult):        
@@ -100,8 +109,20 @@ class HomePage(QSplitter):
             self.loadingScreen.stop()
             ErrorMessage(response['errorMessage']).exec()
         else:
-            saveResult = self.repoManager.save_image(prompt, response['img'])
-            self.successfulSavedImageSignal.emit()
+            # Saving may finish on a background thread. Signals are safe to emit from there.
+            try:
+                saveResult = self.repoManager.save_image(
+                    prompt, response['img'],
+                    onSaved=lambda _ : self.successfulSavedImageSignal.emit(),
+                    engine=self.imageProvider.engine_name(),
+                    latencySeconds=response.get('latencySeconds'),
+                    onFailed=lambda error : self.failedSavedImageSignal.emit(str(error))
+                )
+            except Exception as e:
+                self.loadingScreen.stop()
+                self.show_save_error(str(e))
+                self.imageGenerator.toggle_disabled_prompting(False)
+                return
 
             self.imageViewer.replace_image(saveResult.images[0])
             self.imageMetaInfo = ImageMetaInfo(
@@ -117,10 +138,30 @@ class HomePage(QSplitter):
         self.imageGenerator.toggle_disabled_prompting(False)
 
 
+    def show_save_error(self, errorMessage: str):
+        ErrorMessage(f"Could not save image : {errorMessage}").exec()
+
+
     def load_image_response(self, metaInfo: ImageMetaInfo, image):
         self.imageMetaInfo = metaInfo
         self.imageViewer.replace_image(image)
         self.imageMeta.loadMetaSignal.emit(metaInfo)
+        self.load_image_metadata()
+
+
+    def load_image_metadata(self):
+        # Reads only the small metadata file the repo keeps for every prompt directory, never the image itself
+        if(self.imageMetaInfo is None or self.imageMetaInfo.metadata is not None):
+            return
+        imageMetadata = self.repoManager.get_image_metadata(ImagePromptDirectory(
+                prompt=self.imageMetaInfo.prompt,
+                repo=self.imageMetaInfo.engine,
+                date=self.imageMetaInfo.date,
+                time=self.imageMetaInfo.time
+            ))
+        self.imageMetaInfo.metadata = next((metadata for metadata in imageMetadata if metadata.fileName.startswith(f"{self.imageMetaInfo.num}.")), None)
+        if(self.imageMetaInfo.metadata is not None):
+            self.imageMeta.loadMetaSignal.emit(self.imageMetaInfo)
 
 
     def trash_image(self):
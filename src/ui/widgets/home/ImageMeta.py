@@ -2,18 +2,20 @@ import logging
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFormLayout, QGroupBox, QLabel, QTextBrowser, QPushButton
 from PyQt5.QtGui import QTextOption
 from PyQt5.QtCore import pyqtSignal
+from repoManager.ImageMetadata import ImageMetadata
 from ui.widgets.common.QLine import QHLine
 
 from utils.qtUtils import clear_layout
 
 
 class ImageMetaInfo(object):
-    def __init__(self, prompt: str, engine: str, date: str, time: str, num: str):
+    def __init__(self, prompt: str, engine: str, date: str, time: str, num: str, metadata: ImageMetadata = None):
         self.prompt = prompt
         self.engine = engine
         self.date = date
         self.time = time
         self.num = num
+        self.metadata = metadata
 
 
 DefaultImageMeta = ImageMetaInfo(prompt= '', date= '', time= '', engine= '', num= None)
@@ -74,6 +76,13 @@ class ImageMeta(QWidget):
             metaDetailLayout.addRow(QLabel("Time: "), QLabel(metaInfo.time))
             metaDetailLayout.addRow(QLabel("Engine: "), QLabel(metaInfo.engine))
             metaDetailLayout.addRow(QLabel("Num: "), QLabel(metaInfo.num))
+            if(metaInfo.metadata is not None):
+                metadata = metaInfo.metadata
+                if(metadata.width is not None):
+                    metaDetailLayout.addRow(QLabel("Dimensions: "), QLabel(f"{metadata.width} x {metadata.height}"))
+                metaDetailLayout.addRow(QLabel("Size: "), QLabel(f"{metadata.bytes / 1024:.0f} KB ({metadata.format})"))
+                if(metadata.latencySeconds is not None):
+                    metaDetailLayout.addRow(QLabel("Generated in: "), QLabel(f"{metadata.latencySeconds:.1f} s"))
 
             metaLayout.addLayout(metaDetailLayout)
 
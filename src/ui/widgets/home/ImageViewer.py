@@ -3,6 +3,8 @@ from PyQt5.QtWidgets import QSplashScreen, QGraphicsView, QGraphicsScene, QGraph
 from PyQt5.QtCore import QRectF, QEvent, Qt
 from PyQt5.QtGui import QPixmap, QTransform
 
+from utils.imageFormats import detect_image_format, transcode_image
+
 
 class ImageViewer(QGraphicsView):
     """
@@ -44,7 +46,9 @@ class ImageViewer(QGraphicsView):
 
         # Add an image to the scene
         pixmap = QPixmap()
-        pixmap.loadFromData(image)
+        if(not pixmap.loadFromData(image) and detect_image_format(image) is not None):
+            # Qt may not have a plugin for the format the image is stored in (ex: AVIF) so fall back to Pillow
+            pixmap.loadFromData(transcode_image(image, "PNG"))
 
         splash = QSplashScreen(pixmap) 
         splash.show()
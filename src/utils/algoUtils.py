@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Tuple
 
 from utils.enums import DIRECTION
 
@@ -81,4 +81,59 @@ def get_next_string_index_from_reverse_sorted(theString: str, reverseSortedStrin
             nextIndex = reverse_bisect_left(reverseSortedStrings, theString)
             if(nextIndex != 0):
                 return nextIndex - 1
-    return None
\ No newline at end of file
+    return None
+
+
+class FenwickTree(object):
+    """
+    Binary indexed tree over a list of non negative counts. Updating a count, summing a prefix of counts and finding which
+    count a position falls in all take O(log n).
+    """
+    def __init__(self, counts: List[int] = []):
+        self.size = len(counts)
+        self.tree = [0] + list(counts)
+        # Build in O(n) by pushing every node into its parent
+        for index in range(1, self.size + 1):
+            parent = index + (index & -index)
+            if(parent <= self.size):
+                self.tree[parent] += self.tree[index]
+
+
+    def add(self, index: int, delta: int):
+        index += 1
+        while(index <= self.size):
+            self.tree[index] += delta
+            index += index & -index
+
+
+    def prefix_sum(self, count: int) -> int:
+        """
+        Sums the first "count" counts.
+        """
+        total = 0
+        while(count > 0):
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+
+    def total(self) -> int:
+        return self.prefix_sum(self.size)
+
+
+    def find(self, position: int) -> Tuple[int, int]:
+        """
+        Finds the index of the count the zero based position falls in, if all counts were laid out one after the other, and
+        how far into that count the position is. Returns None if the position is past the total.
+        """
+        if(position < 0 or position >= self.total()):
+            return None
+        index = 0
+        step = 1 << self.size.bit_length()
+        while(step > 0):
+            nextIndex = index + step
+            if(nextIndex <= self.size and self.tree[nextIndex] <= position):
+                index = nextIndex
+                position -= self.tree[nextIndex]
+            step >>= 1
+        return (index, position)
@@ -8,4 +8,12 @@ def generate_ios_date_time_strs() -> List[str]:
     Will be seperated in a tuple where date is the first index and time is the second index.
     """
     now = datetime.now()
-    return [now.date().isoformat(), now.time().isoformat()]
\ No newline at end of file
+    return [now.date().isoformat(), now.time().isoformat()]
+
+
+def split_ios_date_time(dateTime: datetime) -> List[str]:
+    """
+    Same as generate_ios_date_time_strs but for the provided date time rather then now. Times always include microseconds
+    so they sort the same way as generated ones.
+    """
+    return [dateTime.date().isoformat(), dateTime.time().isoformat(timespec="microseconds")]
\ No newline at end of file
@@ -3,4 +3,9 @@ from enum import Enum
 
 class DIRECTION(Enum):
     FORWARD = "forward"
-    BACKWARD = "backward"
\ No newline at end of file
+    BACKWARD = "backward"
+
+class LOAD_MODE(Enum):
+    EAGER = "eager" # Read every image as bytes
+    LAZY = "lazy" # Only reference images with handles that read bytes when asked
+    METADATA = "metadata" # Don't touch image files at all
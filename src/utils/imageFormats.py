@@ -0,0 +1,221 @@
+import struct
+from io import BytesIO
+from typing import Dict, Optional, Set, Tuple
+
+from PIL import Image
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IEND_CHUNK = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+JPEG_SOI = b"\xff\xd8\xff"
+JPEG_EOI = b"\xff\xd9"
+AVIF_BRANDS = (b"avif", b"avis")
+
+# Pillow format names to the file extension images of that format are saved with
+IMAGE_FORMAT_EXTENSIONS = {
+    "PNG": "png",
+    "JPEG": "jpg",
+    "WEBP": "webp",
+    "AVIF": "avif",
+}
+
+# Formats that are written exactly as they are provided
+PASSTHROUGH_FORMATS = {"PNG", "JPEG", "WEBP"}
+
+# Formats images can be stored in, as the Pillow format and the options it's encoded with. Lossless WEBP keeps every pixel
+# while the others trade imperceptible detail for files a tenth the size of PNG. Encoder effort is kept low, higher effort
+# takes several times as long on a pi for only a percent or two smaller files.
+STORAGE_FORMATS: Dict[str, Tuple[str, dict]] = {
+    "png": ("PNG", {}),
+    "webp-lossless": ("WEBP", { "lossless": True, "quality": 50, "method": 2 }),
+    "webp": ("WEBP", { "quality": 90, "method": 4 }),
+    "avif": ("AVIF", { "quality": 85, "speed": 8 }),
+}
+
+
+def detect_image_format(data: bytes) -> Optional[str]:
+    """
+    Detects the format of encoded image bytes from their leading magic bytes without decoding them.
+
+    Returns
+    -------
+    str
+        The Pillow name of the format ("PNG", "JPEG", "WEBP" or "AVIF") or None if it isn't recognized
+    """
+    if(data.startswith(PNG_SIGNATURE)):
+        return "PNG"
+    if(data.startswith(JPEG_SOI)):
+        return "JPEG"
+    if(len(data) >= 12 and data[0:4] == b"RIFF" and data[8:12] == b"WEBP"):
+        return "WEBP"
+    if(len(data) >= 12 and data[4:8] == b"ftyp" and data[8:12] in AVIF_BRANDS):
+        return "AVIF"
+    return None
+
+
+def _has_valid_png_header(data: bytes) -> bool:
+    # Signature, then the IHDR chunk which must come first and is always 13 bytes long
+    if(len(data) < 33 + len(PNG_IEND_CHUNK)):
+        return False
+    length, chunkType, width, height, bitDepth, colorType = struct.unpack(">I4sIIBB", data[8:26])
+    return (
+        length == 13 and chunkType == b"IHDR" and
+        width > 0 and height > 0 and
+        bitDepth in (1, 2, 4, 8, 16) and colorType in (0, 2, 3, 4, 6) and
+        # A truncated PNG is missing its closing chunk
+        data.endswith(PNG_IEND_CHUNK)
+    )
+
+
+def _has_valid_jpeg_header(data: bytes) -> bool:
+    # Some encoders pad after the end of image marker so only look for it near the end
+    return len(data) > 4 and data[3] >= 0xC0 and JPEG_EOI in data[-64:]
+
+
+def _has_valid_webp_header(data: bytes) -> bool:
+    if(len(data) < 20):
+        return False
+    riffSize = struct.unpack("<I", data[4:8])[0]
+    return data[12:16] in (b"VP8 ", b"VP8L", b"VP8X") and riffSize + 8 <= len(data)
+
+
+def _has_valid_avif_header(data: bytes) -> bool:
+    # The file type box comes first, followed by at least the meta box describing the image
+    ftypSize = struct.unpack(">I", data[0:4])[0] if len(data) >= 4 else 0
+    return ftypSize >= 16 and ftypSize + 8 <= len(data)
+
+
+HEADER_VALIDATORS = {
+    "PNG": _has_valid_png_header,
+    "JPEG": _has_valid_jpeg_header,
+    "WEBP": _has_valid_webp_header,
+    "AVIF": _has_valid_avif_header,
+}
+
+
+def has_valid_header(data: bytes, format: str) -> bool:
+    """
+    Cheaply checks that image bytes are a plausible, complete image of the given format. Only headers and markers are
+    looked at so this is far cheaper then decoding the image, but it doesn't guarantee the image data itself is intact.
+    """
+    validator = HEADER_VALIDATORS.get(format)
+    return validator is not None and validator(data)
+
+
+def _read_png_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+    if(len(header) < 24 or header[12:16] != b"IHDR"):
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def _read_jpeg_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+    # Walk the markers until the start of frame. Every marker after the start of image has a 2 byte length.
+    position = 2
+    while(position + 9 <= len(header)):
+        if(header[position] != 0xFF):
+            return None
+        marker = header[position + 1]
+        if(marker == 0xFF):
+            # Fill byte
+            position += 1
+            continue
+        length = struct.unpack(">H", header[position + 2:position + 4])[0]
+        # SOF0 to SOF15 except DHT (C4), JPG (C8) and DAC (CC) which share the range
+        if(0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC)):
+            height, width = struct.unpack(">HH", header[position + 5:position + 9])
+            return (width, height)
+        position += 2 + length
+    return None
+
+
+def _read_webp_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+    if(len(header) < 30):
+        return None
+    chunkType = header[12:16]
+    if(chunkType == b"VP8 "):
+        # Lossy frames have 14 bit dimensions after the 3 byte frame tag and 3 byte start code
+        width, height = struct.unpack("<HH", header[26:30])
+        return (width & 0x3FFF, height & 0x3FFF)
+    if(chunkType == b"VP8L"):
+        # Lossless frames pack 14 bit dimensions, minus one, after a 1 byte signature
+        bits = struct.unpack("<I", header[21:25])[0]
+        return ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if(chunkType == b"VP8X"):
+        # Extended images have 24 bit dimensions, minus one, after 4 bytes of flags
+        return (int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1)
+    return None
+
+
+def _read_avif_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+    # The image spatial extents property within the meta box, after its 4 bytes of version and flags
+    position = header.find(b"ispe")
+    if(position < 0 or position + 16 > len(header)):
+        return None
+    return struct.unpack(">II", header[position + 8:position + 16])
+
+
+DIMENSION_READERS = {
+    "PNG": _read_png_dimensions,
+    "JPEG": _read_jpeg_dimensions,
+    "WEBP": _read_webp_dimensions,
+    "AVIF": _read_avif_dimensions,
+}
+
+
+def read_image_dimensions(header: bytes, format: str = None) -> Optional[Tuple[int, int]]:
+    """
+    Reads the width and height of an image from the start of its bytes without decoding it. PNG, JPEG, WEBP and AVIF are
+    parsed directly, other formats are left to Pillow which only parses their header when opening them.
+
+    Parameters
+    ----------
+    header (bytes):
+        The start of the image. JPEGs keep EXIF data before their dimensions so more then a few bytes may be needed.
+
+    format (str):
+        Format of the image if already known. Detected from the header otherwise.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The width and height of the image or None if they couldn't be found in the header
+    """
+    format = format if format is not None else detect_image_format(header)
+    reader = DIMENSION_READERS.get(format)
+    if(reader is not None):
+        return reader(header)
+    try:
+        with Image.open(BytesIO(header)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def can_pass_through(data: bytes, allowedFormats: Set[str] = PASSTHROUGH_FORMATS) -> Optional[str]:
+    """
+    Gets the format of image bytes if they can be saved exactly as they are, otherwise None.
+    """
+    format = detect_image_format(data)
+    if(format in allowedFormats and has_valid_header(data, format)):
+        return format
+    return None
+
+
+def transcode_image(data: bytes, format: str = "PNG", options: dict = None) -> bytes:
+    """
+    Decodes image bytes of any format Pillow supports and encodes them in the given format, with optional Pillow encoder
+    options (ex: { "lossless": True } for WEBP).
+    """
+    with Image.open(BytesIO(data)) as image:
+        output = BytesIO()
+        image.save(output, format, **(options or {}))
+        return output.getvalue()
+
+
+def get_storage_format(storageFormat: str) -> Tuple[str, dict]:
+    """
+    Gets the Pillow format and encoder options of a storage format name (one of STORAGE_FORMATS).
+    """
+    if(storageFormat not in STORAGE_FORMATS):
+        raise ValueError(f"Storage format must be one of {list(STORAGE_FORMATS.keys())}")
+    return STORAGE_FORMATS[storageFormat]
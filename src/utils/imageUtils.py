@@ -0,0 +1,126 @@
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import List, Union
+
+from PIL import Image
+
+
+def generate_thumbnail_bytes(image: Union[str, Path, BytesIO], size: int, format: str = "PNG") -> bytes:
+    """
+    Decodes an image and scales it down so that it fits within a size x size box, keeping its aspect ratio.
+
+    Parameters
+    ----------
+    image (Path | BytesIO):
+        Path to the image or the image bytes wrapped in a BytesIO
+
+    size (int):
+        Max width and height of the thumbnail in pixels
+
+    format (str):
+        Pillow format the thumbnail is encoded in. Defaults to PNG.
+
+    Returns
+    -------
+    bytes
+        The encoded thumbnail
+    """
+    with Image.open(image) as decodedImage:
+        decodedImage.thumbnail((size, size))
+        output = BytesIO()
+        decodedImage.save(output, format)
+        return output.getvalue()
+
+
+# Sizes (max width/height in pixels) of the thumbnails kept next to every image. Ordered smallest first.
+THUMBNAIL_SIZES = [96, 256]
+
+
+def generate_thumbnail_path(imagePath: Path, size: int) -> Path:
+    """
+    Gets the path of an images thumbnail. Thumbnails are saved next to the image they are made from (ex: "1.png" -> "1.thumb96.png")
+    """
+    imagePath = Path(imagePath)
+    return imagePath.parent/f"{imagePath.name.split('.', 1)[0]}.thumb{size}.png"
+
+
+def _write_file_atomically(path: Path, contents: bytes):
+    # Write the thumbnail to a temp file first so readers never see a partially written thumbnail
+    tempPath = path.parent/("." + path.name + ".tmp")
+    with open(tempPath, 'wb') as f:
+        f.write(contents)
+    os.replace(tempPath, path)
+
+
+def build_thumbnails(imagePath: Union[str, Path], sizes: List[int] = THUMBNAIL_SIZES) -> List[Path]:
+    """
+    Decodes an image once and writes a thumbnail for every provided size next to it.
+
+    Parameters
+    ----------
+    imagePath (Path):
+        Path to the image to make thumbnails of
+
+    sizes (List[int]):
+        The thumbnail sizes to make
+
+    Returns
+    -------
+    List[Path]
+        Paths of the written thumbnails in the same order as the provided sizes
+    """
+    imagePath = Path(imagePath)
+    thumbnailPaths = []
+    with Image.open(imagePath) as decodedImage:
+        decodedImage.load()
+        for size in sizes:
+            thumbnail = decodedImage.copy()
+            thumbnail.thumbnail((size, size))
+            output = BytesIO()
+            thumbnail.save(output, "PNG")
+
+            thumbnailPath = generate_thumbnail_path(imagePath, size)
+            _write_file_atomically(thumbnailPath, output.getvalue())
+            thumbnailPaths.append(thumbnailPath)
+    return thumbnailPaths
+
+
+def has_current_thumbnail(imagePath: Union[str, Path], size: int) -> bool:
+    """
+    Whether a thumbnail of the given size exists and was made after the image was last written.
+    """
+    thumbnailPath = generate_thumbnail_path(imagePath, size)
+    try:
+        return os.stat(thumbnailPath).st_mtime_ns >= os.stat(imagePath).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def get_or_create_thumbnail(imagePath: Union[str, Path], size: int) -> bytes:
+    """
+    Gets the smallest thumbnail that is at least as big as the requested size. Missing or outdated thumbnails are
+    built (and cached next to the image) before being returned.
+
+    If the requested size is bigger then any thumbnail size then the image is scaled down without being cached.
+    """
+    thumbnailSize = next((thumbnailSize for thumbnailSize in THUMBNAIL_SIZES if thumbnailSize >= size), None)
+    if(thumbnailSize is None):
+        return generate_thumbnail_bytes(imagePath, size)
+
+    if(not has_current_thumbnail(imagePath, thumbnailSize)):
+        build_thumbnails(imagePath)
+
+    with open(generate_thumbnail_path(imagePath, thumbnailSize), 'rb') as f:
+        return f.read()
+
+
+def remove_thumbnails(imagePath: Union[str, Path]):
+    """
+    Removes every thumbnail made from the given image, if any.
+    """
+    for size in THUMBNAIL_SIZES:
+        try:
+            os.remove(generate_thumbnail_path(imagePath, size))
+        except FileNotFoundError:
+            pass
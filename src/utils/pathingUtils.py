@@ -56,6 +56,16 @@ def read_file_as_bytes(file_path: Path) -> bytes:
     return file_bytes
 
 
+def get_file_size(file_path: Path) -> int:
+    """
+    Gets the size of a file in bytes, 0 if it doesn't exist
+    """
+    try:
+        return os.stat(file_path).st_size
+    except FileNotFoundError:
+        return 0
+
+
 def get_sorted_directory_by_name(path: Path, reverse: bool) -> List[str]:
     """
     Gets all directories and files from the file system from the proivded directory path in sorted order.
@@ -8,6 +8,7 @@ from pathlib import Path
 from unittest.mock import patch                                       
 from depdencyInjection.Container import Container
 from imageProviders.ImageProvider import ImageProvider, ImageProviderResult
+from repoManager.ListingCache import clear_listing_cache
 
 from utils.pathingUtils import get_project_root, get_or_create_resources, read_file_as_bytes
 from pyfakefs.fake_filesystem import FakeFilesystem 
@@ -40,6 +41,17 @@ def test_image_generator():
         return cb
 
 
+@pytest.fixture(autouse=True)
+def emptyListingCache():
+   """
+   Listings are cached for the whole process. Tests reuse the same paths on fake and real file systems so every test
+   starts with an empty cache.
+   """
+   clear_listing_cache()
+   yield
+   clear_listing_cache()
+
+
 @patch('imageProviders.ImageProvider')
 def override_with_mock_image_provider(container: Container, imageProvider: ImageProvider):
     """
@@ -62,4 +74,7 @@ def containerWithMocks(fs: FakeFilesystem):
    fs.pause()
    override_with_mock_image_provider(container)
    fs.resume()
-   return container
+   yield container
+
+   # Finishes the repo manager's background writes (ex: counts) while the fake file system is still around
+   container.repoManager().close()
@@ -0,0 +1,299 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from repoManager.Catalog import BatchedCatalogIterator, CatalogIterator, RepoCatalog
+from repoManager.Models import DeleteImagePrompsRequest, ImagePromptDirectory
+from repoManager.RepoManager import RepoManager
+from utils.enums import DIRECTION
+from utils.pathingUtils import get_project_root
+
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+
+
+FS_STATE = {
+   "2024-01-14": {
+      "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+      "01:03:45.522668_Donkey Eat Chips": ["1.png"]
+   },
+   "2024-01-13": {
+      "03:03:45.522668_Fiona Eat Chips": ["1.png"],
+      "02:03:45.522668_Puss Eat Chips": ["1.png", "2.png"],
+   }
+}
+
+
+def test_rebuild_orders_like_directory_iterator(tmp_path: Path):
+   """
+   Given prompt entries across dates
+   When catalog rebuilt and iterated
+   Then entries returned by most recent date then most recent time
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+
+   # Act
+   numCatalogued = catalog.rebuild(tmp_path/TEST_REPO)
+   directories = list(CatalogIterator(catalog, TEST_REPO, batchSize=3))
+
+   # Assert
+   assert numCatalogued == 4
+   assert [directory.prompt for directory in directories] == ["Shrek Eat Chips", "Donkey Eat Chips", "Fiona Eat Chips", "Puss Eat Chips"]
+   assert directories[0].repo == TEST_REPO
+   assert directories[0].date == "2024-01-14"
+   assert directories[0].time == "03:03:45.522668"
+
+
+def test_iterator_starting_directory_backwards(tmp_path: Path):
+   """
+   Given catalogued entries and a starting directory that doesn't exist
+   When iterated backwards
+   Then entries more recent then the starting directory returned oldest first
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   catalog.rebuild(tmp_path/TEST_REPO)
+
+   startingDirectory = ImagePromptDirectory(prompt="blah blah", time="02:59:59.522668", repo=TEST_REPO, date="2024-01-13")
+
+   # Act
+   directories = list(CatalogIterator(catalog, TEST_REPO, startingDirectory=startingDirectory, direction=DIRECTION.BACKWARD))
+
+   # Assert
+   assert [directory.prompt for directory in directories] == ["Fiona Eat Chips", "Donkey Eat Chips", "Shrek Eat Chips"]
+
+
+def test_iterator_take_and_advance_mixed_with_next(tmp_path: Path):
+   """
+   Given catalogued entries and an iterator with a batch buffered by next
+   When entries are taken past the buffer, skipped and taken again
+   Then entries come in the same order as when iterated one at a time
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   catalog.rebuild(tmp_path/TEST_REPO)
+   catalogIterator = CatalogIterator(catalog, TEST_REPO, batchSize=2)
+
+   # Act
+   first = next(catalogIterator)
+   taken = catalogIterator.take(2)
+   advanced = catalogIterator.advance(5)
+
+   # Assert
+   assert [directory.prompt for directory in [first] + taken] == ["Shrek Eat Chips", "Donkey Eat Chips", "Fiona Eat Chips"]
+   assert advanced == 1
+   assert catalogIterator.take(1) == []
+
+
+@pytest.mark.parametrize("direction", [DIRECTION.FORWARD, DIRECTION.BACKWARD])
+@pytest.mark.parametrize("startingDirectory", [
+   None,
+   ImagePromptDirectory(prompt="blah blah", time="02:59:59.522668", repo=TEST_REPO, date="2024-01-13"),
+])
+def test_iterator_advance_and_count_remaining_match_next(tmp_path: Path, direction: DIRECTION, startingDirectory: ImagePromptDirectory):
+   """
+   Given catalogued entries and iterators with and without a batch buffered by next
+   When entries are counted with count_remaining and skipped with advance
+   Then the same entries are counted and skipped as when calling next one at a time
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   catalog.rebuild(tmp_path/TEST_REPO)
+   expected = list(CatalogIterator(catalog, TEST_REPO, startingDirectory=startingDirectory, direction=direction))
+
+   for numNexted in [0, 1]:
+      for skipped in range(len(expected) + 2):
+         catalogIterator = CatalogIterator(catalog, TEST_REPO, startingDirectory=startingDirectory, direction=direction, batchSize=2)
+         for _ in range(numNexted):
+            next(catalogIterator)
+
+         # Act
+         counted = catalogIterator.count_remaining()
+         advanced = catalogIterator.advance(skipped)
+         remaining = catalogIterator.count_remaining()
+         rest = list(catalogIterator)
+
+         # Assert
+         assert counted == len(expected) - numNexted
+         assert advanced == min(skipped, len(expected) - numNexted)
+         assert remaining == len(expected[numNexted + advanced:])
+         assert rest == expected[numNexted + advanced:]
+
+
+def test_iterator_advance_only_reads_entry_skipped_to(tmp_path: Path):
+   """
+   Given catalogued entries
+   When several entries are skipped with advance
+   Then only the entry skipped to is read from the catalog
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   catalog.rebuild(tmp_path/TEST_REPO)
+   catalogIterator = CatalogIterator(catalog, TEST_REPO)
+   numbersRead = []
+   get_directories = catalog.get_directories
+   def spy(repo, number, **kwargs):
+      numbersRead.append(number)
+      return get_directories(repo, number, **kwargs)
+   catalog.get_directories = spy
+
+   # Act
+   advanced = catalogIterator.advance(3)
+
+   # Assert
+   assert advanced == 3
+   assert numbersRead == [1]
+   assert next(catalogIterator).prompt == "Puss Eat Chips"
+
+
+def test_batched_iterator_without_fetch_fails_when_made(tmp_path: Path):
+   """
+   Given a batched catalog iterator that doesn't say how batches are fetched
+   When made
+   Then it fails right away rather then on the first batch
+   """
+   # Arrange
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+
+   class NoFetchIterator(BatchedCatalogIterator):
+      pass
+
+   # Act / Assert
+   with pytest.raises(TypeError):
+      NoFetchIterator(catalog, TEST_REPO)
+
+
+def test_consistency_check_finds_external_changes(tmp_path: Path):
+   """
+   Given a catalogued repo modified outside of the catalog
+   When consistency checked
+   Then missing, stale and miscounted entries reported
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   catalog.rebuild(tmp_path/TEST_REPO)
+
+   shutil.rmtree(tmp_path/TEST_REPO/"2024-01-14"/"01:03:45.522668_Donkey Eat Chips")
+   (tmp_path/TEST_REPO/"2024-01-13"/"02:03:45.522668_Puss Eat Chips"/"2.png").unlink()
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-15": { "01:00:00.000000_Dragon Eat Chips": ["1.png"] } })
+
+   # Act
+   report = catalog.check_consistency(tmp_path/TEST_REPO)
+
+   # Assert
+   assert report.is_consistent() is False
+   assert [directory.prompt for directory in report.missing] == ["Dragon Eat Chips"]
+   assert [directory.prompt for directory in report.stale] == ["Donkey Eat Chips"]
+   assert [directory.prompt for directory in report.mismatchedCounts] == ["Puss Eat Chips"]
+
+
+def touch_date(path: Path):
+   # The file system may not update the date directory's mtime within the same tick, so it's moved forward by hand
+   stat = os.stat(path)
+   os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_reconcile_rescans_only_changed_dates(tmp_path: Path):
+   """
+   Given a catalogued repo where a date gets a new entry and another date is deleted outside of the catalog
+   When reconciled
+   Then only those dates are rescanned or removed and the catalog is consistent again
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-12": { "01:00:00.000000_Dragon Eat Chips": ["1.png"] } })
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   catalog.rebuild(tmp_path/TEST_REPO)
+
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-14": { "02:00:00.000000_Farquaad Eat Chips": ["1.png"] } })
+   touch_date(tmp_path/TEST_REPO/"2024-01-14")
+   shutil.rmtree(tmp_path/TEST_REPO/"2024-01-12")
+
+   # Act
+   reconciledDates = catalog.reconcile(tmp_path/TEST_REPO)
+   reconciledAgain = catalog.reconcile(tmp_path/TEST_REPO)
+
+   # Assert
+   assert reconciledDates == ["2024-01-14", "2024-01-12"]
+   assert reconciledAgain == []
+   assert catalog.check_consistency(tmp_path/TEST_REPO).is_consistent()
+   assert [directory.prompt for directory in CatalogIterator(catalog, TEST_REPO)] == ["Shrek Eat Chips", "Farquaad Eat Chips", "Donkey Eat Chips", "Fiona Eat Chips", "Puss Eat Chips"]
+
+
+def test_switching_to_catalogued_repo_picks_up_external_changes(tmp_path: Path):
+   """
+   Given a repo catalogued by a repo manager that then had a date added by another tool
+   When a new repo manager switches to it
+   Then pages from the catalog include the added date
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   RepoManager(tmp_path, TEST_REPO, useCatalog=True).close()
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-15": { "01:00:00.000000_Dragon Eat Chips": ["1.png"] } })
+
+   # Act
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=True)
+   page = repoManager.get_images(2)
+
+   # Assert
+   assert [result.prompt for result in page.results] == ["Dragon Eat Chips", "Shrek Eat Chips"]
+   assert repoManager.check_catalog().is_consistent()
+   repoManager.close()
+
+
+def test_repo_manager_pagination_with_catalog(tmp_path: Path):
+   """
+   Given an existing repo and a repo manager using a catalog
+   When subsequent calls to get_images with token provided
+   Then pages match the file system ordering
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=True)
+
+   # Act
+   firstPage = repoManager.get_images(2)
+   secondPage = repoManager.get_images(2, firstPage.nextToken)
+   backPage = repoManager.get_images(2, firstPage.nextToken, direction=DIRECTION.BACKWARD)
+
+   # Assert
+   assert [result.prompt for result in firstPage.results] == ["Shrek Eat Chips", "Donkey Eat Chips"]
+   assert [result.prompt for result in secondPage.results] == ["Fiona Eat Chips", "Puss Eat Chips"]
+   assert [result.prompt for result in backPage.results] == ["Shrek Eat Chips", "Donkey Eat Chips"]
+   assert backPage.nextToken is None
+
+
+def test_repo_manager_save_and_delete_update_catalog(tmp_path: Path):
+   """
+   Given a repo manager using a catalog
+   When an image is saved and then deleted
+   Then the catalog stays consistent with the file system
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=True)
+   imagePath = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+
+   # Act
+   saveResult = repoManager.save_image("Sad rat", imagePath.read_bytes())
+   afterSave = repoManager.get_images(2)
+   consistentAfterSave = repoManager.check_catalog().is_consistent()
+
+   repoManager.delete_image(DeleteImagePrompsRequest(prompt=saveResult.prompt, repo=saveResult.repo, date=saveResult.date, time=saveResult.time, nums=["1"]))
+   afterDelete = repoManager.get_images(2)
+
+   # Assert
+   assert [result.prompt for result in afterSave.results] == ["Sad rat"]
+   assert consistentAfterSave
+   assert afterDelete.results == []
+   assert repoManager.check_catalog().is_consistent()
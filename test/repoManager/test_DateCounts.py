@@ -0,0 +1,163 @@
+import json
+import shutil
+from pathlib import Path
+
+from repoManager.DateCounts import DateCountIndex
+from repoManager.RepoManager import RepoManager
+from utils.enums import LOAD_MODE
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Shrek": ["1.png"],
+      "04:04:04.000000_Fiona": ["1.png"],
+      "03:03:03.000000_Donkey": ["1.png"],
+   },
+   "2024-01-13": {
+      "02:02:02.000000_Puss": ["1.png"],
+   },
+   "2024-01-12": {
+      "06:06:06.000000_Dragon": ["1.png"],
+      "01:01:01.000000_Farquaad": ["1.png"],
+   },
+}
+
+
+def get_prompts(result):
+   return [imagePromptResult.prompt for imagePromptResult in result.results]
+
+
+def test_date_counts_locate_positions(tmp_path: Path):
+   """
+   Given a repo with prompt directories over three dates
+   When locating positions in it
+   Then the date and offset into the date are found, most recent date first
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+
+   # Act
+   dateCounts = DateCountIndex(tmp_path/TEST_REPO, tmp_path/"counts.json")
+
+   # Assert
+   assert dateCounts.total() == 6
+   assert dateCounts.locate(0) == ("2024-01-14", 0)
+   assert dateCounts.locate(3) == ("2024-01-13", 0)
+   assert dateCounts.locate(5) == ("2024-01-12", 1)
+   assert dateCounts.locate(6) is None
+
+
+def test_date_counts_recount_only_changed_dates(tmp_path: Path):
+   """
+   Given counts stored on disk
+   When a date is changed by something other then the index and the counts are loaded again
+   Then only that date is recounted
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   DateCountIndex(tmp_path/TEST_REPO, tmp_path/"counts.json").refresh()
+   shutil.rmtree(tmp_path/TEST_REPO/"2024-01-13")
+
+   # Act
+   dateCounts = DateCountIndex(tmp_path/TEST_REPO, tmp_path/"counts.json")
+
+   # Assert
+   assert dateCounts.refresh() == 0
+   assert dateCounts.total() == 5
+   assert dateCounts.locate(3) == ("2024-01-12", 0)
+
+
+def test_date_counts_counted_on_first_use_and_written_on_close(tmp_path: Path):
+   """
+   Given a repo
+   When an index of its counts is made, a prompt directory is added to it and the index is closed
+   Then the repo is only counted once the counts are used and the change is only written to disk on close
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   countsPath = tmp_path/"counts.json"
+
+   # Act
+   dateCounts = DateCountIndex(tmp_path/TEST_REPO, countsPath)
+   countedWhenMade = dateCounts.is_counted()
+   total = dateCounts.total()
+   (tmp_path/TEST_REPO/"2024-01-13"/"03:03:03.000000_Fiona").mkdir()
+   dateCounts.add("2024-01-13", 1)
+   savedBeforeClose = json.loads(countsPath.read_text())["dates"]["2024-01-13"][0]
+   dateCounts.close()
+
+   # Assert
+   assert not countedWhenMade
+   assert total == 6
+   assert dateCounts.total() == 7
+   assert savedBeforeClose == 1
+   assert DateCountIndex(tmp_path/TEST_REPO, countsPath).total() == 7
+
+
+def test_date_counts_change_counted_once_when_recounted_before_add(tmp_path: Path):
+   """
+   Given counts of a repo
+   When a prompt directory is added and the date is recounted before add is called for it
+   Then the prompt directory is only counted once
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   dateCounts = DateCountIndex(tmp_path/TEST_REPO, tmp_path/"counts.json")
+   dateCounts.refresh()
+
+   # Act
+   (tmp_path/TEST_REPO/"2024-01-13"/"03:03:03.000000_Fiona").mkdir()
+   dateCounts.refresh_date("2024-01-13")
+   dateCounts.add("2024-01-13", 1)
+
+   # Assert
+   assert dateCounts.total() == 7
+
+
+def test_date_counts_close_waits_for_background_counting(tmp_path: Path):
+   """
+   Given counts being counted in the background
+   When they are closed
+   Then closing waits for the counting and nothing is left running to write to disk afterwards
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   countsPath = tmp_path/"counts.json"
+   dateCounts = DateCountIndex(tmp_path/TEST_REPO, countsPath)
+   countThread = dateCounts.count_in_background()
+
+   # Act
+   dateCounts.close()
+   (tmp_path/TEST_REPO/"2024-01-13"/"03:03:03.000000_Fiona").mkdir()
+   dateCounts.add("2024-01-13", 1)
+
+   # Assert
+   assert not countThread.is_alive()
+   assert dateCounts.saveTimer is None
+   assert json.loads(countsPath.read_text())["dates"]["2024-01-13"][0] == 2
+
+
+def test_get_page_matches_paging_forward(tmp_path: Path):
+   """
+   Given a repo with pages ending in the middle of dates
+   When getting every page by its number
+   Then each page is the same as the one reached by paging forward from the first page
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   sequentialPages = [repoManager.get_images(2, loadMode=LOAD_MODE.METADATA)]
+   while sequentialPages[-1].nextToken is not None:
+      sequentialPages.append(repoManager.get_images(2, token=sequentialPages[-1].nextToken, loadMode=LOAD_MODE.METADATA))
+
+   # Act
+   numberedPages = [repoManager.get_page(pageNumber, 2, loadMode=LOAD_MODE.METADATA) for pageNumber in range(1, 4)]
+   pastLastPage = repoManager.get_page(4, 2, loadMode=LOAD_MODE.METADATA)
+
+   # Assert
+   assert repoManager.total_count() == 6
+   assert [get_prompts(page) for page in numberedPages] == [get_prompts(page) for page in sequentialPages if len(page.results) > 0]
+   assert numberedPages[1].previousToken.prompt == sequentialPages[0].nextToken.prompt
+   assert pastLastPage.errorMessage is not None
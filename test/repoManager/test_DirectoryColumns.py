@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from repoManager.DirectoryColumns import DirectoryColumns
+from repoManager.RepoManager import RepoManager
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000001_Shrek": ["1.png"],
+      "04:04:04.000000_Fiona": ["1.png"],
+   },
+   "2023-12-31": {
+      "23:59:59.999999_Shrek": ["1.png"],
+      "00:00:00.000000_Donkey": ["1.png"],
+   },
+}
+
+
+def get_fields(directories):
+   return [(directory.date, directory.time, directory.prompt) for directory in directories]
+
+
+@pytest.mark.parametrize("useCatalog", [True, False])
+def test_listing_matches_iterating_the_repo(tmp_path: Path, useCatalog: bool):
+   """
+   Given a repo with and without a catalog
+   When every prompt directory is listed into columns
+   Then the listing has the same prompt directories in the same order as iterating the repo and the repeated prompt is stored once
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=useCatalog)
+
+   # Act
+   listing = repoManager.list_directories()
+
+   # Assert
+   assert get_fields(listing) == get_fields(repoManager._create_directory_iterator())
+   assert len(listing) == 4
+   assert listing[-1].repo == TEST_REPO and listing[-1].time == "00:00:00.000000"
+   assert listing.num_prompts() == 3
+
+
+def test_irregular_times_are_kept():
+   """
+   Given a prompt directory whose time isn't in the usual format
+   When it's added to a listing
+   Then it's read back exactly as it was added
+   """
+   # Arrange
+   listing = DirectoryColumns(TEST_REPO)
+
+   # Act
+   listing.append_values("2024-01-14", "Farquaad", "")
+   listing.append_values("2024-01-14", "01:02:03.000004", "Shrek")
+
+   # Assert
+   assert get_fields(listing) == [("2024-01-14", "Farquaad", ""), ("2024-01-14", "01:02:03.000004", "Shrek")]
+   with pytest.raises(IndexError):
+      listing[2]
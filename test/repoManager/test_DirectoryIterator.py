@@ -450,3 +450,77 @@ def test_backwards_starting_directory_provided(fs: FakeFilesystem):
       assert True
    else:
       assert False
+
+
+SKIP_FS_STATE = {
+   "2024-01-12": {
+      "01:01:01.000000_Fiona": ["1.png"],
+   },
+   "2024-01-13": {
+      "01:03:45.522668_Donkey Eat Chips": ["1.png"],
+      "02:03:45.522668_Donkey Eat Waffles": ["1.png"],
+      "03:03:45.522668_Donkey Eat Parfait": ["1.png"],
+   },
+   "2024-01-14": {
+      "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+      "04:03:45.522668_Shrek Eat Onions": ["1.png"],
+   },
+}
+
+
+@pytest.mark.parametrize("direction", [DIRECTION.FORWARD, DIRECTION.BACKWARD])
+@pytest.mark.parametrize("startingDirectory", [
+   None,
+   ImagePromptDirectory(prompt="Donkey Eat Waffles", time="02:03:45.522668", repo="doesn't matter", date="2024-01-13"),
+   ImagePromptDirectory(prompt="Not there", time="02:30:00.000000", repo="doesn't matter", date="2024-01-13"),
+])
+def test_advance_and_take_match_next(fs: FakeFilesystem, direction: DIRECTION, startingDirectory: ImagePromptDirectory):
+   """
+   Given prompt entries across dates and an iterator from the start or a starting directory, existing or not
+   When entries are skipped with advance, counted with count_remaining and taken with take
+   Then the same entries are skipped, counted and taken as when calling next one at a time
+   """
+   # Arrange
+   populate_fs_with(fs, TEST_RESOURCES_FOLDER_NAME, dateDictStructure=SKIP_FS_STATE)
+   expected = list(DirectoryIterator(pathToDirectories=TEST_RESOURCES_FOLDER_NAME, startingDirectory=startingDirectory, direction=direction))
+
+   for skipped in range(len(expected) + 2):
+      directoryIterator = DirectoryIterator(pathToDirectories=TEST_RESOURCES_FOLDER_NAME, startingDirectory=startingDirectory, direction=direction)
+
+      # Act
+      counted = directoryIterator.count_remaining()
+      advanced = directoryIterator.advance(skipped)
+      current = directoryIterator.get_current_image_prompt_directory()
+      remaining = directoryIterator.count_remaining()
+      taken = directoryIterator.take(2)
+      rest = list(directoryIterator)
+
+      # Assert
+      assert counted == len(expected)
+      assert advanced == min(skipped, len(expected))
+      if(0 < skipped <= len(expected)):
+         assert current == expected[skipped - 1]
+      assert remaining == len(expected[advanced:])
+      assert taken == expected[advanced:advanced + 2]
+      assert rest == expected[advanced + 2:]
+
+
+def test_take_past_the_end(fs: FakeFilesystem):
+   """
+   Given prompt entries across dates
+   When more entries are taken then there are
+   Then every entry is returned in order and the iterator is exhausted
+   """
+   # Arrange
+   populate_fs_with(fs, TEST_RESOURCES_FOLDER_NAME, dateDictStructure=SKIP_FS_STATE)
+   directoryIterator = DirectoryIterator(pathToDirectories=TEST_RESOURCES_FOLDER_NAME)
+
+   # Act
+   taken = directoryIterator.take(10)
+
+   # Assert
+   assert [directory.prompt for directory in taken] == ["Shrek Eat Onions", "Shrek Eat Chips", "Donkey Eat Parfait", "Donkey Eat Waffles", "Donkey Eat Chips", "Fiona"]
+   assert taken[0].repo == TEST_RESOURCES_FOLDER_NAME
+   assert directoryIterator.take(1) == []
+   assert directoryIterator.count_remaining() == 0
+   assert next(directoryIterator, None) is None
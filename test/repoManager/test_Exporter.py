@@ -0,0 +1,112 @@
+import io
+import json
+import tarfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from repoManager.PackedSegments import pack_date
+from repoManager.RepoManager import RepoManager
+from utils.pathingUtils import get_project_root
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+TEST_IMAGE = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Sad rat": ["1.png"],
+      "03:03:03.000000_Shrek": ["1.png"],
+   },
+   "2024-01-13": {
+      "02:02:02.000000_Donkey": ["1.png", "2.png"],
+   },
+}
+
+
+def get_manifest_prompts(manifest: dict):
+   return [entry["prompt"] for entry in manifest["entries"]]
+
+
+@pytest.mark.parametrize("archiveFormat", ["zip", "tar.gz"])
+def test_export_streams_repo_into_archive(tmp_path: Path, archiveFormat: str):
+   """
+   Given a repo with a packed date
+   When the whole repo is exported
+   Then every image, packed or not, is in the archive under its prompt directory along with a manifest of every prompt
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   pack_date(tmp_path/TEST_REPO, "2024-01-13")
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   outputPath = tmp_path/("export." + archiveFormat)
+
+   # Act
+   result = repoManager.export(outputPath, archiveFormat=archiveFormat)
+
+   # Assert
+   if(archiveFormat == "zip"):
+      with zipfile.ZipFile(outputPath) as archive:
+         names = archive.namelist()
+         packedImage = archive.read("testRepo/2024-01-13/02:02:02.000000_Donkey/2.png")
+         manifest = json.loads(archive.read("manifest.json"))
+   else:
+      with tarfile.open(outputPath) as archive:
+         names = archive.getnames()
+         packedImage = archive.extractfile("testRepo/2024-01-13/02:02:02.000000_Donkey/2.png").read()
+         manifest = json.loads(archive.extractfile("manifest.json").read())
+   assert (result.entries, result.files, result.bytes) == (3, 4, 4 * TEST_IMAGE.stat().st_size)
+   assert names[0] == "testRepo/2024-01-14/05:05:05.000000_Sad rat/1.png"
+   assert names[-1] == "manifest.json"
+   assert len(names) == 5
+   assert packedImage == TEST_IMAGE.read_bytes()
+   assert get_manifest_prompts(manifest) == ["Sad rat", "Shrek", "Donkey"]
+   assert manifest["entries"][2] == { "repo": TEST_REPO, "date": "2024-01-13", "time": "02:02:02.000000", "prompt": "Donkey", "files": ["testRepo/2024-01-13/02:02:02.000000_Donkey/1.png", "testRepo/2024-01-13/02:02:02.000000_Donkey/2.png"] }
+   assert not (tmp_path/".export.zip.tmp").exists()
+
+
+def test_export_range_and_search_to_stream(tmp_path: Path):
+   """
+   Given a repo
+   When a date range and a search are exported to an in memory stream
+   Then only the prompt directories in the range or matching the search are exported
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   rangeOutput, searchOutput = io.BytesIO(), io.BytesIO()
+
+   # Act
+   repoManager.export(rangeOutput, start=datetime(2024, 1, 13), end=datetime(2024, 1, 14, 4))
+   repoManager.export(searchOutput, archiveFormat="tar", query="sad ra")
+
+   # Assert
+   with zipfile.ZipFile(rangeOutput) as archive:
+      assert get_manifest_prompts(json.loads(archive.read("manifest.json"))) == ["Shrek", "Donkey"]
+   with tarfile.open(fileobj=io.BytesIO(searchOutput.getvalue())) as archive:
+      assert get_manifest_prompts(json.loads(archive.extractfile("manifest.json").read())) == ["Sad rat"]
+
+
+def test_incremental_export_only_has_new_prompts(tmp_path: Path):
+   """
+   Given a repo that was exported
+   When a new image is saved and the repo is exported incrementally twice
+   Then the first incremental export only has the new image and the second has nothing
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   repoManager.export(tmp_path/"full.zip")
+   repoManager.save_image("Fiona", TEST_IMAGE.read_bytes())
+
+   # Act
+   firstResult = repoManager.export(tmp_path/"first.zip", incremental=True)
+   secondResult = repoManager.export(tmp_path/"second.zip", incremental=True)
+
+   # Assert
+   with zipfile.ZipFile(tmp_path/"first.zip") as archive:
+      assert get_manifest_prompts(json.loads(archive.read("manifest.json"))) == ["Fiona"]
+   assert firstResult.entries == 1
+   assert secondResult.entries == 0
@@ -0,0 +1,136 @@
+import os
+from pathlib import Path
+
+from repoManager.Fsck import BAD_DIRECTORY, BAD_IMAGE, CHECKSUM_MISMATCH, EMPTY_DIRECTORY, STRAY_FILE, fsck_repo
+from repoManager.PackedSegments import pack_date
+from repoManager.RepoManager import RepoManager
+from repoManager.utils import METADATA_DIRECTORY_NAME
+from utils.enums import LOAD_MODE
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Shrek": ["1.png"],
+      "04:04:04.000000_Fiona": ["1.png", "2.png"],
+      "03:03:03.000000_Donkey": [],
+      "Farquaad": [],
+   },
+}
+
+
+def damage_repo(repoPath: Path):
+   imagePath = repoPath/"2024-01-14"/"04:04:04.000000_Fiona"/"2.png"
+   imagePath.write_bytes(imagePath.read_bytes()[:-100])
+   (repoPath/"2024-01-14"/"05:05:05.000000_Shrek"/".1.png.tmp").write_bytes(b"partial")
+
+
+def get_problems(report):
+   return sorted((issue.kind, str(issue.relative_path())) for issue in report.issues)
+
+
+def test_fsck_finds_problems_and_only_rechecks_changes(tmp_path: Path):
+   """
+   Given a repo with an empty and a badly named prompt directory, a truncated image and a leftover temp file
+   When checked twice
+   Then every problem is reported both times but good images are only read the first time
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   damage_repo(tmp_path/TEST_REPO)
+
+   # Act
+   firstReport = fsck_repo(tmp_path, TEST_REPO, maxWorkers=1, graceSeconds=0)
+   secondReport = fsck_repo(tmp_path, TEST_REPO, maxWorkers=1, graceSeconds=0)
+
+   # Assert
+   assert get_problems(firstReport) == [
+      (BAD_DIRECTORY, "2024-01-14/Farquaad"),
+      (BAD_IMAGE, "2024-01-14/04:04:04.000000_Fiona/2.png"),
+      (EMPTY_DIRECTORY, "2024-01-14/03:03:03.000000_Donkey"),
+      (STRAY_FILE, "2024-01-14/05:05:05.000000_Shrek/.1.png.tmp"),
+   ]
+   assert firstReport.imagesChecked == 3
+   assert get_problems(secondReport) == get_problems(firstReport)
+   assert secondReport.imagesChecked == 1 and secondReport.imagesSkipped == 2
+
+
+def test_full_fsck_finds_images_changed_in_place(tmp_path: Path):
+   """
+   Given a checked image whose bytes change without its size or modification time changing
+   When checked again in full
+   Then the checksum mismatch is reported
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-14": { "05:05:05.000000_Shrek": ["1.png"] } })
+   imagePath = tmp_path/TEST_REPO/"2024-01-14"/"05:05:05.000000_Shrek"/"1.png"
+   fsck_repo(tmp_path, TEST_REPO, maxWorkers=1, graceSeconds=0)
+   stat = imagePath.stat()
+   data = bytearray(imagePath.read_bytes())
+   data[100] ^= 0xFF
+   imagePath.write_bytes(bytes(data))
+   os.utime(imagePath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+   # Act
+   quickReport = fsck_repo(tmp_path, TEST_REPO, maxWorkers=1, graceSeconds=0)
+   fullReport = fsck_repo(tmp_path, TEST_REPO, full=True, maxWorkers=1, graceSeconds=0)
+
+   # Assert
+   assert quickReport.is_clean()
+   assert get_problems(fullReport) == [(CHECKSUM_MISMATCH, "2024-01-14/05:05:05.000000_Shrek/1.png")]
+
+
+def test_fsck_quarantine_keeps_repo_consistent(tmp_path: Path):
+   """
+   Given a damaged repo with a catalog
+   When fsck quarantines its problems
+   Then they're moved out of the repo, pages only have good prompt directories and a rerun is clean
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-14": dict((timePrompt, images) for timePrompt, images in FS_STATE["2024-01-14"].items() if timePrompt != "Farquaad") })
+   damage_repo(tmp_path/TEST_REPO)
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=True)
+
+   # Act
+   report = repoManager.fsck(action="quarantine", maxWorkers=1, graceSeconds=0)
+   page = repoManager.get_images(10, loadMode=LOAD_MODE.METADATA)
+   rerunReport = repoManager.fsck(maxWorkers=1, graceSeconds=0)
+
+   # Assert
+   assert report.fixed == 3
+   assert [(result.prompt, result.num) for result in page.results] == [("Shrek", "1"), ("Fiona", "1")]
+   assert repoManager.total_count() == 2
+   assert (tmp_path/METADATA_DIRECTORY_NAME/"quarantine"/TEST_REPO/"2024-01-14"/"04:04:04.000000_Fiona"/"2.png").exists()
+   assert rerunReport.is_clean()
+
+
+def test_fsck_checks_and_repairs_packed_dates(tmp_path: Path):
+   """
+   Given a repo whose damaged date is packed into a segment
+   When it's checked twice and then repaired
+   Then the truncated packed image is found both times, good packed images are only read the first time and the repair
+   deletes the bad image from the segment
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-14": dict((timePrompt, images) for timePrompt, images in FS_STATE["2024-01-14"].items() if len(images) > 0) })
+   damage_repo(tmp_path/TEST_REPO)
+   os.remove(tmp_path/TEST_REPO/"2024-01-14"/"05:05:05.000000_Shrek"/".1.png.tmp")
+   pack_date(tmp_path/TEST_REPO, "2024-01-14")
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=True)
+
+   # Act
+   firstReport = repoManager.fsck(maxWorkers=1, graceSeconds=0)
+   secondReport = repoManager.fsck(maxWorkers=1, graceSeconds=0)
+   repairReport = repoManager.fsck(action="repair", maxWorkers=1, graceSeconds=0)
+   rerunReport = repoManager.fsck(maxWorkers=1, graceSeconds=0)
+
+   # Assert
+   assert get_problems(firstReport) == [(BAD_IMAGE, "2024-01-14/04:04:04.000000_Fiona/2.png")]
+   assert firstReport.issues[0].packed
+   assert (firstReport.datesChecked, firstReport.imagesChecked) == (1, 3)
+   assert get_problems(secondReport) == get_problems(firstReport)
+   assert (secondReport.imagesChecked, secondReport.imagesSkipped) == (1, 2)
+   assert repairReport.fixed == 1
+   assert repoManager.segments.get("2024-01-14").list_image_files("04:04:04.000000_Fiona") == ["1.png"]
+   assert rerunReport.is_clean()
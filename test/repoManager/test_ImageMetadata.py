@@ -0,0 +1,79 @@
+import hashlib
+from datetime import date as Date
+from pathlib import Path
+
+from PIL import Image
+
+from repoManager.ImageMetadata import METADATA_FILE_NAME, read_metadata
+from repoManager.Models import ImagePromptDirectory
+from repoManager.RepoManager import RepoManager
+from utils.pathingUtils import get_project_root
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+TEST_IMAGE = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+FS_STATE = {
+   "2024-01-14": {
+      "03:03:45.000000_Shrek": ["1.png"],
+   },
+   "2023-01-13": {
+      "02:02:02.000000_Donkey": ["1.png", "2.png"],
+   },
+}
+
+
+def get_test_image_size():
+   with Image.open(TEST_IMAGE) as image:
+      return image.size
+
+
+def test_saved_image_gets_metadata(tmp_path: Path):
+   """
+   Given a manager storing images as lossless WEBP
+   When an image is saved with its engine and latency
+   Then its metadata file describes the image as stored
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO, storageFormat="webp-lossless")
+
+   # Act
+   saveResult = repoManager.save_image("Sad rat", TEST_IMAGE.read_bytes(), engine="Dall-e", latencySeconds=4.5)
+   metadata = repoManager.get_image_metadata(saveResult)
+
+   # Assert
+   imagePath = repoManager.current_repo_abs_path()/saveResult.date/(saveResult.time + "_Sad rat")/"1.webp"
+   assert len(metadata) == 1
+   assert (metadata[0].fileName, metadata[0].format, metadata[0].bytes) == ("1.webp", "WEBP", imagePath.stat().st_size)
+   assert (metadata[0].width, metadata[0].height) == get_test_image_size()
+   assert metadata[0].sha256 == hashlib.sha256(imagePath.read_bytes()).hexdigest()
+   assert (metadata[0].engine, metadata[0].latencySeconds) == ("Dall-e", 4.5)
+
+
+def test_old_repo_gets_metadata_lazily_and_in_bulk(tmp_path: Path):
+   """
+   Given a repo saved before metadata was written, with a packed date
+   When one prompt directory's metadata is read and then the rest are backfilled
+   Then the read one gets its metadata file right away, the backfill writes the rest and packed images get metadata in memory
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   shrek = ImagePromptDirectory(prompt="Shrek", repo=TEST_REPO, date="2024-01-14", time="03:03:45.000000")
+   donkey = ImagePromptDirectory(prompt="Donkey", repo=TEST_REPO, date="2023-01-13", time="02:02:02.000000")
+
+   # Act
+   shrekMetadata = repoManager.get_image_metadata(shrek)
+   numBackfilled = repoManager.backfill_metadata(maxWorkers=1)
+   repoManager.segments.pack_old_dates(90, today=Date(2024, 1, 20)).result()
+   packedMetadata = repoManager.get_image_metadata(donkey)
+
+   # Assert
+   assert [metadata.fileName for metadata in shrekMetadata] == ["1.png"]
+   assert (shrekMetadata[0].width, shrekMetadata[0].height) == get_test_image_size()
+   assert shrekMetadata[0].engine is None
+   assert numBackfilled == 1
+   assert [metadata.fileName for metadata in packedMetadata] == ["1.png", "2.png"]
+   assert packedMetadata[1].bytes == TEST_IMAGE.stat().st_size
+   assert [metadata.fileName for metadata in read_metadata(tmp_path/TEST_REPO/"2024-01-14"/"03:03:45.000000_Shrek")] == ["1.png"]
+   assert (tmp_path/TEST_REPO/"2024-01-14"/"03:03:45.000000_Shrek"/METADATA_FILE_NAME).exists()
@@ -0,0 +1,106 @@
+import json
+import shutil
+from pathlib import Path
+
+from PIL import Image
+
+from repoManager.Importer import ImportProgress, read_import_metadata
+from repoManager.RepoManager import RepoManager
+from utils.pathingUtils import get_project_root
+
+
+TEST_REPO = "testRepo"
+TEST_IMAGE = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+
+
+def test_metadata_from_file_name(tmp_path: Path):
+   """
+   Given an image named with its time and prompt
+   When its import metadata read
+   Then the prompt and timestamp come from the file name
+   """
+   # Arrange
+   sourcePath = tmp_path/"2024-01-14 03-03-45_Shrek_eat_chips.png"
+   shutil.copyfile(TEST_IMAGE, sourcePath)
+
+   # Act
+   candidate = read_import_metadata(sourcePath)
+
+   # Assert
+   assert candidate.prompt == "Shrek eat chips"
+   assert candidate.date == "2024-01-14"
+   assert candidate.time == "03:03:45.000000"
+
+
+def test_metadata_from_sidecar(tmp_path: Path):
+   """
+   Given an image with a json sidecar
+   When its import metadata read
+   Then the sidecar wins over the file name
+   """
+   # Arrange
+   sourcePath = tmp_path/"2024-01-14 03-03-45_Shrek.png"
+   shutil.copyfile(TEST_IMAGE, sourcePath)
+   sourcePath.with_suffix(".json").write_text(json.dumps({ "prompt": "Donkey/eat chips", "timestamp": "2023-05-06T07:08:09.101112" }))
+
+   # Act
+   candidate = read_import_metadata(sourcePath)
+
+   # Assert
+   assert candidate.prompt == "Donkey eat chips"
+   assert candidate.date == "2023-05-06"
+   assert candidate.time == "07:08:09.101112"
+
+
+def test_import_images_into_repo(tmp_path: Path):
+   """
+   Given a source tree with images sharing a prompt and time, a GIF and a broken image
+   When imported into a repo with a catalog
+   Then images land in the date/time_prompt layout, failures are reported and the catalog is consistent
+   """
+   # Arrange
+   source = tmp_path/"source"
+   (source/"nested").mkdir(parents=True)
+   shutil.copyfile(TEST_IMAGE, source/"2024-01-14 03-03-45_Shrek.png")
+   shutil.copyfile(TEST_IMAGE, source/"nested"/"2024-01-14 03-03-45_Shrek.png")
+   with Image.open(TEST_IMAGE) as image:
+      image.convert("RGB").resize((8, 8)).save(source/"20240113_010203_Fiona.gif")
+   (source/"2024-01-12 01-02-03_Broken.png").write_bytes(b"not an image")
+   repoManager = RepoManager(tmp_path/"repos", TEST_REPO, useCatalog=True)
+   progressCalls = []
+
+   # Act
+   result = repoManager.import_images(source, maxWorkers=2, onProgress=lambda done, total: progressCalls.append((done, total)))
+
+   # Assert
+   assert result.imported == 3
+   assert [Path(sourcePath).name for sourcePath, _ in result.failed] == ["2024-01-12 01-02-03_Broken.png"]
+   shrekPath = repoManager.current_repo_abs_path()/"2024-01-14"/"03:03:45.000000_Shrek"
+   assert sorted(path.name for path in shrekPath.iterdir()) == ["1.png", "2.png"]
+   assert (repoManager.current_repo_abs_path()/"2024-01-13"/"01:02:03.000000_Fiona"/"1.png").exists()
+   assert progressCalls[-1] == (4, 4)
+   assert repoManager.check_catalog().is_consistent()
+   assert [result.prompt for result in repoManager.get_images(5).results] == ["Shrek", "Fiona"]
+
+
+def test_import_resumes(tmp_path: Path):
+   """
+   Given an import that was interrupted after importing one image
+   When the import is rerun
+   Then the already imported image is skipped
+   """
+   # Arrange
+   source = tmp_path/"source"
+   source.mkdir()
+   shutil.copyfile(TEST_IMAGE, source/"2024-01-14 03-03-45_Shrek.png")
+   shutil.copyfile(TEST_IMAGE, source/"2024-01-14 04-03-45_Donkey.png")
+   repoManager = RepoManager(tmp_path/"repos", TEST_REPO)
+   ImportProgress(tmp_path/"repos", source, TEST_REPO).record([str(source/"2024-01-14 03-03-45_Shrek.png")])
+
+   # Act
+   result = repoManager.import_images(source, mode="hardlink", maxWorkers=1)
+
+   # Assert
+   assert result.imported == 1
+   assert result.skipped == 1
+   assert not ImportProgress(tmp_path/"repos", source, TEST_REPO).progressPath.exists()
@@ -0,0 +1,91 @@
+import os
+import time
+from pathlib import Path
+
+from repoManager.DirectoryIterator import DirectoryIterator
+from repoManager.ListingCache import LISTING_CACHE, ListingCache
+from repoManager.utils import list_date_directories
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Sad rat": ["1.png"],
+      "03:03:03.000000_Shrek": ["1.png"],
+   },
+   "2024-01-13": {
+      "02:02:02.000000_Donkey": ["1.png"],
+   },
+}
+
+
+def age_directories(*paths: Path):
+   # Directories modified just before being listed are never cached
+   anHourAgo = time.time() - 3600
+   for path in paths:
+      os.utime(path, (anHourAgo, anHourAgo))
+
+
+def test_unchanged_directories_are_listed_once_across_iterators(tmp_path: Path):
+   """
+   Given a repo whose directories haven't changed in a while
+   When two directory iterators walk the whole repo one after the other
+   Then only the first lists the directories and both walk the same prompts
+   """
+   # Arrange
+   repoPath = tmp_path/TEST_REPO
+   populate_dir_with(repoPath, FS_STATE)
+   age_directories(repoPath, repoPath/"2024-01-14", repoPath/"2024-01-13")
+
+   # Act
+   first = [directory.prompt for directory in DirectoryIterator(repoPath)]
+   second = [directory.prompt for directory in DirectoryIterator(repoPath)]
+
+   # Assert
+   assert first == second == ["Sad rat", "Shrek", "Donkey"]
+   assert (LISTING_CACHE.misses, LISTING_CACHE.hits) == (3, 3)
+
+
+def test_changed_directory_is_listed_again(tmp_path: Path):
+   """
+   Given a cached listing of a repo
+   When a date is added to the repo
+   Then the listing is made again with the new date
+   """
+   # Arrange
+   repoPath = tmp_path/TEST_REPO
+   populate_dir_with(repoPath, FS_STATE)
+   age_directories(repoPath)
+   cache = ListingCache()
+   cache.get_listing(repoPath, list_date_directories)
+
+   # Act
+   (repoPath/"2024-01-15").mkdir()
+   listing = cache.get_listing(repoPath, list_date_directories)
+
+   # Assert
+   assert listing == ("2024-01-15", "2024-01-14", "2024-01-13")
+   assert (cache.misses, cache.hits) == (2, 0)
+
+
+def test_least_recently_used_listings_evicted(tmp_path: Path):
+   """
+   Given a cache that holds at most 3 names
+   When the dates of a repo (2 names) and then the time prompts of a date (2 names) are listed
+   Then the dates are evicted to make room for the time prompts
+   """
+   # Arrange
+   repoPath = tmp_path/TEST_REPO
+   populate_dir_with(repoPath, FS_STATE)
+   age_directories(repoPath, repoPath/"2024-01-14")
+   cache = ListingCache(maxNames=3)
+
+   # Act
+   cache.get_listing(repoPath, list_date_directories)
+   cache.get_listing(repoPath/"2024-01-14", list_date_directories)
+   cache.get_listing(repoPath, list_date_directories)
+
+   # Assert
+   assert (cache.misses, cache.hits) == (3, 0)
+   assert (len(cache), cache.numNames) == (1, 2)
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from repoManager.MergedIterator import MergedIterator
+from repoManager.Models import ImagePromptDirectory
+from repoManager.RepoManager import RepoManager
+from utils.enums import DIRECTION, LOAD_MODE
+from utils_for_test import populate_dir_with
+
+
+DALLE_STATE = {
+   "2024-01-14": {
+      "03:03:45.000000_Shrek": ["1.png"],
+      "01:01:01.000000_Fiona": ["1.png"],
+   },
+   "2024-01-12": {
+      "05:05:05.000000_Donkey": ["1.png"],
+   },
+}
+OTHER_STATE = {
+   "2024-01-14": {
+      "02:02:02.000000_Puss": ["1.png"],
+   },
+   "2024-01-13": {
+      "04:04:04.000000_Dragon": ["1.png"],
+      "03:03:03.000000_Farquaad": ["1.png"],
+   },
+}
+MERGED_ORDER = ["Shrek", "Puss", "Fiona", "Dragon", "Farquaad", "Donkey"]
+
+
+def get_prompts(result):
+   return [imagePromptResult.prompt for imagePromptResult in result.results]
+
+
+def test_merged_iterator_orders_across_iterators():
+   """
+   Given two repo iterators each in their own order
+   When merged going backwards
+   Then prompt directories come out oldest first across both
+   """
+   # Arrange
+   first = [ImagePromptDirectory(prompt="a", repo="first", date="2024-01-01", time="01"), ImagePromptDirectory(prompt="c", repo="first", date="2024-01-03", time="01")]
+   second = [ImagePromptDirectory(prompt="b", repo="second", date="2024-01-02", time="01")]
+
+   # Act
+   merged = MergedIterator({ "first": iter(first), "second": iter(second) }, direction=DIRECTION.BACKWARD)
+
+   # Assert
+   assert [directory.prompt for directory in merged] == ["a", "b", "c"]
+
+
+def test_merged_pages_forward_across_repos(tmp_path: Path):
+   """
+   Given two repos with interleaved dates
+   When paging forward through the merged view
+   Then every prompt directory is seen once in global date/time order
+   """
+   # Arrange
+   populate_dir_with(tmp_path/"Dall-e", DALLE_STATE)
+   populate_dir_with(tmp_path/"Other", OTHER_STATE)
+   repoManager = RepoManager(tmp_path, "Dall-e")
+
+   # Act
+   firstPage = repoManager.get_merged_images(4, loadMode=LOAD_MODE.METADATA)
+   secondPage = repoManager.get_merged_images(4, token=firstPage.nextToken, loadMode=LOAD_MODE.METADATA)
+
+   # Assert
+   assert get_prompts(firstPage) + get_prompts(secondPage) == MERGED_ORDER
+   assert [result.repo for result in firstPage.results] == ["Dall-e", "Other", "Dall-e", "Other"]
+   assert firstPage.nextToken.positions["Dall-e"].prompt == "Fiona"
+   assert firstPage.nextToken.positions["Other"].prompt == "Dragon"
+   assert secondPage.nextToken is None
+
+
+def test_merged_pages_backward_like_get_images(tmp_path: Path):
+   """
+   Given a client on the third page of the merged view
+   When it pages backward twice with its left bookmarks
+   Then it gets the second and then the first page back
+   """
+   # Arrange
+   populate_dir_with(tmp_path/"Dall-e", DALLE_STATE)
+   populate_dir_with(tmp_path/"Other", OTHER_STATE)
+   repoManager = RepoManager(tmp_path, "Dall-e", useCatalog=True)
+   firstPage = repoManager.get_merged_images(2, loadMode=LOAD_MODE.METADATA)
+   secondPage = repoManager.get_merged_images(2, token=firstPage.nextToken, loadMode=LOAD_MODE.METADATA)
+
+   # Act
+   backToSecondPage = repoManager.get_merged_images(2, token=secondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.METADATA)
+   backToFirstPage = repoManager.get_merged_images(2, token=backToSecondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.METADATA)
+
+   # Assert
+   assert get_prompts(backToSecondPage) == ["Fiona", "Dragon"]
+   assert get_prompts(backToFirstPage) == ["Shrek", "Puss"]
+   assert backToFirstPage.nextToken is None
@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from repoManager.Mirror import read_mirror_manifest, sync_repo
+from repoManager.RepoManager import RepoManager
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Shrek": ["1.png"],
+      "04:04:04.000000_Fiona": ["1.png", "2.png"],
+   },
+   "2024-01-13": {
+      "03:03:03.000000_Donkey": ["1.png"],
+   },
+}
+
+
+def list_files(path: Path):
+   return sorted(filePath.relative_to(path).as_posix() for filePath in path.rglob("*") if filePath.is_file() and not any(part.startswith(".") for part in filePath.relative_to(path).parts))
+
+
+def test_mirror_only_copies_changes_and_propagates_deletes(tmp_path: Path):
+   """
+   Given a repo mirrored to a target directory
+   When an image is changed, one is touched, a prompt directory is removed and the repo is mirrored again
+   Then only the changed image is copied, the touched one is hashed rather then copied and the removed one is deleted from the target
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   targetPath = tmp_path/"usb"
+   firstResult = repoManager.mirror(targetPath)
+   repoPath = tmp_path/TEST_REPO
+   (repoPath/"2024-01-14"/"05:05:05.000000_Shrek"/"1.png").write_bytes(b"changed")
+   os.utime(repoPath/"2024-01-14"/"04:04:04.000000_Fiona"/"1.png", ns=(0, 0))
+   for filePath in (repoPath/"2024-01-13"/"03:03:03.000000_Donkey").iterdir():
+      filePath.unlink()
+   (repoPath/"2024-01-13"/"03:03:03.000000_Donkey").rmdir()
+
+   # Act
+   secondResult = repoManager.mirror(targetPath)
+
+   # Assert
+   assert (firstResult.copied, firstResult.deleted) == (4, 0)
+   assert (secondResult.copied, secondResult.unchanged, secondResult.deleted) == (1, 2, 1)
+   assert list_files(targetPath) == list_files(repoPath)
+   assert not (targetPath/"2024-01-13").exists()
+   assert (targetPath/"2024-01-14"/"05:05:05.000000_Shrek"/"1.png").read_bytes() == b"changed"
+   assert len(read_mirror_manifest(targetPath)) == 3
+
+
+def test_interrupted_mirror_resumes(tmp_path: Path):
+   """
+   Given a mirror interrupted after its first copy
+   When mirrored again
+   Then only the files that weren't copied yet are copied
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   def interrupt(done, total):
+      raise KeyboardInterrupt()
+
+   # Act
+   with pytest.raises(KeyboardInterrupt):
+      sync_repo(tmp_path/TEST_REPO, tmp_path/"usb", maxWorkers=1, onProgress=interrupt)
+   resumedResult = sync_repo(tmp_path/TEST_REPO, tmp_path/"usb", maxWorkers=1)
+   verifiedResult = sync_repo(tmp_path/TEST_REPO, tmp_path/"usb", verify=True)
+
+   # Assert
+   assert resumedResult.copied < 4
+   assert resumedResult.copied + resumedResult.unchanged == 4
+   assert verifiedResult.copied == 0
+   assert list_files(tmp_path/"usb") == list_files(tmp_path/TEST_REPO)
@@ -0,0 +1,35 @@
+import pickle
+
+import pytest
+
+from decorators.decorators import get_fields
+from repoManager.Models import DeleteImagePrompsRequest, ImagePromptDirectory, ImagePrompResult, NextToken
+
+
+def test_records_are_slotted_immutable_and_hashable():
+   """
+   Given records made from the same fields
+   When compared, hashed, changed, pickled and printed
+   Then they're equal and hash the same, can't be changed, survive pickling and print their fields without a __dict__
+   """
+   # Arrange
+   directory = ImagePromptDirectory(prompt="Shrek", repo="testRepo", date="2024-01-14", time="03:03:45.000000")
+   result = ImagePrompResult(prompt="Shrek", repo="testRepo", date="2024-01-14", time="03:03:45.000000", num="1", images=[b"image"])
+
+   # Act
+   sameDirectory = ImagePromptDirectory(prompt="Shrek", repo="testRepo", date="2024-01-14", time="03:03:45.000000")
+   token = NextToken(prompt="Shrek", repo="testRepo", date="2024-01-14", time="03:03:45.000000")
+   request = DeleteImagePrompsRequest(prompt="Shrek", repo="testRepo", date="2024-01-14", time="03:03:45.000000", nums=["1"])
+
+   # Assert
+   assert directory == sameDirectory and hash(directory) == hash(sameDirectory)
+   assert directory != token
+   assert len({ directory, sameDirectory, token }) == 2
+   assert hash(result) == hash(pickle.loads(pickle.dumps(result)))
+   assert pickle.loads(pickle.dumps(request)) == request
+   assert request.nums == ("1",)
+   assert not hasattr(directory, "__dict__")
+   with pytest.raises(AttributeError):
+      directory.prompt = "Fiona"
+   assert get_fields(directory) == { "prompt": "Shrek", "repo": "testRepo", "date": "2024-01-14", "time": "03:03:45.000000" }
+   assert str(result).startswith("ImagePrompResult(prompt=Shrek, repo=testRepo, date=2024-01-14, time=03:03:45.000000, num=1, images=")
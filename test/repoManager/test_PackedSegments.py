@@ -0,0 +1,190 @@
+import threading
+from datetime import date as Date
+from pathlib import Path
+
+from repoManager.DirectoryIterator import DirectoryIterator
+from repoManager.Models import DeleteImagePrompsRequest
+from repoManager.PackedSegments import PackedSegment, SegmentStore, generate_pack_path, pack_date
+from repoManager.RepoManager import RepoManager
+from utils.enums import LOAD_MODE
+from utils.pathingUtils import get_project_root
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+TEST_IMAGE = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+FS_STATE = {
+   "2024-01-14": {
+      "03:03:45.000000_Shrek": ["1.png"],
+   },
+   "2023-01-13": {
+      "02:02:02.000000_Donkey": ["1.png", "2.png"],
+      "01:01:01.000000_Fiona": ["1.png"],
+   },
+}
+
+
+def test_packed_date_stays_browsable(tmp_path: Path):
+   """
+   Given a repo with an old date
+   When dates older then 90 days are packed
+   Then the old date directory is replaced by a segment and pages read the same images out of it
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+
+   # Act
+   numPacked = repoManager.segments.pack_old_dates(90, today=Date(2024, 1, 20)).result()
+   eagerResult = repoManager.get_images(5)
+   lazyResult = repoManager.get_images(5, loadMode=LOAD_MODE.LAZY)
+
+   # Assert
+   assert numPacked == 1
+   assert not (tmp_path/TEST_REPO/"2023-01-13").exists()
+   assert generate_pack_path(tmp_path/TEST_REPO, "2023-01-13").exists()
+   assert [result.prompt for result in eagerResult.results] == ["Shrek", "Donkey", "Fiona"]
+   assert [len(result.images) for result in eagerResult.results] == [1, 2, 1]
+   assert eagerResult.results[1].images[1] == TEST_IMAGE.read_bytes()
+   assert lazyResult.results[2].images[0].read_bytes() == TEST_IMAGE.read_bytes()
+   assert lazyResult.results[2].images[0].is_current()
+
+
+def test_iterator_merges_packed_and_unpacked_dates(tmp_path: Path):
+   """
+   Given a date that is packed but also has a new directory written to it afterwards
+   When the repo is iterated
+   Then time prompts from the segment and the directory come out in order
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   pack_date(tmp_path/TEST_REPO, "2023-01-13")
+   populate_dir_with(tmp_path/TEST_REPO, { "2023-01-13": { "01:30:00.000000_Puss": ["1.png"] } })
+
+   # Act
+   iterator = DirectoryIterator(tmp_path/TEST_REPO, segments=SegmentStore(tmp_path/TEST_REPO))
+
+   # Assert
+   assert [directory.prompt for directory in iterator] == ["Shrek", "Donkey", "Puss", "Fiona"]
+
+
+def test_delete_from_packed_date_removes_segment(tmp_path: Path):
+   """
+   Given a packed date
+   When all of its images are deleted
+   Then the deletes are tombstoned right away and the emptied segment is removed in the background
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   pack_date(tmp_path/TEST_REPO, "2023-01-13")
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=True)
+
+   # Act
+   results = repoManager.delete_images([
+      DeleteImagePrompsRequest(prompt="Donkey", repo=TEST_REPO, date="2023-01-13", time="02:02:02.000000", nums=["1", "2"]),
+      DeleteImagePrompsRequest(prompt="Fiona", repo=TEST_REPO, date="2023-01-13", time="01:01:01.000000", nums=["1", "2"]),
+   ])
+   pageResult = repoManager.get_images(5)
+   repoManager.segments.wait()
+
+   # Assert
+   assert [result.numDeleted for result in results] == [2, 1]
+   assert all(result.directoryRemoved for result in results)
+   assert [result.prompt for result in pageResult.results] == ["Shrek"]
+   assert not generate_pack_path(tmp_path/TEST_REPO, "2023-01-13").exists()
+   assert repoManager.check_catalog().is_consistent()
+
+
+def test_delete_waits_for_packing(tmp_path: Path):
+   """
+   Given a date being packed
+   When one of its images is deleted from the gallery while the date is read into its segment
+   Then the delete waits for the packing and removes the image from the segment instead of being undone by it
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   request = DeleteImagePrompsRequest(prompt="Donkey", repo=TEST_REPO, date="2023-01-13", time="02:02:02.000000", nums=["2"])
+   results = []
+
+   # Act
+   with repoManager.segments.writeLock:
+      deleter = threading.Thread(target=lambda: results.extend(repoManager.delete_images([request])))
+      deleter.start()
+      deleter.join(0.2)
+      waitedForPacking = deleter.is_alive()
+      pack_date(tmp_path/TEST_REPO, "2023-01-13")
+   deleter.join()
+
+   # Assert
+   assert waitedForPacking
+   assert results[0].numDeleted == 1
+   assert PackedSegment(tmp_path/TEST_REPO, "2023-01-13").list_image_files("02:02:02.000000_Donkey") == ["1.png"]
+
+
+def test_unpack_restores_date_directories(tmp_path: Path):
+   """
+   Given a packed date with one of its images deleted from the segment
+   When it's unpacked
+   Then the date directory has every live file back, the segment is gone and the repo pages the same as before packing
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   repoManager.segments.pack_old_dates(90, today=Date(2024, 1, 20)).result()
+   repoManager.delete_images([DeleteImagePrompsRequest(prompt="Donkey", repo=TEST_REPO, date="2023-01-13", time="02:02:02.000000", nums=["2"])])
+
+   # Act
+   numUnpacked = repoManager.unpack_dates().result()
+   pageResult = repoManager.get_images(5)
+
+   # Assert
+   assert numUnpacked == 1
+   assert not generate_pack_path(tmp_path/TEST_REPO, "2023-01-13").exists()
+   assert sorted(path.name for path in (tmp_path/TEST_REPO/"2023-01-13"/"02:02:02.000000_Donkey").iterdir()) == ["1.png"]
+   assert (tmp_path/TEST_REPO/"2023-01-13"/"01:01:01.000000_Fiona"/"1.png").read_bytes() == TEST_IMAGE.read_bytes()
+   assert [result.prompt for result in pageResult.results] == ["Shrek", "Donkey", "Fiona"]
+
+
+def test_packing_off_by_default_and_done_in_background(tmp_path: Path):
+   """
+   Given a repo with an old date
+   When repo managers are made with and without an age to pack dates after
+   Then only the one given an age packs the old date, once the repo has been counted
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+
+   # Act
+   defaultRepoManager = RepoManager(tmp_path, TEST_REPO)
+   defaultRepoManager.close()
+   packedByDefault = generate_pack_path(tmp_path/TEST_REPO, "2023-01-13").exists()
+   repoManager = RepoManager(tmp_path, TEST_REPO, packAfterDays=90)
+   repoManager.close()
+
+   # Assert
+   assert not packedByDefault
+   assert generate_pack_path(tmp_path/TEST_REPO, "2023-01-13").exists()
+   assert not (tmp_path/TEST_REPO/"2023-01-13").exists()
+
+
+def test_compaction_keeps_live_entries(tmp_path: Path):
+   """
+   Given a segment with one of its prompts tombstoned
+   When the segment store compacts it
+   Then only the live prompt is left in the rewritten segment
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   pack_date(tmp_path/TEST_REPO, "2023-01-13")
+   segments = SegmentStore(tmp_path/TEST_REPO)
+
+   # Act
+   segments.delete("2023-01-13", "02:02:02.000000_Donkey", ["1.png", "2.png"])
+   segments.wait()
+   segment = PackedSegment(tmp_path/TEST_REPO, "2023-01-13")
+
+   # Assert
+   assert segment.list_time_prompts() == ["01:01:01.000000_Fiona"]
+   assert segment.deletedBytes == 0
+   assert segment.read("01:01:01.000000_Fiona", "1.png") == TEST_IMAGE.read_bytes()
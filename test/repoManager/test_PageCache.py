@@ -0,0 +1,208 @@
+from pathlib import Path
+
+from repoManager.Models import DeleteImagePrompsRequest, GetImagePrompsResult, ImagePrompResult
+from repoManager.PageCache import PageCache, generate_page_key
+from repoManager.RepoManager import RepoManager
+from utils.enums import DIRECTION, LOAD_MODE
+
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+
+
+FS_STATE = {
+   "2024-01-14": {
+      "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+      "01:03:45.522668_Donkey Eat Chips": ["1.png"]
+   },
+   "2024-01-13": {
+      "03:03:45.522668_Fiona Eat Chips": ["1.png"],
+      "02:03:45.522668_Puss Eat Chips": ["1.png"],
+   },
+   "2024-01-12": {
+      "03:03:45.522668_Dragon Eat Chips": ["1.png"],
+   }
+}
+
+
+def generate_result(date: str, imageBytes: bytes = b"") -> GetImagePrompsResult:
+   return GetImagePrompsResult([ImagePrompResult(prompt="Shrek", repo=TEST_REPO, date=date, time="01:00:00.000000", num=1, images=[imageBytes])])
+
+
+def test_repeated_page_served_from_cache(tmp_path: Path):
+   """
+   Given a repo manager with a page cache
+   When the same page requested twice
+   Then the second request is a cache hit returning the same page
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024)
+
+   # Act
+   firstPage = repoManager.get_images(2, loadMode=LOAD_MODE.LAZY)
+   secondPage = repoManager.get_images(2, loadMode=LOAD_MODE.LAZY)
+
+   # Assert
+   assert secondPage is firstPage
+   stats = repoManager.page_cache_stats()
+   assert stats.hits == 1
+   assert stats.misses == 1
+
+
+def test_delete_only_invalidates_pages_of_modified_date(tmp_path: Path):
+   """
+   Given cached pages across several dates
+   When an entry is deleted from the oldest date
+   Then only pages depending on that date are reloaded
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024)
+   firstPage = repoManager.get_images(2, loadMode=LOAD_MODE.LAZY)
+   secondPage = repoManager.get_images(2, firstPage.nextToken, loadMode=LOAD_MODE.LAZY)
+   lastPage = repoManager.get_images(2, secondPage.nextToken, loadMode=LOAD_MODE.LAZY)
+
+   # Act
+   repoManager.delete_image(DeleteImagePrompsRequest(prompt="Dragon Eat Chips", repo=TEST_REPO, date="2024-01-12", time="03:03:45.522668", nums=["1"]))
+
+   # Assert
+   assert repoManager.get_images(2, loadMode=LOAD_MODE.LAZY) is firstPage
+   assert repoManager.get_images(2, firstPage.nextToken, loadMode=LOAD_MODE.LAZY) is secondPage
+   reloadedLastPage = repoManager.get_images(2, secondPage.nextToken, loadMode=LOAD_MODE.LAZY)
+   assert reloadedLastPage is not lastPage
+   assert reloadedLastPage.results == []
+
+
+def test_save_invalidates_first_page(tmp_path: Path):
+   """
+   Given a cached first page
+   When a new image is saved
+   Then the first page is reloaded with the new image
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024)
+   repoManager.get_images(2)
+
+   # Act
+   repoManager.save_image("Sad rat", (tmp_path/TEST_REPO/"2024-01-12"/"03:03:45.522668_Dragon Eat Chips"/"1.png").read_bytes())
+   page = repoManager.get_images(2)
+
+   # Assert
+   assert page.results[0].prompt == "Sad rat"
+
+
+def test_backward_page_range(tmp_path: Path):
+   """
+   Given a cached backward page that reached the most recent entry
+   When an image is saved
+   Then the backward page is invalidated
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024)
+   firstPage = repoManager.get_images(2, loadMode=LOAD_MODE.LAZY)
+   secondPage = repoManager.get_images(2, firstPage.nextToken, loadMode=LOAD_MODE.LAZY)
+   backPage = repoManager.get_images(4, secondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.LAZY)
+   cachedBackPage = repoManager.get_images(4, secondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.LAZY)
+
+   # Act
+   repoManager.save_image("Sad rat", (tmp_path/TEST_REPO/"2024-01-12"/"03:03:45.522668_Dragon Eat Chips"/"1.png").read_bytes())
+
+   # Assert
+   assert backPage.nextToken is None
+   assert cachedBackPage is backPage
+   assert repoManager.get_images(4, secondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.LAZY) is not backPage
+
+
+def test_backward_page_depends_on_date_of_next_token(tmp_path: Path):
+   """
+   Given a cached backward page whose next token points at an entry on a later date then any of its results
+   When that entry is deleted
+   Then the backward page is invalidated and its next token points at the entry now after it
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024)
+   firstPage = repoManager.get_images(2, loadMode=LOAD_MODE.LAZY)
+   secondPage = repoManager.get_images(2, firstPage.nextToken, loadMode=LOAD_MODE.LAZY)
+   backPage = repoManager.get_images(2, secondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.LAZY)
+   cachedBackPage = repoManager.get_images(2, secondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.LAZY)
+
+   # Act
+   repoManager.delete_images([DeleteImagePrompsRequest(prompt="Donkey Eat Chips", repo=TEST_REPO, date="2024-01-14", time="01:03:45.522668", nums=["1"])])
+   newBackPage = repoManager.get_images(2, secondPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.LAZY)
+
+   # Assert
+   assert cachedBackPage is backPage
+   assert backPage.nextToken.prompt == "Donkey Eat Chips"
+   assert newBackPage is not backPage
+   assert newBackPage.nextToken.prompt == "Shrek Eat Chips"
+
+
+def test_page_by_number_leaves_cached_page_unchanged(tmp_path: Path):
+   """
+   Given a cached page gotten by paging forward
+   When the same page is gotten by its number
+   Then the page has a previous token while the cached page doesn't
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024)
+   firstPage = repoManager.get_images(3, loadMode=LOAD_MODE.LAZY)
+   secondPage = repoManager.get_images(3, firstPage.nextToken, loadMode=LOAD_MODE.LAZY)
+
+   # Act
+   numberedPage = repoManager.get_page(2, 3, loadMode=LOAD_MODE.LAZY)
+
+   # Assert
+   assert numberedPage is not secondPage
+   assert numberedPage.results == secondPage.results
+   assert numberedPage.previousToken is not None
+   assert secondPage.previousToken is None
+   assert repoManager.get_images(3, firstPage.nextToken, loadMode=LOAD_MODE.LAZY) is secondPage
+
+
+def test_evicts_least_recently_used_within_byte_budget():
+   """
+   Given a page cache with room for two pages
+   When a third page is cached
+   Then the least recently used page is evicted
+   """
+   # Arrange
+   cache = PageCache(maxBytes=3200)
+   keys = [generate_page_key(TEST_REPO, None, DIRECTION.FORWARD, number, LOAD_MODE.EAGER) for number in range(3)]
+   cache.put(keys[0], generate_result("2024-01-14", b"0" * 1000), None, None)
+   cache.put(keys[1], generate_result("2024-01-13", b"0" * 1000), None, None)
+   cache.get(keys[0])
+
+   # Act
+   cache.put(keys[2], generate_result("2024-01-12", b"0" * 1000), None, None)
+
+   # Assert
+   assert cache.contains(keys[0])
+   assert not cache.contains(keys[1])
+   assert cache.contains(keys[2])
+   assert cache.stats().evictions == 1
+
+
+def test_stale_put_rejected():
+   """
+   Given a page loaded before an invalidation
+   When the page is put with the version read before loading
+   Then the page isn't cached
+   """
+   # Arrange
+   cache = PageCache(maxBytes=3000)
+   key = generate_page_key(TEST_REPO, None, DIRECTION.FORWARD, 2, LOAD_MODE.EAGER)
+   version = cache.version
+
+   # Act
+   cache.invalidate_date(TEST_REPO, "2024-01-14")
+   cached = cache.put(key, generate_result("2024-01-14"), None, None, version=version)
+
+   # Assert
+   assert cached is False
+   assert not cache.contains(key)
@@ -0,0 +1,120 @@
+import threading
+from pathlib import Path
+
+from repoManager.Prefetcher import PagePrefetcher
+from repoManager.RepoManager import RepoManager
+from utils.enums import DIRECTION, LOAD_MODE
+
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+
+
+FS_STATE = {
+   "2024-01-14": {
+      "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+      "01:03:45.522668_Donkey Eat Chips": ["1.png"]
+   },
+   "2024-01-13": {
+      "03:03:45.522668_Fiona Eat Chips": ["1.png"],
+      "02:03:45.522668_Puss Eat Chips": ["1.png"],
+   },
+   "2024-01-12": {
+      "03:03:45.522668_Dragon Eat Chips": ["1.png"],
+   }
+}
+
+
+def test_adjacent_pages_served_from_cache(tmp_path: Path):
+   """
+   Given a client on the second page
+   When adjacent pages prefetched and then requested
+   Then both adjacent pages are cache hits matching what would have been loaded
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024)
+   firstPage = repoManager.get_images(2, loadMode=LOAD_MODE.LAZY)
+   secondPage = repoManager.get_images(2, firstPage.nextToken, loadMode=LOAD_MODE.LAZY)
+
+   # Act
+   repoManager.prefetch_adjacent_pages(2, forwardToken=secondPage.nextToken, backwardToken=firstPage.nextToken, loadMode=LOAD_MODE.LAZY)
+   repoManager.prefetcher.wait()
+   hitsBefore = repoManager.page_cache_stats().hits
+   nextPage = repoManager.get_images(2, secondPage.nextToken, loadMode=LOAD_MODE.LAZY)
+   previousPage = repoManager.get_images(2, firstPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.LAZY)
+
+   # Assert
+   assert repoManager.page_cache_stats().hits == hitsBefore + 2
+   assert [result.prompt for result in nextPage.results] == ["Dragon Eat Chips"]
+   assert [result.prompt for result in previousPage.results] == ["Shrek Eat Chips", "Donkey Eat Chips"]
+
+
+def test_prefetch_without_page_cache_does_nothing(tmp_path: Path):
+   """
+   Given a repo manager without a page cache
+   When adjacent pages prefetched
+   Then nothing is loaded in the background
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   firstPage = repoManager.get_images(2)
+
+   # Act
+   repoManager.prefetch_adjacent_pages(2, forwardToken=firstPage.nextToken)
+
+   # Assert
+   assert repoManager.prefetcher is None
+
+
+def test_cancel_pending_only_cancels_queued_loads():
+   """
+   Given a prefetcher with one running load and one queued load
+   When pending loads cancelled
+   Then only the queued load is cancelled
+   """
+   # Arrange
+   prefetcher = PagePrefetcher(maxWorkers=1)
+   started = threading.Event()
+   release = threading.Event()
+   def blockingLoad():
+      started.set()
+      release.wait()
+      return "running"
+
+   running = prefetcher.submit("running", blockingLoad)
+   started.wait()
+   queued = prefetcher.submit("queued", lambda: "queued")
+
+   # Act
+   numCancelled = prefetcher.cancel_pending()
+   release.set()
+
+   # Assert
+   assert numCancelled == 1
+   assert queued.cancelled()
+   assert running.result() == "running"
+   prefetcher.shutdown()
+   assert prefetcher.get_in_flight("running") is None
+
+
+def test_same_page_submitted_once():
+   """
+   Given a page already queued
+   When the same page submitted again
+   Then the existing load is reused
+   """
+   # Arrange
+   prefetcher = PagePrefetcher(maxWorkers=1)
+   release = threading.Event()
+
+   # Act
+   first = prefetcher.submit("page", release.wait)
+   second = prefetcher.submit("page", release.wait)
+   release.set()
+
+   # Assert
+   assert first is second
+   prefetcher.shutdown()
@@ -0,0 +1,154 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from repoManager.Catalog import SCHEMA, RepoCatalog
+from repoManager.Models import ImagePromptDirectory
+from repoManager.PromptSearch import SearchIterator, build_match_query, prompt_matches
+from repoManager.RepoManager import RepoManager
+from utils.enums import DIRECTION, LOAD_MODE
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Sad rat": ["1.png"],
+      "04:04:04.000000_Happy cat": ["1.png"],
+      "03:03:03.000000_Sad cat": ["1.png"],
+   },
+   "2024-01-13": {
+      "02:02:02.000000_Rats in sad hats": ["1.png"],
+      "01:01:01.000000_Mom yelling": ["1.png"],
+   },
+}
+
+
+def get_prompts(result):
+   return [imagePromptResult.prompt for imagePromptResult in result.results]
+
+
+def test_prompt_matching():
+   """
+   Given a query typed by a user
+   When matched against prompts
+   Then every word of the query has to start a word of the prompt regardless of case
+   """
+   # Assert
+   assert prompt_matches("Sad rat", "sad ra")
+   assert prompt_matches("Rats in sad hats", "RAT sad")
+   assert not prompt_matches("Sad cat", "sad rat")
+   assert prompt_matches("sad_rat", "rat")
+   assert prompt_matches("Crème brûlée", "creme brulee")
+   assert build_match_query("sad \"rat") == '"sad"* "rat"*'
+   assert build_match_query("  !? ") is None
+
+
+@pytest.mark.parametrize("useCatalog", [True, False])
+def test_search_pages_like_get_images(tmp_path: Path, useCatalog: bool):
+   """
+   Given a repo with and without a catalog
+   When searching for "sad rat" a page at a time forward and then back
+   Then only matching prompts are returned, most recent first, with the same token behavior as get_images
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=useCatalog)
+
+   # Act
+   firstPage = repoManager.search_images("sad rat", 1, loadMode=LOAD_MODE.METADATA)
+   secondPage = repoManager.search_images("sad rat", 1, token=firstPage.nextToken, loadMode=LOAD_MODE.METADATA)
+   thirdPage = repoManager.search_images("sad rat", 1, token=secondPage.nextToken, loadMode=LOAD_MODE.METADATA)
+   backToFirstPage = repoManager.search_images("sad rat", 1, token=firstPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.METADATA)
+
+   # Assert
+   assert get_prompts(firstPage) == ["Sad rat"]
+   assert get_prompts(secondPage) == ["Rats in sad hats"]
+   assert get_prompts(thirdPage) == []
+   assert get_prompts(backToFirstPage) == ["Sad rat"]
+
+
+def test_search_index_follows_catalog_changes(tmp_path: Path):
+   """
+   Given a catalog with a prompt directory in it
+   When the directory is replaced, another is added and the first is removed
+   Then the search index has exactly the directories left in the catalog
+   """
+   # Arrange
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   sadRat = ImagePromptDirectory(prompt="Sad rat", repo=TEST_REPO, date="2024-01-14", time="05:05:05.000000")
+   sadCat = ImagePromptDirectory(prompt="Sad cat", repo=TEST_REPO, date="2024-01-14", time="03:03:03.000000")
+
+   # Act
+   catalog.add_directory(sadRat, 1)
+   catalog.add_directory(sadRat, 2)
+   catalog.apply_changes(updated=[(sadCat, 1)], removed=[sadRat])
+
+   # Assert
+   assert [directory.prompt for directory in SearchIterator(catalog, TEST_REPO, "sad")] == ["Sad cat"]
+   assert catalog.connection.execute("SELECT COUNT(*) FROM prompt_search").fetchone()[0] == 1
+
+
+def test_existing_catalog_gets_search_index(tmp_path: Path):
+   """
+   Given a catalog made before it had a search index
+   When it's opened
+   Then its prompts are indexed for searching
+   """
+   # Arrange
+   connection = sqlite3.connect(tmp_path/"catalog.sqlite3")
+   connection.executescript(SCHEMA)
+   connection.execute("INSERT INTO prompts VALUES (?, ?, ?, ?, ?, ?)", (TEST_REPO, "2024-01-14", "05:05:05.000000_Sad rat", "05:05:05.000000", "Sad rat", 1))
+   connection.commit()
+   connection.close()
+
+   # Act
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+
+   # Assert
+   assert [directory.prompt for directory in SearchIterator(catalog, TEST_REPO, "rat")] == ["Sad rat"]
+
+
+@pytest.mark.parametrize("query", ["shrek", "swamp", "creme", "CRÈME brûlée", "garcon", "Ωραίο", "ωραιο", "ogre_", "σπιτι"])
+def test_prompt_matching_tokenizes_like_catalog(tmp_path: Path, query: str):
+   """
+   Given prompts with underscores, diacritics and non latin scripts in a catalog
+   When matched in memory and searched for in the catalog
+   Then both find the same prompts
+   """
+   # Arrange
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   prompts = ["shrek_in_swamp", "Crème brûlée", "Garçon", "Ωραίο σπίτι", "ΣΠΙΤΙ"]
+   for i, prompt in enumerate(prompts):
+      catalog.add_directory(ImagePromptDirectory(prompt=prompt, repo=TEST_REPO, date="2024-01-14", time=f"0{i}:00:00.000000"), 1)
+
+   # Act
+   matchedInMemory = {prompt for prompt in prompts if prompt_matches(prompt, query)}
+   matchedInCatalog = {directory.prompt for directory in SearchIterator(catalog, TEST_REPO, query)}
+
+   # Assert
+   assert matchedInMemory == matchedInCatalog
+
+
+def test_search_iterator_take_and_advance_mixed_with_next(tmp_path: Path):
+   """
+   Given a catalog with prompts matching a query among others
+   When the search iterator is advanced, taken from and nexted with a small batch size
+   Then the matches come out in order as though only next was called
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   catalog = RepoCatalog(tmp_path/"catalog.sqlite3")
+   catalog.rebuild(tmp_path/TEST_REPO)
+   iterator = SearchIterator(catalog, TEST_REPO, "sad", batchSize=2)
+
+   # Act
+   skipped = iterator.advance(1)
+   taken = [directory.prompt for directory in iterator.take(1)]
+   remaining = [directory.prompt for directory in iterator]
+
+   # Assert
+   assert skipped == 1
+   assert taken == ["Sad cat"]
+   assert remaining == ["Rats in sad hats"]
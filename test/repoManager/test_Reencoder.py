@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from repoManager.Reencoder import reencode_repo
+from repoManager.RepoManager import RepoManager
+from utils.enums import LOAD_MODE
+from utils.imageFormats import detect_image_format
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Sad rat": ["1.png"],
+      "04:04:04.000000_Happy cat": ["1.png", "2.png"],
+   },
+}
+
+
+def test_reencode_repo_shrinks_images_and_keeps_them_readable(tmp_path: Path):
+   """
+   Given a repo of PNG images
+   When it's re-encoded as lossless WEBP twice
+   Then every image is replaced by a smaller WEBP the repo still reads, and the second run skips them all
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+
+   # Act
+   result = reencode_repo(tmp_path/TEST_REPO, "webp-lossless", maxWorkers=1)
+   rerunResult = reencode_repo(tmp_path/TEST_REPO, "webp-lossless", maxWorkers=1)
+   page = RepoManager(tmp_path, TEST_REPO).get_images(2, loadMode=LOAD_MODE.EAGER)
+
+   # Assert
+   assert result.reencoded == 3
+   assert result.bytes_saved() > 0
+   assert result.failed == []
+   assert rerunResult.reencoded == 0 and rerunResult.skipped == 3
+   assert sorted(path.name for path in (tmp_path/TEST_REPO/"2024-01-14"/"04:04:04.000000_Happy cat").iterdir()) == ["1.webp", "2.webp"]
+   assert [detect_image_format(image) for result in page.results for image in result.images] == ["WEBP", "WEBP", "WEBP"]
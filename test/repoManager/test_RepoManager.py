@@ -1,10 +1,12 @@
 
 import io
-from utils.enums import DIRECTION
+from datetime import datetime, timedelta
+from utils.enums import DIRECTION, LOAD_MODE
 
 from PIL import Image
 
 from depdencyInjection.Container import Container
+from repoManager.Models import DeleteImagePrompsRequest, ImageHandle
 from repoManager.RepoManager import RepoManager
 from utils_for_test import populate_fs_with
 from pyfakefs.fake_filesystem import FakeFilesystem 
@@ -253,3 +255,177 @@ def test_backwards_pagination_multi(containerWithMocks: Container, fs: FakeFiles
    assert resultTwo.time == "01:03:45.522668"
    with Image.open(io.BytesIO(resultTwo.images[0])): # if no exception is thrown then the bytes are a proper image
       assert True
+
+
+def test_lazy_get_images(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given single prompt entry
+   When get_images called lazily
+   Then image handles returned which can load the image when asked
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+
+   fsState = {
+      "2024-01-14": { 
+         "03:03:45.522668_Shrek Eat Chips": ["1.png"]
+      }
+   }
+   populate_fs_with(fs,repoManager.current_repo_abs_path(), dateDictStructure=fsState)
+
+   # Act
+   result = repoManager.get_images(2, loadMode=LOAD_MODE.LAZY)
+
+   # Assert
+   [onlyResult] = result.results
+   [handle] = onlyResult.images
+   assert isinstance(handle, ImageHandle)
+   assert handle.path.name == "1.png"
+   assert handle.size == len(handle.read_bytes())
+   assert handle.is_current()
+   with Image.open(io.BytesIO(handle.read_thumbnail(75))) as thumbnail:
+      assert max(thumbnail.size) >= 75
+
+
+def test_metadata_get_images(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given lots of prompt entries
+   When get_images called for metadata only
+   Then entries returned without any images
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+
+   fsState = {
+      "2024-01-14": { 
+         "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+         "01:03:45.522668_Donkey Eat Chips": ["1.png"]
+      },
+   }
+   populate_fs_with(fs,repoManager.current_repo_abs_path(), dateDictStructure=fsState)
+
+   # Act
+   result = repoManager.get_images(1, loadMode=LOAD_MODE.METADATA)
+
+   # Assert
+   [onlyResult] = result.results
+   assert onlyResult.prompt == "Shrek Eat Chips"
+   assert onlyResult.images == []
+   assert result.nextToken is not None
+
+
+def test_delete_images(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given prompt entries across dates
+   When images deleted in bulk, including one from a missing directory
+   Then emptied prompt and date directories removed once and a result returned per request
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+
+   fsState = {
+      "2024-01-14": { 
+         "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+         "01:03:45.522668_Donkey Eat Chips": ["1.png", "2.png"]
+      },
+      "2024-01-13": { 
+         "03:03:45.522668_Fiona Eat Chips": ["1.png"],
+      },
+   }
+   populate_fs_with(fs,repoManager.current_repo_abs_path(), dateDictStructure=fsState)
+   requests = [
+      DeleteImagePrompsRequest(prompt="Shrek Eat Chips", repo="testRepo", date="2024-01-14", time="03:03:45.522668", nums=["1"]),
+      DeleteImagePrompsRequest(prompt="Fiona Eat Chips", repo="testRepo", date="2024-01-13", time="03:03:45.522668", nums=["1"]),
+      DeleteImagePrompsRequest(prompt="Donkey Eat Chips", repo="testRepo", date="2024-01-14", time="01:03:45.522668", nums=["2"]),
+      DeleteImagePrompsRequest(prompt="Puss Eat Chips", repo="testRepo", date="2024-01-14", time="00:03:45.522668", nums=["1"]),
+   ]
+
+   # Act
+   results = repoManager.delete_images(requests)
+
+   # Assert
+   assert [result.numDeleted for result in results] == [1, 1, 1, 0]
+   assert [result.directoryRemoved for result in results] == [True, True, False, False]
+   assert results[2].remainingImages == 1
+   assert results[3].errorMessage is not None
+   assert not (repoManager.current_repo_abs_path()/"2024-01-13").exists()
+   assert [result.prompt for result in repoManager.get_images(5).results] == ["Donkey Eat Chips"]
+
+
+def test_get_images_between(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given prompt entries over several dates
+   When get_images_between paged forward and back over a range cutting through two dates
+   Then only entries within the range are returned, starting straight at the range
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+
+   fsState = {
+      "2024-01-15": { 
+         "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+      },
+      "2024-01-14": { 
+         "23:00:00.000000_Donkey Eat Chips": ["1.png"],
+         "01:03:45.522668_Fiona Eat Chips": ["1.png"],
+      },
+      "2024-01-13": { 
+         "22:00:00.000000_Puss Eat Chips": ["1.png"],
+         "03:03:45.522668_Dragon Eat Chips": ["1.png"],
+      },
+   }
+   populate_fs_with(fs,repoManager.current_repo_abs_path(), dateDictStructure=fsState)
+   start, end = datetime(2024, 1, 13, 12), datetime(2024, 1, 14, 23)
+
+   # Act
+   firstPage = repoManager.get_images_between(start, end, 2, loadMode=LOAD_MODE.METADATA)
+   secondPage = repoManager.get_images_between(start, end, 2, token=firstPage.nextToken, loadMode=LOAD_MODE.METADATA)
+   oldestFirst = repoManager.get_images_between(start, end, 5, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.METADATA)
+   around = repoManager.get_images_around(datetime(2024, 1, 14, 1), timedelta(hours=1), 5, loadMode=LOAD_MODE.METADATA)
+
+   # Assert
+   assert [result.prompt for result in firstPage.results] == ["Donkey Eat Chips", "Fiona Eat Chips"]
+   assert [result.prompt for result in secondPage.results] == ["Puss Eat Chips"]
+   assert secondPage.nextToken is None
+   assert [result.prompt for result in oldestFirst.results] == ["Donkey Eat Chips", "Fiona Eat Chips", "Puss Eat Chips"]
+   assert oldestFirst.nextToken is None
+   assert [result.prompt for result in around.results] == ["Fiona Eat Chips"]
+
+
+def test_iter_images_streams_like_get_images(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given prompt entries over several dates
+   When iterating images from a token in both directions
+   Then results come one at a time in the same order get_images would page them
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+
+   fsState = {
+      "2024-01-14": { 
+         "23:00:00.000000_Donkey Eat Chips": ["1.png"],
+         "01:03:45.522668_Fiona Eat Chips": ["1.png"],
+      },
+      "2024-01-13": { 
+         "22:00:00.000000_Puss Eat Chips": ["1.png"],
+      },
+   }
+   populate_fs_with(fs,repoManager.current_repo_abs_path(), dateDictStructure=fsState)
+   firstPage = repoManager.get_images(1, loadMode=LOAD_MODE.METADATA)
+
+   # Act
+   images = repoManager.iter_images(loadMode=LOAD_MODE.METADATA)
+   first = next(images)
+   afterToken = list(repoManager.iter_images(token=firstPage.nextToken, loadMode=LOAD_MODE.METADATA))
+   backward = list(repoManager.iter_images(token=firstPage.nextToken, direction=DIRECTION.BACKWARD, loadMode=LOAD_MODE.METADATA))
+
+   # Assert
+   assert first.prompt == "Donkey Eat Chips"
+   assert [result.prompt for result in images] == ["Fiona Eat Chips", "Puss Eat Chips"]
+   assert [result.prompt for result in afterToken] == ["Fiona Eat Chips", "Puss Eat Chips"]
+   assert [result.prompt for result in backward] == ["Donkey Eat Chips"]
@@ -0,0 +1,148 @@
+import shutil
+import time
+from pathlib import Path
+from typing import Callable
+
+from repoManager.DirectoryIterator import DirectoryIterator
+from repoManager.RepoManager import RepoManager
+from repoManager.RepoSnapshot import RepoSnapshot
+from repoManager.RepoWatcher import PollingRepoWatcher
+
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+
+
+FS_STATE = {
+   "2024-01-14": {
+      "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+      "01:03:45.522668_Donkey Eat Chips": ["1.png"]
+   },
+   "2024-01-13": {
+      "03:03:45.522668_Fiona Eat Chips": ["1.png"],
+   }
+}
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+   deadline = time.monotonic() + timeout
+   while(time.monotonic() < deadline):
+      if(condition()):
+         return True
+      time.sleep(0.05)
+   return condition()
+
+
+def test_iterator_with_snapshot_matches_file_system(tmp_path: Path):
+   """
+   Given a snapshot of a repo
+   When iterated with and without the snapshot
+   Then both iterators return the same directories
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   snapshot = RepoSnapshot(tmp_path/TEST_REPO)
+
+   # Act
+   withSnapshot = list(DirectoryIterator(tmp_path/TEST_REPO, snapshot=snapshot))
+   withoutSnapshot = list(DirectoryIterator(tmp_path/TEST_REPO))
+
+   # Assert
+   assert [directory.prompt for directory in withSnapshot] == [directory.prompt for directory in withoutSnapshot]
+   assert [directory.prompt for directory in withSnapshot] == ["Shrek Eat Chips", "Donkey Eat Chips", "Fiona Eat Chips"]
+
+
+def test_snapshot_incremental_updates_keep_order(tmp_path: Path):
+   """
+   Given a snapshot of a repo
+   When directories are added and removed through the snapshot
+   Then listings stay reverse sorted without rescanning
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   snapshot = RepoSnapshot(tmp_path/TEST_REPO)
+   snapshot.get_sorted_time_prompts("2024-01-14")
+
+   # Act
+   snapshot.add_time_prompt("2024-01-14", "02:03:45.522668_Fiona Eat Chips")
+   snapshot.add_time_prompt("2024-01-15", "01:00:00.000000_Dragon Eat Chips")
+   snapshot.remove_date("2024-01-13")
+
+   # Assert
+   assert snapshot.get_sorted_dates() == ["2024-01-15", "2024-01-14"]
+   assert snapshot.get_sorted_time_prompts("2024-01-14") == ["03:03:45.522668_Shrek Eat Chips", "02:03:45.522668_Fiona Eat Chips", "01:03:45.522668_Donkey Eat Chips"]
+
+
+def test_snapshot_leaves_out_hidden_directories(tmp_path: Path):
+   """
+   Given a repo with hidden bookkeeping and temp directories
+   When listed by a snapshot and hidden directories are added to it
+   Then the hidden directories aren't listed and no change is reported
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   (tmp_path/TEST_REPO/".paiid").mkdir()
+   (tmp_path/TEST_REPO/"2024-01-14"/".01:00:00.000000_Temp.tmp").mkdir()
+   changedDates = []
+   snapshot = RepoSnapshot(tmp_path/TEST_REPO, onChange=changedDates.append)
+   snapshot.get_sorted_time_prompts("2024-01-14")
+   changedDates.clear()
+
+   # Act
+   snapshot.add_date(".tmp")
+   snapshot.add_time_prompt(".paiid", "counts")
+   snapshot.add_time_prompt("2024-01-14", ".02:00:00.000000_Temp.tmp")
+
+   # Assert
+   assert snapshot.get_sorted_dates() == ["2024-01-14", "2024-01-13"]
+   assert snapshot.get_sorted_time_prompts("2024-01-14") == ["03:03:45.522668_Shrek Eat Chips", "01:03:45.522668_Donkey Eat Chips"]
+   assert changedDates == []
+
+
+def test_polling_watcher_picks_up_external_changes(tmp_path: Path):
+   """
+   Given a polled snapshot
+   When directories are made and removed by another tool
+   Then the snapshot catches up and reports the changed dates
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   changedDates = []
+   snapshot = RepoSnapshot(tmp_path/TEST_REPO, onChange=changedDates.append)
+   snapshot.get_sorted_time_prompts("2024-01-14")
+   watcher = PollingRepoWatcher(snapshot, pollInterval=0.05)
+   watcher.start()
+
+   # Act
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-15": { "01:00:00.000000_Dragon Eat Chips": ["1.png"] } })
+   shutil.rmtree(tmp_path/TEST_REPO/"2024-01-14"/"01:03:45.522668_Donkey Eat Chips")
+
+   # Assert
+   try:
+      assert wait_until(lambda: snapshot.get_sorted_dates() == ["2024-01-15", "2024-01-14", "2024-01-13"])
+      assert wait_until(lambda: snapshot.get_sorted_time_prompts("2024-01-14") == ["03:03:45.522668_Shrek Eat Chips"])
+      assert "2024-01-15" in changedDates
+   finally:
+      watcher.stop()
+
+
+def test_watched_repo_manager_sees_external_changes(tmp_path: Path):
+   """
+   Given a repo manager watching its repo with cached pages
+   When another tool adds a prompt directory
+   Then the next page request includes it
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   repoManager = RepoManager(tmp_path, TEST_REPO, pageCacheBytes=1024 * 1024, watchRepo=True)
+   assert [result.prompt for result in repoManager.get_images(1).results] == ["Shrek Eat Chips"]
+
+   # Act
+   populate_dir_with(tmp_path/TEST_REPO, { "2024-01-15": { "01:00:00.000000_Dragon Eat Chips": ["1.png"] } })
+
+   # Assert
+   try:
+      assert wait_until(lambda: [result.prompt for result in repoManager.get_images(1).results] == ["Dragon Eat Chips"])
+   finally:
+      repoManager.stop_watching()
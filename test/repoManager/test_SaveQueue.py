@@ -0,0 +1,283 @@
+import io
+import threading
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from repoManager.Models import DeleteImagePrompsRequest
+from repoManager.RepoManager import RepoManager
+from repoManager.SaveQueue import SaveJob, SaveJournal, SaveQueue, generate_temp_path, write_images
+from repoManager.utils import is_image_file_name
+from utils.dateUtils import generate_ios_date_time_strs
+from utils.enums import LOAD_MODE
+from utils.imageFormats import detect_image_format
+from utils.imageUtils import THUMBNAIL_SIZES, generate_thumbnail_path
+from utils.pathingUtils import get_project_root
+
+
+TEST_REPO = "testRepo"
+TEST_IMAGE = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+
+
+def test_async_save_calls_back_once_written(tmp_path: Path):
+   """
+   Given a repo manager saving asynchronously
+   When an image is saved
+   Then the result is returned right away and the callback fires once the image is on disk
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO, asyncSaves=True)
+   imageBytes = TEST_IMAGE.read_bytes()
+   saved = threading.Event()
+   savedResults = []
+   def onSaved(saveResult):
+      savedResults.append(saveResult)
+      saved.set()
+
+   # Act
+   saveResult = repoManager.save_image("Sad rat", imageBytes, onSaved=onSaved)
+
+   # Assert
+   assert saved.wait(timeout=5)
+   assert savedResults == [saveResult]
+   imagePath = repoManager.current_repo_abs_path()/saveResult.date/(saveResult.time + "_Sad rat")/"1.png"
+   assert imagePath.read_bytes() == imageBytes
+   assert not generate_temp_path(imagePath).exists()
+   assert [result.prompt for result in repoManager.get_images(1).results] == ["Sad rat"]
+
+
+def test_queued_saves_written_in_batches(tmp_path: Path):
+   """
+   Given a save queue busy writing
+   When several saves arrive
+   Then they are all written and the journal is left empty
+   """
+   # Arrange
+   journal = SaveJournal(tmp_path/"journal.jsonl")
+   saveQueue = SaveQueue(journal=journal, maxBatch=4)
+   paths = [tmp_path/f"{num}.png" for num in range(1, 11)]
+
+   # Act
+   for path in paths:
+      saveQueue.submit(SaveJob(path, path.name.encode()))
+   saveQueue.wait()
+   saveQueue.shutdown()
+
+   # Assert
+   assert [path.read_bytes() for path in paths] == [path.name.encode() for path in paths]
+   assert journal.read_uncommitted() == []
+
+
+def test_replay_finishes_complete_writes_and_cleans_partial_ones(tmp_path: Path):
+   """
+   Given a journal with writes interrupted by a crash
+   When the journal is replayed
+   Then complete temp files are moved into place and partial ones are removed along with their empty directories
+   """
+   # Arrange
+   journal = SaveJournal(tmp_path/"journal.jsonl")
+   completeJob = SaveJob(tmp_path/"complete"/"1.png", b"complete image")
+   partialJob = SaveJob(tmp_path/"partial"/"1.png", b"partial image")
+   for job in [completeJob, partialJob]:
+      job.imagePath.parent.mkdir()
+   journal.begin([completeJob, partialJob])
+   generate_temp_path(completeJob.imagePath).write_bytes(b"complete image")
+   generate_temp_path(partialJob.imagePath).write_bytes(b"parti")
+
+   # Act
+   numRecovered = journal.replay()
+
+   # Assert
+   assert numRecovered == 1
+   assert completeJob.imagePath.read_bytes() == b"complete image"
+   assert not (tmp_path/"partial").exists()
+   assert journal.read_uncommitted() == []
+
+
+def test_journal_in_use_by_another_process_left_alone(tmp_path: Path):
+   """
+   Given a journal with a save in flight that is in use by another process
+   When a second process opens the journal, replays it and commits a save of its own
+   Then the in flight save is neither cleaned up nor dropped from the journal until the other process is done with it
+   """
+   # Arrange
+   journal = SaveJournal(tmp_path/"journal.jsonl")
+   inFlightJob = SaveJob(tmp_path/"inFlight"/"1.png", b"in flight image")
+   inFlightJob.imagePath.parent.mkdir()
+   journal.begin([inFlightJob])
+   generate_temp_path(inFlightJob.imagePath).write_bytes(b"in fli")
+
+   # Act
+   otherJournal = SaveJournal(tmp_path/"journal.jsonl")
+   numRecoveredWhileInUse = otherJournal.replay()
+   truncatedWhileInUse = otherJournal.truncate()
+   tempLeftWhileInUse = generate_temp_path(inFlightJob.imagePath).exists()
+   journal.close()
+   numRecovered = otherJournal.replay()
+
+   # Assert
+   assert numRecoveredWhileInUse == 0
+   assert not truncatedWhileInUse
+   assert tempLeftWhileInUse
+   assert numRecovered == 0
+   assert not (tmp_path/"inFlight").exists()
+   assert otherJournal.read_uncommitted() == []
+
+
+def test_jpeg_saved_unchanged_and_deletable(tmp_path: Path):
+   """
+   Given a provider returning a JPEG
+   When the image is saved and then deleted
+   Then it's written unchanged as a .jpg and deleting it removes the prompt directory
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   output = io.BytesIO()
+   with Image.open(TEST_IMAGE) as image:
+      image.convert("RGB").save(output, "JPEG")
+   imageBytes = output.getvalue()
+
+   # Act
+   saveResult = repoManager.save_image("Sad rat", imageBytes)
+   promptPath = repoManager.current_repo_abs_path()/saveResult.date/(saveResult.time + "_Sad rat")
+   savedBytes = (promptPath/"1.jpg").read_bytes()
+   repoManager.thumbnailWorker.wait()
+   numDeleted = repoManager.delete_image(DeleteImagePrompsRequest(prompt="Sad rat", repo=TEST_REPO, date=saveResult.date, time=saveResult.time, nums=["1"]))
+
+   # Assert
+   assert savedBytes == imageBytes
+   assert numDeleted == 1
+   assert not promptPath.exists()
+
+
+def test_image_saved_in_storage_format(tmp_path: Path):
+   """
+   Given a manager storing images as lossless WEBP
+   When a PNG is saved in the background
+   Then it's written as a .webp with exactly the same pixels
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO, asyncSaves=True, storageFormat="webp-lossless")
+
+   # Act
+   saveResult = repoManager.save_image("Sad rat", TEST_IMAGE.read_bytes())
+   repoManager.wait_for_saves()
+   promptPath = repoManager.current_repo_abs_path()/saveResult.date/(saveResult.time + "_Sad rat")
+
+   # Assert
+   assert [path.name for path in promptPath.iterdir() if is_image_file_name(path.name)] == ["1.webp"]
+   with Image.open(promptPath/"1.webp") as stored, Image.open(TEST_IMAGE) as original:
+      assert stored.convert("RGBA").tobytes() == original.convert("RGBA").tobytes()
+
+
+def test_undecodable_image_written_as_provided(tmp_path: Path):
+   """
+   Given a batch with bytes that aren't an image between two images to re-encode
+   When the batch is written
+   Then the bad bytes are written as provided and the images around them are still re-encoded
+   """
+   # Arrange
+   journal = SaveJournal(tmp_path/"journal.jsonl")
+   jobs = [
+      SaveJob(tmp_path/"first.webp", TEST_IMAGE.read_bytes(), transcodeTo="WEBP"),
+      SaveJob(tmp_path/"bad.webp", b"not an image at all", transcodeTo="WEBP"),
+      SaveJob(tmp_path/"last.webp", TEST_IMAGE.read_bytes(), transcodeTo="WEBP"),
+   ]
+
+   # Act
+   write_images(jobs, journal=journal)
+
+   # Assert
+   assert (tmp_path/"bad.webp").read_bytes() == b"not an image at all"
+   assert [detect_image_format((tmp_path/name).read_bytes()) for name in ["first.webp", "last.webp"]] == ["WEBP", "WEBP"]
+   assert journal.read_uncommitted() == []
+
+
+def test_save_of_undecodable_image_kept(tmp_path: Path):
+   """
+   Given a provider returning bytes that aren't an image
+   When they are saved
+   Then they are written as provided and the prompt directory is listed with its image
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+
+   # Act
+   saveResult = repoManager.save_image("bad", b"not an image at all")
+
+   # Assert
+   promptPath = repoManager.current_repo_abs_path()/saveResult.date/(saveResult.time + "_bad")
+   assert (promptPath/"1.png").read_bytes() == b"not an image at all"
+   assert [(result.prompt, result.num) for result in repoManager.get_images(1, loadMode=LOAD_MODE.METADATA).results] == [("bad", "1")]
+   assert repoManager.total_count() == 1
+
+
+def test_failed_save_reported_without_failing_batch(tmp_path: Path):
+   """
+   Given a save queue writing a batch where one image can't be written
+   When the batch is written in the background and the same image is saved on the calling thread
+   Then the rest of the batch is written, the failure is given to the failed image's callback and raised on the calling thread
+   """
+   # Arrange
+   journal = SaveJournal(tmp_path/"journal.jsonl")
+   saveQueue = SaveQueue(journal=journal)
+   (tmp_path/"notADirectory").write_bytes(b"")
+   failures = []
+   jobs = [
+      SaveJob(tmp_path/"first.png", b"first"),
+      SaveJob(tmp_path/"notADirectory"/"prompt"/"1.png", b"failed", onFailed=failures.append, makeDirectories=True),
+      SaveJob(tmp_path/"last.png", b"last"),
+   ]
+
+   # Act
+   for job in jobs:
+      saveQueue.submit(job)
+   saveQueue.wait()
+   saveQueue.shutdown()
+
+   # Assert
+   assert [(tmp_path/name).read_bytes() for name in ["first.png", "last.png"]] == [b"first", b"last"]
+   assert len(failures) == 1 and isinstance(failures[0], OSError)
+   assert journal.read_uncommitted() == []
+   with pytest.raises(OSError):
+      saveQueue.save(SaveJob(tmp_path/"notADirectory"/"prompt"/"1.png", b"failed", makeDirectories=True))
+
+
+def test_failed_save_leaves_nothing_behind(tmp_path: Path):
+   """
+   Given a repo where today's date can't be made a directory
+   When an image is saved
+   Then the error is raised and no prompt directory is listed or counted
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO)
+   (repoManager.current_repo_abs_path()/generate_ios_date_time_strs()[0]).write_bytes(b"")
+
+   # Act
+   with pytest.raises(OSError):
+      repoManager.save_image("Sad rat", TEST_IMAGE.read_bytes())
+
+   # Assert
+   assert repoManager.get_images(1).results == []
+   assert repoManager.total_count() == 0
+
+
+def test_close_writes_queued_saves(tmp_path: Path):
+   """
+   Given a repo manager saving asynchronously
+   When images are saved and the manager is closed right away
+   Then every image is written along with its thumbnails
+   """
+   # Arrange
+   repoManager = RepoManager(tmp_path, TEST_REPO, asyncSaves=True)
+
+   # Act
+   saveResults = [repoManager.save_image(prompt, TEST_IMAGE.read_bytes()) for prompt in ["Sad rat", "Shrek", "Donkey"]]
+   repoManager.close()
+
+   # Assert
+   for saveResult in saveResults:
+      imagePath = tmp_path/TEST_REPO/saveResult.date/(saveResult.time + "_" + saveResult.prompt)/"1.png"
+      assert imagePath.read_bytes() == TEST_IMAGE.read_bytes()
+      assert all(generate_thumbnail_path(imagePath, size).exists() for size in THUMBNAIL_SIZES)
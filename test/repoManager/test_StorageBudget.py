@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from repoManager.DateCounts import DateCountIndex
+from repoManager.RepoManager import RepoManager
+from repoManager.StorageBudget import StorageBudget, StorageJanitor
+from utils.enums import LOAD_MODE
+from utils.pathingUtils import get_project_root
+from utils_for_test import populate_dir_with
+
+
+TEST_REPO = "testRepo"
+TEST_IMAGE = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+FS_STATE = {
+   "2024-01-14": {
+      "05:05:05.000000_Shrek": ["1.png"],
+   },
+   "2024-01-13": {
+      "02:02:02.000000_Puss": ["1.png"],
+      "01:01:01.000000_Dragon": ["1.png"],
+   },
+   "2024-01-12": {
+      "06:06:06.000000_Farquaad": ["1.png"],
+   },
+}
+
+
+def test_janitor_evicts_oldest_dates_to_archive(tmp_path: Path):
+   """
+   Given a repo of 4 images over 3 dates with a budget of 2 images and an archive
+   When the budget is enforced
+   Then the oldest dates are moved to the archive until the repo is within budget
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   dateCounts = DateCountIndex(tmp_path/TEST_REPO, tmp_path/"counts.json")
+   janitor = StorageJanitor(dateCounts, StorageBudget(maxImages=2, archivePath=tmp_path/"archive"))
+
+   # Act
+   evicted = janitor.enforce()
+
+   # Assert
+   assert evicted == ["2024-01-12", "2024-01-13"]
+   assert dateCounts.total() == 1
+   assert sorted(path.name for path in (tmp_path/TEST_REPO).iterdir()) == ["2024-01-14"]
+   assert (tmp_path/"archive"/TEST_REPO/"2024-01-13"/"01:01:01.000000_Dragon"/"1.png").exists()
+
+
+def test_saves_over_budget_evict_in_background(tmp_path: Path):
+   """
+   Given a repo whose older dates hold most of a byte budget
+   When an image is saved that puts the repo over budget
+   Then the oldest date is evicted in the background, usage reflects it and the remaining images still page
+   """
+   # Arrange
+   populate_dir_with(tmp_path/TEST_REPO, FS_STATE)
+   imageSize = TEST_IMAGE.stat().st_size
+   repoManager = RepoManager(tmp_path, TEST_REPO, useCatalog=True, storageBudget=StorageBudget(maxBytes=imageSize * 4 + imageSize // 2))
+   repoManager.wait_for_janitor()
+   usageBefore = repoManager.get_storage_usage()
+
+   # Act
+   repoManager.save_image("Fiona", TEST_IMAGE.read_bytes())
+   repoManager.wait_for_saves()
+   repoManager.wait_for_janitor()
+   usageAfter = repoManager.get_storage_usage()
+   page = repoManager.get_images(10, loadMode=LOAD_MODE.METADATA)
+
+   # Assert
+   assert usageBefore.bytes == imageSize * 4 and usageBefore.images == 4
+   assert usageAfter.images == 4 and usageAfter.bytes <= usageAfter.maxBytes
+   assert not (tmp_path/TEST_REPO/"2024-01-12").exists()
+   assert [result.prompt for result in page.results] == ["Fiona", "Shrek", "Puss", "Dragon"]
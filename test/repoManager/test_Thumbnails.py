@@ -0,0 +1,124 @@
+import io
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from depdencyInjection.Container import Container
+from repoManager.Models import DeleteImagePrompsRequest, ImagePromptDirectory
+from repoManager.RepoManager import RepoManager
+from repoManager.Thumbnails import backfill_thumbnails, find_images_missing_thumbnails
+from utils.imageUtils import THUMBNAIL_SIZES, generate_thumbnail_path
+from utils.pathingUtils import get_project_root, read_file_as_bytes
+from utils_for_test import populate_dir_with, populate_fs_with
+from pyfakefs.fake_filesystem import FakeFilesystem
+
+
+TEST_IMAGE = (get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png").resolve()
+
+
+def test_save_image_builds_thumbnails(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given an empty repo
+   When an image is saved
+   Then thumbnails are built next to it and aren't listed as images
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+   fs.add_real_file(TEST_IMAGE)
+
+   # Act
+   saveResult = repoManager.save_image("Sad rat", read_file_as_bytes(TEST_IMAGE))
+   repoManager.thumbnailWorker.wait()
+
+   # Assert
+   imagePath = repoManager.current_repo_abs_path()/saveResult.date/(saveResult.time + "_Sad rat")/"1.png"
+   for size in THUMBNAIL_SIZES:
+      with Image.open(generate_thumbnail_path(imagePath, size)) as thumbnail:
+         assert max(thumbnail.size) == size
+
+   [onlyResult] = repoManager.get_images(1).results
+   assert len(onlyResult.images) == 1
+
+
+def test_get_thumbnails_builds_missing(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given an image saved without thumbnails
+   When get_thumbnails called
+   Then thumbnail returned and cached next to the image
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+
+   fsState = {
+      "2024-01-14": {
+         "03:03:45.522668_Shrek Eat Chips": ["1.png"]
+      }
+   }
+   populate_fs_with(fs,repoManager.current_repo_abs_path(), dateDictStructure=fsState)
+   directory = ImagePromptDirectory(prompt="Shrek Eat Chips", repo="testRepo", date="2024-01-14", time="03:03:45.522668")
+
+   # Act
+   [thumbnailBytes] = repoManager.get_thumbnails(directory, size=75)
+
+   # Assert
+   with Image.open(io.BytesIO(thumbnailBytes)) as thumbnail:
+      assert max(thumbnail.size) == THUMBNAIL_SIZES[0]
+   imagePath = repoManager.current_repo_abs_path()/"2024-01-14"/"03:03:45.522668_Shrek Eat Chips"/"1.png"
+   assert os.path.exists(generate_thumbnail_path(imagePath, THUMBNAIL_SIZES[0]))
+
+
+def test_delete_image_removes_thumbnails(containerWithMocks: Container, fs: FakeFilesystem):
+   """
+   Given an image with thumbnails
+   When the image is deleted
+   Then its whole prompt directory is removed
+   """
+
+   # Arrange
+   repoManager: RepoManager = containerWithMocks.repoManager()
+
+   fsState = {
+      "2024-01-14": {
+         "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+         "01:03:45.522668_Donkey Eat Chips": ["1.png"]
+      }
+   }
+   populate_fs_with(fs,repoManager.current_repo_abs_path(), dateDictStructure=fsState)
+   directory = ImagePromptDirectory(prompt="Shrek Eat Chips", repo="testRepo", date="2024-01-14", time="03:03:45.522668")
+   repoManager.get_thumbnails(directory)
+
+   # Act
+   numDeleted = repoManager.delete_image(DeleteImagePrompsRequest(prompt="Shrek Eat Chips", repo="testRepo", date="2024-01-14", time="03:03:45.522668", nums=["1"]))
+
+   # Assert
+   assert numDeleted == 1
+   assert not os.path.exists(repoManager.current_repo_abs_path()/"2024-01-14"/"03:03:45.522668_Shrek Eat Chips")
+
+
+def test_backfill_thumbnails(tmp_path: Path):
+   """
+   Given a repo made before thumbnails existed
+   When thumbnails backfilled
+   Then every image gets its thumbnails
+   """
+
+   # Arrange
+   fsState = {
+      "2024-01-14": {
+         "03:03:45.522668_Shrek Eat Chips": ["1.png"],
+      },
+      "2024-01-13": {
+         "03:03:45.522668_Fiona Eat Chips": ["1.png", "2.png"],
+      }
+   }
+   populate_dir_with(tmp_path/"testRepo", fsState)
+
+   # Act
+   numBuilt = backfill_thumbnails(tmp_path/"testRepo", maxWorkers=2)
+
+   # Assert
+   assert numBuilt == 3
+   assert find_images_missing_thumbnails(tmp_path/"testRepo") == []
@@ -37,6 +37,7 @@ def test_gallery_loads_correctly(containerWithMocks: Container, qtbot: QtBot, fs
     # Assert   
     while ( gallery.isVisible() is False ):
         QTest.qWait(200)
+    qtbot.waitUntil(lambda : not gallery.gallery.is_loading())
 
     assert gallery.gallery.contentWidget.layout().count() == 0
     assert gallery.forward_page_button.isEnabled() is False
@@ -81,6 +82,7 @@ def test_gallery_loads_with_images(containerWithMocks: Container, qtbot: QtBot,
     # Assert   
     while ( gallery.isVisible() is False ):
         QTest.qWait(200)
+    qtbot.waitUntil(lambda : not gallery.gallery.is_loading())
 
     assert gallery.forward_page_button.isEnabled()
     assert gallery.backward_page_button.isEnabled() is False
@@ -126,6 +128,7 @@ def test_gallery_forward_button_click(containerWithMocks: Container, qtbot: QtBo
     gallery.show()
     while ( gallery.isVisible() is False ):
         QTest.qWait(200)
+    qtbot.waitUntil(lambda : not gallery.gallery.is_loading())
 
     # Act
     QTest.mouseClick(gallery.forward_page_button, Qt.LeftButton)
@@ -133,6 +136,7 @@ def test_gallery_forward_button_click(containerWithMocks: Container, qtbot: QtBo
     # Assert
     while ( gallery.forward_page_button.isEnabled() ):
         QTest.qWait(200)
+    qtbot.waitUntil(lambda : not gallery.gallery.is_loading())
 
     assert gallery.forward_page_button.isEnabled() is False
     assert gallery.backward_page_button.isEnabled()
@@ -140,3 +144,33 @@ def test_gallery_forward_button_click(containerWithMocks: Container, qtbot: QtBo
     assert gallery.gallery.contentWidget.layout().itemAt(0).widget() is not None
     assert gallery.gallery.contentWidget.layout().itemAt(1).widget() is not None
     assert gallery.current_page.text == "2"
+
+
+@pytest.mark.timeout(10)
+def test_gallery_rows_shown_while_page_is_read(qtbot: QtBot):
+    """
+    Given a page of images that is still being read
+    When the gallery displays it
+    Then the first row is shown before the rest of the page is read
+    """
+
+    # Arrange
+    from ui.widgets.gallery.GalleryDisplay import GalleryDisplay
+    from repoManager.Models import ImagePrompResult
+
+    display = GalleryDisplay()
+    qtbot.addWidget(display)
+
+    rowsShownWhenRead = []
+    def read_page():
+        for i in range(3):
+            rowsShownWhenRead.append(display.contentWidget.layout().count())
+            yield ImagePrompResult(f"Shrek {i}", "testRepo", "2024-01-14", f"0{i}:00:00.000000", "1", [])
+
+    # Act
+    display.replace_display(read_page())
+    qtbot.waitUntil(lambda : not display.is_loading())
+
+    # Assert
+    assert rowsShownWhenRead == [0, 1, 2]
+    assert display.contentWidget.layout().count() == 3
@@ -1,7 +1,7 @@
 from typing import Dict, List
 from utils.enums import DIRECTION
 
-from utils.algoUtils import get_next_string_index_from_reverse_sorted
+from utils.algoUtils import FenwickTree, get_next_string_index_from_reverse_sorted
 
 TimeWithPromptDictType = Dict[str, List[str]]
 DateDictType = Dict[str, TimeWithPromptDictType]
@@ -130,3 +130,24 @@ def test_rewind_backwards():
     assert index == 1
     assert index2 == 0
 
+
+def test_fenwick_tree_find():
+    """
+    Given counts with an empty count in the middle
+    When positions are found before and after updating a count
+    Then each position maps to the count it falls in and its offset within it
+    """
+    # Arrange
+    tree = FenwickTree([3, 0, 2, 5])
+
+    # Act
+    before = [tree.find(position) for position in [0, 2, 3, 4, 5, 9, 10]]
+    tree.add(1, 4)
+    after = [tree.find(position) for position in [3, 6, 7]]
+
+    # Assert
+    assert before == [(0, 0), (0, 2), (2, 0), (2, 1), (3, 0), (3, 4), None]
+    assert tree.total() == 14
+    assert tree.prefix_sum(2) == 7
+    assert after == [(1, 0), (1, 3), (2, 0)]
+
@@ -0,0 +1,120 @@
+from io import BytesIO
+
+from PIL import Image
+
+from utils.imageFormats import STORAGE_FORMATS, can_pass_through, detect_image_format, has_valid_header, read_image_dimensions, transcode_image
+from utils.pathingUtils import get_project_root
+
+
+TEST_IMAGE = get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png"
+
+
+def encode_test_image(format: str) -> bytes:
+    with Image.open(TEST_IMAGE) as image:
+        output = BytesIO()
+        image.convert("RGB").save(output, format)
+        return output.getvalue()
+
+
+def test_detect_image_format():
+    """
+    Given images encoded in every passthrough format
+    When their format detected
+    Then the format matches how they were encoded
+    """
+    # Arrange
+    formats = ["PNG", "JPEG", "WEBP"]
+
+    # Act
+    detected = [detect_image_format(encode_test_image(format)) for format in formats]
+
+    # Assert
+    assert detected == formats
+    assert detect_image_format(b"GIF89a") is None
+
+
+def test_truncated_images_are_not_passed_through():
+    """
+    Given images cut short as if a download was interrupted
+    When checked for passthrough
+    Then none of them are passed through
+    """
+    # Arrange
+    truncated = [encode_test_image(format)[:-100] for format in ["PNG", "JPEG", "WEBP"]]
+
+    # Act
+    results = [can_pass_through(image) for image in truncated]
+
+    # Assert
+    assert results == [None, None, None]
+
+
+def test_valid_images_pass_through():
+    """
+    Given the provider test image
+    When checked for passthrough
+    Then it's passed through as a PNG
+    """
+    # Arrange
+    imageBytes = TEST_IMAGE.read_bytes()
+
+    # Act
+    format = can_pass_through(imageBytes)
+
+    # Assert
+    assert format == "PNG"
+    assert has_valid_header(imageBytes, "PNG")
+
+
+def test_transcode_image():
+    """
+    Given a GIF
+    When transcoded to PNG
+    Then a valid PNG is returned
+    """
+    # Arrange
+    output = BytesIO()
+    Image.new("RGB", (4, 4)).save(output, "GIF")
+
+    # Act
+    transcoded = transcode_image(output.getvalue(), "PNG")
+
+    # Assert
+    assert can_pass_through(transcoded) == "PNG"
+
+
+def test_storage_formats_detected_and_passed_through():
+    """
+    Given the test image encoded in every storage format
+    When their format is detected
+    Then each is recognized as the format it was stored in and passes through when that format is allowed
+    """
+    # Arrange
+    imageBytes = TEST_IMAGE.read_bytes()
+
+    # Act
+    stored = dict((name, transcode_image(imageBytes, format, options)) for name, (format, options) in STORAGE_FORMATS.items())
+
+    # Assert
+    for name, (format, _) in STORAGE_FORMATS.items():
+        assert detect_image_format(stored[name]) == format
+        assert can_pass_through(stored[name], allowedFormats={format}) == format
+    assert len(stored["webp-lossless"]) < len(imageBytes)
+
+
+def test_dimensions_read_from_headers():
+    """
+    Given the test image encoded in every storage format and as a JPEG
+    When its dimensions are read from only the start of the encoded bytes
+    Then they match the decoded image
+    """
+    # Arrange
+    with Image.open(TEST_IMAGE) as image:
+        expected = image.size
+    encoded = [transcode_image(TEST_IMAGE.read_bytes(), format, options) for format, options in STORAGE_FORMATS.values()] + [encode_test_image("JPEG")]
+
+    # Act
+    dimensions = [read_image_dimensions(imageBytes[:1024]) for imageBytes in encoded]
+
+    # Assert
+    assert dimensions == [expected] * len(encoded)
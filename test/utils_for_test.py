@@ -1,5 +1,6 @@
 from typing import Union, Dict, List
 import os
+import shutil
 from pathlib import Path
 from pyfakefs.fake_filesystem import FakeFilesystem 
 from utils.pathingUtils import get_project_root
@@ -28,4 +29,20 @@ def populate_fs_with(fs: FakeFilesystem, path: Union[Path, str], dateDictStructu
             fs.create_dir(directory_path=path/date/timePrompt)
             for image in images:
                 # Use a real image to simplify the test
-                fs.add_real_file(source_path=get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png", target_path=path/date/timePrompt/image)
\ No newline at end of file
+                fs.add_real_file(source_path=get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png", target_path=path/date/timePrompt/image)
+
+def populate_dir_with(path: Union[Path, str], dateDictStructure : DateDictType):
+    """
+    Same as populate_fs_with but populates a real directory (like one made by the tmp_path fixture) instead of a fake file system.
+
+    Needed for code that can't run against a fake file system, like SQLite databases.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for date, timePrompts in dateDictStructure.items():
+        (path/date).mkdir(exist_ok=True)
+        for timePrompt, images in timePrompts.items():
+            (path/date/timePrompt).mkdir()
+            for image in images:
+                # Use a real image to simplify the test
+                shutil.copyfile(get_project_root()/'..'/'testResources'/'images'/'ai'/"test1.png", path/date/timePrompt/image)